@@ -3,21 +3,30 @@ import sys
 
 import click
 import requests
-from ckan.common import config
 from ckan.model import meta
 from ckan.plugins import toolkit
 
+import ckanext.feedback.services.common.event_log as event_log_service
 import ckanext.feedback.services.common.upload as upload_service
+import ckanext.feedback.services.package.summary as package_summary_service
+import ckanext.feedback.services.ranking.cache as ranking_cache_service
+import ckanext.feedback.services.ranking.dataset as ranking_service
 import ckanext.feedback.services.resource.comment as comment_service
+import ckanext.feedback.services.resource.summary as resource_summary_service
 import ckanext.feedback.services.utilization.details as detail_service
+import ckanext.feedback.services.utilization.summary as utilization_summary_service
 from ckanext.feedback.controllers.api.moral_check_log import (
     generate_moral_check_log_excel_bytes,
 )
 from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
+from ckanext.feedback.models.event import FeedbackEvent, FeedbackEventRollup
 from ckanext.feedback.models.issue import IssueResolution, IssueResolutionSummary
 from ckanext.feedback.models.likes import ResourceLike, ResourceLikeMonthly
+from ckanext.feedback.models.package_summary import PackageFeedbackSummary
+from ckanext.feedback.models.ranking import PackageMetricMonthly, PackageTrendingScore
 from ckanext.feedback.models.resource_comment import (
     ResourceComment,
+    ResourceCommentMonthly,
     ResourceCommentMoralCheckLog,
     ResourceCommentReactions,
     ResourceCommentReply,
@@ -26,38 +35,25 @@ from ckanext.feedback.models.resource_comment import (
 from ckanext.feedback.models.utilization import (
     Utilization,
     UtilizationComment,
+    UtilizationCommentMonthly,
     UtilizationCommentMoralCheckLog,
     UtilizationCommentReply,
     UtilizationSummary,
 )
+from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.common.search_index import (
+    clear_solr_schema_setup_stamps,
+    get_solr_url,
+    invalidate_solr_field_cache,
+    rebuild_search_index,
+    reindex_count_fields,
+    setup_solr_schema,
+)
 
 # Solr configuration constants
 FEEDBACK_SOLR_FIELDS = ['downloads_total_i', 'likes_total_i']
 
 
-def get_solr_url():
-    """
-    Get Solr URL from CKAN config.
-
-    Checks multiple possible config keys in order:
-    1. ckan.solr_url (CKAN standard)
-    2. solr_url (alternative)
-    3. Default fallback
-    """
-    # Try CKAN standard config key first
-    solr_url = config.get('ckan.solr_url')
-    if solr_url:
-        return solr_url
-
-    # Try alternative config key
-    solr_url = config.get('solr_url')
-    if solr_url:
-        return solr_url
-
-    # Fallback to default (for development environments)
-    return 'http://solr:8983/solr/ckan'
-
-
 def get_solr_schema_api():
     """Get Solr schema API URL from config."""
     solr_url = get_solr_url()
@@ -112,6 +108,7 @@ def drop_utilization_tables(engine):
     IssueResolutionSummary.__table__.drop(engine, checkfirst=True)
     IssueResolution.__table__.drop(engine, checkfirst=True)
     UtilizationCommentMoralCheckLog.__table__.drop(engine, checkfirst=True)
+    UtilizationCommentMonthly.__table__.drop(engine, checkfirst=True)
     UtilizationSummary.__table__.drop(engine, checkfirst=True)
     UtilizationCommentReply.__table__.drop(engine, checkfirst=True)
     UtilizationComment.__table__.drop(engine, checkfirst=True)
@@ -123,16 +120,21 @@ def create_utilization_tables(engine):
     UtilizationComment.__table__.create(engine, checkfirst=True)
     UtilizationCommentReply.__table__.create(engine, checkfirst=True)
     UtilizationSummary.__table__.create(engine, checkfirst=True)
+    UtilizationCommentMonthly.__table__.create(engine, checkfirst=True)
     UtilizationCommentMoralCheckLog.__table__.create(engine, checkfirst=True)
     IssueResolution.__table__.create(engine, checkfirst=True)
     IssueResolutionSummary.__table__.create(engine, checkfirst=True)
 
 
 def drop_resource_tables(engine):
+    PackageTrendingScore.__table__.drop(engine, checkfirst=True)
+    PackageMetricMonthly.__table__.drop(engine, checkfirst=True)
+    PackageFeedbackSummary.__table__.drop(engine, checkfirst=True)
     ResourceCommentMoralCheckLog.__table__.drop(engine, checkfirst=True)
     ResourceCommentReactions.__table__.drop(engine, checkfirst=True)
     ResourceLikeMonthly.__table__.drop(engine, checkfirst=True)
     ResourceLike.__table__.drop(engine, checkfirst=True)
+    ResourceCommentMonthly.__table__.drop(engine, checkfirst=True)
     ResourceCommentSummary.__table__.drop(engine, checkfirst=True)
     ResourceCommentReply.__table__.drop(engine, checkfirst=True)
     ResourceComment.__table__.drop(engine, checkfirst=True)
@@ -142,13 +144,19 @@ def create_resource_tables(engine):
     ResourceComment.__table__.create(engine, checkfirst=True)
     ResourceCommentReply.__table__.create(engine, checkfirst=True)
     ResourceCommentSummary.__table__.create(engine, checkfirst=True)
+    ResourceCommentMonthly.__table__.create(engine, checkfirst=True)
     ResourceLike.__table__.create(engine, checkfirst=True)
     ResourceLikeMonthly.__table__.create(engine, checkfirst=True)
     ResourceCommentReactions.__table__.create(engine, checkfirst=True)
     ResourceCommentMoralCheckLog.__table__.create(engine, checkfirst=True)
+    PackageFeedbackSummary.__table__.create(engine, checkfirst=True)
+    PackageMetricMonthly.__table__.create(engine, checkfirst=True)
+    PackageTrendingScore.__table__.create(engine, checkfirst=True)
 
 
 def drop_download_tables(engine):
+    FeedbackEventRollup.__table__.drop(engine, checkfirst=True)
+    FeedbackEvent.__table__.drop(engine, checkfirst=True)
     DownloadMonthly.__table__.drop(engine, checkfirst=True)
     DownloadSummary.__table__.drop(engine, checkfirst=True)
 
@@ -156,6 +164,242 @@ def drop_download_tables(engine):
 def create_download_tables(engine):
     DownloadSummary.__table__.create(engine, checkfirst=True)
     DownloadMonthly.__table__.create(engine, checkfirst=True)
+    FeedbackEvent.__table__.create(engine, checkfirst=True)
+    FeedbackEventRollup.__table__.create(engine, checkfirst=True)
+
+
+@feedback.command(
+    name='rollup', short_help='fold recorded download and like events into counts.'
+)
+@click.option(
+    '-b',
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help='Number of event ids folded per transaction.',
+)
+@click.option(
+    '-s',
+    '--settle-seconds',
+    type=click.IntRange(min=0),
+    default=60,
+    show_default=True,
+    help='Leave events newer than this for the next run.',
+)
+def rollup(batch_size, settle_seconds):
+    try:
+        folded = event_log_service.rollup_events(
+            batch_size=batch_size, settle_seconds=settle_seconds
+        )
+    except Exception as e:
+        toolkit.error_shout(e)
+        sys.exit(1)
+    click.secho(f'Folded {folded} feedback events: SUCCESS', fg='green', bold=True)
+
+
+@feedback.command(
+    name='rebuild-package-summary',
+    short_help='recompute the feedback stats of every package.',
+)
+@click.option(
+    '-b',
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help='Number of packages recomputed per transaction.',
+)
+def rebuild_package_summary(batch_size):
+    try:
+        rebuilt = package_summary_service.rebuild_package_feedback_summary(
+            batch_size=batch_size
+        )
+    except Exception as e:
+        toolkit.error_shout(e)
+        sys.exit(1)
+    click.secho(
+        f'Rebuilt feedback stats of {rebuilt} packages: SUCCESS',
+        fg='green',
+        bold=True,
+    )
+
+
+@feedback.command(
+    name='rollup-ranking',
+    short_help='recompute the monthly counts read by the dataset ranking.',
+)
+@click.option(
+    '-s',
+    '--since',
+    type=click.DateTime(formats=['%Y-%m']),
+    default=None,
+    help='Only recompute the months from this one (YYYY-MM).',
+)
+def rollup_ranking(since):
+    try:
+        written = ranking_service.rebuild_package_metric_monthly(
+            since=since.date() if since else None
+        )
+    except Exception as e:
+        toolkit.error_shout(e)
+        sys.exit(1)
+    click.secho(
+        f'Rolled up {written} monthly ranking counts: SUCCESS',
+        fg='green',
+        bold=True,
+    )
+
+
+@feedback.command(
+    name='rollup-comments',
+    short_help='recompute the monthly comment counts used by the dataset ranking.',
+)
+@click.option(
+    '-b',
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help='Number of resources whose counts are committed together.',
+)
+def rollup_comments(batch_size):
+    try:
+        written = resource_summary_service.rebuild_resource_comment_monthly(
+            batch_size=batch_size
+        )
+        written += utilization_summary_service.rebuild_utilization_comment_monthly(
+            batch_size=batch_size
+        )
+        ranking_cache_service.invalidate_ranking_cache()
+    except Exception as e:
+        toolkit.error_shout(e)
+        sys.exit(1)
+    click.secho(
+        f'Rolled up {written} monthly comment counts: SUCCESS',
+        fg='green',
+        bold=True,
+    )
+
+
+@feedback.command(
+    name='reindex',
+    short_help='rebuild the search index with feedback counts loaded in bulk.',
+)
+@click.option(
+    '-c',
+    '--chunk-size',
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help='Number of packages whose counts are loaded together.',
+)
+@click.option(
+    '-f',
+    '--force',
+    is_flag=True,
+    help='Keep reindexing the other packages when one fails.',
+)
+def reindex(chunk_size, force):
+    try:
+        result = rebuild_search_index(chunk_size=chunk_size, force=force)
+    except Exception as e:
+        toolkit.error_shout(e)
+        sys.exit(1)
+
+    if result.failed:
+        toolkit.error_shout(
+            f'Failed to reindex {len(result.failed)} of {result.total} packages: '
+            f'{", ".join(result.failed)}'
+        )
+        sys.exit(1)
+    click.secho(f'Reindexed {result.total} packages: SUCCESS', fg='green', bold=True)
+
+
+@feedback.command(
+    name='reindex-counts',
+    short_help='update the feedback count fields in Solr from the database.',
+)
+@click.option(
+    '-b',
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=500,
+    show_default=True,
+    help='Number of packages sent to Solr per request.',
+)
+@click.option(
+    '-w',
+    '--workers',
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help='Number of requests sent to Solr at the same time.',
+)
+@click.option(
+    '--start-after',
+    default=None,
+    help='Skip the packages up to this package id, to resume a previous run.',
+)
+@click.option(
+    '--dry-run',
+    is_flag=True,
+    help='Read the counts without updating Solr.',
+)
+def reindex_counts(batch_size, workers, start_after, dry_run):
+    prefix = '[DRY RUN] ' if dry_run else ''
+
+    def echo_progress(progress):
+        message = f'{prefix}{progress.packages}/{progress.total} packages'
+        if progress.resume_after:
+            message += f' (resume with --start-after {progress.resume_after})'
+        click.echo(message)
+
+    try:
+        progress = reindex_count_fields(
+            batch_size=batch_size,
+            workers=workers,
+            start_after=start_after,
+            dry_run=dry_run,
+            on_progress=echo_progress,
+        )
+    except Exception as e:
+        toolkit.error_shout(e)
+        sys.exit(1)
+
+    if progress.missing:
+        click.secho(
+            f'{progress.missing} packages are not in the search index, '
+            'run ckan search-index rebuild --only-missing',
+            fg='yellow',
+        )
+    if progress.failed:
+        toolkit.error_shout(
+            f'Failed to update {progress.failed} packages, '
+            f'resume with --start-after {progress.resume_after}'
+        )
+        sys.exit(1)
+    click.secho(
+        f'{prefix}Updated feedback counts of {progress.updated} packages: SUCCESS',
+        fg='green',
+        bold=True,
+    )
+
+
+@feedback.command(
+    name='validate-config', short_help='check a feedback_config.json file.'
+)
+@click.argument('path', required=False, type=click.Path(dir_okay=False))
+def validate_config(path):
+    '''Check PATH, or the feedback_config.json in use, without loading it.'''
+    fb_config = FeedbackConfig()
+    path = path or fb_config.get_feedback_config_file()
+    errors = fb_config.validate_feedback_config_file(path)
+    if errors:
+        for error in errors:
+            toolkit.error_shout(error)
+        sys.exit(1)
+    click.secho(f'{path} is valid: SUCCESS', fg='green', bold=True)
 
 
 @feedback.command(
@@ -266,6 +510,21 @@ def moral_check_log(separation, output):
         raise click.Abort()
 
 
+@feedback.command(
+    name='setup-solr-fields',
+    short_help='add the feedback fields to the Solr schema.',
+)
+def setup_solr_fields():
+    '''Add the fields for sorting by the enabled features, if missing.'''
+    if not FeedbackConfig().custom_sort.is_enable():
+        toolkit.error_shout('custom_sort is disabled in feedback_config.json')
+        sys.exit(1)
+    if not setup_solr_schema():
+        toolkit.error_shout('Failed to set up the Solr fields, see the log')
+        sys.exit(1)
+    click.secho('Set up Solr fields: SUCCESS', fg='green', bold=True)
+
+
 @feedback.command(
     name='reset-solr-fields',
     short_help='Delete feedback Solr fields (requires reindex after).',
@@ -317,6 +576,11 @@ def reset_solr_fields(yes):
                 click.secho(f'  ✗ Error: {field_name} - {e}', fg='red')
                 error_count += 1
 
+        # Neither this process nor the running workers may use the deleted fields
+        invalidate_solr_field_cache()
+        # Added again when the workers of this node restart
+        clear_solr_schema_setup_stamps(get_solr_url())
+
         click.echo()
         if deleted_count > 0:
             click.secho('✓ Fields deleted successfully!', fg='green', bold=True)
@@ -27,6 +27,7 @@ from ckanext.feedback.services.common.check import (
     has_organization_admin_role,
 )
 from ckanext.feedback.services.organization import organization as organization_service
+from ckanext.feedback.services.ranking import cache as ranking_cache_service
 
 log = logging.getLogger(__name__)
 
@@ -426,6 +427,8 @@ class AdminController:
             )
             return 0
 
+        # The deleted comments are left out of the ranking
+        ranking_cache_service.invalidate_ranking_cache()
         return len(target)
 
     @staticmethod
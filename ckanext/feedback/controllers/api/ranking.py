@@ -8,11 +8,15 @@ from ckan.logic import side_effect_free
 from ckan.plugins import toolkit
 from dateutil.relativedelta import relativedelta
 
+import ckanext.feedback.services.ranking.cache as ranking_cache_service
 import ckanext.feedback.services.ranking.dataset as dataset_ranking_service
 from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
 from ckanext.feedback.models.likes import ResourceLike, ResourceLikeMonthly
-from ckanext.feedback.models.resource_comment import ResourceCommentSummary
-from ckanext.feedback.models.utilization import Utilization
+from ckanext.feedback.models.resource_comment import (
+    ResourceCommentMonthly,
+    ResourceCommentSummary,
+)
+from ckanext.feedback.models.utilization import Utilization, UtilizationCommentMonthly
 from ckanext.feedback.services.common.config import FeedbackConfig
 from ckanext.feedback.services.organization import organization as organization_service
 
@@ -41,6 +45,7 @@ class RankingConfig:
         'likes',
         'resource_comments',
         'utilization_comments',
+        'trending',
     ]
 
 
@@ -157,6 +162,14 @@ class RankingValidator:
                 {"message": "This is a non-existent aggregation metric."}
             )
 
+    def validate_aggregation_metrics(self, aggregation_metrics):
+        if not aggregation_metrics:
+            raise toolkit.ValidationError(
+                {"message": "Please specify at least one aggregation metric."}
+            )
+        for aggregation_metric in aggregation_metrics:
+            self.validate_aggregation_metric(aggregation_metric)
+
     def validate_download_function(self):
         if not FeedbackConfig().download.is_enable():
             raise toolkit.ValidationError(
@@ -201,6 +214,17 @@ class RankingValidator:
                 }
             )
 
+    def validate_trending_function(self):
+        if not FeedbackConfig().ranking_rollup.is_enable():
+            raise toolkit.ValidationError(
+                {
+                    "message": (
+                        "Trending ranking is off. "
+                        "Please contact the site administrator for assistance."
+                    )
+                }
+            )
+
     def validate_organization_name_in_group(self, organization_name):
         org_name = organization_service.get_organization_name_by_name(organization_name)
 
@@ -330,38 +354,94 @@ class DatasetRankingService:
         if organization_name:
             self.validator.validate_organization_name_in_group(organization_name)
 
+        source = self._get_ranking_source(metric, organization_name)
+        return self._get_ranking(
+            metric,
+            source,
+            top_ranked_limit,
+            start_year_month,
+            end_year_month,
+            organization_name,
+        )
+
+    def get_dataset_rankings(
+        self,
+        metrics,
+        top_ranked_limit,
+        start_year_month,
+        end_year_month,
+        organization_name,
+    ):
+        """
+        Get the rankings of several metrics, keyed by metric. The
+        organization and the metrics are all validated before any ranking
+        is aggregated.
+        """
+        if organization_name:
+            self.validator.validate_organization_name_in_group(organization_name)
+
+        sources = {
+            metric: self._get_ranking_source(metric, organization_name)
+            for metric in metrics
+        }
+        return {
+            metric: self._get_ranking(
+                metric,
+                source,
+                top_ranked_limit,
+                start_year_month,
+                end_year_month,
+                organization_name,
+            )
+            for metric, source in sources.items()
+        }
+
+    def _get_ranking_source(self, metric, organization_name):
+        """
+        Validate that the metric can be ranked, for the organization when it
+        is given, and return its period model and column and its total
+        model and column, or None for the trending metric.
+        """
         if metric == 'download':
             self.validator.validate_download_function()
-            enable_orgs = FeedbackConfig().download.get_enable_org_names()
+            metric_config = FeedbackConfig().download
             period_model = DownloadMonthly
             period_column = "download_count"
             total_model = DownloadSummary
             total_column = "download"
         elif metric == 'likes':
             self.validator.validate_likes_function()
-            enable_orgs = FeedbackConfig().like.get_enable_org_names()
+            metric_config = FeedbackConfig().like
             period_model = ResourceLikeMonthly
             period_column = "like_count"
             total_model = ResourceLike
             total_column = "like_count"
         elif metric == 'resource_comments':
             self.validator.validate_resource_comments_function()
-            enable_orgs = FeedbackConfig().resource_comment.get_enable_org_names()
-            period_model = ResourceCommentSummary
-            period_column = "comment"
+            metric_config = FeedbackConfig().resource_comment
+            period_model = ResourceCommentMonthly
+            period_column = "comment_count"
             total_model = ResourceCommentSummary
             total_column = "comment"
         elif metric == 'utilization_comments':
             self.validator.validate_utilization_comments_function()
-            enable_orgs = FeedbackConfig().utilization_comment.get_enable_org_names()
-            period_model = Utilization
-            period_column = "comment"
+            metric_config = FeedbackConfig().utilization_comment
+            period_model = UtilizationCommentMonthly
+            period_column = "comment_count"
             total_model = Utilization
             total_column = "comment"
+        elif metric == 'trending':
+            # Combines every metric, so no single function or
+            # organization setting applies
+            self.validator.validate_trending_function()
+            return None
         else:
             raise toolkit.ValidationError({"message": "Invalid metric specified."})
 
         if organization_name:
+            # Listing the enabled organizations reads every organization, so
+            # it is only done when one is selected
+            enable_orgs = metric_config.get_enable_org_names()
             if metric == 'likes':
                 self.validator.validate_organization_likes_enabled(
                     organization_name, enable_orgs
@@ -379,16 +459,48 @@ class DatasetRankingService:
                     organization_name, enable_orgs
                 )
 
-        get_ranking_result = dataset_ranking_service.get_generic_ranking(
-            top_ranked_limit,
+        return period_model, period_column, total_model, total_column
+
+    def _get_ranking(
+        self,
+        metric,
+        source,
+        top_ranked_limit,
+        start_year_month,
+        end_year_month,
+        organization_name,
+    ):
+        if source is None:
+            return ranking_cache_service.get_cached_ranking(
+                metric,
+                start_year_month,
+                end_year_month,
+                organization_name,
+                top_ranked_limit,
+                lambda: dataset_ranking_service.get_trending_ranking(
+                    top_ranked_limit, organization_name=organization_name
+                ),
+            )
+
+        period_model, period_column, total_model, total_column = source
+        get_ranking_result = ranking_cache_service.get_cached_ranking(
+            metric,
             start_year_month,
             end_year_month,
-            period_model,
-            period_column,
-            total_model,
-            total_column,
-            enable_org=None,
-            organization_name=organization_name,
+            organization_name,
+            top_ranked_limit,
+            lambda: dataset_ranking_service.get_generic_ranking(
+                top_ranked_limit,
+                start_year_month,
+                end_year_month,
+                period_model,
+                period_column,
+                total_model,
+                total_column,
+                enable_org=None,
+                organization_name=organization_name,
+                metric=metric,
+            ),
         )
         return get_ranking_result
 
@@ -415,9 +527,13 @@ class DatasetRankingService:
                 'dataset_title': dataset_title,
                 'dataset_notes': dataset_notes,
                 'dataset_link': dataset_link,
-                f'{metric_name}_count_by_period': count_by_period,
-                f'total_{metric_name}_count': total_count,
             }
+            if metric_name == 'trending':
+                # The score takes the place of the count by period
+                dataset_ranking_dict['trending_score'] = round(count_by_period, 2)
+            else:
+                dataset_ranking_dict[f'{metric_name}_count_by_period'] = count_by_period
+                dataset_ranking_dict[f'total_{metric_name}_count'] = total_count
 
             dataset_ranking_list.append(dataset_ranking_dict)
 
@@ -443,7 +559,13 @@ class DatasetRankingController:
             params['start_year_month'],
             params['end_year_month'],
         )
-        self.validator.validate_aggregation_metric(params['aggregation_metric'])
+        aggregation_metric = params['aggregation_metric']
+        if isinstance(aggregation_metric, list):
+            return self._get_datasets_rankings(
+                params, aggregation_metric, start_year_month, end_year_month
+            )
+
+        self.validator.validate_aggregation_metric(aggregation_metric)
 
         results = self.ranking_service.get_dataset_ranking(
             metric=params['aggregation_metric'],
@@ -457,6 +579,26 @@ class DatasetRankingController:
             results, metric_name=params['aggregation_metric']
         )
 
+    def _get_datasets_rankings(
+        self, params, aggregation_metrics, start_year_month, end_year_month
+    ):
+        self.validator.validate_aggregation_metrics(aggregation_metrics)
+
+        results = self.ranking_service.get_dataset_rankings(
+            metrics=list(dict.fromkeys(aggregation_metrics)),
+            top_ranked_limit=params['top_ranked_limit'],
+            start_year_month=start_year_month,
+            end_year_month=end_year_month,
+            organization_name=params['organization_name'],
+        )
+
+        return {
+            metric: self.ranking_service.generate_dataset_ranking_list(
+                rows, metric_name=metric
+            )
+            for metric, rows in results.items()
+        }
+
     def _extract_parameters(self, data_dict):
         return {
             'top_ranked_limit': data_dict.get(
@@ -0,0 +1,20 @@
+from ckan.logic import side_effect_free
+from ckan.plugins import toolkit
+
+from ckanext.feedback.services.common import cache as stats_cache_service
+
+
+@side_effect_free
+def feedback_stats_cache_status(context, data_dict):
+    """
+    Return the hit and miss counts of the feedback stats cache of the web
+    worker that handles the request, to help sizing the cache.
+    """
+    toolkit.check_access('sysadmin', context, data_dict)
+
+    if not stats_cache_service.is_stats_cache_enabled():
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        **stats_cache_service.get_stats_cache().get_status(),
+    }
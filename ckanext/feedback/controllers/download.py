@@ -7,31 +7,18 @@ import requests
 from ckan.plugins import toolkit
 from flask import Response, request
 
-from ckanext.feedback.models.session import session
 from ckanext.feedback.services.common import config as feedback_config
-from ckanext.feedback.services.download.monthly import (
-    increment_resource_downloads_monthly,
+from ckanext.feedback.services.download.counter import count_download
+from ckanext.feedback.services.download.dedupe import should_count_download
+from ckanext.feedback.services.download.proxy import (
+    is_proxy_stream_enabled,
+    stream_external_resource,
 )
-from ckanext.feedback.services.download.summary import increment_resource_downloads
 from ckanext.feedback.services.resource.comment import get_resource
 
 log = logging.getLogger(__name__)
 
 
-def _update_package_search_index(package_id):
-    """
-    Update Solr index for a specific package.
-    This is needed when download/like counts change without package metadata changing.
-    """
-    try:
-        from ckan.lib.search import rebuild
-
-        rebuild(package_id)
-        log.debug(f"Updated search index for package {package_id}")
-    except Exception as e:
-        log.warning(f"Failed to update search index for package {package_id}: {e}")
-
-
 class DownloadController:
     # extend default download function to count when a resource is downloaded
     @staticmethod
@@ -40,21 +27,11 @@ class DownloadController:
             filename = get_resource(resource_id).Resource.url
 
         user_download = toolkit.asbool(request.args.get('user-download'))
-        if request.headers.get('Sec-Fetch-Dest') == 'document' or user_download:
-            try:
-                increment_resource_downloads(resource_id)
-                increment_resource_downloads_monthly(resource_id)
-                session.commit()
-
-                # Update Solr index to reflect new download count
-                _update_package_search_index(id)
-            except Exception as e:
-                session.rollback()
-                log.warning(f'Transaction rolled back for resource {resource_id}')
-                log.exception(
-                    f'Failed to increment download count for resource '
-                    f'{resource_id}: {e}'
-                )
+        is_download = (
+            request.headers.get('Sec-Fetch-Dest') == 'document' or user_download
+        )
+        if is_download and should_count_download(resource_id):
+            count_download(resource_id, package_id=id)
 
         handler = feedback_config.download_handler()
         if not handler:
@@ -70,19 +47,28 @@ class DownloadController:
             if response.status_code == 302:
                 url = response.headers.get('Location')
                 filename = os.path.basename(urlparse(url).path)
-                try:
-                    redirect_response = requests.get(url, allow_redirects=True)
-                    external_response = Response(
-                        redirect_response.content,
-                        headers=dict(redirect_response.headers),
-                        content_type=redirect_response.headers['Content-Type'],
-                    )
-                except requests.exceptions.ConnectionError:
-                    log.exception(f'Cannot connect to external resource. URL[{url}]')
-                    return response
-                if external_response.status_code != 200:
-                    log.exception(f'Failure to acquire external resource. URL[{url}]')
-                    return response
+                if is_proxy_stream_enabled():
+                    external_response = stream_external_resource(url)
+                    if external_response is None:
+                        return response
+                else:
+                    try:
+                        redirect_response = requests.get(url, allow_redirects=True)
+                        external_response = Response(
+                            redirect_response.content,
+                            headers=dict(redirect_response.headers),
+                            content_type=redirect_response.headers['Content-Type'],
+                        )
+                    except requests.exceptions.ConnectionError:
+                        log.exception(
+                            f'Cannot connect to external resource. URL[{url}]'
+                        )
+                        return response
+                    if external_response.status_code != 200:
+                        log.exception(
+                            f'Failure to acquire external resource. URL[{url}]'
+                        )
+                        return response
                 response = external_response
 
             c_d_value = response.headers.get('Content-Disposition')
@@ -23,6 +23,7 @@ from ckanext.feedback.controllers.cookie import (
     set_repeat_post_limit_cookie,
 )
 from ckanext.feedback.controllers.pagination import get_pagination_value
+from ckanext.feedback.models.event import FeedbackEventKind
 from ckanext.feedback.models.resource_comment import ResourceCommentCategory
 from ckanext.feedback.models.session import session
 from ckanext.feedback.models.types import (
@@ -40,6 +41,8 @@ from ckanext.feedback.services.common.check import (
     require_package_access,
 )
 from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.common.event_log import add_event, is_event_log_enabled
+from ckanext.feedback.services.common.search_index import update_package_search_index
 from ckanext.feedback.services.common.send_mail import send_email
 from ckanext.feedback.services.common.upload import upload_image_with_validation
 from ckanext.feedback.services.recaptcha.check import is_recaptcha_verified
@@ -51,20 +54,6 @@ log = logging.getLogger(__name__)
 _session = session
 
 
-def _update_package_search_index(package_id):
-    """
-    Update Solr index for a specific package.
-    This is needed when download/like counts change without package metadata changing.
-    """
-    try:
-        from ckan.lib.search import rebuild
-
-        rebuild(package_id)
-        log.debug(f"Updated search index for package {package_id}")
-    except Exception as e:
-        log.warning(f"Failed to update search index for package {package_id}: {e}")
-
-
 class FormFields:
     """Form field name constants"""
 
@@ -887,13 +876,17 @@ class ResourceController:
             else str(like_status_raw).lower() == 'true'
         )
 
+        event_log_enabled = is_event_log_enabled()
+
         def operation():
-            if like_status:
-                likes_service.increment_resource_like_count(resource_id)
-                likes_service.increment_resource_like_count_monthly(resource_id)
+            if event_log_enabled:
+                # Counts are updated by `ckan feedback rollup`
+                kind = (
+                    FeedbackEventKind.LIKE if like_status else FeedbackEventKind.UNLIKE
+                )
+                add_event(resource_id, kind)
             else:
-                likes_service.decrement_resource_like_count(resource_id)
-                likes_service.decrement_resource_like_count_monthly(resource_id)
+                likes_service.toggle_resource_like_count(resource_id, like_status)
 
         result = ResourceController._persist_operation(
             operation, resource_id, 'Failed to toggle like.'
@@ -905,11 +898,12 @@ class ResourceController:
             )
 
         # Update Solr index to reflect new like count
-        try:
-            resource = comment_service.get_resource(resource_id)
-            _update_package_search_index(resource.Resource.package_id)
-        except Exception as e:
-            log.warning(f"Failed to update search index after like toggle: {e}")
+        if not event_log_enabled:
+            try:
+                resource = comment_service.get_resource(resource_id)
+                update_package_search_index(resource.Resource.package_id)
+            except Exception as e:
+                log.warning(f"Failed to update search index after like toggle: {e}")
 
         resp = Response('OK', status=HTTPStatus.OK, mimetype='text/plain')
         return set_like_status_cookie(resp, resource_id, like_status)
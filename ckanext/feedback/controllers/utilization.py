@@ -40,6 +40,7 @@ from ckanext.feedback.services.common.check import (
 from ckanext.feedback.services.common.config import FeedbackConfig
 from ckanext.feedback.services.common.send_mail import send_email
 from ckanext.feedback.services.common.upload import upload_image_with_validation
+from ckanext.feedback.services.ranking import cache as ranking_cache_service
 from ckanext.feedback.services.recaptcha.check import is_recaptcha_verified
 from ckanext.feedback.utils.auth import create_auth_context
 
@@ -1170,6 +1171,8 @@ class UtilizationController:
                 'utilization.details', utilization_id=utilization_id
             )
 
+        # The deleted comments are left out of the ranking
+        ranking_cache_service.invalidate_ranking_cache()
         helpers.flash_success(
             _('The utilization has been successfully deleted.'),
             allow_html=True,
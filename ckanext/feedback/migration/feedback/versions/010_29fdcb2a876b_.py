@@ -0,0 +1,100 @@
+"""Add month period and unique constraints to monthly counter tables
+
+Tables affected:
+- download_monthly
+- resource_like_monthly
+
+Rows are back-filled with the month of their created timestamp and
+duplicate rows of the same resource and month are merged into one.
+
+Revision ID: 29fdcb2a876b
+Revises: 80347650eb3a
+Create Date: 2026-10-18 09:12:40.518204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '29fdcb2a876b'
+down_revision = '80347650eb3a'
+branch_labels = None
+depends_on = None
+
+
+def merge_monthly_duplicates(table, count_column):
+    conn = op.get_bind()
+
+    conn.execute(f"""
+        UPDATE {table}
+        SET period = date_trunc('month', COALESCE(created, updated, NOW()))::date
+        WHERE period IS NULL;
+    """)
+
+    # Keep the row with the smallest id of each (resource_id, period) group
+    # and fold the counts of the others into it
+    conn.execute(f"""
+        UPDATE {table} AS keep
+        SET {count_column} = merged.total,
+            created = merged.created,
+            updated = merged.updated
+        FROM (
+            SELECT resource_id,
+                   period,
+                   MIN(id) AS keep_id,
+                   SUM(COALESCE({count_column}, 0)) AS total,
+                   MIN(created) AS created,
+                   MAX(updated) AS updated
+            FROM {table}
+            GROUP BY resource_id, period
+            HAVING COUNT(*) > 1
+        ) AS merged
+        WHERE keep.id = merged.keep_id;
+    """)
+    conn.execute(f"""
+        DELETE FROM {table} AS duplicate
+        USING {table} AS keep
+        WHERE duplicate.resource_id = keep.resource_id
+          AND duplicate.period = keep.period
+          AND duplicate.id > keep.id;
+    """)
+
+
+def upgrade():
+    op.add_column('download_monthly', sa.Column('period', sa.Date(), nullable=True))
+    op.add_column(
+        'resource_like_monthly', sa.Column('period', sa.Date(), nullable=True)
+    )
+
+    merge_monthly_duplicates('download_monthly', 'download_count')
+    merge_monthly_duplicates('resource_like_monthly', 'like_count')
+
+    op.alter_column('download_monthly', 'period', nullable=False)
+    op.alter_column('resource_like_monthly', 'period', nullable=False)
+
+    op.create_unique_constraint(
+        'uq_download_monthly_resource_id_period',
+        'download_monthly',
+        ['resource_id', 'period'],
+    )
+    op.create_unique_constraint(
+        'uq_resource_like_monthly_resource_id_period',
+        'resource_like_monthly',
+        ['resource_id', 'period'],
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        'uq_resource_like_monthly_resource_id_period',
+        'resource_like_monthly',
+        type_='unique',
+    )
+    op.drop_constraint(
+        'uq_download_monthly_resource_id_period',
+        'download_monthly',
+        type_='unique',
+    )
+    op.drop_column('resource_like_monthly', 'period')
+    op.drop_column('download_monthly', 'period')
@@ -0,0 +1,60 @@
+"""Add append-only feedback event log
+
+Tables affected:
+- feedback_event
+- feedback_event_rollup
+
+Revision ID: cee5943b374c
+Revises: 29fdcb2a876b
+Create Date: 2026-10-18 13:20:11.402317
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from ckanext.feedback.models.event import FeedbackEventKind
+
+# revision identifiers, used by Alembic.
+revision = 'cee5943b374c'
+down_revision = '29fdcb2a876b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'feedback_event',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column(
+            'resource_id',
+            sa.Text(),
+            sa.ForeignKey('resource.id', onupdate='CASCADE', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column(
+            'kind',
+            sa.Enum(FeedbackEventKind, name='feedback_event_kind'),
+            nullable=False,
+        ),
+        sa.Column('ts', sa.TIMESTAMP(), nullable=False),
+    )
+    op.create_index('ix_feedback_event_resource_id', 'feedback_event', ['resource_id'])
+    op.create_table(
+        'feedback_event_rollup',
+        sa.Column('name', sa.Text(), primary_key=True, nullable=False),
+        sa.Column(
+            'last_event_id',
+            sa.BigInteger(),
+            server_default=sa.text('0'),
+            nullable=False,
+        ),
+        sa.Column('updated', sa.TIMESTAMP()),
+    )
+
+
+def downgrade():
+    op.drop_table('feedback_event_rollup')
+    op.drop_index('ix_feedback_event_resource_id', table_name='feedback_event')
+    op.drop_table('feedback_event')
+    op.execute('DROP TYPE IF EXISTS feedback_event_kind;')
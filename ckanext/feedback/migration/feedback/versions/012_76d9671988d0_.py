@@ -0,0 +1,63 @@
+"""Add package feedback summary table
+
+Tables affected:
+- package_feedback_summary
+
+The table is filled by `ckan feedback rebuild-package-summary`.
+
+Revision ID: 76d9671988d0
+Revises: cee5943b374c
+Create Date: 2026-10-18 15:04:27.193846
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '76d9671988d0'
+down_revision = 'cee5943b374c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'package_feedback_summary',
+        sa.Column(
+            'package_id',
+            sa.Text(),
+            sa.ForeignKey('package.id', onupdate='CASCADE', ondelete='CASCADE'),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column(
+            'like_count', sa.Integer(), server_default=sa.text('0'), nullable=False
+        ),
+        sa.Column(
+            'downloads', sa.Integer(), server_default=sa.text('0'), nullable=False
+        ),
+        sa.Column(
+            'utilizations', sa.Integer(), server_default=sa.text('0'), nullable=False
+        ),
+        sa.Column(
+            'comments', sa.Integer(), server_default=sa.text('0'), nullable=False
+        ),
+        sa.Column(
+            'total_rating', sa.Float(), server_default=sa.text('0'), nullable=False
+        ),
+        sa.Column(
+            'rating_comment', sa.Integer(), server_default=sa.text('0'), nullable=False
+        ),
+        sa.Column(
+            'issue_resolutions',
+            sa.Integer(),
+            server_default=sa.text('0'),
+            nullable=False,
+        ),
+        sa.Column('updated', sa.TIMESTAMP()),
+    )
+
+
+def downgrade():
+    op.drop_table('package_feedback_summary')
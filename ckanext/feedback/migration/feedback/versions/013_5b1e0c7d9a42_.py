@@ -0,0 +1,50 @@
+"""Add package metric monthly table
+
+Tables affected:
+- package_metric_monthly
+
+The table is filled by `ckan feedback rollup-ranking`.
+
+Revision ID: 5b1e0c7d9a42
+Revises: 76d9671988d0
+Create Date: 2026-10-18 18:42:09.516204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0c7d9a42'
+down_revision = '76d9671988d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'package_metric_monthly',
+        sa.Column(
+            'package_id',
+            sa.Text(),
+            sa.ForeignKey('package.id', onupdate='CASCADE', ondelete='CASCADE'),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column('metric', sa.Text(), primary_key=True, nullable=False),
+        sa.Column('month', sa.Date(), primary_key=True, nullable=False),
+        sa.Column('count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('updated', sa.TIMESTAMP()),
+    )
+    op.create_index(
+        'ix_package_metric_monthly_metric_month',
+        'package_metric_monthly',
+        ['metric', 'month'],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_package_metric_monthly_metric_month', table_name='package_metric_monthly'
+    )
+    op.drop_table('package_metric_monthly')
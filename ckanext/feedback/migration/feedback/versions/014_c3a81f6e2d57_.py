@@ -0,0 +1,46 @@
+"""Add package trending score table
+
+Tables affected:
+- package_trending_score
+
+The table is filled by `ckan feedback rollup-ranking`.
+
+Revision ID: c3a81f6e2d57
+Revises: 5b1e0c7d9a42
+Create Date: 2026-10-18 19:27:41.803152
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c3a81f6e2d57'
+down_revision = '5b1e0c7d9a42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'package_trending_score',
+        sa.Column(
+            'package_id',
+            sa.Text(),
+            sa.ForeignKey('package.id', onupdate='CASCADE', ondelete='CASCADE'),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column('score', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('updated', sa.TIMESTAMP()),
+    )
+    op.create_index(
+        'ix_package_trending_score_score', 'package_trending_score', ['score']
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_package_trending_score_score', table_name='package_trending_score'
+    )
+    op.drop_table('package_trending_score')
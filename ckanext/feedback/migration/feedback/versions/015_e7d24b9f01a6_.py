@@ -0,0 +1,93 @@
+"""Add monthly comment tables
+
+Tables affected:
+- resource_comment_monthly
+- utilization_comment_monthly
+
+Rows are back-filled from the approved comments, by the month of their
+approval.
+
+Revision ID: e7d24b9f01a6
+Revises: c3a81f6e2d57
+Create Date: 2026-10-18 21:04:15.362918
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e7d24b9f01a6'
+down_revision = 'c3a81f6e2d57'
+branch_labels = None
+depends_on = None
+
+
+def create_monthly_comment_table(table):
+    op.create_table(
+        table,
+        sa.Column('id', sa.Text(), primary_key=True, nullable=False),
+        sa.Column(
+            'resource_id',
+            sa.Text(),
+            sa.ForeignKey('resource.id', onupdate='CASCADE', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('comment_count', sa.Integer()),
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('created', sa.TIMESTAMP()),
+        sa.Column('updated', sa.TIMESTAMP()),
+        sa.UniqueConstraint(
+            'resource_id', 'period', name=f'uq_{table}_resource_id_period'
+        ),
+    )
+
+
+def upgrade():
+    create_monthly_comment_table('resource_comment_monthly')
+    create_monthly_comment_table('utilization_comment_monthly')
+
+    conn = op.get_bind()
+    conn.execute("""
+        INSERT INTO resource_comment_monthly
+            (id, resource_id, comment_count, period, created, updated)
+        SELECT md5(random()::text || clock_timestamp()::text)::uuid::text,
+               resource_id,
+               COUNT(*),
+               date_trunc('month', COALESCE(approved, created))::date,
+               MIN(COALESCE(approved, created)),
+               NOW()
+        FROM resource_comment
+        WHERE approval AND content IS NOT NULL
+        GROUP BY resource_id, date_trunc('month', COALESCE(approved, created));
+    """)
+    conn.execute("""
+        INSERT INTO utilization_comment_monthly
+            (id, resource_id, comment_count, period, created, updated)
+        SELECT md5(random()::text || clock_timestamp()::text)::uuid::text,
+               utilization.resource_id,
+               COUNT(*),
+               date_trunc(
+                   'month',
+                   COALESCE(utilization_comment.approved, utilization_comment.created)
+               )::date,
+               MIN(
+                   COALESCE(utilization_comment.approved, utilization_comment.created)
+               ),
+               NOW()
+        FROM utilization_comment
+        JOIN utilization ON utilization.id = utilization_comment.utilization_id
+        WHERE utilization_comment.approval
+        GROUP BY utilization.resource_id,
+                 date_trunc(
+                     'month',
+                     COALESCE(
+                         utilization_comment.approved, utilization_comment.created
+                     )
+                 );
+    """)
+
+
+def downgrade():
+    op.drop_table('utilization_comment_monthly')
+    op.drop_table('resource_comment_monthly')
@@ -1,10 +1,32 @@
+from datetime import datetime
+
 from ckan.model.resource import Resource
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, Text
+from sqlalchemy import (
+    TIMESTAMP,
+    Column,
+    Date,
+    ForeignKey,
+    Integer,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from ckanext.feedback.models.session import Base
 
 
+def get_month_period(dt=None):
+    dt = dt or datetime.now()
+    if isinstance(dt, str):
+        dt = datetime.fromisoformat(dt)
+    return dt.date().replace(day=1)
+
+
+def default_month_period(context):
+    # Fall back to the month of `created` for rows inserted without a period
+    return get_month_period(context.get_current_parameters().get('created'))
+
+
 class DownloadSummary(Base):
     __tablename__ = 'download_summary'
     id = Column(Text, primary_key=True, nullable=False)
@@ -23,6 +45,11 @@ class DownloadSummary(Base):
 
 class DownloadMonthly(Base):
     __tablename__ = 'download_monthly'
+    __table_args__ = (
+        UniqueConstraint(
+            'resource_id', 'period', name='uq_download_monthly_resource_id_period'
+        ),
+    )
     id = Column(Text, primary_key=True, nullable=False)
     resource_id = Column(
         Text,
@@ -30,6 +57,7 @@ class DownloadMonthly(Base):
         nullable=False,
     )
     download_count = Column(Integer)
+    period = Column(Date, nullable=False, default=default_month_period)
     created = Column(TIMESTAMP)
     updated = Column(TIMESTAMP)
 
@@ -0,0 +1,37 @@
+import enum
+from datetime import datetime
+
+from ckan.model.resource import Resource
+from sqlalchemy import TIMESTAMP, BigInteger, Column, Enum, ForeignKey, Index, Text
+from sqlalchemy.orm import relationship
+
+from ckanext.feedback.models.session import Base
+
+
+class FeedbackEventKind(enum.Enum):
+    DOWNLOAD = 'download'
+    LIKE = 'like'
+    UNLIKE = 'unlike'
+
+
+class FeedbackEvent(Base):
+    __tablename__ = 'feedback_event'
+    __table_args__ = (Index('ix_feedback_event_resource_id', 'resource_id'),)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    resource_id = Column(
+        Text,
+        ForeignKey('resource.id', onupdate='CASCADE', ondelete='CASCADE'),
+        nullable=False,
+    )
+    kind = Column(Enum(FeedbackEventKind, name='feedback_event_kind'), nullable=False)
+    ts = Column(TIMESTAMP, nullable=False, default=datetime.now)
+
+    resource = relationship(Resource)
+
+
+class FeedbackEventRollup(Base):
+    # High-water mark of the events already folded into the summary tables
+    __tablename__ = 'feedback_event_rollup'
+    name = Column(Text, primary_key=True, nullable=False)
+    last_event_id = Column(BigInteger, nullable=False, default=0)
+    updated = Column(TIMESTAMP)
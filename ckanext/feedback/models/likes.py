@@ -2,9 +2,18 @@ import uuid
 from datetime import datetime
 
 from ckan.model.resource import Resource
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, Text
+from sqlalchemy import (
+    TIMESTAMP,
+    Column,
+    Date,
+    ForeignKey,
+    Integer,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
+from ckanext.feedback.models.download import default_month_period
 from ckanext.feedback.models.session import Base
 
 
@@ -26,6 +35,11 @@ class ResourceLike(Base):
 
 class ResourceLikeMonthly(Base):
     __tablename__ = 'resource_like_monthly'
+    __table_args__ = (
+        UniqueConstraint(
+            'resource_id', 'period', name='uq_resource_like_monthly_resource_id_period'
+        ),
+    )
     id = Column(Text, default=uuid.uuid4, primary_key=True, nullable=False)
     resource_id = Column(
         Text,
@@ -33,6 +47,7 @@ class ResourceLikeMonthly(Base):
         nullable=False,
     )
     like_count = Column(Integer)
+    period = Column(Date, nullable=False, default=default_month_period)
     created = Column(TIMESTAMP)
     updated = Column(TIMESTAMP)
 
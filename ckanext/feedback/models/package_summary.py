@@ -0,0 +1,29 @@
+from ckan.model.package import Package
+from sqlalchemy import TIMESTAMP, Column, Float, ForeignKey, Integer, Text
+from sqlalchemy.orm import relationship
+
+from ckanext.feedback.models.session import Base
+
+
+class PackageFeedbackSummary(Base):
+    # Feedback stats of the active resources of a package, kept in step with
+    # the resource-level summary tables
+    __tablename__ = 'package_feedback_summary'
+    package_id = Column(
+        Text,
+        ForeignKey('package.id', onupdate='CASCADE', ondelete='CASCADE'),
+        primary_key=True,
+        nullable=False,
+    )
+    like_count = Column(Integer, nullable=False, default=0)
+    downloads = Column(Integer, nullable=False, default=0)
+    utilizations = Column(Integer, nullable=False, default=0)
+    comments = Column(Integer, nullable=False, default=0)
+    # Sum of rating * rating_comment, so that the package rating is the
+    # average weighted by the number of rated comments
+    total_rating = Column(Float, nullable=False, default=0)
+    rating_comment = Column(Integer, nullable=False, default=0)
+    issue_resolutions = Column(Integer, nullable=False, default=0)
+    updated = Column(TIMESTAMP)
+
+    package = relationship(Package)
@@ -0,0 +1,43 @@
+from ckan.model.package import Package
+from sqlalchemy import TIMESTAMP, Column, Date, Float, ForeignKey, Index, Integer, Text
+from sqlalchemy.orm import relationship
+
+from ckanext.feedback.models.session import Base
+
+
+class PackageMetricMonthly(Base):
+    # Monthly counts of the ranking metrics of a package, summed over its
+    # active resources by `ckan feedback rollup-ranking`
+    __tablename__ = 'package_metric_monthly'
+    __table_args__ = (
+        Index('ix_package_metric_monthly_metric_month', 'metric', 'month'),
+    )
+    package_id = Column(
+        Text,
+        ForeignKey('package.id', onupdate='CASCADE', ondelete='CASCADE'),
+        primary_key=True,
+        nullable=False,
+    )
+    metric = Column(Text, primary_key=True, nullable=False)
+    month = Column(Date, primary_key=True, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    updated = Column(TIMESTAMP)
+
+    package = relationship(Package)
+
+
+class PackageTrendingScore(Base):
+    # Time-decayed sum of the monthly counts of a package, recomputed from
+    # package_metric_monthly by `ckan feedback rollup-ranking`
+    __tablename__ = 'package_trending_score'
+    __table_args__ = (Index('ix_package_trending_score_score', 'score'),)
+    package_id = Column(
+        Text,
+        ForeignKey('package.id', onupdate='CASCADE', ondelete='CASCADE'),
+        primary_key=True,
+        nullable=False,
+    )
+    score = Column(Float, nullable=False, default=0)
+    updated = Column(TIMESTAMP)
+
+    package = relationship(Package)
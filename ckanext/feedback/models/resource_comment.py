@@ -8,14 +8,17 @@ from sqlalchemy import (
     BOOLEAN,
     TIMESTAMP,
     Column,
+    Date,
     Enum,
     Float,
     ForeignKey,
     Integer,
     Text,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 
+from ckanext.feedback.models.download import default_month_period
 from ckanext.feedback.models.session import Base
 from ckanext.feedback.models.types import (
     MoralCheckAction,
@@ -108,6 +111,31 @@ class ResourceCommentSummary(Base):
     resource = relationship(Resource)
 
 
+class ResourceCommentMonthly(Base):
+    # Approved comments of a resource by the month they were approved in
+    __tablename__ = 'resource_comment_monthly'
+    __table_args__ = (
+        UniqueConstraint(
+            'resource_id',
+            'period',
+            name='uq_resource_comment_monthly_resource_id_period',
+        ),
+    )
+    id = Column(Text, default=uuid.uuid4, primary_key=True, nullable=False)
+    resource_id = Column(
+        Text,
+        ForeignKey('resource.id', onupdate='CASCADE', ondelete='CASCADE'),
+        nullable=False,
+    )
+    comment_count = Column(Integer)
+    period = Column(Date, nullable=False, default=default_month_period)
+    # the first approval of the month
+    created = Column(TIMESTAMP)
+    updated = Column(TIMESTAMP)
+
+    resource = relationship(Resource)
+
+
 class ResourceCommentReactions(Base):
     __tablename__ = 'resource_comment_reactions'
     id = Column(Text, default=uuid.uuid4, primary_key=True, nullable=False)
@@ -4,9 +4,20 @@ from datetime import datetime
 
 from ckan.model.resource import Resource
 from ckan.model.user import User
-from sqlalchemy import BOOLEAN, TIMESTAMP, Column, Enum, ForeignKey, Integer, Text
+from sqlalchemy import (
+    BOOLEAN,
+    TIMESTAMP,
+    Column,
+    Date,
+    Enum,
+    ForeignKey,
+    Integer,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
+from ckanext.feedback.models.download import default_month_period
 from ckanext.feedback.models.session import Base
 from ckanext.feedback.models.types import MoralCheckAction
 
@@ -112,6 +123,32 @@ class UtilizationSummary(Base):
     resource = relationship(Resource)
 
 
+class UtilizationCommentMonthly(Base):
+    # Approved utilization comments of a resource by the month they were
+    # approved in
+    __tablename__ = 'utilization_comment_monthly'
+    __table_args__ = (
+        UniqueConstraint(
+            'resource_id',
+            'period',
+            name='uq_utilization_comment_monthly_resource_id_period',
+        ),
+    )
+    id = Column(Text, default=uuid.uuid4, primary_key=True, nullable=False)
+    resource_id = Column(
+        Text,
+        ForeignKey('resource.id', onupdate='CASCADE', ondelete='CASCADE'),
+        nullable=False,
+    )
+    comment_count = Column(Integer)
+    period = Column(Date, nullable=False, default=default_month_period)
+    # the first approval of the month
+    created = Column(TIMESTAMP)
+    updated = Column(TIMESTAMP)
+
+    resource = relationship(Resource)
+
+
 class UtilizationCommentMoralCheckLog(Base):
     __tablename__ = 'utilization_comment_moral_check_log'
     id = Column(Text, default=uuid.uuid4, primary_key=True, nullable=False)
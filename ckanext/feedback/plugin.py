@@ -1,8 +1,6 @@
 import logging
 from typing import Any, Dict, Optional
 
-import ckan.model as model
-import requests
 from ckan import plugins
 from ckan.common import _, config
 from ckan.lib import helpers as core_helpers
@@ -13,12 +11,21 @@ from ckan.types import PUploader
 from ckanext.feedback.command import feedback
 from ckanext.feedback.components.comment import CommentComponent
 from ckanext.feedback.controllers.api import ranking as get_action_controllers
+from ckanext.feedback.controllers.api import stats_cache as stats_cache_controllers
 from ckanext.feedback.controllers.resource import ResourceController
+from ckanext.feedback.services.common import cache as stats_cache_service
 from ckanext.feedback.services.common import check
-from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.common import search_index as search_index_service
+from ckanext.feedback.services.common.config import (
+    CONFIG_RELOAD_INTERVAL,
+    FeedbackConfig,
+)
 from ckanext.feedback.services.common.upload import FeedbackUpload
 from ckanext.feedback.services.download import summary as download_summary_service
+from ckanext.feedback.services.package import owner as package_owner_service
 from ckanext.feedback.services.package import summary as package_summary_service
+from ckanext.feedback.services.ranking import cache as ranking_cache_service
+from ckanext.feedback.services.ranking import dataset as ranking_service
 from ckanext.feedback.services.resource import comment as comment_service
 from ckanext.feedback.services.resource import likes as resource_likes_service
 from ckanext.feedback.services.resource import summary as resource_summary_service
@@ -29,6 +36,11 @@ from ckanext.feedback.views import admin, api, download, likes, resource, utiliz
 log = logging.getLogger(__name__)
 
 
+def _reload_feedback_config():
+    # Returns None so that Flask goes on with the request
+    FeedbackConfig().reload_feedback_config_if_changed()
+
+
 class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
     # Declare class implements
     plugins.implements(plugins.IConfigurer)
@@ -40,6 +52,7 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
     plugins.implements(plugins.IResourceController, inherit=True)
     plugins.implements(plugins.IActions)
     plugins.implements(plugins.IUploader, inherit=True)
+    plugins.implements(plugins.IMiddleware, inherit=True)
 
     # IConfigurer
 
@@ -55,8 +68,13 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         self.fb_config = FeedbackConfig()
         self.fb_config.load_feedback_config()
 
-        # Setup Solr schema using Schema API (PR #4536 pattern)
-        self._setup_solr_schema()
+        # Setup Solr schema using Schema API (PR #4536 pattern). By default
+        # it is done in the background so that workers do not wait for Solr.
+        schema_setup = self.fb_config.custom_sort.schema_setup.get()
+        if schema_setup == 'startup':
+            self._setup_solr_schema()
+        elif schema_setup == 'background':
+            search_index_service.start_solr_schema_setup()
 
     def _get_solr_url(self):
         """
@@ -90,53 +108,10 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         Returns:
             bool: True if field exists, False otherwise
         """
-        try:
-            solr_url = self._get_solr_url()
-            schema_api = f"{solr_url}/schema"
-            response = requests.get(f"{schema_api}/fields/{field_name}", timeout=5)
-            return response.status_code == 200
-        except Exception:
-            # If check fails, assume field doesn't exist to be safe
-            return False
-
-    def _add_solr_field(self, schema_api: str, field_name: str, existing_fields: list):
-        """
-        Add a Solr field to the schema.
-
-        Args:
-            schema_api: Solr schema API URL
-            field_name: Name of the field to add
-            existing_fields: List of existing field names
-        """
-        if field_name in existing_fields:
-            log.debug(f"Field '{field_name}' already exists")
-            return
-
-        log.info(f"Adding '{field_name}' field to Solr schema")
-        try:
-            response = requests.post(
-                schema_api,
-                json={
-                    "add-field": {
-                        "name": field_name,
-                        "type": "pint",
-                        "indexed": True,
-                        "stored": False,
-                        "docValues": True,
-                    }
-                },
-                timeout=10,
-            )
-
-            if response.status_code in [200, 201]:
-                log.info(f"Successfully added '{field_name}' field")
-            else:
-                log.error(
-                    f"Failed to add '{field_name}' field: "
-                    f"{response.status_code} - {response.text}"
-                )
-        except requests.exceptions.RequestException as e:
-            log.error(f"Error adding '{field_name}' field: {e}")
+        # Kept for a while, as this is called for every dataset indexed
+        return search_index_service.field_exists_in_solr(
+            self._get_solr_url(), field_name
+        )
 
     def _setup_solr_schema(self):
         """
@@ -144,64 +119,14 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         This automatically adds required integer fields for sorting by
         downloads and likes without manual schema.xml modification.
         """
-        try:
-            cfg = getattr(self, 'fb_config', FeedbackConfig())
-
-            # Check if custom sort feature is enabled
-            if not cfg.custom_sort.is_enable():
-                log.debug("Custom sort feature is disabled in feedback_config.json")
-                return
-
-            # Get Solr URL from config
-            solr_url = self._get_solr_url()
-            schema_api = f"{solr_url}/schema"
-
-            log.info(f"Setting up Solr schema via API: {schema_api}")
-
-            # Check if Schema API is available
-            try:
-                response = requests.get(f"{schema_api}/fields", timeout=5)
-                if response.status_code != 200:
-                    log.warning(
-                        f"Schema API returned status {response.status_code}. "
-                        "Manual schema configuration may be required."
-                    )
-                    return
-            except requests.exceptions.RequestException as e:
-                log.warning(
-                    f"Schema API not available: {e}\n"
-                    "Manual schema configuration required. Add "
-                    "the following to managed-schema:\n"
-                    "  <field name='downloads_total_i' type='pint' "
-                    "indexed='true' stored='false' docValues='true'/>\n"
-                    "  <field name='likes_total_i' type='pint' "
-                    "indexed='true' stored='false' docValues='true'/>"
-                )
-                return
-
-            # Get existing fields (for idempotency check)
-            existing_fields = [f['name'] for f in response.json().get('fields', [])]
-
-            # Add downloads_total_i field if downloads feature is enabled
-            if cfg.download.is_enable():
-                self._add_solr_field(schema_api, 'downloads_total_i', existing_fields)
-
-            # Add likes_total_i field if likes feature is enabled
-            if cfg.like.is_enable():
-                self._add_solr_field(schema_api, 'likes_total_i', existing_fields)
-
-            log.info("Solr schema setup completed")
-
-        except Exception as e:
-            log.error(f"Unexpected error in Solr schema setup: {e}", exc_info=True)
-            log.warning(
-                "If you continue to see this error, "
-                "please manually add fields to managed-schema:\n"
-                "  <field name='downloads_total_i' type='pint' "
-                "indexed='true' stored='false' docValues='true'/>\n"
-                "  <field name='likes_total_i' type='pint' "
-                "indexed='true' stored='false' docValues='true'/>"
-            )
+        return search_index_service.setup_solr_schema()
+
+    # IMiddleware
+
+    def make_middleware(self, app, config):
+        if toolkit.asint(config.get(CONFIG_RELOAD_INTERVAL, 0)) > 0:
+            app.before_request(_reload_feedback_config)
+        return app
 
     # IClick
 
@@ -222,8 +147,6 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
                     get_datastore_download_blueprint,
                 )
 
-                # Insert at the beginning for slight performance optimization
-                # since before_app_request hooks run in registration order
                 blueprints.insert(0, get_datastore_download_blueprint())
             blueprints.append(download.get_download_blueprint())
 
@@ -334,15 +257,20 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         # This avoids multiple HTTP requests per dataset
         downloads_field_exists = self._field_exists_in_solr('downloads_total_i')
         likes_field_exists = self._field_exists_in_solr('likes_total_i')
+        # Counts loaded up front when the packages are reindexed in bulk
+        prefetched = search_index_service.get_prefetched_feedback_counts(package_id)
 
         # Add download count as an integer field
         # Only add if downloads feature is enabled for this organization
         if cfg.download.is_enable(owner_org):
             # Only add field if it exists in Solr schema
             if downloads_field_exists:
-                downloads = (
-                    download_summary_service.get_package_downloads(package_id) or 0
-                )
+                if prefetched is not None:
+                    downloads = prefetched.downloads
+                else:
+                    downloads = (
+                        download_summary_service.get_package_downloads(package_id) or 0
+                    )
                 pkg_dict['downloads_total_i'] = int(downloads)
                 org_info = f" (org: {owner_org})" if owner_org else " (no org)"
                 log.debug(
@@ -355,7 +283,12 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         if cfg.like.is_enable(owner_org):
             # Only add field if it exists in Solr schema
             if likes_field_exists:
-                likes = resource_likes_service.get_package_like_count(package_id) or 0
+                if prefetched is not None:
+                    likes = prefetched.likes
+                else:
+                    likes = (
+                        resource_likes_service.get_package_like_count(package_id) or 0
+                    )
                 pkg_dict['likes_total_i'] = int(likes)
                 org_info = f" (org: {owner_org})" if owner_org else " (no org)"
                 log.debug(
@@ -377,8 +310,10 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         if request.endpoint in skip_endpoints:
             return pkg_dict
 
-        package_id = pkg_dict['id']
-        package = model.Package.get(package_id)
+        # The dict of package_show carries owner_org and the resources, which
+        # before_resource_show reads afterwards for each resource
+        package_owner_service.remember_package_owners([pkg_dict])
+        package = package_owner_service.get_package_owner(pkg_dict['id'])
 
         # Skip if package does not exist or has been removed
         if package is None:
@@ -431,10 +366,25 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
 
         return pkg_dict
 
+    def after_dataset_create(self, context, pkg_dict):
+        package_summary_service.refresh_package_feedback_summary([pkg_dict['id']])
+
+    def after_dataset_update(self, context, pkg_dict):
+        # Resources may have been added or deleted with the dataset
+        package_summary_service.refresh_package_feedback_summary([pkg_dict['id']])
+        ranking_service.refresh_package_metric_monthly([pkg_dict['id']])
+        stats_cache_service.invalidate_package_stats([pkg_dict['id']])
+
+    def after_dataset_delete(self, context, pkg_dict):
+        # Deleted datasets are left out of the ranking
+        ranking_cache_service.invalidate_ranking_cache()
+
     # IResourceController
 
     def before_resource_show(self, resource_dict: Dict[str, Any]) -> Dict[str, Any]:
-        owner_org = model.Package.get(resource_dict['package_id']).owner_org
+        package_id = resource_dict['package_id']
+        package = package_owner_service.get_package_owner(package_id)
+        owner_org = package.owner_org if package else None
         resource_id = resource_dict['id']
         cfg = getattr(self, 'fb_config', FeedbackConfig())
 
@@ -444,35 +394,42 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
             if resource_dict.get('datastore_active', False):
                 resource_dict['datastore_active'] = False
 
+        if not (
+            cfg.download.is_enable(owner_org)
+            or cfg.utilization.is_enable(owner_org)
+            or cfg.resource_comment.is_enable(owner_org)
+            or cfg.like.is_enable(owner_org)
+        ):
+            return resource_dict
+
+        # The stats of all resources in the package are fetched at once
+        stats = resource_summary_service.get_resource_feedback_stats(
+            package_id,
+            resource_id,
+            package.resource_ids if package else [],
+        )
+
         if cfg.download.is_enable(owner_org):
             if _('Downloads') != 'Downloads':
                 resource_dict.pop('Downloads', None)
-            resource_dict[_('Downloads')] = (
-                download_summary_service.get_resource_downloads(resource_id)
-            )
+            resource_dict[_('Downloads')] = stats['downloads']
 
         if cfg.utilization.is_enable(owner_org):
             if _('Utilizations') != 'Utilizations':
                 resource_dict.pop('Utilizations', None)
-            resource_dict[_('Utilizations')] = (
-                utilization_summary_service.get_resource_utilizations(resource_id)
-            )
+            resource_dict[_('Utilizations')] = stats['utilizations']
             if _('Issue Resolutions') != 'Issue Resolutions':
                 resource_dict.pop('Issue Resolutions', None)
-            resource_dict[_('Issue Resolutions')] = (
-                utilization_summary_service.get_resource_issue_resolutions(resource_id)
-            )
+            resource_dict[_('Issue Resolutions')] = stats['issue_resolutions']
 
         if cfg.resource_comment.is_enable(owner_org):
             if _('Comments') != 'Comments':
                 resource_dict.pop('Comments', None)
-            resource_dict[_('Comments')] = (
-                resource_summary_service.get_resource_comments(resource_id)
-            )
+            resource_dict[_('Comments')] = stats['comments']
             if cfg.resource_comment.rating.is_enable(owner_org):
                 if _('Rating') != 'Rating':
                     resource_dict.pop('Rating', None)
-                rating_value = resource_summary_service.get_resource_rating(resource_id)
+                rating_value = stats['rating']
                 resource_dict[_('Rating')] = (
                     0 if rating_value == 0 else round(rating_value, 1)
                 )
@@ -480,9 +437,7 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
         if cfg.like.is_enable(owner_org):
             if _('Number of Likes') != 'Number of Likes':
                 resource_dict.pop('Number of Likes', None)
-            resource_dict[_('Number of Likes')] = (
-                resource_likes_service.get_resource_like_count(resource_id)
-            )
+            resource_dict[_('Number of Likes')] = stats['like_count']
 
         return resource_dict
 
@@ -491,6 +446,9 @@ class FeedbackPlugin(plugins.SingletonPlugin, DefaultTranslation):
     def get_actions(self):
         return {
             'datasets_ranking': get_action_controllers.datasets_ranking,
+            'feedback_stats_cache_status': (
+                stats_cache_controllers.feedback_stats_cache_status
+            ),
         }
 
     # IUploader
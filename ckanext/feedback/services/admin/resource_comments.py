@@ -13,6 +13,12 @@ from ckanext.feedback.models.resource_comment import (
     ResourceCommentSummary,
 )
 from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.cache import invalidate_resource_stats
+from ckanext.feedback.services.package.summary import (
+    COMMENT_COLUMNS,
+    refresh_resources_package_feedback_summary,
+)
+from ckanext.feedback.services.resource.summary import refresh_resource_comment_monthly
 
 
 def get_resource_comments_query(org_list):
@@ -221,3 +227,7 @@ def refresh_resources_comments(resource_comment_summaries):
             }
         )
     session.bulk_update_mappings(ResourceCommentSummary, mappings)
+    resource_ids = [s.resource_id for s in resource_comment_summaries]
+    refresh_resource_comment_monthly(resource_ids)
+    refresh_resources_package_feedback_summary(resource_ids, COMMENT_COLUMNS)
+    invalidate_resource_stats(resource_ids)
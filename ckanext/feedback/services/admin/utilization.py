@@ -13,6 +13,14 @@ from ckanext.feedback.models.utilization import (
     UtilizationComment,
     UtilizationSummary,
 )
+from ckanext.feedback.services.common.cache import invalidate_resource_stats
+from ckanext.feedback.services.package.summary import (
+    UTILIZATION_COLUMNS,
+    refresh_resources_package_feedback_summary,
+)
+from ckanext.feedback.services.utilization.summary import (
+    refresh_utilization_comment_monthly,
+)
 
 
 def get_utilizations_query(org_list):
@@ -128,11 +136,14 @@ def approve_utilization(utilization_id_list, approval_user_id):
 
 
 def delete_utilization(utilization_id_list):
+    resource_ids = get_utilization_resource_ids(utilization_id_list)
     (
         session.query(Utilization)
         .filter(Utilization.id.in_(utilization_id_list))
         .delete(synchronize_session='fetch')
     )
+    # The comments of the utilizations are deleted with them
+    refresh_utilization_comment_monthly(resource_ids)
 
 
 def refresh_utilization_summary(resource_ids):
@@ -162,3 +173,5 @@ def refresh_utilization_summary(resource_ids):
             },
         )
         session.execute(summary)
+    refresh_resources_package_feedback_summary(resource_ids, UTILIZATION_COLUMNS)
+    invalidate_resource_stats(resource_ids)
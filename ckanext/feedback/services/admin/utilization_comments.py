@@ -9,6 +9,9 @@ from sqlalchemy import literal
 import ckanext.feedback.services.utilization.details as detail_service
 from ckanext.feedback.models.session import session
 from ckanext.feedback.models.utilization import Utilization, UtilizationComment
+from ckanext.feedback.services.utilization.summary import (
+    refresh_utilization_comment_monthly,
+)
 
 
 def get_utilization_comments_query(org_list):
@@ -146,3 +149,6 @@ def refresh_utilizations_comments(utilizations):
             for utilization in utilizations
         ],
     )
+    refresh_utilization_comment_monthly(
+        {utilization.resource_id for utilization in utilizations}
+    )
@@ -0,0 +1,77 @@
+import atexit
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from ckanext.feedback.models.session import session
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicWorker(ABC):
+    """
+    Base class for per-process work that runs in a daemon thread.
+
+    `flush()` is called every `interval` seconds, as soon as `wakeup()` is
+    called, and once more at interpreter shutdown. The thread is started
+    lazily so that each forked web worker gets its own.
+    """
+
+    thread_name = 'feedback-worker'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._worker_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @abstractmethod
+    def flush(self):
+        """
+        Write the pending work and return the number of items written.
+        """
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    def _ensure_worker(self):
+        # Workers forked from a pre-loaded master do not inherit its threads,
+        # so the thread is (re)started lazily in each process.
+        pid = os.getpid()
+        if self._is_worker_running(pid):
+            return
+
+        with self._worker_lock:
+            if self._is_worker_running(pid):
+                return
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name=self.thread_name, daemon=True
+            )
+            self._thread.start()
+            atexit.register(self._flush_on_exit)
+
+    def _is_worker_running(self, pid):
+        return self._pid == pid and self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception(f'Unexpected error in {self.thread_name} thread')
+            finally:
+                # The worker thread owns its own scoped session
+                session.remove()
+
+    def _flush_on_exit(self):
+        if os.getpid() != self._pid:
+            return
+        try:
+            self.flush()
+        except Exception:
+            log.exception(f'Failed to run {self.thread_name} at shutdown')
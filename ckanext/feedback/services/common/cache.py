@@ -0,0 +1,267 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from ckan.lib.redis import connect_to_redis
+from ckan.model.resource import Resource
+from sqlalchemy import event
+
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.config import FeedbackConfig
+
+log = logging.getLogger(__name__)
+
+RESOURCE_STATS = 'resource_stats'
+PACKAGE_STATS = 'package_stats'
+
+# Keys of session.info collecting the ids whose cached stats are dropped
+# once the transaction that changed them commits
+STALE_RESOURCES_KEY = 'feedback_stale_resource_stats'
+STALE_PACKAGES_KEY = 'feedback_stale_package_stats'
+
+
+class LocalCache:
+    """
+    In-process LRU cache whose entries expire after a TTL.
+
+    Each web worker has its own, so it also stands in for Redis in tests.
+    """
+
+    name = 'local'
+
+    def __init__(self, max_size=10000, clock=time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_many(self, keys):
+        now = self._clock()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping, ttl):
+        expires = self._clock() + ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCache:
+    """
+    Cache shared by every web worker, stored in the Redis used by CKAN.
+    """
+
+    name = 'redis'
+    prefix = 'ckanext-feedback:'
+
+    def __init__(self, client):
+        self._client = client
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget([self.prefix + key for key in keys])
+        return {
+            key: json.loads(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    def set_many(self, mapping, ttl):
+        pipeline = self._client.pipeline()
+        for key, value in mapping.items():
+            pipeline.set(self.prefix + key, json.dumps(value), ex=ttl)
+        pipeline.execute()
+
+    def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def size(self):
+        # Other keys share the database, so the size is not known
+        return None
+
+
+class StatsCache:
+    """
+    Read-through cache of feedback stats, counting hits and misses.
+
+    Values are dicts keyed by `namespace` and id. Errors of the backend are
+    logged and the stats are read from the database instead.
+    """
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, namespace, ids, load):
+        """
+        Get the stats of `ids`, loading the ones not cached with `load`,
+        which takes a list of ids and returns a dict keyed by id.
+        """
+        keys = {id_: f'{namespace}:{id_}' for id_ in ids}
+        try:
+            cached = self.backend.get_many(keys.values())
+        except Exception:
+            log.exception('Failed to read feedback stats from the cache')
+            cached = {}
+
+        # Copied so that callers cannot change the cached values
+        found = {id_: dict(cached[key]) for id_, key in keys.items() if key in cached}
+        missing = [id_ for id_ in keys if id_ not in found]
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = load(missing)
+            try:
+                self.backend.set_many(
+                    {keys[id_]: dict(loaded[id_]) for id_ in missing if id_ in loaded},
+                    self.ttl,
+                )
+            except Exception:
+                log.exception('Failed to write feedback stats to the cache')
+            found.update(loaded)
+        return found
+
+    def delete_many(self, namespace, ids):
+        try:
+            self.backend.delete_many([f'{namespace}:{id_}' for id_ in ids])
+        except Exception:
+            log.exception('Failed to delete feedback stats from the cache')
+
+    def get_status(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'backend': self.backend.name,
+            'ttl': self.ttl,
+            'size': self.backend.size(),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0,
+        }
+
+
+_stats_cache = None
+_stats_cache_lock = threading.Lock()
+
+
+def is_stats_cache_enabled():
+    return FeedbackConfig().stats_cache.is_enable()
+
+
+def get_stats_cache():
+    global _stats_cache
+
+    if _stats_cache is None:
+        with _stats_cache_lock:
+            if _stats_cache is None:
+                stats_cache = FeedbackConfig().stats_cache
+                backend = stats_cache.backend.get()
+                if backend == 'redis':
+                    cache_backend = RedisCache(connect_to_redis())
+                else:
+                    if backend != 'local':
+                        log.warning(
+                            f'Unknown feedback stats cache backend "{backend}". '
+                            'The local cache is used instead.'
+                        )
+                    cache_backend = LocalCache(max_size=int(stats_cache.max_size.get()))
+                _stats_cache = StatsCache(cache_backend, int(stats_cache.ttl.get()))
+    return _stats_cache
+
+
+def get_cached_stats(namespace, ids, load):
+    """
+    Get the stats of `ids` through the stats cache when it is enabled, and
+    with `load` otherwise.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    if not is_stats_cache_enabled():
+        return load(ids)
+    return get_stats_cache().get_many(namespace, ids, load)
+
+
+def invalidate_resource_stats(resource_ids):
+    """
+    Drop the cached stats of the resources and their packages when the
+    current transaction commits. `resource_ids` is only iterated when the
+    cache is enabled.
+    """
+    if not is_stats_cache_enabled():
+        return
+    session.info.setdefault(STALE_RESOURCES_KEY, set()).update(resource_ids)
+
+
+def invalidate_package_stats(package_ids):
+    "Drop the cached stats of the packages when the current transaction commits."
+    if not is_stats_cache_enabled():
+        return
+    session.info.setdefault(STALE_PACKAGES_KEY, set()).update(package_ids)
+
+
+@event.listens_for(session, 'before_commit')
+def _add_stale_packages(db_session):
+    resource_ids = db_session.info.get(STALE_RESOURCES_KEY)
+    if not resource_ids:
+        return
+    package_ids = db_session.query(Resource.package_id).filter(
+        Resource.id.in_(resource_ids)
+    )
+    db_session.info.setdefault(STALE_PACKAGES_KEY, set()).update(
+        package_id for (package_id,) in package_ids
+    )
+
+
+@event.listens_for(session, 'after_commit')
+def _drop_stale_stats(db_session):
+    resource_ids = db_session.info.pop(STALE_RESOURCES_KEY, None)
+    package_ids = db_session.info.pop(STALE_PACKAGES_KEY, None)
+    # Dropped after the commit so that the next read loads the committed
+    # stats
+    if resource_ids:
+        get_stats_cache().delete_many(RESOURCE_STATS, resource_ids)
+    if package_ids:
+        get_stats_cache().delete_many(PACKAGE_STATS, package_ids)
+
+
+@event.listens_for(session, 'after_rollback')
+def _discard_stale_stats(db_session):
+    db_session.info.pop(STALE_RESOURCES_KEY, None)
+    db_session.info.pop(STALE_PACKAGES_KEY, None)
@@ -1,7 +1,12 @@
 import json
 import logging
 import os
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import NamedTuple, Optional
 
 from ckan.common import config
 from ckan.plugins import toolkit
@@ -12,6 +17,7 @@ from ckanext.feedback.services.organization import organization as organization_
 log = logging.getLogger(__name__)
 
 CONFIG_HANDLER_PATH = 'ckan.feedback.download_handler'
+CONFIG_RELOAD_INTERVAL = 'ckan.feedback.config_reload_interval'
 
 
 def download_handler():
@@ -29,6 +35,69 @@ def is_list_of_str(value):
     return isinstance(value, list) and all(isinstance(x, str) for x in value)
 
 
+class StagedConfig:
+    """
+    Values of the CKAN config set or removed while feedback_config.json is
+    loaded, applied together once the whole file has loaded.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.removed = set()
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+        self.removed.discard(key)
+
+    def pop(self, key, default=None):
+        self.removed.add(key)
+        return self.values.pop(key, default)
+
+
+class ConfigSnapshot:
+    """
+    Values of the CKAN config set or removed by the loaded
+    feedback_config.json, over the values of ckan.ini. A new snapshot
+    replaces the whole of it, so a reader never sees a file half applied.
+    """
+
+    def __init__(self, values=None, removed=()):
+        self.values = MappingProxyType(dict(values or {}))
+        self.removed = frozenset(removed)
+
+    def get(self, key, default=None):
+        if key in self.values:
+            return self.values[key]
+        if key in self.removed:
+            return default
+        return config.get(key, default)
+
+
+# Set while feedback_config.json is loaded, so that other threads keep
+# reading the values loaded before
+_staged_config = ContextVar('feedback_staged_config', default=None)
+_config_snapshot = ConfigSnapshot()
+
+
+def get_config_target():
+    staged = _staged_config.get()
+    return config if staged is None else staged
+
+
+def get_config_snapshot():
+    return _config_snapshot
+
+
+def set_config_snapshot(snapshot):
+    global _config_snapshot
+    _config_snapshot = snapshot
+
+
+def get_file_signature(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
 class Singleton(object):
     _instance = None
 
@@ -46,7 +115,93 @@ class FeedbackConfigInterface(ABC):
         pass
 
 
+class FeatureFlag(NamedTuple):
+    # Values read from the config, to tell when the flag must be compiled again
+    raw: tuple
+    enable: bool
+    enable_orgs: Optional[frozenset]
+    disable_orgs: Optional[frozenset]
+    # Message of the ValidationError raised when an organization is checked
+    error: Optional[str]
+
+
+def compile_feature_flag(enable, enable_orgs, disable_orgs):
+    raw = (enable, enable_orgs, disable_orgs)
+
+    try:
+        # Convert the retrieved value to a boolean
+        # (True, yes, on, 1, False, no, off, 0)
+        enable = toolkit.asbool(enable)
+    except ValueError:
+        # Raise a ValidationError if conversion fails
+        raise toolkit.ValidationError(
+            {
+                "message": (
+                    "The value of the \"enable\" key is invalid. "
+                    "Please specify a boolean value such as "
+                    "`true` or `false` for the \"enable\" key."
+                )
+            }
+        )
+
+    error = None
+    if enable_orgs and not is_list_of_str(enable_orgs):
+        error = (
+            "The \"enable_orgs\" key must be a string array "
+            "to specify valid organizations "
+            "(e.g., \"enable_orgs\": [\"org-name-a\", \"org-name-b\"])."
+        )
+    elif disable_orgs and not is_list_of_str(disable_orgs):
+        error = (
+            "The \"disable_orgs\" key must be a string array "
+            "to specify invalid organizations "
+            "(e.g., \"disable_orgs\": [\"org-name-a\", \"org-name-b\"])."
+        )
+
+    return FeatureFlag(
+        raw=raw,
+        enable=enable,
+        enable_orgs=frozenset(enable_orgs) if enable_orgs and not error else None,
+        disable_orgs=frozenset(disable_orgs) if disable_orgs and not error else None,
+        error=error,
+    )
+
+
+class OrganizationNameCache:
+    """
+    Names of organizations by id, kept for `ttl` seconds so that is_enable
+    does not query them on every call.
+    """
+
+    def __init__(self, ttl=60, max_size=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._names = {}
+
+    def get(self, org_id):
+        now = self._clock()
+        cached = self._names.get(org_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        organization = organization_service.get_organization_name_by_id(org_id)
+        name = organization.name if organization else None
+        if len(self._names) >= self.max_size:
+            self._names.clear()
+        self._names[org_id] = (now + self.ttl, name)
+        return name
+
+    def clear(self):
+        self._names.clear()
+
+
+organization_names = OrganizationNameCache()
+
+
 class BaseConfig:
+    _feature_flag = None
+
     def __init__(self, name: str, parent: list = None):
         self.default = None
         self.name = name
@@ -66,12 +221,13 @@ class BaseConfig:
         conf_tree = feedback_config
 
         ckan_conf_str = self.get_ckan_conf_str()
+        target = get_config_target()
 
         for key in key_list:
             conf_tree = conf_tree.get(key)
 
             if conf_tree is None:
-                config.pop(f"{ckan_conf_str}.enable", None)
+                target.pop(f"{ckan_conf_str}.enable", None)
                 return
 
             if key == key_list[-1]:
@@ -87,11 +243,11 @@ class BaseConfig:
                 enable_orgs = conf_tree.get("enable_orgs")
                 disable_orgs = conf_tree.get("disable_orgs")
 
-        config[f"{ckan_conf_str}.enable"] = enable
+        target[f"{ckan_conf_str}.enable"] = enable
         if enable_orgs:
-            config[f"{ckan_conf_str}.enable_orgs"] = enable_orgs
+            target[f"{ckan_conf_str}.enable_orgs"] = enable_orgs
         if disable_orgs:
-            config[f"{ckan_conf_str}.disable_orgs"] = disable_orgs
+            target[f"{ckan_conf_str}.disable_orgs"] = disable_orgs
 
     def set_config(
         self,
@@ -111,32 +267,35 @@ class BaseConfig:
             except AttributeError as e:
                 toolkit.error_shout(e)
         if value is not None:
-            config[ckan_conf_path_str] = value
+            get_config_target()[ckan_conf_path_str] = value
 
     def get(self):
         ck_conf_str = self.get_ckan_conf_str()
-        return config.get(f"{ck_conf_str}", self.default)
+        return get_config_snapshot().get(f"{ck_conf_str}", self.default)
 
-    def is_enable(self, org_id=''):
+    def get_feature_flag(self):
+        """
+        Get the on/off value and the organization lists of the feature,
+        compiled again only when their values in the config have changed.
+        """
         ck_conf_str = self.get_ckan_conf_str()
-        # Retrieve the on/off value for the feature from the ini file
-        enable = config.get(f"{ck_conf_str}.enable", self.default)
+        snapshot = get_config_snapshot()
+        # Retrieve the on/off value and the lists of enabled and disabled
+        # organizations from the ini file
+        raw = (
+            snapshot.get(f"{ck_conf_str}.enable", self.default),
+            snapshot.get(f"{ck_conf_str}.enable_orgs"),
+            snapshot.get(f"{ck_conf_str}.disable_orgs"),
+        )
+        feature_flag = self._feature_flag
+        if feature_flag is None or feature_flag.raw != raw:
+            feature_flag = compile_feature_flag(*raw)
+            self._feature_flag = feature_flag
+        return feature_flag
 
-        try:
-            # Convert the retrieved value to a boolean
-            # (True, yes, on, 1, False, no, off, 0)
-            enable = toolkit.asbool(enable)
-        except ValueError:
-            # Raise a ValidationError if conversion fails
-            raise toolkit.ValidationError(
-                {
-                    "message": (
-                        "The value of the \"enable\" key is invalid. "
-                        "Please specify a boolean value such as "
-                        "`true` or `false` for the \"enable\" key."
-                    )
-                }
-            )
+    def is_enable(self, org_id=''):
+        feature_flag = self.get_feature_flag()
+        enable = feature_flag.enable
 
         # Return the value of the module or feature if it is off, if the
         # configuration file is missing, or if no organization is specified
@@ -144,73 +303,42 @@ class BaseConfig:
             return enable
 
         # Retrieve the name of the specified organization
-        organization = organization_service.get_organization_name_by_id(org_id)
+        organization_name = organization_names.get(org_id)
 
         # Return False if the specified organization cannot be retrieved
-        if not organization:
+        if not organization_name:
             return False
 
-        # Retrieve the list of enabled organizations and disabled
-        # organizations from the ini file
-        enable_orgs = config.get(f"{ck_conf_str}.enable_orgs")
-        disable_orgs = config.get(f"{ck_conf_str}.disable_orgs")
+        # Raise a ValidationError if either list is not an array of strings
+        if feature_flag.error:
+            raise toolkit.ValidationError({"message": feature_flag.error})
 
         # Return True if neither the list of enabled organizations
         # nor the list of disabled organizations exists
-        if not enable_orgs and not disable_orgs:
+        if feature_flag.enable_orgs is None and feature_flag.disable_orgs is None:
             return enable
 
-        # Raise a ValidationError if the list of enabled
-        # organizations exists and is not an array of strings
-        if enable_orgs and not is_list_of_str(enable_orgs):
-            raise toolkit.ValidationError(
-                {
-                    "message": (
-                        "The \"enable_orgs\" key must be a string array "
-                        "to specify valid organizations "
-                        "(e.g., \"enable_orgs\": [\"org-name-a\", \"org-name-b\"])."
-                    )
-                }
-            )
+        # If the list of disabled organizations exists, turn off the
+        # organizations in it and turn on the others, whether or not the list
+        # of enabled organizations exists
+        if feature_flag.disable_orgs is not None:
+            return organization_name not in feature_flag.disable_orgs
 
-        # Raise a ValidationError if the list of disabled
-        # organizations exists and is not an array of strings
-        if disable_orgs and not is_list_of_str(disable_orgs):
-            raise toolkit.ValidationError(
-                {
-                    "message": (
-                        "The \"disable_orgs\" key must be a string array "
-                        "to specify invalid organizations "
-                        "(e.g., \"disable_orgs\": [\"org-name-a\", \"org-name-b\"])."
-                    )
-                }
-            )
-
-        # If both the list of enabled organizations and the list
-        # of disabled organizations exist, turn off the organizations
-        # in the disabled list and turn on the others
-        if enable_orgs and disable_orgs:
-            return organization.name not in disable_orgs
-
-        if enable_orgs:
-            # If only the list of enabled organizations exists,
-            # turn on organizations in the enabled list and turn off the others
-            return organization.name in enable_orgs
-        else:
-            # If only the list of disabled organizations exists,
-            # turn off organizations in the disabled list and turn on the others
-            return organization.name not in disable_orgs
+        # If only the list of enabled organizations exists,
+        # turn on organizations in the enabled list and turn off the others
+        return organization_name in feature_flag.enable_orgs
 
     def get_enable_org_names(self):
         ck_conf_str = self.get_ckan_conf_str()
-        enable = config.get(f"{ck_conf_str}.enable", self.default)
+        snapshot = get_config_snapshot()
+        enable = snapshot.get(f"{ck_conf_str}.enable", self.default)
 
         if not enable:
             return []
 
         all_org_names = organization_service.get_organization_name_list()
-        enable_orgs = config.get(f"{ck_conf_str}.enable_orgs", [])
-        disable_orgs = config.get(f"{ck_conf_str}.disable_orgs", [])
+        enable_orgs = snapshot.get(f"{ck_conf_str}.enable_orgs", [])
+        disable_orgs = snapshot.get(f"{ck_conf_str}.disable_orgs", [])
 
         if disable_orgs:
             enable_orgs = [org for org in all_org_names if org not in disable_orgs]
@@ -230,6 +358,37 @@ class DownloadsConfig(BaseConfig, FeedbackConfigInterface):
         self.modal = BaseConfig('modal', parents)
         self.modal.default = True
 
+        # Write-behind download counters (ckan.ini only, process-wide settings)
+        self.write_behind = BaseConfig('write_behind', self.conf_path)
+        self.write_behind.default = False
+        write_behind_parents = self.conf_path + ['write_behind']
+        self.write_behind.flush_interval = BaseConfig(
+            'flush_interval', write_behind_parents
+        )
+        self.write_behind.flush_interval.default = 10
+        self.write_behind.flush_size = BaseConfig('flush_size', write_behind_parents)
+        self.write_behind.flush_size.default = 500
+
+        # Streaming proxy for user-download of redirected resources (ckan.ini only)
+        self.proxy_stream = BaseConfig('proxy_stream', self.conf_path)
+        self.proxy_stream.default = False
+        proxy_stream_parents = self.conf_path + ['proxy_stream']
+        self.proxy_stream.timeout = BaseConfig('timeout', proxy_stream_parents)
+        self.proxy_stream.timeout.default = 30
+        self.proxy_stream.max_size = BaseConfig('max_size', proxy_stream_parents)
+        self.proxy_stream.max_size.default = 0
+
+        # Duplicate and bot download suppression (ckan.ini only)
+        self.dedupe = BaseConfig('dedupe', self.conf_path)
+        self.dedupe.default = False
+        dedupe_parents = self.conf_path + ['dedupe']
+        self.dedupe.window = BaseConfig('window', dedupe_parents)
+        self.dedupe.window.default = 30
+        self.dedupe.max_entries = BaseConfig('max_entries', dedupe_parents)
+        self.dedupe.max_entries.default = 100000
+        self.dedupe.deny_user_agents = BaseConfig('deny_user_agents', dedupe_parents)
+        self.dedupe.deny_user_agents.default = 'bot crawler spider'
+
     def load_config(self, feedback_config):
         self.set_enable_and_enable_orgs_and_disable_orgs(feedback_config)
         fb_feedback_prompt_conf_path = self.conf_path + ['feedback_prompt']
@@ -336,6 +495,32 @@ class CustomSortConfig(BaseConfig, FeedbackConfigInterface):
         super().__init__('custom_sort')
         self.default = True
 
+        # Debounced search index updates (ckan.ini only, process-wide settings)
+        self.reindex_queue = BaseConfig('reindex_queue', self.conf_path)
+        self.reindex_queue.default = False
+        self.reindex_queue.interval = BaseConfig(
+            'interval', self.conf_path + ['reindex_queue']
+        )
+        self.reindex_queue.interval.default = 30
+
+        # Push only the count fields with Solr atomic updates (ckan.ini only)
+        self.atomic_update = BaseConfig('atomic_update', self.conf_path)
+        self.atomic_update.default = False
+        self.atomic_update.batch_size = BaseConfig(
+            'batch_size', self.conf_path + ['atomic_update']
+        )
+        self.atomic_update.batch_size.default = 100
+
+        # Seconds for which the fields of the Solr schema are known to exist
+        # or not (ckan.ini only, 0 checks them for every dataset)
+        self.field_cache_ttl = BaseConfig('field_cache_ttl', self.conf_path)
+        self.field_cache_ttl.default = 300
+
+        # When the plugin adds the fields to the Solr schema: 'background',
+        # 'startup' (blocking) or 'none' (ckan.ini only)
+        self.schema_setup = BaseConfig('schema_setup', self.conf_path)
+        self.schema_setup.default = 'background'
+
     def load_config(self, feedback_config):
         self.set_enable_and_enable_orgs_and_disable_orgs(feedback_config)
 
@@ -432,6 +617,74 @@ class MoralKeeperAiConfig(BaseConfig, FeedbackConfigInterface):
         self.set_enable_and_enable_orgs_and_disable_orgs(feedback_config)
 
 
+class EventLogConfig(BaseConfig, FeedbackConfigInterface):
+    def __init__(self):
+        super().__init__('event_log')
+        self.default = False
+
+    def load_config(self, feedback_config):
+        # Process-wide setting, only read from ckan.ini
+        pass
+
+
+class PackageSummaryConfig(BaseConfig, FeedbackConfigInterface):
+    def __init__(self):
+        super().__init__('package_summary')
+        self.default = False
+
+    def load_config(self, feedback_config):
+        # Process-wide setting, only read from ckan.ini
+        pass
+
+
+class RankingRollupConfig(BaseConfig, FeedbackConfigInterface):
+    def __init__(self):
+        super().__init__('ranking_rollup')
+        self.default = False
+        self.trending_half_life_months = BaseConfig(
+            'trending_half_life_months', self.conf_path
+        )
+        self.trending_half_life_months.default = 1
+
+    def load_config(self, feedback_config):
+        # Process-wide setting, only read from ckan.ini
+        pass
+
+
+class RankingCacheConfig(BaseConfig, FeedbackConfigInterface):
+    def __init__(self):
+        super().__init__('ranking_cache')
+        self.default = False
+        self.backend = BaseConfig('backend', self.conf_path)
+        self.backend.default = 'local'
+        self.ttl = BaseConfig('ttl', self.conf_path)
+        self.ttl.default = 600
+        self.closed_period_ttl = BaseConfig('closed_period_ttl', self.conf_path)
+        self.closed_period_ttl.default = 86400
+        self.max_size = BaseConfig('max_size', self.conf_path)
+        self.max_size.default = 1000
+
+    def load_config(self, feedback_config):
+        # Process-wide setting, only read from ckan.ini
+        pass
+
+
+class StatsCacheConfig(BaseConfig, FeedbackConfigInterface):
+    def __init__(self):
+        super().__init__('stats_cache')
+        self.default = False
+        self.backend = BaseConfig('backend', self.conf_path)
+        self.backend.default = 'local'
+        self.ttl = BaseConfig('ttl', self.conf_path)
+        self.ttl.default = 60
+        self.max_size = BaseConfig('max_size', self.conf_path)
+        self.max_size.default = 10000
+
+    def load_config(self, feedback_config):
+        # Process-wide setting, only read from ckan.ini
+        pass
+
+
 class FeedbackConfig(Singleton):
     is_feedback_config_file = None
     _initialized = False
@@ -445,6 +698,11 @@ class FeedbackConfig(Singleton):
                 'ckan.feedback.config_file', self.config_default_dir
             )
             self.is_feedback_config_file = False
+            # Keys of the CKAN config set from feedback_config.json
+            self._file_config_keys = set()
+            self._config_file_signature = None
+            self._next_reload_check = 0
+            self._reload_lock = threading.Lock()
             self.download = DownloadsConfig()
             self.resource_comment = ResourceCommentConfig()
             self.utilization = UtilizationConfig()
@@ -454,22 +712,140 @@ class FeedbackConfig(Singleton):
             self.like = LikesConfig()
             self.custom_sort = CustomSortConfig()
             self.moral_keeper_ai = MoralKeeperAiConfig()
+            self.event_log = EventLogConfig()
+            self.package_summary = PackageSummaryConfig()
+            self.ranking_rollup = RankingRollupConfig()
+            self.ranking_cache = RankingCacheConfig()
+            self.stats_cache = StatsCacheConfig()
+
+    def get_feedback_config_file(self):
+        return f'{self.feedback_config_path}/{self.config_file_name}'
+
+    def stage_feedback_config(self, feedback_config):
+        """
+        Load `feedback_config` into a StagedConfig without changing the CKAN
+        config. Raises a ValidationError if the file is incomplete.
+        """
+        staged = StagedConfig()
+        token = _staged_config.set(staged)
+        try:
+            for value in self.__dict__.values():
+                if isinstance(value, BaseConfig):
+                    value.load_config(feedback_config)
+        finally:
+            _staged_config.reset(token)
+        return staged
+
+    def apply_staged_config(self, staged):
+        # Keys set from an earlier version of the file and no longer in it
+        # are dropped, so that removed settings stop applying
+        removed = staged.removed | (self._file_config_keys - set(staged.values))
+        set_config_snapshot(ConfigSnapshot(staged.values, removed))
+        # Also kept in the CKAN config for the readers outside of this plugin
+        for key in removed:
+            config.pop(key, None)
+        config.update(staged.values)
+        self._file_config_keys = set(staged.values)
 
     def load_feedback_config(self):
+        # Organizations may have been renamed since their names were kept
+        organization_names.clear()
         try:
-            with open(
-                f'{self.feedback_config_path}/feedback_config.json', 'r'
-            ) as json_file:
+            signature = get_file_signature(self.get_feedback_config_file())
+            with open(self.get_feedback_config_file(), 'r') as json_file:
                 self.is_feedback_config_file = True
+                self._config_file_signature = signature
                 feedback_config = json.load(json_file)
-                for value in self.__dict__.values():
-                    if isinstance(value, BaseConfig):
-                        value.load_config(feedback_config)
+                self.apply_staged_config(self.stage_feedback_config(feedback_config))
         except FileNotFoundError:
             toolkit.error_shout(
                 'The feedback config file not found. '
                 f'{self.feedback_config_path}/feedback_config.json'
             )
             self.is_feedback_config_file = False
+            self._config_file_signature = None
+            self.apply_staged_config(StagedConfig())
         except json.JSONDecodeError:
             toolkit.error_shout('The feedback config file not decoded correctly')
+
+    def validate_feedback_config_file(self, file_path=None):
+        """
+        Check a feedback_config.json without loading it, returning the list
+        of error messages found.
+        """
+        file_path = file_path or self.get_feedback_config_file()
+        try:
+            with open(file_path, 'r') as json_file:
+                feedback_config = json.load(json_file)
+        except FileNotFoundError:
+            return [f'The feedback config file not found. {file_path}']
+        except json.JSONDecodeError as e:
+            return [f'The feedback config file not decoded correctly: {e}']
+
+        if not isinstance(feedback_config, dict):
+            return ['The feedback config file must contain a JSON object.']
+
+        try:
+            staged = self.stage_feedback_config(feedback_config)
+        except toolkit.ValidationError as e:
+            return [e.error_dict.get('message')]
+        except AttributeError as e:
+            return [f'The feedback config file has an invalid structure: {e}']
+
+        errors = []
+        for key, enable in staged.values.items():
+            if not key.endswith('.enable'):
+                continue
+            prefix = key[: -len('.enable')]
+            try:
+                feature_flag = compile_feature_flag(
+                    enable,
+                    staged.values.get(f'{prefix}.enable_orgs'),
+                    staged.values.get(f'{prefix}.disable_orgs'),
+                )
+            except toolkit.ValidationError as e:
+                errors.append(f'{prefix}: {e.error_dict.get("message")}')
+                continue
+            if feature_flag.error:
+                errors.append(f'{prefix}: {feature_flag.error}')
+        return errors
+
+    def reload_feedback_config_if_changed(self):
+        """
+        Load feedback_config.json again if it has changed since it was
+        loaded, checking it at most once per reload interval. If the changed
+        file is invalid, the errors are logged and the values loaded before
+        are kept.
+        """
+        interval = toolkit.asint(config.get(CONFIG_RELOAD_INTERVAL, 0))
+        now = time.monotonic()
+        if interval <= 0 or now < self._next_reload_check:
+            return False
+        # Another thread of the worker is already checking the file
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        try:
+            self._next_reload_check = now + interval
+            file_path = self.get_feedback_config_file()
+            try:
+                signature = get_file_signature(file_path)
+            except FileNotFoundError:
+                signature = None
+            if signature == self._config_file_signature:
+                return False
+
+            if signature is not None:
+                errors = self.validate_feedback_config_file(file_path)
+                if errors:
+                    for error in errors:
+                        log.error(f'{file_path} was not reloaded: {error}')
+                    # Not checked again until the file changes
+                    self._config_file_signature = signature
+                    return False
+
+            self.load_feedback_config()
+            log.info(f'Reloaded {file_path}')
+            return True
+        finally:
+            self._reload_lock.release()
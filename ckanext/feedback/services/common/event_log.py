@@ -0,0 +1,160 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from ckan.model import Resource
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from ckanext.feedback.models.event import (
+    FeedbackEvent,
+    FeedbackEventKind,
+    FeedbackEventRollup,
+)
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.common.search_index import update_package_search_index
+from ckanext.feedback.services.download.monthly import (
+    increment_resource_downloads_monthly_bulk,
+)
+from ckanext.feedback.services.download.summary import increment_resource_downloads_bulk
+from ckanext.feedback.services.resource.likes import (
+    increment_resource_like_count_bulk,
+    increment_resource_like_count_monthly_bulk,
+)
+
+log = logging.getLogger(__name__)
+
+ROLLUP_NAME = 'summary'
+
+LIKE_DELTAS = {
+    FeedbackEventKind.LIKE: 1,
+    FeedbackEventKind.UNLIKE: -1,
+}
+
+
+def is_event_log_enabled():
+    return FeedbackConfig().event_log.is_enable()
+
+
+def add_event(resource_id, kind):
+    session.add(FeedbackEvent(resource_id=resource_id, kind=kind, ts=datetime.now()))
+
+
+def _lock_rollup_state():
+    # The row lock makes concurrent rollups wait for each other
+    session.execute(
+        insert(FeedbackEventRollup)
+        .values(name=ROLLUP_NAME, last_event_id=0, updated=datetime.now())
+        .on_conflict_do_nothing(index_elements=['name'])
+    )
+    return (
+        session.query(FeedbackEventRollup)
+        .filter(FeedbackEventRollup.name == ROLLUP_NAME)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+
+
+def _get_settled_event_id(last_event_id, settle_seconds):
+    # Ids are assigned at insert time, so an event with a smaller id can
+    # become visible after larger ones. Only events older than the settle
+    # window are folded, which keeps the high-water mark from skipping
+    # events whose transaction has not been committed yet.
+    cutoff = datetime.now() - timedelta(seconds=settle_seconds)
+    unsettled_event_id = (
+        session.query(func.min(FeedbackEvent.id))
+        .filter(FeedbackEvent.id > last_event_id, FeedbackEvent.ts >= cutoff)
+        .scalar()
+    )
+    if unsettled_event_id is not None:
+        return unsettled_event_id - 1
+    return session.query(func.max(FeedbackEvent.id)).scalar() or last_event_id
+
+
+def _fold_events(first_event_id, last_event_id):
+    month = func.date_trunc('month', FeedbackEvent.ts)
+    rows = (
+        session.query(
+            FeedbackEvent.resource_id,
+            FeedbackEvent.kind,
+            month.label('month'),
+            func.count(FeedbackEvent.id).label('event_count'),
+        )
+        .filter(
+            FeedbackEvent.id > first_event_id,
+            FeedbackEvent.id <= last_event_id,
+        )
+        .group_by(FeedbackEvent.resource_id, FeedbackEvent.kind, month)
+        .all()
+    )
+
+    download_counts = defaultdict(int)
+    monthly_download_counts = defaultdict(int)
+    like_counts = defaultdict(int)
+    monthly_like_counts = defaultdict(int)
+    for row in rows:
+        if row.kind == FeedbackEventKind.DOWNLOAD:
+            download_counts[row.resource_id] += row.event_count
+            monthly_download_counts[(row.resource_id, row.month)] += row.event_count
+        else:
+            delta = LIKE_DELTAS[row.kind] * row.event_count
+            like_counts[row.resource_id] += delta
+            monthly_like_counts[(row.resource_id, row.month)] += delta
+
+    increment_resource_downloads_bulk(download_counts)
+    increment_resource_downloads_monthly_bulk(monthly_download_counts)
+    increment_resource_like_count_bulk(like_counts)
+    increment_resource_like_count_monthly_bulk(monthly_like_counts)
+
+    resource_ids = {row.resource_id for row in rows}
+    return sum(row.event_count for row in rows), resource_ids
+
+
+def rollup_events(batch_size=10000, settle_seconds=60):
+    """
+    Fold the events after the high-water mark into the download and like
+    summary and monthly tables.
+
+    Each batch covers at most `batch_size` event ids and is committed
+    together with the new high-water mark, so an interrupted rollup
+    resumes where it stopped. Returns the number of folded events.
+    """
+    folded = 0
+    resource_ids = set()
+
+    while True:
+        rollup = _lock_rollup_state()
+        first_event_id = rollup.last_event_id
+        last_event_id = min(
+            first_event_id + batch_size,
+            _get_settled_event_id(first_event_id, settle_seconds),
+        )
+        if last_event_id <= first_event_id:
+            session.commit()
+            break
+
+        try:
+            count, batch_resource_ids = _fold_events(first_event_id, last_event_id)
+            rollup.last_event_id = last_event_id
+            rollup.updated = datetime.now()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        folded += count
+        resource_ids.update(batch_resource_ids)
+        log.debug(f'Folded {count} feedback events up to event id {last_event_id}')
+
+    if resource_ids:
+        package_ids = (
+            session.query(Resource.package_id)
+            .filter(Resource.id.in_(resource_ids))
+            .distinct()
+        )
+        for (package_id,) in package_ids:
+            update_package_search_index(package_id)
+
+    return folded
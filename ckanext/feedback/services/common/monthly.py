@@ -0,0 +1,78 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Date, cast, func, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from ckanext.feedback.models.session import session
+
+
+def get_approval_month(model):
+    """
+    The approval timestamp of the comments of `model` and its month. Comments
+    approved before the timestamp was recorded fall back to their creation.
+    """
+    approved = func.coalesce(model.approved, model.created)
+    # The literal keeps the expression identical in SELECT and GROUP BY
+    month = cast(func.date_trunc(literal_column("'month'"), approved), Date)
+    return approved, month
+
+
+def replace_monthly_counts(monthly_model, count_column, resource_ids, rows):
+    """
+    Replace the rows of the resources in `monthly_model` with `rows` of
+    resource_id, period, count and first approval. Returns the number of
+    rows written.
+
+    The rows are upserted on (resource_id, period) so that concurrent
+    refreshes of the same resource do not collide on the unique constraint.
+    """
+    now = datetime.now()
+    mappings = [
+        {
+            'id': str(uuid.uuid4()),
+            'resource_id': resource_id,
+            count_column: count,
+            'period': period,
+            'created': created,
+            'updated': now,
+        }
+        for resource_id, period, count, created in rows
+    ]
+    stale = session.query(monthly_model).filter(
+        monthly_model.resource_id.in_(resource_ids)
+    )
+    if mappings:
+        stale = stale.filter(
+            tuple_(monthly_model.resource_id, monthly_model.period).notin_(
+                [(m['resource_id'], m['period']) for m in mappings]
+            )
+        )
+    stale.delete(synchronize_session=False)
+
+    if mappings:
+        insert_monthly = insert(monthly_model).values(mappings)
+        session.execute(
+            insert_monthly.on_conflict_do_update(
+                index_elements=['resource_id', 'period'],
+                set_={
+                    count_column: insert_monthly.excluded[count_column],
+                    'created': insert_monthly.excluded.created,
+                    'updated': now,
+                },
+            )
+        )
+    return len(mappings)
+
+
+def rebuild_monthly_counts(resource_ids, refresh, batch_size):
+    """
+    Call `refresh` with the resource ids in batches of `batch_size`,
+    committing each batch. Returns the number of rows written.
+    """
+    resource_ids = list(resource_ids)
+    written = 0
+    for i in range(0, len(resource_ids), batch_size):
+        written += refresh(resource_ids[i : i + batch_size])
+        session.commit()
+    return written
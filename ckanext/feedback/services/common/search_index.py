@@ -0,0 +1,969 @@
+import fcntl
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple
+
+import requests
+from ckan.common import config
+from ckan.lib.redis import connect_to_redis
+from ckan.model.package import Package
+from ckan.model.resource import Resource
+from ckan.plugins import toolkit
+from flask import current_app, has_app_context
+from sqlalchemy import and_, func
+
+from ckanext.feedback.models.download import DownloadSummary
+from ckanext.feedback.models.likes import ResourceLike
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.background import PeriodicWorker
+from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.download import summary as download_summary_service
+from ckanext.feedback.services.resource import likes as resource_likes_service
+
+log = logging.getLogger(__name__)
+
+
+def get_solr_url():
+    """
+    Get Solr URL from CKAN config.
+
+    Checks multiple possible config keys in order:
+    1. ckan.solr_url (CKAN standard)
+    2. solr_url (alternative)
+    3. Default fallback
+    """
+    # Try CKAN standard config key first
+    solr_url = config.get('ckan.solr_url')
+    if solr_url:
+        return solr_url
+
+    # Try alternative config key
+    solr_url = config.get('solr_url')
+    if solr_url:
+        return solr_url
+
+    # Fallback to default (for development environments)
+    return 'http://solr:8983/solr/ckan'
+
+
+def get_index_id(package_id):
+    # Same unique key as the documents written by ckan.lib.search
+    return hashlib.md5(
+        f"{package_id}{config.get('ckan.site_id')}".encode('utf-8')
+    ).hexdigest()
+
+
+def rebuild_package_search_index(package_id):
+    """
+    Update Solr index for a specific package.
+    This is needed when download/like counts change without package metadata changing.
+    """
+    try:
+        from ckan.lib.search import rebuild
+
+        rebuild(package_id)
+        log.debug(f"Updated search index for package {package_id}")
+    except Exception as e:
+        log.warning(f"Failed to update search index for package {package_id}: {e}")
+
+
+class FeedbackCounts(NamedTuple):
+    downloads: int
+    likes: int
+
+
+_prefetched_feedback_counts = ContextVar('feedback_prefetched_counts', default=None)
+
+
+@contextmanager
+def prefetched_feedback_counts(package_ids):
+    """
+    Load the download and like totals of the packages with one query each,
+    for before_dataset_index to use while they are reindexed in the block.
+    """
+    package_ids = list(package_ids)
+    downloads = {}
+    likes = {}
+    if package_ids:
+        downloads = download_summary_service.get_package_downloads_bulk(package_ids)
+        likes = resource_likes_service.get_package_like_count_bulk(package_ids)
+    counts = {
+        package_id: FeedbackCounts(
+            int(downloads.get(package_id, 0)), int(likes.get(package_id, 0))
+        )
+        for package_id in package_ids
+    }
+    with feedback_counts_for_indexing(counts):
+        yield counts
+
+
+@contextmanager
+def feedback_counts_for_indexing(counts):
+    "Have before_dataset_index use `counts`, a dict of ids to FeedbackCounts."
+    token = _prefetched_feedback_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        _prefetched_feedback_counts.reset(token)
+
+
+def get_prefetched_feedback_counts(package_id):
+    "The counts set for indexing in the current context, or None outside of it."
+    counts = _prefetched_feedback_counts.get()
+    if counts is None:
+        return None
+    return counts.get(package_id)
+
+
+class SearchIndexRebuildResult(NamedTuple):
+    total: int
+    failed: list
+
+
+def _rebuild_one_by_one(rebuild, package_ids, force, failed):
+    for package_id in package_ids:
+        try:
+            rebuild(package_ids=[package_id])
+        except Exception as e:
+            log.error(f"Failed to reindex package {package_id}: {e}")
+            failed.append(package_id)
+            if not force:
+                raise RuntimeError(
+                    f"Failed to reindex package {package_id}: {e}"
+                ) from e
+
+
+def rebuild_search_index(chunk_size=1000, force=False):
+    """
+    Reindex every package like `ckan search-index rebuild`, loading the
+    feedback counts of each chunk of packages up front instead of querying
+    them for every package.
+
+    If a chunk fails, its packages are reindexed one by one to find the
+    ones that fail. With `force`, the other packages are still reindexed
+    and the ids of the failed ones are returned, otherwise the first
+    failure is raised.
+    """
+    from ckan.lib.search import commit, rebuild
+
+    packages = session.query(Package.id)
+    if toolkit.asbool(config.get('ckan.search.remove_deleted_packages')):
+        packages = packages.filter(Package.state != 'deleted')
+    package_ids = [package_id for (package_id,) in packages.order_by(Package.id)]
+
+    total = len(package_ids)
+    failed = []
+    for start in range(0, total, chunk_size):
+        chunk = package_ids[start : start + chunk_size]
+        with prefetched_feedback_counts(chunk):
+            try:
+                rebuild(package_ids=chunk)
+            except Exception as e:
+                log.warning(
+                    f"Failed to reindex {len(chunk)} packages from {chunk[0]}, "
+                    f"reindexing them one by one: {e}"
+                )
+                _rebuild_one_by_one(rebuild, chunk, force, failed)
+        log.info(f"Reindexed {start + len(chunk)}/{total} packages")
+    commit()
+    return SearchIndexRebuildResult(total, failed)
+
+
+# Changed when the fields of the Solr schema are added or deleted, so that
+# every worker sharing the Redis of CKAN checks the schema again
+SOLR_FIELDS_STAMP_KEY = 'ckanext-feedback:solr_fields:stamp'
+
+
+def get_solr_fields_stamp():
+    try:
+        return connect_to_redis().get(SOLR_FIELDS_STAMP_KEY)
+    except Exception as e:
+        # The kept results then only expire after their TTL
+        log.debug(f"Failed to read the Solr fields stamp: {e}")
+        return None
+
+
+class SolrFieldCache:
+    """
+    Whether fields exist in the Solr schema, kept for a while so that
+    indexing each dataset does not ask the schema API again. The results
+    kept before the stamp returned by `stamp` changed are not used.
+    """
+
+    def __init__(self, clock=time.monotonic, stamp=get_solr_fields_stamp):
+        self._clock = clock
+        self._stamp = stamp
+        self._lock = threading.Lock()
+        self._fields = {}
+
+    def _get(self, key, ttl, load):
+        """
+        The kept value of `key`, or the value returned by `load` along with
+        whether it may be kept.
+        """
+        if ttl <= 0:
+            return load()[0]
+
+        now = self._clock()
+        stamp = self._stamp()
+        with self._lock:
+            cached = self._fields.get(key)
+        if cached is not None and cached[0] > now and cached[2] == stamp:
+            return cached[1]
+
+        value, keep = load()
+        if keep:
+            with self._lock:
+                self._fields[key] = (now + ttl, value, stamp)
+        return value
+
+    def field_exists(self, solr_url, field_name, ttl):
+        def load():
+            try:
+                response = requests.get(
+                    f"{solr_url}/schema/fields/{field_name}", timeout=5
+                )
+            except Exception:
+                # Not kept, so that the field is checked again once Solr is back.
+                # If check fails, assume field doesn't exist to be safe
+                return False, False
+            return response.status_code == 200, response.status_code in (200, 404)
+
+        return self._get((solr_url, field_name), ttl, load)
+
+    def atomic_update_supported(self, solr_url, ttl):
+        def load():
+            try:
+                dropped = _get_fields_dropped_by_atomic_update(solr_url)
+            except Exception as e:
+                log.warning(f"Failed to check the Solr schema for atomic updates: {e}")
+                return False, False
+            if dropped:
+                log.warning(
+                    "Solr atomic updates would drop the fields "
+                    f"{', '.join(dropped)}, which are neither stored nor "
+                    "docValues, so whole datasets are reindexed instead"
+                )
+            return not dropped, True
+
+        return self._get(('atomic_update', solr_url), ttl, load)
+
+    def clear(self):
+        with self._lock:
+            self._fields.clear()
+
+
+solr_field_cache = SolrFieldCache()
+
+
+def _get_fields_dropped_by_atomic_update(solr_url):
+    """
+    The fields of the Solr schema whose values an atomic update would lose,
+    as Solr rebuilds the document from its stored and docValues fields.
+    The destinations of copyField are filled again from their sources.
+    """
+    response = requests.get(
+        f"{solr_url}/schema/fields", params={'showDefaults': 'true'}, timeout=5
+    )
+    response.raise_for_status()
+    fields = response.json().get('fields', [])
+
+    response = requests.get(f"{solr_url}/schema/copyfields", timeout=5)
+    response.raise_for_status()
+    copied = {field['dest'] for field in response.json().get('copyFields', [])}
+
+    return [
+        field['name']
+        for field in fields
+        if not field.get('stored', True)
+        and not field.get('docValues', False)
+        and field['name'] not in copied
+    ]
+
+
+def field_exists_in_solr(solr_url, field_name):
+    ttl = int(FeedbackConfig().custom_sort.field_cache_ttl.get())
+    return solr_field_cache.field_exists(solr_url, field_name, ttl)
+
+
+def atomic_update_supported(solr_url):
+    """
+    Whether the count fields can be updated with Solr atomic updates
+    without losing the values of other fields, such as permission_labels.
+    """
+    ttl = int(FeedbackConfig().custom_sort.field_cache_ttl.get())
+    return solr_field_cache.atomic_update_supported(solr_url, ttl)
+
+
+def invalidate_solr_field_cache():
+    """
+    Check the Solr schema again, after its fields have been added or
+    deleted. The other workers check it again once they see the new stamp.
+    """
+    solr_field_cache.clear()
+    try:
+        connect_to_redis().incr(SOLR_FIELDS_STAMP_KEY)
+    except Exception as e:
+        log.warning(
+            "Failed to update the Solr fields stamp, other workers keep the "
+            f"fields they checked until field_cache_ttl passes: {e}"
+        )
+
+
+def _add_solr_field(schema_api, field_name, existing_fields):
+    """
+    Add a Solr field to the schema.
+
+    Args:
+        schema_api: Solr schema API URL
+        field_name: Name of the field to add
+        existing_fields: List of existing field names
+
+    Returns:
+        bool: True if the field is in the schema
+    """
+    if field_name in existing_fields:
+        log.debug(f"Field '{field_name}' already exists")
+        return True
+
+    log.info(f"Adding '{field_name}' field to Solr schema")
+    try:
+        response = requests.post(
+            schema_api,
+            json={
+                "add-field": {
+                    "name": field_name,
+                    "type": "pint",
+                    "indexed": True,
+                    "stored": False,
+                    "docValues": True,
+                }
+            },
+            timeout=10,
+        )
+
+        if response.status_code in [200, 201]:
+            log.info(f"Successfully added '{field_name}' field")
+            return True
+        log.error(
+            f"Failed to add '{field_name}' field: "
+            f"{response.status_code} - {response.text}"
+        )
+    except requests.exceptions.RequestException as e:
+        log.error(f"Error adding '{field_name}' field: {e}")
+    return False
+
+
+def setup_solr_schema():
+    """
+    Setup Solr schema fields using Schema API.
+    This automatically adds required integer fields for sorting by
+    downloads and likes without manual schema.xml modification.
+    Returns True if the fields of the enabled features are in the schema.
+    """
+    try:
+        cfg = FeedbackConfig()
+
+        # Check if custom sort feature is enabled
+        if not cfg.custom_sort.is_enable():
+            log.debug("Custom sort feature is disabled in feedback_config.json")
+            return False
+
+        # Get Solr URL from config
+        solr_url = get_solr_url()
+        schema_api = f"{solr_url}/schema"
+
+        log.info(f"Setting up Solr schema via API: {schema_api}")
+
+        # Check if Schema API is available
+        try:
+            response = requests.get(f"{schema_api}/fields", timeout=5)
+            if response.status_code != 200:
+                log.warning(
+                    f"Schema API returned status {response.status_code}. "
+                    "Manual schema configuration may be required."
+                )
+                return False
+        except requests.exceptions.RequestException as e:
+            log.warning(
+                f"Schema API not available: {e}\n"
+                "Manual schema configuration required. Add "
+                "the following to managed-schema:\n"
+                "  <field name='downloads_total_i' type='pint' "
+                "indexed='true' stored='false' docValues='true'/>\n"
+                "  <field name='likes_total_i' type='pint' "
+                "indexed='true' stored='false' docValues='true'/>"
+            )
+            return False
+
+        # Get existing fields (for idempotency check)
+        existing_fields = [f['name'] for f in response.json().get('fields', [])]
+
+        added = True
+        # Add downloads_total_i field if downloads feature is enabled
+        if cfg.download.is_enable():
+            added &= _add_solr_field(schema_api, 'downloads_total_i', existing_fields)
+
+        # Add likes_total_i field if likes feature is enabled
+        if cfg.like.is_enable():
+            added &= _add_solr_field(schema_api, 'likes_total_i', existing_fields)
+
+        invalidate_solr_field_cache()
+        log.info("Solr schema setup completed")
+        return added
+
+    except Exception as e:
+        log.error(f"Unexpected error in Solr schema setup: {e}", exc_info=True)
+        log.warning(
+            "If you continue to see this error, "
+            "please manually add fields to managed-schema:\n"
+            "  <field name='downloads_total_i' type='pint' "
+            "indexed='true' stored='false' docValues='true'/>\n"
+            "  <field name='likes_total_i' type='pint' "
+            "indexed='true' stored='false' docValues='true'/>"
+        )
+        return False
+
+
+# Raised when the fields added by setup_solr_schema change, so that the
+# setup recorded for the earlier fields runs again
+SOLR_SCHEMA_VERSION = 1
+
+
+def _get_solr_schema_lock_file(solr_url):
+    digest = hashlib.md5(solr_url.encode('utf-8')).hexdigest()
+    return os.path.join(
+        tempfile.gettempdir(), f'ckanext-feedback-solr-schema-{digest}.lock'
+    )
+
+
+def _get_solr_schema_stamp_file(solr_url):
+    """
+    The file recording that setup_solr_schema has finished for the Solr
+    core, the schema version and the fields of the enabled features.
+    """
+    cfg = FeedbackConfig()
+    fields = []
+    if cfg.download.is_enable():
+        fields.append('downloads_total_i')
+    if cfg.like.is_enable():
+        fields.append('likes_total_i')
+    version = hashlib.md5(
+        f"{SOLR_SCHEMA_VERSION}:{','.join(fields)}".encode('utf-8')
+    ).hexdigest()
+    return _get_solr_schema_lock_file(solr_url)[: -len('.lock')] + f'-{version}.done'
+
+
+def clear_solr_schema_setup_stamps(solr_url):
+    "Have setup_solr_schema_once set up the Solr core again on this node."
+    lock_file = _get_solr_schema_lock_file(solr_url)
+    for stamp_file in glob.glob(f"{lock_file[: -len('.lock')]}-*.done"):
+        try:
+            os.remove(stamp_file)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def solr_schema_setup_lock(solr_url):
+    """
+    Lock shared by the processes of this node that use the same Solr core.
+    Yields False without waiting if another process holds it.
+    """
+    with open(_get_solr_schema_lock_file(solr_url), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def setup_solr_schema_once():
+    """
+    Set up the Solr schema unless a process of this node has already done
+    it or is doing it, so that workers started together or restarted do
+    not all call the API.
+    """
+    solr_url = get_solr_url()
+    stamp_file = _get_solr_schema_stamp_file(solr_url)
+    if os.path.exists(stamp_file):
+        log.debug("Solr schema has already been set up")
+        return True
+
+    with solr_schema_setup_lock(solr_url) as locked:
+        if not locked:
+            log.debug("Solr schema setup is running in another process")
+            return False
+        # Finished by the process that held the lock before
+        if os.path.exists(stamp_file):
+            return True
+        if not setup_solr_schema():
+            return False
+        with open(stamp_file, 'w') as f:
+            f.write(solr_url)
+        return True
+
+
+def start_solr_schema_setup():
+    "Set up the Solr schema in a daemon thread, without blocking startup."
+    thread = threading.Thread(
+        target=setup_solr_schema_once, name='feedback-solr-schema', daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _get_indexed_packages(solr_url, index_ids):
+    response = requests.post(
+        f"{solr_url}/select",
+        data={
+            'q': '*:*',
+            'fq': f"index_id:({' OR '.join(index_ids)})",
+            'fl': 'index_id,owner_org',
+            'rows': len(index_ids),
+            'wt': 'json',
+        },
+        timeout=10,
+    )
+    response.raise_for_status()
+    docs = response.json()['response']['docs']
+    return {doc['index_id']: doc.get('owner_org') for doc in docs}
+
+
+def _get_count_field_updates(solr_url, packages):
+    """
+    Build the atomic updates for the count fields that before_dataset_index
+    would set, keyed by package id.
+    """
+    package_ids = list(packages)
+    downloads = likes = None
+    if field_exists_in_solr(solr_url, 'downloads_total_i'):
+        downloads = download_summary_service.get_package_downloads_bulk(package_ids)
+    if field_exists_in_solr(solr_url, 'likes_total_i'):
+        likes = resource_likes_service.get_package_like_count_bulk(package_ids)
+    return _build_count_field_updates(packages, downloads, likes)
+
+
+def _build_count_field_updates(packages, downloads, likes):
+    """
+    Build the atomic updates of the packages, a dict of ids to owner_org,
+    from their counts. The counts of a field missing in Solr are None.
+    """
+    fb_config = FeedbackConfig()
+    field_updates = {package_id: {} for package_id in packages}
+
+    if downloads is not None:
+        for package_id, owner_org in packages.items():
+            if fb_config.download.is_enable(owner_org):
+                field_updates[package_id]['downloads_total_i'] = {
+                    'set': int(downloads.get(package_id, 0))
+                }
+
+    if likes is not None:
+        for package_id, owner_org in packages.items():
+            if fb_config.like.is_enable(owner_org):
+                field_updates[package_id]['likes_total_i'] = {
+                    'set': int(likes.get(package_id, 0))
+                }
+
+    return field_updates
+
+
+def _post_count_field_updates(solr_url, field_updates, commit=True):
+    docs = [
+        {'index_id': get_index_id(package_id), **fields}
+        for package_id, fields in field_updates.items()
+        if fields
+    ]
+    if not docs:
+        return 0
+
+    params = {}
+    if commit and toolkit.asbool(config.get('ckan.search.solr_commit', True)):
+        params['commit'] = 'true'
+    response = requests.post(f"{solr_url}/update", params=params, json=docs, timeout=30)
+    response.raise_for_status()
+    return len(docs)
+
+
+def _update_count_fields(package_ids):
+    """
+    Send one atomic update request for the given packages and return the
+    ids of the packages that have no document in the index yet.
+    """
+    solr_url = get_solr_url()
+    package_by_index_id = {
+        get_index_id(package_id): package_id for package_id in package_ids
+    }
+    indexed = _get_indexed_packages(solr_url, list(package_by_index_id))
+
+    # An atomic update of a missing document would create a document that
+    # only has the count fields, so those packages need a full rebuild.
+    missing = [
+        package_id
+        for index_id, package_id in package_by_index_id.items()
+        if index_id not in indexed
+    ]
+    packages = {
+        package_by_index_id[index_id]: owner_org
+        for index_id, owner_org in indexed.items()
+    }
+    if not packages:
+        return missing
+
+    field_updates = _get_count_field_updates(solr_url, packages)
+    updated = _post_count_field_updates(solr_url, field_updates)
+    if updated:
+        log.debug(f"Updated feedback counts in search index for {updated} packages")
+    return missing
+
+
+def rebuild_package_search_indexes(package_ids):
+    "Reindex the packages with their feedback counts loaded up front."
+    with prefetched_feedback_counts(package_ids):
+        for package_id in package_ids:
+            rebuild_package_search_index(package_id)
+
+
+def update_package_count_fields(package_ids):
+    """
+    Update downloads_total_i and likes_total_i of the given packages with
+    Solr atomic updates instead of re-indexing the whole dataset documents.
+    Packages that cannot be updated that way are rebuilt, as are all of
+    them if the Solr schema has fields that atomic updates would drop.
+    """
+    batch_size = int(FeedbackConfig().custom_sort.atomic_update.batch_size.get())
+    package_ids = list(dict.fromkeys(package_ids))
+    if not atomic_update_supported(get_solr_url()):
+        rebuild_package_search_indexes(package_ids)
+        return
+
+    for start in range(0, len(package_ids), batch_size):
+        batch = package_ids[start : start + batch_size]
+        try:
+            missing = _update_count_fields(batch)
+        except Exception as e:
+            log.warning(
+                "Failed to update feedback counts in search index, "
+                f"rebuilding {len(batch)} packages instead: {e}"
+            )
+            missing = batch
+
+        for package_id in missing:
+            rebuild_package_search_index(package_id)
+
+
+def _query_package_counts(start_after=None):
+    """
+    The download and like totals of every active package in id order,
+    starting after the package id `start_after`.
+    """
+    query = (
+        session.query(
+            Package.id.label('package_id'),
+            Package.owner_org.label('owner_org'),
+            func.coalesce(func.sum(DownloadSummary.download), 0).label('downloads'),
+            func.coalesce(func.sum(ResourceLike.like_count), 0).label('likes'),
+        )
+        .outerjoin(
+            Resource,
+            and_(Resource.package_id == Package.id, Resource.state == 'active'),
+        )
+        .outerjoin(DownloadSummary, DownloadSummary.resource_id == Resource.id)
+        .outerjoin(ResourceLike, ResourceLike.resource_id == Resource.id)
+        .filter(Package.state == 'active')
+        .group_by(Package.id)
+        .order_by(Package.id)
+    )
+    if start_after:
+        query = query.filter(Package.id > start_after)
+    return query
+
+
+def _count_packages(start_after=None):
+    query = session.query(func.count(Package.id)).filter(Package.state == 'active')
+    if start_after:
+        query = query.filter(Package.id > start_after)
+    return query.scalar()
+
+
+def _iter_batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _push_count_field_updates(solr_url, field_updates):
+    """
+    Send the atomic updates of the packages that are in the index, without
+    committing. Returns the numbers of updated and of missing packages.
+    """
+    package_by_index_id = {
+        get_index_id(package_id): package_id for package_id in field_updates
+    }
+    indexed = _get_indexed_packages(solr_url, list(package_by_index_id))
+    # Atomic updates would create documents with only the count fields
+    updates = {
+        package_id: field_updates[package_id]
+        for index_id, package_id in package_by_index_id.items()
+        if index_id in indexed
+    }
+    updated = _post_count_field_updates(solr_url, updates, commit=False)
+    return updated, len(field_updates) - len(updates)
+
+
+class CountReindexProgress:
+    """
+    Counts of a reindex_count_fields run, and the package id after which
+    it can be started again to skip the packages already updated.
+    """
+
+    def __init__(self, total, start_after=None):
+        self.total = total
+        self.packages = 0
+        self.updated = 0
+        self.missing = 0
+        self.failed = 0
+        self.resume_after = start_after
+        self._next_batch = 0
+        self._batches = {}
+
+    def add_batch(self, number, last_package_id, packages, updated=0, missing=0):
+        """Record a finished batch. `last_package_id` is None if it failed."""
+        self.packages += packages
+        if last_package_id is None:
+            self.failed += packages
+        else:
+            self.updated += updated
+            self.missing += missing
+        self._batches[number] = last_package_id
+
+        # Batches finish out of order, so only move past the ones that
+        # succeeded together with all of the batches before them
+        while self._batches.get(self._next_batch) is not None:
+            self.resume_after = self._batches.pop(self._next_batch)
+            self._next_batch += 1
+
+
+def _rebuild_count_fields(progress, batch_size, start_after, dry_run, on_progress):
+    """
+    Reindex the packages of reindex_count_fields with package_index, using
+    the totals read from the database instead of querying them again.
+    """
+    from ckan.lib.search import commit, rebuild
+
+    # Read up front, as reindexing commits the session
+    rows = _query_package_counts(start_after).all()
+    for number, batch in enumerate(_iter_batches(rows, batch_size)):
+        last_package_id = batch[-1].package_id
+        if not dry_run:
+            counts = {
+                row.package_id: FeedbackCounts(int(row.downloads), int(row.likes))
+                for row in batch
+            }
+            try:
+                with feedback_counts_for_indexing(counts):
+                    rebuild(package_ids=list(counts))
+            except Exception as e:
+                log.warning(
+                    f"Failed to reindex {len(batch)} packages up to "
+                    f"{last_package_id}: {e}"
+                )
+                last_package_id = None
+        progress.add_batch(number, last_package_id, len(batch), len(batch))
+        if on_progress:
+            on_progress(progress)
+
+    if not dry_run and progress.updated:
+        commit()
+    return progress
+
+
+def reindex_count_fields(
+    batch_size=500, workers=4, start_after=None, dry_run=False, on_progress=None
+):
+    """
+    Set downloads_total_i and likes_total_i of every indexed package from
+    the database with Solr atomic updates, without reindexing the datasets.
+    If the Solr schema has fields that atomic updates would drop, the
+    datasets are reindexed with package_index instead.
+
+    The totals are streamed from a server-side cursor in package id order
+    and each batch is sent to Solr by one of `workers` threads. With
+    `dry_run`, the totals are read but nothing is sent. `on_progress` is
+    called with the CountReindexProgress after each batch.
+    """
+    fb_config = FeedbackConfig()
+    if not fb_config.custom_sort.is_enable():
+        raise RuntimeError('custom_sort is disabled in feedback_config.json')
+
+    solr_url = get_solr_url()
+    downloads_field = field_exists_in_solr(solr_url, 'downloads_total_i')
+    likes_field = field_exists_in_solr(solr_url, 'likes_total_i')
+    if not downloads_field and not likes_field:
+        raise RuntimeError(
+            'downloads_total_i and likes_total_i are not in the Solr schema'
+        )
+
+    progress = CountReindexProgress(_count_packages(start_after), start_after)
+    if not atomic_update_supported(solr_url):
+        log.warning(
+            "Solr atomic updates cannot be used with this schema, "
+            "reindexing the datasets instead"
+        )
+        return _rebuild_count_fields(
+            progress, batch_size, start_after, dry_run, on_progress
+        )
+
+    rows = _query_package_counts(start_after).yield_per(batch_size)
+
+    def finish(number, batch, future):
+        last_package_id = batch[-1].package_id
+        try:
+            updated, missing = future.result()
+        except Exception as e:
+            log.warning(
+                "Failed to update feedback counts in search index for "
+                f"{len(batch)} packages up to {last_package_id}: {e}"
+            )
+            progress.add_batch(number, None, len(batch))
+        else:
+            progress.add_batch(number, last_package_id, len(batch), updated, missing)
+        if on_progress:
+            on_progress(progress)
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='feedback-reindex-counts'
+    ) as executor:
+        pending = {}
+        for number, batch in enumerate(_iter_batches(rows, batch_size)):
+            # Built here, as the config lookups may need the database
+            field_updates = _build_count_field_updates(
+                {row.package_id: row.owner_org for row in batch},
+                (
+                    {row.package_id: row.downloads for row in batch}
+                    if downloads_field
+                    else None
+                ),
+                {row.package_id: row.likes for row in batch} if likes_field else None,
+            )
+            if dry_run:
+                updated = sum(1 for fields in field_updates.values() if fields)
+                progress.add_batch(number, batch[-1].package_id, len(batch), updated)
+                if on_progress:
+                    on_progress(progress)
+                continue
+
+            future = executor.submit(_push_count_field_updates, solr_url, field_updates)
+            pending[future] = (number, batch)
+            # Keep the number of batches held in memory bounded
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(*pending.pop(future), future)
+
+        for future in list(pending):
+            finish(*pending.pop(future), future)
+
+    if (
+        not dry_run
+        and progress.updated
+        and toolkit.asbool(config.get('ckan.search.solr_commit', True))
+    ):
+        response = requests.post(f"{solr_url}/update", json={'commit': {}}, timeout=60)
+        response.raise_for_status()
+    return progress
+
+
+class SearchIndexQueue(PeriodicWorker):
+    """
+    Debounced queue of packages whose feedback counts changed.
+
+    Package ids are collected for `interval` seconds and each one is
+    reindexed once at the end of the window, outside of the request that
+    changed it.
+    """
+
+    thread_name = 'feedback-search-index'
+
+    def __init__(self, interval=30):
+        super().__init__(interval)
+        self._lock = threading.Lock()
+        self._package_ids = set()
+        self._app = None
+
+    def add(self, package_id):
+        if not package_id:
+            return
+        if self._app is None and has_app_context():
+            # Reindexing runs plugin hooks that may expect a request context
+            self._app = current_app._get_current_object()
+        with self._lock:
+            self._package_ids.add(package_id)
+        self._ensure_worker()
+
+    def pending(self):
+        with self._lock:
+            return len(self._package_ids)
+
+    def flush(self):
+        with self._lock:
+            package_ids, self._package_ids = self._package_ids, set()
+        if not package_ids:
+            return 0
+
+        if self._app is not None:
+            with self._app.test_request_context():
+                self._rebuild(package_ids)
+        else:
+            self._rebuild(package_ids)
+        return len(package_ids)
+
+    def _rebuild(self, package_ids):
+        if FeedbackConfig().custom_sort.atomic_update.is_enable():
+            update_package_count_fields(package_ids)
+            return
+        rebuild_package_search_indexes(package_ids)
+
+
+_search_index_queue = None
+_search_index_queue_lock = threading.Lock()
+
+
+def get_search_index_queue():
+    global _search_index_queue
+
+    if _search_index_queue is None:
+        with _search_index_queue_lock:
+            if _search_index_queue is None:
+                reindex_queue = FeedbackConfig().custom_sort.reindex_queue
+                _search_index_queue = SearchIndexQueue(
+                    interval=float(reindex_queue.interval.get())
+                )
+    return _search_index_queue
+
+
+def update_package_search_index(package_id):
+    if FeedbackConfig().custom_sort.reindex_queue.is_enable():
+        get_search_index_queue().add(package_id)
+    elif FeedbackConfig().custom_sort.atomic_update.is_enable():
+        update_package_count_fields([package_id])
+    else:
+        rebuild_package_search_index(package_id)
@@ -0,0 +1,62 @@
+import logging
+
+from ckanext.feedback.models.event import FeedbackEventKind
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.event_log import add_event, is_event_log_enabled
+from ckanext.feedback.services.common.search_index import update_package_search_index
+from ckanext.feedback.services.download.monthly import (
+    increment_resource_downloads_monthly,
+)
+from ckanext.feedback.services.download.summary import increment_resource_downloads
+from ckanext.feedback.services.download.write_behind import (
+    get_download_buffer,
+    is_write_behind_enabled,
+)
+
+log = logging.getLogger(__name__)
+
+
+def _increment_downloads(resource_id, package_id):
+    try:
+        increment_resource_downloads(resource_id)
+        increment_resource_downloads_monthly(resource_id)
+        session.commit()
+
+        # Update Solr index to reflect new download count
+        if package_id:
+            update_package_search_index(package_id)
+    except Exception as e:
+        session.rollback()
+        log.warning(f'Transaction rolled back for resource {resource_id}')
+        log.exception(
+            f'Failed to increment download count for resource {resource_id}: {e}'
+        )
+
+
+def _add_download_event(resource_id):
+    try:
+        add_event(resource_id, FeedbackEventKind.DOWNLOAD)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        log.exception(
+            f'Failed to record download event for resource {resource_id}: {e}'
+        )
+
+
+def count_download(resource_id, package_id=None):
+    """
+    Count a download of the resource with the configured counter.
+
+    Downloads go to the event log or the write-behind buffer when either is
+    enabled, and are written to the database immediately otherwise. The
+    search index of `package_id` is updated along with the counts.
+    """
+    if is_event_log_enabled():
+        # Counts and the search index are updated by `ckan feedback rollup`
+        _add_download_event(resource_id)
+    elif is_write_behind_enabled():
+        # Counts and the search index are updated by the flush thread
+        get_download_buffer().add(resource_id, package_id=package_id)
+    else:
+        _increment_downloads(resource_id, package_id)
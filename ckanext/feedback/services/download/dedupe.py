@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from ckan.common import current_user
+from ckan.plugins import toolkit
+from flask import request
+
+from ckanext.feedback.services.common.config import FeedbackConfig
+
+
+class DownloadDeduplicator:
+    """
+    Bounded LRU of the downloads counted recently in this process.
+
+    A download of the same resource by the same client within `window`
+    seconds is reported as a duplicate. When more than `max_entries`
+    clients are tracked the least recently seen ones are forgotten, so
+    memory stays bounded at the cost of occasionally counting twice.
+    """
+
+    def __init__(self, window=30, max_entries=100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def is_duplicate(self, fingerprint, resource_id):
+        key = (fingerprint, resource_id)
+        now = time.monotonic()
+        with self._lock:
+            last_counted = self._entries.get(key)
+            if last_counted is not None and now - last_counted < self.window:
+                self._entries.move_to_end(key)
+                return True
+
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_deduplicator = None
+_deduplicator_lock = threading.Lock()
+
+
+def get_download_deduplicator():
+    global _deduplicator
+
+    if _deduplicator is None:
+        with _deduplicator_lock:
+            if _deduplicator is None:
+                dedupe = FeedbackConfig().download.dedupe
+                _deduplicator = DownloadDeduplicator(
+                    window=float(dedupe.window.get()),
+                    max_entries=int(dedupe.max_entries.get()),
+                )
+    return _deduplicator
+
+
+def get_client_fingerprint():
+    # Hashed so that client addresses are not kept in memory as they are
+    user_id = getattr(current_user, 'id', None) or ''
+    client = '\n'.join(
+        [
+            request.remote_addr or '',
+            request.headers.get('User-Agent', ''),
+            user_id,
+        ]
+    )
+    return hashlib.blake2b(client.encode('utf-8'), digest_size=16).digest()
+
+
+def is_denied_user_agent(user_agent):
+    user_agent = (user_agent or '').lower()
+    deny_user_agents = toolkit.aslist(
+        FeedbackConfig().download.dedupe.deny_user_agents.get()
+    )
+    return any(token.lower() in user_agent for token in deny_user_agents)
+
+
+def should_count_download(resource_id):
+    """
+    Return False for downloads by denied user agents and for repeated
+    downloads of the same resource by the same client.
+    """
+    if not FeedbackConfig().download.dedupe.is_enable():
+        return True
+
+    if is_denied_user_agent(request.headers.get('User-Agent')):
+        return False
+
+    return not get_download_deduplicator().is_duplicate(
+        get_client_fingerprint(), resource_id
+    )
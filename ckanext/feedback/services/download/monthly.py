@@ -2,36 +2,62 @@ import logging
 import uuid
 from datetime import datetime
 
-from sqlalchemy import extract
+from sqlalchemy.dialects.postgresql import insert
 
-from ckanext.feedback.models.download import DownloadMonthly
+from ckanext.feedback.models.download import DownloadMonthly, get_month_period
 from ckanext.feedback.models.session import session
 
 log = logging.getLogger(__name__)
 
 
 def increment_resource_downloads_monthly(resource_id):
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-
-    download_monthly = (
-        session.query(DownloadMonthly)
-        .filter(
-            DownloadMonthly.resource_id == resource_id,
-            extract('year', DownloadMonthly.created) == current_year,
-            extract('month', DownloadMonthly.created) == current_month,
-        )
-        .first()
+    now = datetime.now()
+
+    insert_download_monthly = insert(DownloadMonthly).values(
+        id=str(uuid.uuid4()),
+        resource_id=resource_id,
+        download_count=1,
+        period=get_month_period(now),
+        created=now,
+        updated=now,
+    )
+    download_monthly = insert_download_monthly.on_conflict_do_update(
+        index_elements=['resource_id', 'period'],
+        set_={
+            'download_count': DownloadMonthly.download_count + 1,
+            'updated': now,
+        },
+    )
+    session.execute(download_monthly)
+
+
+def increment_resource_downloads_monthly_bulk(monthly_download_counts):
+    if not monthly_download_counts:
+        return
+
+    now = datetime.now()
+
+    insert_download_monthly = insert(DownloadMonthly).values(
+        [
+            {
+                'id': str(uuid.uuid4()),
+                'resource_id': resource_id,
+                'download_count': count,
+                'period': get_month_period(month),
+                'created': month,
+                'updated': now,
+            }
+            for (resource_id, month), count in monthly_download_counts.items()
+        ]
+    )
+    download_monthly = insert_download_monthly.on_conflict_do_update(
+        index_elements=['resource_id', 'period'],
+        set_={
+            'download_count': (
+                DownloadMonthly.download_count
+                + insert_download_monthly.excluded.download_count
+            ),
+            'updated': now,
+        },
     )
-    if download_monthly is None:
-        download_monthly = DownloadMonthly(
-            id=str(uuid.uuid4()),
-            resource_id=resource_id,
-            download_count=1,
-            created=datetime.now(),
-            updated=datetime.now(),
-        )
-        session.add(download_monthly)
-    else:
-        download_monthly.download_count = download_monthly.download_count + 1
-        download_monthly.updated = datetime.now()
+    session.execute(download_monthly)
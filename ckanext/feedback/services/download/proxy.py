@@ -0,0 +1,123 @@
+import logging
+import threading
+
+import requests
+from flask import Response, request
+
+from ckanext.feedback.services.common.config import FeedbackConfig
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Headers passed to the upstream server so that resumed and conditional
+# downloads keep working through the proxy
+FORWARDED_REQUEST_HEADERS = (
+    'Range',
+    'If-Range',
+    'If-None-Match',
+    'If-Modified-Since',
+)
+FORWARDED_RESPONSE_HEADERS = (
+    'Content-Type',
+    'Content-Length',
+    'Content-Encoding',
+    'Content-Range',
+    'Content-Disposition',
+    'Accept-Ranges',
+    'ETag',
+    'Last-Modified',
+)
+PROXIED_STATUS_CODES = (200, 206, 304)
+
+
+class ResourceTooLargeError(Exception):
+    pass
+
+
+_proxy_session = None
+_proxy_session_lock = threading.Lock()
+
+
+def get_proxy_session():
+    # A shared session keeps connections to the resource hosts alive
+    # between downloads
+    global _proxy_session
+
+    if _proxy_session is None:
+        with _proxy_session_lock:
+            if _proxy_session is None:
+                _proxy_session = requests.Session()
+    return _proxy_session
+
+
+def is_proxy_stream_enabled():
+    return FeedbackConfig().download.proxy_stream.is_enable()
+
+
+def _iter_upstream(upstream, url, max_size):
+    received = 0
+    try:
+        # Relay the body as sent by the upstream server so that
+        # Content-Length and Content-Encoding stay valid
+        for chunk in upstream.raw.stream(CHUNK_SIZE, decode_content=False):
+            received += len(chunk)
+            if max_size and received > max_size:
+                # Abort the transfer so that the client sees an incomplete body
+                raise ResourceTooLargeError(
+                    f'External resource exceeds {max_size} bytes. URL[{url}]'
+                )
+            yield chunk
+    finally:
+        upstream.close()
+
+
+def stream_external_resource(url):
+    """
+    Relay an external resource to the client in chunks.
+
+    Returns None when the resource cannot be relayed, in which case the
+    caller should fall back to its own response.
+    """
+    proxy_stream = FeedbackConfig().download.proxy_stream
+    timeout = float(proxy_stream.timeout.get())
+    max_size = int(proxy_stream.max_size.get())
+
+    headers = {
+        name: request.headers[name]
+        for name in FORWARDED_REQUEST_HEADERS
+        if name in request.headers
+    }
+    try:
+        upstream = get_proxy_session().get(
+            url, headers=headers, stream=True, timeout=timeout, allow_redirects=True
+        )
+    except requests.exceptions.RequestException:
+        log.exception(f'Cannot connect to external resource. URL[{url}]')
+        return None
+
+    if upstream.status_code not in PROXIED_STATUS_CODES:
+        upstream.close()
+        log.warning(
+            f'Failure to acquire external resource. '
+            f'URL[{url}] status[{upstream.status_code}]'
+        )
+        return None
+
+    content_length = upstream.headers.get('Content-Length', '')
+    if max_size and content_length.isdigit() and int(content_length) > max_size:
+        upstream.close()
+        log.warning(f'External resource exceeds {max_size} bytes. URL[{url}]')
+        return None
+
+    response_headers = {
+        name: upstream.headers[name]
+        for name in FORWARDED_RESPONSE_HEADERS
+        if name in upstream.headers
+    }
+    return Response(
+        _iter_upstream(upstream, url, max_size),
+        status=upstream.status_code,
+        headers=response_headers,
+        direct_passthrough=True,
+    )
@@ -8,6 +8,15 @@ from sqlalchemy.dialects.postgresql import insert
 
 from ckanext.feedback.models.download import DownloadSummary
 from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.cache import (
+    invalidate_resource_stats,
+    is_stats_cache_enabled,
+)
+from ckanext.feedback.services.package.summary import (
+    execute_with_package_feedback_summary_delta,
+    increment_package_feedback_summary,
+)
+from ckanext.feedback.services.resource.summary import get_resource_feedback_stats_bulk
 
 log = logging.getLogger(__name__)
 
@@ -40,6 +49,8 @@ def get_package_downloads_bulk(package_ids):
 
 
 def get_resource_downloads(resource_id):
+    if is_stats_cache_enabled():
+        return get_resource_feedback_stats_bulk([resource_id])[resource_id]['downloads']
     count = (
         session.query(DownloadSummary.download)
         .filter(DownloadSummary.resource_id == resource_id)
@@ -64,4 +75,38 @@ def increment_resource_downloads(resource_id):
             'updated': now,
         },
     )
+    execute_with_package_feedback_summary_delta(
+        download_summary, DownloadSummary.resource_id, 'downloads', 1
+    )
+    invalidate_resource_stats([resource_id])
+
+
+def increment_resource_downloads_bulk(download_counts):
+    if not download_counts:
+        return
+
+    now = datetime.now()
+
+    insert_download_summary = insert(DownloadSummary).values(
+        [
+            {
+                'id': str(uuid.uuid4()),
+                'resource_id': resource_id,
+                'download': count,
+                'created': now,
+            }
+            for resource_id, count in download_counts.items()
+        ]
+    )
+    download_summary = insert_download_summary.on_conflict_do_update(
+        index_elements=['resource_id'],
+        set_={
+            'download': (
+                DownloadSummary.download + insert_download_summary.excluded.download
+            ),
+            'updated': now,
+        },
+    )
     session.execute(download_summary)
+    increment_package_feedback_summary('downloads', download_counts)
+    invalidate_resource_stats(download_counts)
@@ -0,0 +1,135 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app, has_app_context
+
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.background import PeriodicWorker
+from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.common.search_index import update_package_search_index
+from ckanext.feedback.services.download.monthly import (
+    increment_resource_downloads_monthly_bulk,
+)
+from ckanext.feedback.services.download.summary import increment_resource_downloads_bulk
+
+log = logging.getLogger(__name__)
+
+
+def get_current_month():
+    return datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class DownloadCounterBuffer(PeriodicWorker):
+    """
+    Per-process buffer that accumulates download hits keyed by
+    (resource_id, month) and writes them to the database in batches.
+
+    The buffer is flushed every `flush_interval` seconds, earlier when
+    `flush_size` hits are pending, and once more at interpreter shutdown.
+    """
+
+    thread_name = 'feedback-download-flush'
+
+    def __init__(self, flush_interval=10, flush_size=500):
+        super().__init__(flush_interval)
+        self.flush_size = flush_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counts = defaultdict(int)
+        self._package_ids = set()
+        self._pending = 0
+        self._app = None
+
+    def add(self, resource_id, package_id=None):
+        if self._app is None and has_app_context():
+            # Reindexing runs plugin hooks that may expect a request context
+            self._app = current_app._get_current_object()
+        with self._lock:
+            self._counts[(resource_id, get_current_month())] += 1
+            if package_id:
+                self._package_ids.add(package_id)
+            self._pending += 1
+            if self._pending >= self.flush_size:
+                self.wakeup()
+        self._ensure_worker()
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def flush(self):
+        with self._flush_lock:
+            counts, package_ids = self._drain()
+            if not counts:
+                return 0
+
+            download_counts = defaultdict(int)
+            for (resource_id, _month), count in counts.items():
+                download_counts[resource_id] += count
+
+            try:
+                increment_resource_downloads_bulk(download_counts)
+                increment_resource_downloads_monthly_bulk(counts)
+                session.commit()
+            except Exception:
+                session.rollback()
+                log.exception(
+                    'Failed to flush buffered download counts. '
+                    'They will be retried on the next flush.'
+                )
+                self._restore(counts, package_ids)
+                return 0
+
+            self._update_search_index(package_ids)
+            flushed = sum(counts.values())
+            log.debug(f'Flushed {flushed} buffered downloads')
+            return flushed
+
+    def _drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(int)
+            package_ids, self._package_ids = self._package_ids, set()
+            self._pending = 0
+        return counts, package_ids
+
+    def _restore(self, counts, package_ids):
+        with self._lock:
+            for key, count in counts.items():
+                self._counts[key] += count
+                self._pending += count
+            self._package_ids.update(package_ids)
+
+    def _update_search_index(self, package_ids):
+        if self._app is not None:
+            with self._app.test_request_context():
+                self._update_packages(package_ids)
+        else:
+            self._update_packages(package_ids)
+
+    def _update_packages(self, package_ids):
+        for package_id in package_ids:
+            update_package_search_index(package_id)
+
+
+_download_buffer = None
+_download_buffer_lock = threading.Lock()
+
+
+def get_download_buffer():
+    global _download_buffer
+
+    if _download_buffer is None:
+        with _download_buffer_lock:
+            if _download_buffer is None:
+                write_behind = FeedbackConfig().download.write_behind
+                _download_buffer = DownloadCounterBuffer(
+                    flush_interval=float(write_behind.flush_interval.get()),
+                    flush_size=int(write_behind.flush_size.get()),
+                )
+    return _download_buffer
+
+
+def is_write_behind_enabled():
+    return FeedbackConfig().download.write_behind.is_enable()
@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ckan.model.package import Package
+from ckan.model.resource import Resource
+from flask import g, has_request_context
+from sqlalchemy import and_
+
+from ckanext.feedback.models.session import session
+
+PACKAGE_OWNER_CACHE_KEY = '_feedback_package_owners'
+
+
+@dataclass
+class PackageOwner:
+    owner_org: Optional[str]
+    resource_ids: list = field(default_factory=list)
+
+
+def _get_request_owners():
+    if not has_request_context():
+        return {}
+
+    owners = g.get(PACKAGE_OWNER_CACHE_KEY)
+    if owners is None:
+        owners = {}
+        setattr(g, PACKAGE_OWNER_CACHE_KEY, owners)
+    return owners
+
+
+def remember_package_owners(pkg_dicts):
+    """
+    Keep the owner_org and the resource ids of package dicts for the rest of
+    the request, so that the hooks called for their resources need not load
+    the packages again.
+    """
+    owners = _get_request_owners()
+    for pkg_dict in pkg_dicts:
+        if 'id' not in pkg_dict or 'owner_org' not in pkg_dict:
+            continue
+        if 'resources' not in pkg_dict:
+            continue
+        owners[pkg_dict['id']] = PackageOwner(
+            pkg_dict['owner_org'],
+            [resource['id'] for resource in pkg_dict['resources']],
+        )
+
+
+def _load_package_owners(package_ids):
+    rows = (
+        session.query(Package.id, Package.owner_org, Resource.id)
+        .outerjoin(
+            Resource,
+            and_(Resource.package_id == Package.id, Resource.state != 'deleted'),
+        )
+        .filter(Package.id.in_(package_ids))
+        .order_by(Resource.position)
+    )
+
+    owners = {}
+    for package_id, owner_org, resource_id in rows:
+        owner = owners.setdefault(package_id, PackageOwner(owner_org))
+        if resource_id is not None:
+            owner.resource_ids.append(resource_id)
+    return owners
+
+
+def get_package_owners(package_ids):
+    """
+    Get the owner_org and the active resource ids of the packages, keyed by
+    package id. Packages not remembered in the request are loaded together
+    in a single query. Packages that do not exist are left out.
+    """
+    owners = _get_request_owners()
+    missing = [
+        package_id
+        for package_id in dict.fromkeys(package_ids)
+        if package_id not in owners
+    ]
+    if missing:
+        owners.update(_load_package_owners(missing))
+    return {
+        package_id: owners[package_id]
+        for package_id in package_ids
+        if package_id in owners
+    }
+
+
+def get_package_owner(package_id):
+    return get_package_owners([package_id]).get(package_id)
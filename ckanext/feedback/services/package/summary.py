@@ -1,12 +1,41 @@
 import logging
+from datetime import datetime
 
-from ckanext.feedback.services.download import summary as download_summary_service
-from ckanext.feedback.services.resource import likes as resource_likes_service
-from ckanext.feedback.services.resource import summary as resource_summary_service
-from ckanext.feedback.services.utilization import summary as utilization_summary_service
+from ckan.model.package import Package
+from ckan.model.resource import Resource
+from sqlalchemy import Integer, Text
+from sqlalchemy import column as sql_column
+from sqlalchemy import func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+
+from ckanext.feedback.models.download import DownloadSummary
+from ckanext.feedback.models.issue import IssueResolutionSummary
+from ckanext.feedback.models.likes import ResourceLike
+from ckanext.feedback.models.package_summary import PackageFeedbackSummary
+from ckanext.feedback.models.resource_comment import ResourceCommentSummary
+from ckanext.feedback.models.session import session
+from ckanext.feedback.models.utilization import Utilization, UtilizationSummary
+from ckanext.feedback.services.common.cache import PACKAGE_STATS, get_cached_stats
+from ckanext.feedback.services.common.config import FeedbackConfig
 
 log = logging.getLogger(__name__)
 
+PACKAGE_SUMMARY_COLUMNS = (
+    'like_count',
+    'downloads',
+    'utilizations',
+    'comments',
+    'total_rating',
+    'rating_comment',
+    'issue_resolutions',
+)
+COMMENT_COLUMNS = ('comments', 'total_rating', 'rating_comment')
+UTILIZATION_COLUMNS = ('utilizations', 'issue_resolutions')
+
+
+def is_package_summary_enabled():
+    return FeedbackConfig().package_summary.is_enable()
+
 
 def get_package_id_from_packages(package):
     if not package:
@@ -20,6 +49,90 @@ def get_package_id_from_packages(package):
     return s if s and s != "None" else None
 
 
+def _get_package_feedback_stats_query(package_ids):
+    # Active resources of the packages, shared by every metric
+    active_resource = (
+        session.query(
+            Resource.id.label('resource_id'),
+            Resource.package_id.label('package_id'),
+        )
+        .filter(
+            Resource.package_id.in_(package_ids),
+            Resource.state == "active",
+        )
+        .cte('active_resource')
+    )
+    # A resource has many utilizations, so their issue resolutions are
+    # summed per resource before being joined
+    issue_resolutions = (
+        session.query(
+            Utilization.resource_id.label('resource_id'),
+            func.sum(IssueResolutionSummary.issue_resolution).label(
+                'issue_resolutions'
+            ),
+        )
+        .join(Utilization, IssueResolutionSummary.utilization_id == Utilization.id)
+        .join(active_resource, active_resource.c.resource_id == Utilization.resource_id)
+        .group_by(Utilization.resource_id)
+        .subquery()
+    )
+    resource_id = active_resource.c.resource_id
+    # Packages without active resources get a row of zeros
+    return (
+        session.query(
+            Package.id.label('package_id'),
+            func.coalesce(func.sum(ResourceLike.like_count), 0).label('like_count'),
+            func.coalesce(func.sum(DownloadSummary.download), 0).label('downloads'),
+            func.coalesce(func.sum(UtilizationSummary.utilization), 0).label(
+                'utilizations'
+            ),
+            func.coalesce(func.sum(ResourceCommentSummary.comment), 0).label(
+                'comments'
+            ),
+            func.coalesce(
+                func.sum(
+                    ResourceCommentSummary.rating
+                    * ResourceCommentSummary.rating_comment
+                ),
+                0,
+            ).label('total_rating'),
+            func.coalesce(func.sum(ResourceCommentSummary.rating_comment), 0).label(
+                'rating_comment'
+            ),
+            func.coalesce(func.sum(issue_resolutions.c.issue_resolutions), 0).label(
+                'issue_resolutions'
+            ),
+        )
+        .outerjoin(active_resource, active_resource.c.package_id == Package.id)
+        .outerjoin(ResourceLike, ResourceLike.resource_id == resource_id)
+        .outerjoin(DownloadSummary, DownloadSummary.resource_id == resource_id)
+        .outerjoin(UtilizationSummary, UtilizationSummary.resource_id == resource_id)
+        .outerjoin(
+            ResourceCommentSummary, ResourceCommentSummary.resource_id == resource_id
+        )
+        .outerjoin(issue_resolutions, issue_resolutions.c.resource_id == resource_id)
+        .filter(Package.id.in_(package_ids))
+        .group_by(Package.id)
+    )
+
+
+def _get_package_feedback_stats_rows(package_ids):
+    return _get_package_feedback_stats_query(package_ids).all()
+
+
+def _get_package_feedback_summary_rows(package_ids):
+    rows = (
+        session.query(PackageFeedbackSummary)
+        .filter(PackageFeedbackSummary.package_id.in_(package_ids))
+        .all()
+    )
+    # Packages without a summary row yet are aggregated on the fly
+    missing = set(package_ids) - {row.package_id for row in rows}
+    if missing:
+        rows.extend(_get_package_feedback_stats_rows(list(missing)))
+    return rows
+
+
 def get_package_feedback_stats_bulk(packages):
     if not packages:
         return {}
@@ -35,28 +148,180 @@ def get_package_feedback_stats_bulk(packages):
     if not package_ids:
         return {}
 
-    likes = resource_likes_service.get_package_like_count_bulk(package_ids)
-    downloads = download_summary_service.get_package_downloads_bulk(package_ids)
-    utilizations = utilization_summary_service.get_package_utilizations_bulk(
-        package_ids
-    )
-    comments = resource_summary_service.get_package_comments_bulk(package_ids)
-    rating = resource_summary_service.get_package_rating_bulk(package_ids)
-    issue_resolutions = utilization_summary_service.get_package_issue_resolutions_bulk(
-        package_ids
-    )
+    return get_cached_stats(PACKAGE_STATS, package_ids, _load_package_feedback_stats)
+
+
+def _load_package_feedback_stats(package_ids):
+    if is_package_summary_enabled():
+        rows = _get_package_feedback_summary_rows(package_ids)
+    else:
+        rows = _get_package_feedback_stats_rows(package_ids)
+    rows = {str(r.package_id): r for r in rows}
 
     by_id = {}
 
     for pid in package_ids:
-        raw_rating = rating.get(pid, 0)
+        row = rows.get(pid)
+        if row is None:
+            by_id[pid] = {
+                "like_count": 0,
+                "downloads": 0,
+                "utilizations": 0,
+                "comments": 0,
+                "rating": 0,
+                "issue_resolutions": 0,
+            }
+            continue
+
+        raw_rating = (
+            row.total_rating / row.rating_comment
+            if row.rating_comment and row.rating_comment > 0
+            else 0
+        )
         by_id[pid] = {
-            "like_count": likes.get(pid, 0),
-            "downloads": downloads.get(pid, 0),
-            "utilizations": utilizations.get(pid, 0),
-            "comments": comments.get(pid, 0),
+            "like_count": row.like_count or 0,
+            "downloads": row.downloads or 0,
+            "utilizations": row.utilizations or 0,
+            "comments": row.comments or 0,
             "rating": 0 if raw_rating == 0 else round(raw_rating, 1),
-            "issue_resolutions": issue_resolutions.get(pid, 0),
+            "issue_resolutions": row.issue_resolutions or 0,
         }
 
     return by_id
+
+
+def refresh_package_feedback_summary(package_ids, columns=PACKAGE_SUMMARY_COLUMNS):
+    """
+    Recompute `columns` of the summary rows of the packages from the
+    resource-level summary tables. `package_ids` may also be a subquery.
+    """
+    if not is_package_summary_enabled():
+        return
+    _upsert_package_feedback_summary(package_ids, columns)
+
+
+def refresh_resources_package_feedback_summary(resource_ids, columns):
+    """
+    Recompute `columns` of the summary rows of the packages of the resources.
+    `resource_ids` may also be a subquery.
+    """
+    if not is_package_summary_enabled():
+        return
+    _upsert_package_feedback_summary(
+        select(Resource.package_id).where(Resource.id.in_(resource_ids)), columns
+    )
+
+
+def _upsert_package_feedback_summary(package_ids, columns=PACKAGE_SUMMARY_COLUMNS):
+    # Pending resource-level summaries must be visible to the aggregation
+    session.flush()
+
+    now = datetime.now()
+    stats = _get_package_feedback_stats_query(package_ids).subquery()
+    insert_summary = insert(PackageFeedbackSummary).from_select(
+        ['package_id', *PACKAGE_SUMMARY_COLUMNS, 'updated'],
+        select(
+            stats.c.package_id,
+            *(stats.c[name] for name in PACKAGE_SUMMARY_COLUMNS),
+            literal(now),
+        ),
+    )
+    summary = insert_summary.on_conflict_do_update(
+        index_elements=['package_id'],
+        set_={
+            **{name: insert_summary.excluded[name] for name in columns},
+            'updated': now,
+        },
+    )
+    session.execute(summary)
+
+
+def rebuild_package_feedback_summary(batch_size=1000):
+    """
+    Recompute the summary rows of every package, committing each batch.
+    Returns the number of packages.
+    """
+    package_ids = [
+        package_id
+        for (package_id,) in session.query(Package.id).order_by(Package.id).all()
+    ]
+    for start in range(0, len(package_ids), batch_size):
+        _upsert_package_feedback_summary(package_ids[start : start + batch_size])
+        session.commit()
+    return len(package_ids)
+
+
+def package_feedback_summary_delta_statement(changed_resources, column, delta):
+    """
+    Build an UPDATE adding `delta` to `column` of the summary rows of the
+    packages of `changed_resources`, a CTE with a resource_id column.
+    """
+    # Bound with literal() so that the statement can be combined with others
+    target = getattr(PackageFeedbackSummary, column)
+    return (
+        update(PackageFeedbackSummary)
+        .where(
+            PackageFeedbackSummary.package_id == Resource.package_id,
+            Resource.id == changed_resources.c.resource_id,
+            Resource.state == literal('active'),
+        )
+        .values(
+            {
+                column: func.greatest(target + literal(delta), 0),
+                'updated': literal(datetime.now()),
+            }
+        )
+    )
+
+
+def execute_with_package_feedback_summary_delta(statement, resource_id, column, delta):
+    """
+    Execute a resource-level INSERT or UPDATE and add `delta` to `column` of
+    the package of each resource it changed, with a single statement.
+    """
+    if not is_package_summary_enabled():
+        session.execute(statement)
+        return
+
+    changed_resources = statement.returning(resource_id).cte('changed_resource')
+    session.execute(
+        package_feedback_summary_delta_statement(changed_resources, column, delta)
+    )
+
+
+def increment_package_feedback_summary(column, resource_counts):
+    """
+    Add the counts of `resource_counts`, a dict of resource ids to counts,
+    to `column` of the summary rows of their packages.
+    """
+    if not resource_counts or not is_package_summary_enabled():
+        return
+
+    resource_delta = values(
+        sql_column('resource_id', Text),
+        sql_column('delta', Integer),
+        name='resource_delta',
+    ).data(list(resource_counts.items()))
+    package_delta = (
+        select(
+            Resource.package_id.label('package_id'),
+            func.sum(resource_delta.c.delta).label('delta'),
+        )
+        .join_from(
+            resource_delta, Resource, Resource.id == resource_delta.c.resource_id
+        )
+        .where(Resource.state == 'active')
+        .group_by(Resource.package_id)
+        .subquery()
+    )
+    target = getattr(PackageFeedbackSummary, column)
+    session.execute(
+        update(PackageFeedbackSummary)
+        .where(PackageFeedbackSummary.package_id == package_delta.c.package_id)
+        .values(
+            {
+                column: func.greatest(target + package_delta.c.delta, 0),
+                'updated': datetime.now(),
+            }
+        )
+    )
@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from ckan.lib.redis import connect_to_redis
+from dateutil.relativedelta import relativedelta
+
+from ckanext.feedback.services.common.cache import LocalCache, RedisCache
+from ckanext.feedback.services.common.config import FeedbackConfig
+
+log = logging.getLogger(__name__)
+
+RANKING_NAMESPACE = 'datasets_ranking'
+# Changed on invalidation, so that the rankings cached before are no longer
+# looked up by any worker sharing the backend
+GENERATION_KEY = f'{RANKING_NAMESPACE}:generation'
+
+
+class RankingCache:
+    """
+    Read-through cache of dataset rankings, keyed by their normalized
+    parameters.
+
+    Rankings of periods ending before the last month are kept for
+    `closed_period_ttl`, the others for `ttl`. The generation is kept in
+    `generation_backend`, by default `backend`, which has to be shared by
+    every worker for invalidation to reach them. Errors of the backends
+    are logged and the rankings are read from the database instead.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl,
+        closed_period_ttl,
+        clock=datetime.now,
+        generation_backend=None,
+    ):
+        self.backend = backend
+        self.generation_backend = generation_backend or backend
+        self.ttl = ttl
+        self.closed_period_ttl = closed_period_ttl
+        self._clock = clock
+
+    def _get_generation(self):
+        return self.generation_backend.get_many([GENERATION_KEY]).get(
+            GENERATION_KEY, '0'
+        )
+
+    def _get_ttl(self, end_year_month):
+        last_month = (self._clock() - relativedelta(months=1)).strftime('%Y-%m')
+        if end_year_month < last_month:
+            return self.closed_period_ttl
+        return self.ttl
+
+    def get(
+        self,
+        metric,
+        start_year_month,
+        end_year_month,
+        organization_name,
+        top_ranked_limit,
+        load,
+    ):
+        """
+        Get the ranking rows of the parameters, loading them with `load`,
+        which takes no arguments, when they are not cached.
+        """
+        try:
+            key = ':'.join(
+                [
+                    RANKING_NAMESPACE,
+                    self._get_generation(),
+                    metric,
+                    start_year_month,
+                    end_year_month,
+                    organization_name or '',
+                    str(int(top_ranked_limit)),
+                ]
+            )
+            cached = self.backend.get_many([key])
+        except Exception:
+            log.exception('Failed to read the dataset ranking from the cache')
+            return load()
+
+        if key in cached:
+            return [list(row) for row in cached[key]]
+
+        rows = [list(row) for row in load()]
+        try:
+            self.backend.set_many({key: rows}, self._get_ttl(end_year_month))
+        except Exception:
+            log.exception('Failed to write the dataset ranking to the cache')
+        return [list(row) for row in rows]
+
+    def invalidate(self):
+        try:
+            # Kept as long as the rankings of the previous generation
+            self.generation_backend.set_many(
+                {GENERATION_KEY: str(time.time_ns())},
+                max(self.ttl, self.closed_period_ttl),
+            )
+        except Exception:
+            log.exception('Failed to invalidate the dataset ranking cache')
+
+
+_ranking_cache = None
+_ranking_cache_lock = threading.Lock()
+
+
+def is_ranking_cache_enabled():
+    return FeedbackConfig().ranking_cache.is_enable()
+
+
+def get_ranking_cache():
+    global _ranking_cache
+
+    if _ranking_cache is None:
+        with _ranking_cache_lock:
+            if _ranking_cache is None:
+                ranking_cache = FeedbackConfig().ranking_cache
+                backend = ranking_cache.backend.get()
+                # The rankings cached in the memory of each worker are also
+                # dropped by the others when the shared generation changes
+                generation_backend = RedisCache(connect_to_redis())
+                if backend == 'redis':
+                    cache_backend = generation_backend
+                else:
+                    if backend != 'local':
+                        log.warning(
+                            f'Unknown dataset ranking cache backend "{backend}". '
+                            'The local cache is used instead.'
+                        )
+                    cache_backend = LocalCache(
+                        max_size=int(ranking_cache.max_size.get())
+                    )
+                _ranking_cache = RankingCache(
+                    cache_backend,
+                    int(ranking_cache.ttl.get()),
+                    int(ranking_cache.closed_period_ttl.get()),
+                    generation_backend=generation_backend,
+                )
+    return _ranking_cache
+
+
+def get_cached_ranking(
+    metric, start_year_month, end_year_month, organization_name, top_ranked_limit, load
+):
+    """
+    Get the ranking rows through the ranking cache when it is enabled, and
+    with `load` otherwise.
+    """
+    if not is_ranking_cache_enabled():
+        return load()
+    return get_ranking_cache().get(
+        metric,
+        start_year_month,
+        end_year_month,
+        organization_name,
+        top_ranked_limit,
+        load,
+    )
+
+
+def invalidate_ranking_cache():
+    "Stop serving the rankings cached by any worker."
+    if not is_ranking_cache_enabled():
+        return
+    get_ranking_cache().invalidate()
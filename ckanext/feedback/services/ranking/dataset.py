@@ -1,14 +1,46 @@
 import calendar
 import logging
-from datetime import datetime
+import math
+from datetime import date, datetime
 
 from ckan.model import Group, Package, Resource
-from sqlalchemy import func
+from sqlalchemy import case, delete, extract, func, insert, literal, select
 
+from ckanext.feedback.models.download import DownloadMonthly
+from ckanext.feedback.models.likes import ResourceLikeMonthly
+from ckanext.feedback.models.ranking import PackageMetricMonthly, PackageTrendingScore
+from ckanext.feedback.models.resource_comment import ResourceCommentMonthly
 from ckanext.feedback.models.session import session
+from ckanext.feedback.models.utilization import UtilizationCommentMonthly
+from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.ranking.cache import invalidate_ranking_cache
 
 log = logging.getLogger(__name__)
 
+# The monthly table and column each ranking metric is counted from, by
+# the month in their period column
+PACKAGE_METRIC_SOURCES = {
+    'download': (DownloadMonthly, 'download_count'),
+    'likes': (ResourceLikeMonthly, 'like_count'),
+    'resource_comments': (ResourceCommentMonthly, 'comment_count'),
+    'utilization_comments': (UtilizationCommentMonthly, 'comment_count'),
+}
+
+# Weight of one count of each metric in the trending score
+TRENDING_WEIGHTS = {
+    'download': 1,
+    'likes': 2,
+    'resource_comments': 3,
+    'utilization_comments': 3,
+}
+# Months older than this many half-lives weigh less than 1/1024 and are
+# left out of the trending score
+TRENDING_HALF_LIVES = 10
+
+
+def is_ranking_rollup_enabled():
+    return FeedbackConfig().ranking_rollup.is_enable()
+
 
 def get_generic_ranking(
     top_ranked_limit,
@@ -20,7 +52,20 @@ def get_generic_ranking(
     total_column,
     enable_org=None,
     organization_name=None,
+    metric=None,
 ):
+    if metric in PACKAGE_METRIC_SOURCES and is_ranking_rollup_enabled():
+        return get_rollup_ranking(
+            top_ranked_limit,
+            start_year_month,
+            end_year_month,
+            metric,
+            total_model,
+            total_column,
+            enable_org=enable_org,
+            organization_name=organization_name,
+        )
+
     count_by_period = get_count_by_period(
         period_model, period_column, start_year_month, end_year_month
     )
@@ -53,6 +98,222 @@ def get_generic_ranking(
     return query
 
 
+def get_rollup_ranking(
+    top_ranked_limit,
+    start_year_month,
+    end_year_month,
+    metric,
+    total_model,
+    total_column,
+    enable_org=None,
+    organization_name=None,
+):
+    """
+    Same rows as get_generic_ranking, with the counts by period read from
+    package_metric_monthly. The total counts are only aggregated for the
+    packages counted in the period.
+    """
+    start_month = datetime.strptime(start_year_month, '%Y-%m').date()
+    end_month = datetime.strptime(end_year_month, '%Y-%m').date()
+    count_by_period = (
+        session.query(
+            PackageMetricMonthly.package_id.label('package_id'),
+            func.sum(PackageMetricMonthly.count).label('count'),
+        )
+        .filter(
+            PackageMetricMonthly.metric == metric,
+            PackageMetricMonthly.month >= start_month,
+            PackageMetricMonthly.month <= end_month,
+        )
+        .group_by(PackageMetricMonthly.package_id)
+        .subquery()
+    )
+    total_count = get_total_count(
+        total_model,
+        total_column,
+        package_ids=select(count_by_period.c.package_id),
+    )
+    query = (
+        session.query(
+            Group.name,
+            Group.title,
+            Package.name,
+            Package.title,
+            Package.notes,
+            count_by_period.c.count.label("count_by_period"),
+            total_count.c.count.label("total_count"),
+        )
+        .join(count_by_period, Package.id == count_by_period.c.package_id)
+        .join(total_count, Package.id == total_count.c.package_id)
+        .join(Group, Package.owner_org == Group.id)
+        .filter(
+            Package.state == 'active',
+            Group.state == 'active',
+        )
+    )
+    if enable_org and enable_org != [None]:
+        query = query.filter(Group.name.in_(enable_org))
+
+    if organization_name:
+        query = query.filter(Group.name == organization_name)
+
+    return query.order_by(count_by_period.c.count.desc()).limit(top_ranked_limit).all()
+
+
+def _package_metric_monthly_select(metric, package_ids=None, since=None):
+    model, column = PACKAGE_METRIC_SOURCES[metric]
+    query = (
+        select(
+            Resource.package_id,
+            literal(metric),
+            model.period,
+            func.coalesce(func.sum(getattr(model, column)), 0),
+            literal(datetime.now()),
+        )
+        .join_from(model, Resource, Resource.id == model.resource_id)
+        .where(Resource.state == 'active')
+        .group_by(Resource.package_id, model.period)
+    )
+    if package_ids is not None:
+        query = query.where(Resource.package_id.in_(package_ids))
+    if since is not None:
+        query = query.where(model.period >= since)
+    return query
+
+
+def _refresh_package_metric_monthly(metrics, package_ids=None, since=None):
+    # Rows are limited to the packages of `package_ids` and to the months
+    # from `since`, the first day of a month, when they are given
+    # Pending counts must be visible to the aggregation
+    session.flush()
+
+    written = 0
+    for metric in metrics:
+        stale = delete(PackageMetricMonthly).where(
+            PackageMetricMonthly.metric == metric
+        )
+        if package_ids is not None:
+            stale = stale.where(PackageMetricMonthly.package_id.in_(package_ids))
+        if since is not None:
+            stale = stale.where(PackageMetricMonthly.month >= since)
+        session.execute(stale)
+
+        result = session.execute(
+            insert(PackageMetricMonthly).from_select(
+                ['package_id', 'metric', 'month', 'count', 'updated'],
+                _package_metric_monthly_select(metric, package_ids, since),
+            )
+        )
+        written += result.rowcount
+    return written
+
+
+def refresh_package_metric_monthly(package_ids):
+    """
+    Recompute every monthly count of the packages, whose resources may have
+    been added or deleted.
+    """
+    if not is_ranking_rollup_enabled():
+        return
+    _refresh_package_metric_monthly(PACKAGE_METRIC_SOURCES, package_ids=package_ids)
+
+
+def rebuild_package_metric_monthly(since=None):
+    """
+    Recompute the package_metric_monthly rows of every package, committing
+    each metric, then the trending scores. Returns the number of rows
+    written.
+    """
+    if since is not None:
+        since = since.replace(day=1)
+
+    written = 0
+    for metric in PACKAGE_METRIC_SOURCES:
+        written += _refresh_package_metric_monthly([metric], since=since)
+        session.commit()
+        log.info(f'Rolled up the monthly {metric} counts of the packages')
+
+    # Recomputed in full, as every score decays when the month changes
+    scored = refresh_package_trending_score()
+    session.commit()
+    log.info(f'Recomputed the trending scores of {scored} packages')
+    invalidate_ranking_cache()
+    return written
+
+
+def get_trending_ranking(top_ranked_limit, enable_org=None, organization_name=None):
+    """
+    Rows of the packages with the highest trending scores, with the score
+    in place of the count by period and no total count.
+    """
+    query = (
+        session.query(
+            Group.name,
+            Group.title,
+            Package.name,
+            Package.title,
+            Package.notes,
+            PackageTrendingScore.score,
+            literal(None),
+        )
+        .join(PackageTrendingScore, Package.id == PackageTrendingScore.package_id)
+        .join(Group, Package.owner_org == Group.id)
+        .filter(
+            Package.state == 'active',
+            Group.state == 'active',
+            PackageTrendingScore.score > 0,
+        )
+    )
+    if enable_org and enable_org != [None]:
+        query = query.filter(Group.name.in_(enable_org))
+
+    if organization_name:
+        query = query.filter(Group.name == organization_name)
+
+    return (
+        query.order_by(PackageTrendingScore.score.desc()).limit(top_ranked_limit).all()
+    )
+
+
+def refresh_package_trending_score(today=None):
+    """
+    Recompute the trending score of every package from package_metric_monthly.
+    The counts of each month are weighted by metric and halved every
+    `trending_half_life_months` months before the current one.
+    Returns the number of packages with a score.
+    """
+    half_life = float(FeedbackConfig().ranking_rollup.trending_half_life_months.get())
+    today = today or date.today()
+    current_month = today.year * 12 + today.month - 1
+    oldest_month = current_month - math.ceil(half_life * TRENDING_HALF_LIVES)
+
+    age = literal(current_month) - (
+        extract('year', PackageMetricMonthly.month) * 12
+        + extract('month', PackageMetricMonthly.month)
+        - 1
+    )
+    weight = case(TRENDING_WEIGHTS, value=PackageMetricMonthly.metric, else_=0)
+    score = func.sum(
+        PackageMetricMonthly.count * weight * func.power(0.5, age / half_life)
+    )
+
+    session.execute(delete(PackageTrendingScore))
+    result = session.execute(
+        insert(PackageTrendingScore).from_select(
+            ['package_id', 'score', 'updated'],
+            select(PackageMetricMonthly.package_id, score, literal(datetime.now()))
+            .where(
+                PackageMetricMonthly.metric.in_(TRENDING_WEIGHTS),
+                PackageMetricMonthly.month
+                >= date(oldest_month // 12, oldest_month % 12 + 1, 1),
+                PackageMetricMonthly.month <= today,
+            )
+            .group_by(PackageMetricMonthly.package_id),
+        )
+    )
+    return result.rowcount
+
+
 def get_last_day_of_month(year, month):
     _, last_day = calendar.monthrange(year, month)
     return last_day
@@ -88,7 +349,7 @@ def get_count_by_period(model, column, start_year_month, end_year_month):
     return query
 
 
-def get_total_count(total_model, total_column):
+def get_total_count(total_model, total_column, package_ids=None):
     query = (
         session.query(
             Resource.package_id.label('package_id'),
@@ -96,7 +357,7 @@ def get_total_count(total_model, total_column):
         )
         .join(total_model, Resource.id == total_model.resource_id)
         .filter(Resource.state == 'active')
-        .group_by(Resource.package_id)
-        .subquery()
     )
-    return query
+    if package_ids is not None:
+        query = query.filter(Resource.package_id.in_(package_ids))
+    return query.group_by(Resource.package_id).subquery()
@@ -3,94 +3,304 @@ import uuid
 from datetime import datetime
 
 from ckan.model import Resource
-from sqlalchemy import extract, func
+from sqlalchemy import Date, Integer, Text
+from sqlalchemy import column as sql_column
+from sqlalchemy import func, literal, update, values
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 
+from ckanext.feedback.models.download import get_month_period
 from ckanext.feedback.models.likes import ResourceLike, ResourceLikeMonthly
+from ckanext.feedback.models.package_summary import PackageFeedbackSummary
 from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.cache import (
+    invalidate_resource_stats,
+    is_stats_cache_enabled,
+)
+from ckanext.feedback.services.package.summary import (
+    execute_with_package_feedback_summary_delta,
+    increment_package_feedback_summary,
+    is_package_summary_enabled,
+    package_feedback_summary_delta_statement,
+)
+from ckanext.feedback.services.resource.summary import get_resource_feedback_stats_bulk
 
 log = logging.getLogger(__name__)
 
 
-def increment_resource_like_count(resource_id):
-    now = datetime.now()
-
+# The values are bound with literal() so that the statements get anonymous
+# parameters and can be combined into one statement without name clashes
+def _increment_resource_like_count_statement(resource_id, now):
     insert_resource_like = insert(ResourceLike).values(
-        resource_id=resource_id,
-        like_count=1,
-        created=now,
-        updated=now,
+        id=literal(str(uuid.uuid4())),
+        resource_id=literal(resource_id),
+        like_count=literal(1),
+        created=literal(now),
+        updated=literal(now),
     )
-    resource_like = insert_resource_like.on_conflict_do_update(
+    return insert_resource_like.on_conflict_do_update(
         index_elements=['resource_id'],
         set_={
             'like_count': ResourceLike.like_count + 1,
-            'updated': now,
+            'updated': literal(now),
         },
     )
-    session.execute(resource_like)
 
 
-def decrement_resource_like_count(resource_id):
-    resource_like = (
-        session.query(ResourceLike)
-        .filter(ResourceLike.resource_id == resource_id)
-        .first()
+def _decrement_resource_like_count_statement(resource_id, now):
+    # Computed by the database so that concurrent toggles are not lost,
+    # and clamped so that the count never becomes negative. Resources
+    # without likes are left alone so that their packages are not changed.
+    return (
+        update(ResourceLike)
+        .where(
+            ResourceLike.resource_id == literal(resource_id),
+            ResourceLike.like_count > literal(0),
+        )
+        .values(
+            like_count=func.greatest(ResourceLike.like_count - 1, 0),
+            updated=literal(now),
+        )
     )
 
-    if resource_like is not None:
-        resource_like.like_count = resource_like.like_count - 1
-        resource_like.updated = datetime.now()
 
+def _increment_resource_like_count_monthly_statement(resource_id, now):
+    insert_resource_like_monthly = insert(ResourceLikeMonthly).values(
+        id=literal(str(uuid.uuid4())),
+        resource_id=literal(resource_id),
+        like_count=literal(1),
+        period=literal(get_month_period(now)),
+        created=literal(now),
+        updated=literal(now),
+    )
+    return insert_resource_like_monthly.on_conflict_do_update(
+        index_elements=['resource_id', 'period'],
+        set_={
+            'like_count': ResourceLikeMonthly.like_count + 1,
+            'updated': literal(now),
+        },
+    )
 
-def increment_resource_like_count_monthly(resource_id):
-    current_year = datetime.now().year
-    current_month = datetime.now().month
 
-    resource_like_monthly = (
-        session.query(ResourceLikeMonthly)
-        .filter(
-            ResourceLikeMonthly.resource_id == resource_id,
-            extract('year', ResourceLikeMonthly.created) == current_year,
-            extract('month', ResourceLikeMonthly.created) == current_month,
+def _decrement_resource_like_count_monthly_statement(resource_id, now):
+    # There is nothing to insert for a decrement, so only the current
+    # month's row is updated
+    return (
+        update(ResourceLikeMonthly)
+        .where(
+            ResourceLikeMonthly.resource_id == literal(resource_id),
+            ResourceLikeMonthly.period == literal(get_month_period(now)),
+        )
+        .values(
+            like_count=func.greatest(ResourceLikeMonthly.like_count - 1, 0),
+            updated=literal(now),
         )
-        .first()
     )
 
-    if resource_like_monthly is None:
-        resource_like_monthly = ResourceLikeMonthly(
-            id=str(uuid.uuid4()),
-            resource_id=resource_id,
-            like_count=1,
-            created=datetime.now(),
-            updated=datetime.now(),
-        )
-        session.add(resource_like_monthly)
-    else:
-        resource_like_monthly.like_count = resource_like_monthly.like_count + 1
-        resource_like_monthly.updated = datetime.now()
+
+def increment_resource_like_count(resource_id):
+    execute_with_package_feedback_summary_delta(
+        _increment_resource_like_count_statement(resource_id, datetime.now()),
+        ResourceLike.resource_id,
+        'like_count',
+        1,
+    )
+    invalidate_resource_stats([resource_id])
+
+
+def decrement_resource_like_count(resource_id):
+    execute_with_package_feedback_summary_delta(
+        _decrement_resource_like_count_statement(resource_id, datetime.now()),
+        ResourceLike.resource_id,
+        'like_count',
+        -1,
+    )
+    invalidate_resource_stats([resource_id])
+
+
+def increment_resource_like_count_monthly(resource_id):
+    session.execute(
+        _increment_resource_like_count_monthly_statement(resource_id, datetime.now())
+    )
 
 
 def decrement_resource_like_count_monthly(resource_id):
-    current_year = datetime.now().year
-    current_month = datetime.now().month
+    session.execute(
+        _decrement_resource_like_count_monthly_statement(resource_id, datetime.now())
+    )
 
-    resource_like_monthly = (
-        session.query(ResourceLikeMonthly)
-        .filter(
-            ResourceLikeMonthly.resource_id == resource_id,
-            extract('year', ResourceLikeMonthly.created) == current_year,
-            extract('month', ResourceLikeMonthly.created) == current_month,
+
+def toggle_resource_like_count(resource_id, like_status):
+    """
+    Add or remove one like of the resource in both the total and the
+    current month's counts with a single statement.
+    """
+    now = datetime.now()
+    if like_status:
+        total = _increment_resource_like_count_statement(resource_id, now)
+        monthly = _increment_resource_like_count_monthly_statement(resource_id, now)
+    else:
+        total = _decrement_resource_like_count_statement(resource_id, now)
+        monthly = _decrement_resource_like_count_monthly_statement(resource_id, now)
+
+    # PostgreSQL runs a data-modifying statement in WITH even though the
+    # main statement does not refer to it
+    total_cte = total.returning(ResourceLike.resource_id).cte('resource_like_total')
+    statement = monthly.add_cte(total_cte)
+    if is_package_summary_enabled():
+        # Applied to the package of the resource only when its count changed
+        package = package_feedback_summary_delta_statement(
+            total_cte, 'like_count', 1 if like_status else -1
         )
-        .first()
-    )
+        statement = statement.add_cte(
+            package.returning(PackageFeedbackSummary.package_id).cte(
+                'package_like_total'
+            )
+        )
+    session.execute(statement)
+    invalidate_resource_stats([resource_id])
+
+
+def _split_like_counts(like_counts):
+    # Only likes insert rows. Unlikes are applied to the rows that exist,
+    # like the decrements of toggle_resource_like_count.
+    increments = {key: count for key, count in like_counts.items() if count > 0}
+    decrements = {key: count for key, count in like_counts.items() if count < 0}
+    return increments, decrements
+
+
+def increment_resource_like_count_bulk(like_counts):
+    # Counts are negative when unlikes outnumber likes, and the like counts
+    # are clamped so that they never become negative
+    if not like_counts:
+        return
+
+    now = datetime.now()
+    increments, decrements = _split_like_counts(like_counts)
 
-    if resource_like_monthly is not None:
-        resource_like_monthly.like_count = resource_like_monthly.like_count - 1
-        resource_like_monthly.updated = datetime.now()
+    if increments:
+        insert_resource_like = insert(ResourceLike).values(
+            [
+                {
+                    'id': str(uuid.uuid4()),
+                    'resource_id': resource_id,
+                    'like_count': count,
+                    'created': now,
+                    'updated': now,
+                }
+                for resource_id, count in increments.items()
+            ]
+        )
+        resource_like = insert_resource_like.on_conflict_do_update(
+            index_elements=['resource_id'],
+            set_={
+                'like_count': func.greatest(
+                    ResourceLike.like_count + insert_resource_like.excluded.like_count,
+                    0,
+                ),
+                'updated': now,
+            },
+        )
+        session.execute(resource_like)
+
+    applied = dict(increments)
+    if decrements:
+        resource_delta = values(
+            sql_column('resource_id', Text),
+            sql_column('delta', Integer),
+            name='resource_like_delta',
+        ).data(list(decrements.items()))
+        # The joined row keeps the count from before the update, so that
+        # the packages get the change that was actually applied
+        previous = aliased(ResourceLike)
+        rows = session.execute(
+            update(ResourceLike)
+            .where(
+                ResourceLike.resource_id == resource_delta.c.resource_id,
+                previous.id == ResourceLike.id,
+            )
+            .values(
+                like_count=func.greatest(
+                    previous.like_count + resource_delta.c.delta, 0
+                ),
+                updated=now,
+            )
+            .returning(
+                ResourceLike.resource_id, ResourceLike.like_count - previous.like_count
+            )
+        )
+        applied.update({resource_id: delta for resource_id, delta in rows if delta})
+
+    increment_package_feedback_summary('like_count', applied)
+    invalidate_resource_stats(like_counts)
+
+
+def increment_resource_like_count_monthly_bulk(monthly_like_counts):
+    if not monthly_like_counts:
+        return
+
+    now = datetime.now()
+    increments, decrements = _split_like_counts(monthly_like_counts)
+
+    if increments:
+        insert_resource_like_monthly = insert(ResourceLikeMonthly).values(
+            [
+                {
+                    'id': str(uuid.uuid4()),
+                    'resource_id': resource_id,
+                    'like_count': count,
+                    'period': get_month_period(month),
+                    'created': month,
+                    'updated': now,
+                }
+                for (resource_id, month), count in increments.items()
+            ]
+        )
+        resource_like_monthly = insert_resource_like_monthly.on_conflict_do_update(
+            index_elements=['resource_id', 'period'],
+            set_={
+                'like_count': func.greatest(
+                    ResourceLikeMonthly.like_count
+                    + insert_resource_like_monthly.excluded.like_count,
+                    0,
+                ),
+                'updated': now,
+            },
+        )
+        session.execute(resource_like_monthly)
+
+    if decrements:
+        monthly_delta = values(
+            sql_column('resource_id', Text),
+            sql_column('period', Date),
+            sql_column('delta', Integer),
+            name='resource_like_monthly_delta',
+        ).data(
+            [
+                (resource_id, get_month_period(month), count)
+                for (resource_id, month), count in decrements.items()
+            ]
+        )
+        session.execute(
+            update(ResourceLikeMonthly)
+            .where(
+                ResourceLikeMonthly.resource_id == monthly_delta.c.resource_id,
+                ResourceLikeMonthly.period == monthly_delta.c.period,
+            )
+            .values(
+                like_count=func.greatest(
+                    ResourceLikeMonthly.like_count + monthly_delta.c.delta, 0
+                ),
+                updated=now,
+            )
+        )
 
 
 def get_resource_like_count(resource_id):
+    if is_stats_cache_enabled():
+        return get_resource_feedback_stats_bulk([resource_id])[resource_id][
+            'like_count'
+        ]
     count = (
         session.query(ResourceLike.like_count)
         .filter(ResourceLike.resource_id == resource_id)
@@ -134,7 +344,7 @@ def get_resource_like_count_monthly(resource_id, period):
         session.query(ResourceLikeMonthly.like_count)
         .filter(
             ResourceLikeMonthly.resource_id == resource_id,
-            func.date_trunc('month', ResourceLikeMonthly.created) == func.date(period),
+            ResourceLikeMonthly.period == func.date(period),
         )
         .scalar()
     )
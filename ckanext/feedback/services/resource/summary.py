@@ -2,17 +2,49 @@ import logging
 from datetime import datetime
 
 from ckan.model.resource import Resource
-from sqlalchemy import func
+from flask import g, has_request_context
+from sqlalchemy import func, union
 from sqlalchemy.dialects.postgresql import insert
 
+from ckanext.feedback.models.download import DownloadSummary
+from ckanext.feedback.models.issue import IssueResolutionSummary
+from ckanext.feedback.models.likes import ResourceLike
 from ckanext.feedback.models.resource_comment import (
     ResourceComment,
+    ResourceCommentMonthly,
     ResourceCommentSummary,
 )
 from ckanext.feedback.models.session import session
+from ckanext.feedback.models.utilization import Utilization, UtilizationSummary
+from ckanext.feedback.services.common.cache import (
+    RESOURCE_STATS,
+    get_cached_stats,
+    invalidate_resource_stats,
+    is_stats_cache_enabled,
+)
+from ckanext.feedback.services.common.monthly import (
+    get_approval_month,
+    rebuild_monthly_counts,
+    replace_monthly_counts,
+)
+from ckanext.feedback.services.package.summary import (
+    COMMENT_COLUMNS,
+    refresh_resources_package_feedback_summary,
+)
 
 log = logging.getLogger(__name__)
 
+RESOURCE_STATS_CACHE_KEY = '_feedback_resource_stats'
+
+EMPTY_RESOURCE_STATS = {
+    'downloads': 0,
+    'utilizations': 0,
+    'issue_resolutions': 0,
+    'comments': 0,
+    'rating': 0,
+    'like_count': 0,
+}
+
 
 # Get comments of the target package
 def get_package_comments(package_id):
@@ -44,6 +76,8 @@ def get_package_comments_bulk(package_ids):
 
 # Get comments of the target resource
 def get_resource_comments(resource_id):
+    if is_stats_cache_enabled():
+        return get_resource_feedback_stats_bulk([resource_id])[resource_id]['comments']
     count = (
         session.query(ResourceCommentSummary.comment)
         .filter(ResourceCommentSummary.resource_id == resource_id)
@@ -100,16 +134,98 @@ def get_package_rating_bulk(package_ids):
 
 # Get rating of the target resource
 def get_resource_rating(resource_id):
-    rating = (
-        session.query(ResourceCommentSummary.rating)
-        .filter(ResourceCommentSummary.resource_id == resource_id)
-        .scalar()
-    )
+    if is_stats_cache_enabled():
+        rating = get_resource_feedback_stats_bulk([resource_id])[resource_id]['rating']
+    else:
+        rating = (
+            session.query(ResourceCommentSummary.rating)
+            .filter(ResourceCommentSummary.resource_id == resource_id)
+            .scalar()
+        )
     if rating is None or rating == 0:
         return 0
     return round(rating, 1)
 
 
+def get_resource_feedback_stats_bulk(resource_ids):
+    """
+    Get the feedback stats of the resources with a single query, or from
+    the stats cache when it is enabled.
+
+    Returns a dict keyed by resource id. Resources without feedback get
+    zero for every stat.
+    """
+    return get_cached_stats(RESOURCE_STATS, resource_ids, _load_resource_feedback_stats)
+
+
+def _load_resource_feedback_stats(resource_ids):
+    issue_resolutions = (
+        session.query(
+            Utilization.resource_id.label('resource_id'),
+            func.sum(IssueResolutionSummary.issue_resolution).label(
+                'issue_resolutions'
+            ),
+        )
+        .join(Utilization, IssueResolutionSummary.utilization_id == Utilization.id)
+        .filter(Utilization.resource_id.in_(resource_ids))
+        .group_by(Utilization.resource_id)
+        .subquery()
+    )
+    rows = (
+        session.query(
+            Resource.id,
+            DownloadSummary.download,
+            UtilizationSummary.utilization,
+            issue_resolutions.c.issue_resolutions,
+            ResourceCommentSummary.comment,
+            ResourceCommentSummary.rating,
+            ResourceLike.like_count,
+        )
+        .outerjoin(DownloadSummary, DownloadSummary.resource_id == Resource.id)
+        .outerjoin(UtilizationSummary, UtilizationSummary.resource_id == Resource.id)
+        .outerjoin(issue_resolutions, issue_resolutions.c.resource_id == Resource.id)
+        .outerjoin(
+            ResourceCommentSummary, ResourceCommentSummary.resource_id == Resource.id
+        )
+        .outerjoin(ResourceLike, ResourceLike.resource_id == Resource.id)
+        .filter(Resource.id.in_(resource_ids))
+        .all()
+    )
+
+    stats_by_id = {
+        resource_id: dict(EMPTY_RESOURCE_STATS) for resource_id in resource_ids
+    }
+    for row in rows:
+        stats_by_id[row.id] = {
+            'downloads': row.download or 0,
+            'utilizations': row.utilization or 0,
+            'issue_resolutions': row.issue_resolutions or 0,
+            'comments': row.comment or 0,
+            'rating': row.rating or 0,
+            'like_count': row.like_count or 0,
+        }
+    return stats_by_id
+
+
+def get_resource_feedback_stats(package_id, resource_id, resource_ids=()):
+    """
+    Get the feedback stats of a resource of the package.
+
+    CKAN shows every resource of a package in turn, so in a request the
+    stats of `resource_ids` are fetched together on the first call and
+    kept until a resource of another package is shown.
+    """
+    if not has_request_context():
+        return get_resource_feedback_stats_bulk([resource_id])[resource_id]
+
+    cached = g.get(RESOURCE_STATS_CACHE_KEY)
+    if cached is None or cached[0] != package_id or resource_id not in cached[1]:
+        stats_by_id = get_resource_feedback_stats_bulk({resource_id, *resource_ids})
+        cached = (package_id, stats_by_id)
+        setattr(g, RESOURCE_STATS_CACHE_KEY, cached)
+    return cached[1][resource_id]
+
+
 # Create new resource summary
 def create_resource_summary(resource_id):
     summary = insert(ResourceCommentSummary).values(
@@ -178,3 +294,51 @@ def refresh_resource_summary(resource_id):
         },
     )
     session.execute(summary)
+    refresh_resource_comment_monthly([resource_id])
+    refresh_resources_package_feedback_summary([resource_id], COMMENT_COLUMNS)
+    invalidate_resource_stats([resource_id])
+
+
+def refresh_resource_comment_monthly(resource_ids):
+    """
+    Recalculate the approved comments of the resources by month of approval.
+    Returns the number of rows written.
+    """
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return 0
+    # Pending approvals must be visible to the aggregation
+    session.flush()
+
+    approved, month = get_approval_month(ResourceComment)
+    rows = (
+        session.query(
+            ResourceComment.resource_id, month, func.count(), func.min(approved)
+        )
+        .filter(
+            ResourceComment.resource_id.in_(resource_ids),
+            ResourceComment.approval,
+            ResourceComment.content.isnot(None),
+        )
+        .group_by(ResourceComment.resource_id, month)
+        .all()
+    )
+    return replace_monthly_counts(
+        ResourceCommentMonthly, 'comment_count', resource_ids, rows
+    )
+
+
+def rebuild_resource_comment_monthly(batch_size=1000):
+    """
+    Recalculate the resource_comment_monthly rows of every resource with
+    comments or rows left. Returns the number of rows written.
+    """
+    resource_ids = union(
+        session.query(ResourceComment.resource_id),
+        session.query(ResourceCommentMonthly.resource_id),
+    )
+    return rebuild_monthly_counts(
+        sorted(resource_id for (resource_id,) in session.execute(resource_ids)),
+        refresh_resource_comment_monthly,
+        batch_size,
+    )
@@ -18,6 +18,9 @@ from ckanext.feedback.models.utilization import (
     UtilizationCommentReply,
 )
 from ckanext.feedback.services.common.check import has_organization_admin_role
+from ckanext.feedback.services.utilization.summary import (
+    refresh_utilization_comment_monthly,
+)
 
 
 # Get details from the Utilization record
@@ -214,6 +217,7 @@ def refresh_utilization_comments(utilization_id):
     utilization = session.query(Utilization).get(utilization_id)
     utilization.comment = count
     utilization.updated = datetime.now()
+    refresh_utilization_comment_monthly([utilization.resource_id])
 
 
 # Get path for attached image
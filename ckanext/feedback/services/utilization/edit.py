@@ -3,6 +3,9 @@ from ckan.model.resource import Resource
 
 from ckanext.feedback.models.session import session
 from ckanext.feedback.models.utilization import Utilization
+from ckanext.feedback.services.utilization.summary import (
+    refresh_utilization_comment_monthly,
+)
 
 
 # Get details from the Utilization record
@@ -37,3 +40,5 @@ def update_utilization(utilization_id, title, url, description):
 def delete_utilization(utilization_id):
     utilization = session.query(Utilization).get(utilization_id)
     session.delete(utilization)
+    # The comments of the utilization are deleted with it
+    refresh_utilization_comment_monthly([utilization.resource_id])
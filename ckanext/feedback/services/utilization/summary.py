@@ -2,12 +2,31 @@ import logging
 from datetime import datetime
 
 from ckan.model import Resource
-from sqlalchemy import func
+from sqlalchemy import func, select, union
 from sqlalchemy.dialects.postgresql import insert
 
 from ckanext.feedback.models.issue import IssueResolutionSummary
 from ckanext.feedback.models.session import session
-from ckanext.feedback.models.utilization import Utilization, UtilizationSummary
+from ckanext.feedback.models.utilization import (
+    Utilization,
+    UtilizationComment,
+    UtilizationCommentMonthly,
+    UtilizationSummary,
+)
+from ckanext.feedback.services.common.cache import (
+    invalidate_resource_stats,
+    is_stats_cache_enabled,
+)
+from ckanext.feedback.services.common.monthly import (
+    get_approval_month,
+    rebuild_monthly_counts,
+    replace_monthly_counts,
+)
+from ckanext.feedback.services.package.summary import (
+    UTILIZATION_COLUMNS,
+    refresh_resources_package_feedback_summary,
+)
+from ckanext.feedback.services.resource.summary import get_resource_feedback_stats_bulk
 
 log = logging.getLogger(__name__)
 
@@ -42,6 +61,10 @@ def get_package_utilizations_bulk(package_ids):
 
 # Get utilization summary count of the target resource
 def get_resource_utilizations(resource_id):
+    if is_stats_cache_enabled():
+        return get_resource_feedback_stats_bulk([resource_id])[resource_id][
+            'utilizations'
+        ]
     count = (
         session.query(UtilizationSummary.utilization)
         .filter(UtilizationSummary.resource_id == resource_id)
@@ -89,6 +112,53 @@ def refresh_utilization_summary(resource_id):
         },
     )
     session.execute(summary)
+    refresh_resources_package_feedback_summary([resource_id], UTILIZATION_COLUMNS)
+    invalidate_resource_stats([resource_id])
+
+
+def refresh_utilization_comment_monthly(resource_ids):
+    """
+    Recalculate the approved comments on the utilizations of the resources by
+    month of approval. Returns the number of rows written.
+    """
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return 0
+    # Pending approvals must be visible to the aggregation
+    session.flush()
+
+    approved, month = get_approval_month(UtilizationComment)
+    rows = (
+        session.query(Utilization.resource_id, month, func.count(), func.min(approved))
+        .join(Utilization, UtilizationComment.utilization_id == Utilization.id)
+        .filter(
+            Utilization.resource_id.in_(resource_ids),
+            UtilizationComment.approval,
+        )
+        .group_by(Utilization.resource_id, month)
+        .all()
+    )
+    return replace_monthly_counts(
+        UtilizationCommentMonthly, 'comment_count', resource_ids, rows
+    )
+
+
+def rebuild_utilization_comment_monthly(batch_size=1000):
+    """
+    Recalculate the utilization_comment_monthly rows of every resource with
+    utilization comments or rows left. Returns the number of rows written.
+    """
+    resource_ids = union(
+        session.query(Utilization.resource_id).join(
+            UtilizationComment, UtilizationComment.utilization_id == Utilization.id
+        ),
+        session.query(UtilizationCommentMonthly.resource_id),
+    )
+    return rebuild_monthly_counts(
+        sorted(resource_id for (resource_id,) in session.execute(resource_ids)),
+        refresh_utilization_comment_monthly,
+        batch_size,
+    )
 
 
 def get_package_issue_resolutions(package_id):
@@ -106,6 +176,10 @@ def get_package_issue_resolutions(package_id):
 
 
 def get_resource_issue_resolutions(resource_id):
+    if is_stats_cache_enabled():
+        return get_resource_feedback_stats_bulk([resource_id])[resource_id][
+            'issue_resolutions'
+        ]
     count = (
         session.query(func.sum(IssueResolutionSummary.issue_resolution))
         .join(Utilization)
@@ -149,3 +223,13 @@ def increment_issue_resolution_summary(utilization_id):
         },
     )
     session.execute(issue_resolution_summary)
+    refresh_resources_package_feedback_summary(
+        select(Utilization.resource_id).where(Utilization.id == utilization_id),
+        UTILIZATION_COLUMNS,
+    )
+    invalidate_resource_stats(
+        resource_id
+        for (resource_id,) in session.query(Utilization.resource_id).filter(
+            Utilization.id == utilization_id
+        )
+    )
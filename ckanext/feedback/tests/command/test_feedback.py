@@ -1,3 +1,5 @@
+import json
+from datetime import date
 from unittest.mock import MagicMock, call, patch
 
 import pytest
@@ -8,14 +10,17 @@ from ckanext.feedback.command.feedback import (
     delete_invalid_files,
     feedback,
     get_solr_schema_api,
-    get_solr_url,
     handle_file_deletion,
 )
 from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
+from ckanext.feedback.models.event import FeedbackEvent, FeedbackEventRollup
 from ckanext.feedback.models.issue import IssueResolution, IssueResolutionSummary
 from ckanext.feedback.models.likes import ResourceLike, ResourceLikeMonthly
+from ckanext.feedback.models.package_summary import PackageFeedbackSummary
+from ckanext.feedback.models.ranking import PackageMetricMonthly, PackageTrendingScore
 from ckanext.feedback.models.resource_comment import (
     ResourceComment,
+    ResourceCommentMonthly,
     ResourceCommentMoralCheckLog,
     ResourceCommentReactions,
     ResourceCommentReply,
@@ -24,10 +29,15 @@ from ckanext.feedback.models.resource_comment import (
 from ckanext.feedback.models.utilization import (
     Utilization,
     UtilizationComment,
+    UtilizationCommentMonthly,
     UtilizationCommentMoralCheckLog,
     UtilizationCommentReply,
     UtilizationSummary,
 )
+from ckanext.feedback.services.common.search_index import (
+    CountReindexProgress,
+    SearchIndexRebuildResult,
+)
 
 engine = model.repo.session.get_bind()
 
@@ -65,11 +75,18 @@ class TestFeedbackCommand:
                         'issue_resolution',
                         'issue_resolution_summary',
                         'utilization_summary',
+                        'utilization_comment_monthly',
                         'resource_comment_summary',
+                        'resource_comment_monthly',
                         'resource_like',
                         'resource_like_monthly',
                         'download_summary',
                         'download_monthly',
+                        'package_feedback_summary',
+                        'package_metric_monthly',
+                        'package_trending_score',
+                        'feedback_event_rollup',
+                        'feedback_event',
                         'utilization_comment',
                         'utilization',
                         'resource_comment',
@@ -100,17 +117,24 @@ class TestFeedbackCommand:
                 IssueResolutionSummary.__table__,
                 IssueResolution.__table__,
                 UtilizationCommentMoralCheckLog.__table__,
+                UtilizationCommentMonthly.__table__,
                 UtilizationSummary.__table__,
                 UtilizationCommentReply.__table__,
                 UtilizationComment.__table__,
                 Utilization.__table__,
+                PackageTrendingScore.__table__,
+                PackageMetricMonthly.__table__,
+                PackageFeedbackSummary.__table__,
                 ResourceCommentMoralCheckLog.__table__,
                 ResourceCommentReactions.__table__,
                 ResourceLikeMonthly.__table__,
                 ResourceLike.__table__,
+                ResourceCommentMonthly.__table__,
                 ResourceCommentSummary.__table__,
                 ResourceCommentReply.__table__,
                 ResourceComment.__table__,
+                FeedbackEventRollup.__table__,
+                FeedbackEvent.__table__,
                 DownloadMonthly.__table__,
                 DownloadSummary.__table__,
             ],
@@ -126,18 +150,25 @@ class TestFeedbackCommand:
         assert engine.has_table(Utilization.__table__)
         assert engine.has_table(UtilizationComment.__table__)
         assert engine.has_table(UtilizationSummary.__table__)
+        assert engine.has_table(UtilizationCommentMonthly.__table__)
         assert engine.has_table(UtilizationCommentMoralCheckLog.__table__)
         assert engine.has_table(IssueResolution.__table__)
         assert engine.has_table(IssueResolutionSummary.__table__)
         assert engine.has_table(ResourceComment.__table__)
         assert engine.has_table(ResourceCommentReply.__table__)
         assert engine.has_table(ResourceCommentSummary.__table__)
+        assert engine.has_table(ResourceCommentMonthly.__table__)
         assert engine.has_table(ResourceLike.__table__)
         assert engine.has_table(ResourceLikeMonthly.__table__)
         assert engine.has_table(ResourceCommentReactions.__table__)
         assert engine.has_table(ResourceCommentMoralCheckLog.__table__)
+        assert engine.has_table(PackageFeedbackSummary.__table__)
+        assert engine.has_table(PackageMetricMonthly.__table__)
+        assert engine.has_table(PackageTrendingScore.__table__)
         assert engine.has_table(DownloadSummary.__table__)
         assert engine.has_table(DownloadMonthly.__table__)
+        assert engine.has_table(FeedbackEvent.__table__)
+        assert engine.has_table(FeedbackEventRollup.__table__)
 
     def test_feedback_utilization(self):
         result = self.runner.invoke(
@@ -148,12 +179,14 @@ class TestFeedbackCommand:
         assert engine.has_table(Utilization.__table__)
         assert engine.has_table(UtilizationComment.__table__)
         assert engine.has_table(UtilizationSummary.__table__)
+        assert engine.has_table(UtilizationCommentMonthly.__table__)
         assert engine.has_table(UtilizationCommentMoralCheckLog.__table__)
         assert engine.has_table(IssueResolution.__table__)
         assert engine.has_table(IssueResolutionSummary.__table__)
         assert not engine.has_table(ResourceComment.__table__)
         assert not engine.has_table(ResourceCommentReply.__table__)
         assert not engine.has_table(ResourceCommentSummary.__table__)
+        assert not engine.has_table(ResourceCommentMonthly.__table__)
         assert not engine.has_table(ResourceLike.__table__)
         assert not engine.has_table(ResourceLikeMonthly.__table__)
         assert not engine.has_table(ResourceCommentReactions.__table__)
@@ -167,16 +200,21 @@ class TestFeedbackCommand:
         assert not engine.has_table(Utilization.__table__)
         assert not engine.has_table(UtilizationComment.__table__)
         assert not engine.has_table(UtilizationSummary.__table__)
+        assert not engine.has_table(UtilizationCommentMonthly.__table__)
         assert not engine.has_table(UtilizationCommentMoralCheckLog.__table__)
         assert not engine.has_table(IssueResolution.__table__)
         assert not engine.has_table(IssueResolutionSummary.__table__)
         assert engine.has_table(ResourceComment.__table__)
         assert engine.has_table(ResourceCommentReply.__table__)
         assert engine.has_table(ResourceCommentSummary.__table__)
+        assert engine.has_table(ResourceCommentMonthly.__table__)
         assert engine.has_table(ResourceLike.__table__)
         assert engine.has_table(ResourceLikeMonthly.__table__)
         assert engine.has_table(ResourceCommentReactions.__table__)
         assert engine.has_table(ResourceCommentMoralCheckLog.__table__)
+        assert engine.has_table(PackageFeedbackSummary.__table__)
+        assert engine.has_table(PackageMetricMonthly.__table__)
+        assert engine.has_table(PackageTrendingScore.__table__)
         assert not engine.has_table(DownloadSummary.__table__)
         assert not engine.has_table(DownloadMonthly.__table__)
 
@@ -186,18 +224,25 @@ class TestFeedbackCommand:
         assert not engine.has_table(Utilization.__table__)
         assert not engine.has_table(UtilizationComment.__table__)
         assert not engine.has_table(UtilizationSummary.__table__)
+        assert not engine.has_table(UtilizationCommentMonthly.__table__)
         assert not engine.has_table(UtilizationCommentMoralCheckLog.__table__)
         assert not engine.has_table(IssueResolution.__table__)
         assert not engine.has_table(IssueResolutionSummary.__table__)
         assert not engine.has_table(ResourceComment.__table__)
         assert not engine.has_table(ResourceCommentReply.__table__)
         assert not engine.has_table(ResourceCommentSummary.__table__)
+        assert not engine.has_table(ResourceCommentMonthly.__table__)
         assert not engine.has_table(ResourceLike.__table__)
         assert not engine.has_table(ResourceLikeMonthly.__table__)
         assert not engine.has_table(ResourceCommentReactions.__table__)
         assert not engine.has_table(ResourceCommentMoralCheckLog.__table__)
+        assert not engine.has_table(PackageFeedbackSummary.__table__)
+        assert not engine.has_table(PackageMetricMonthly.__table__)
+        assert not engine.has_table(PackageTrendingScore.__table__)
         assert engine.has_table(DownloadSummary.__table__)
         assert engine.has_table(DownloadMonthly.__table__)
+        assert engine.has_table(FeedbackEvent.__table__)
+        assert engine.has_table(FeedbackEventRollup.__table__)
 
     def test_feedback_session_error(self):
         with patch(
@@ -210,12 +255,14 @@ class TestFeedbackCommand:
         assert not engine.has_table(Utilization.__table__)
         assert not engine.has_table(UtilizationComment.__table__)
         assert not engine.has_table(UtilizationSummary.__table__)
+        assert not engine.has_table(UtilizationCommentMonthly.__table__)
         assert not engine.has_table(UtilizationCommentMoralCheckLog.__table__)
         assert not engine.has_table(IssueResolution.__table__)
         assert not engine.has_table(IssueResolutionSummary.__table__)
         assert not engine.has_table(ResourceComment.__table__)
         assert not engine.has_table(ResourceCommentReply.__table__)
         assert not engine.has_table(ResourceCommentSummary.__table__)
+        assert not engine.has_table(ResourceCommentMonthly.__table__)
         assert not engine.has_table(ResourceLike.__table__)
         assert not engine.has_table(ResourceLikeMonthly.__table__)
         assert not engine.has_table(ResourceCommentReactions.__table__)
@@ -223,6 +270,309 @@ class TestFeedbackCommand:
         assert not engine.has_table(DownloadSummary.__table__)
         assert not engine.has_table(DownloadMonthly.__table__)
 
+    @patch('ckanext.feedback.command.feedback.event_log_service')
+    def test_rollup(self, mock_event_log_service):
+        mock_event_log_service.rollup_events.return_value = 3
+
+        result = self.runner.invoke(
+            feedback, ['rollup', '--batch-size', '100', '--settle-seconds', '0']
+        )
+
+        assert result.exit_code == 0
+        assert 'Folded 3 feedback events: SUCCESS' in result.output
+        mock_event_log_service.rollup_events.assert_called_once_with(
+            batch_size=100, settle_seconds=0
+        )
+
+    @patch('ckanext.feedback.command.feedback.event_log_service')
+    def test_rollup_default_options(self, mock_event_log_service):
+        mock_event_log_service.rollup_events.return_value = 0
+
+        result = self.runner.invoke(feedback, ['rollup'])
+
+        assert result.exit_code == 0
+        mock_event_log_service.rollup_events.assert_called_once_with(
+            batch_size=10000, settle_seconds=60
+        )
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.event_log_service')
+    def test_rollup_error(self, mock_event_log_service, mock_error_shout):
+        error = Exception('Error message')
+        mock_event_log_service.rollup_events.side_effect = error
+
+        result = self.runner.invoke(feedback, ['rollup'])
+
+        assert result.exit_code != 0
+        mock_error_shout.assert_called_once_with(error)
+
+    @patch('ckanext.feedback.command.feedback.package_summary_service')
+    def test_rebuild_package_summary(self, mock_package_summary_service):
+        mock_rebuild = mock_package_summary_service.rebuild_package_feedback_summary
+        mock_rebuild.return_value = 5
+
+        result = self.runner.invoke(
+            feedback, ['rebuild-package-summary', '--batch-size', '100']
+        )
+
+        assert result.exit_code == 0
+        assert 'Rebuilt feedback stats of 5 packages: SUCCESS' in result.output
+        mock_rebuild.assert_called_once_with(batch_size=100)
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.package_summary_service')
+    def test_rebuild_package_summary_error(
+        self, mock_package_summary_service, mock_error_shout
+    ):
+        error = Exception('Error message')
+        mock_package_summary_service.rebuild_package_feedback_summary.side_effect = (
+            error
+        )
+
+        result = self.runner.invoke(feedback, ['rebuild-package-summary'])
+
+        assert result.exit_code != 0
+        mock_error_shout.assert_called_once_with(error)
+
+    @patch('ckanext.feedback.command.feedback.ranking_service')
+    def test_rollup_ranking(self, mock_ranking_service):
+        mock_rebuild = mock_ranking_service.rebuild_package_metric_monthly
+        mock_rebuild.return_value = 12
+
+        result = self.runner.invoke(feedback, ['rollup-ranking', '--since', '2024-05'])
+
+        assert result.exit_code == 0
+        assert 'Rolled up 12 monthly ranking counts: SUCCESS' in result.output
+        mock_rebuild.assert_called_once_with(since=date(2024, 5, 1))
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.ranking_service')
+    def test_rollup_ranking_error(self, mock_ranking_service, mock_error_shout):
+        error = Exception('Error message')
+        mock_ranking_service.rebuild_package_metric_monthly.side_effect = error
+
+        result = self.runner.invoke(feedback, ['rollup-ranking'])
+
+        assert result.exit_code != 0
+        mock_ranking_service.rebuild_package_metric_monthly.assert_called_once_with(
+            since=None
+        )
+        mock_error_shout.assert_called_once_with(error)
+
+    @patch('ckanext.feedback.command.feedback.ranking_cache_service')
+    @patch('ckanext.feedback.command.feedback.utilization_summary_service')
+    @patch('ckanext.feedback.command.feedback.resource_summary_service')
+    def test_rollup_comments(
+        self,
+        mock_resource_summary_service,
+        mock_utilization_summary_service,
+        mock_ranking_cache_service,
+    ):
+        mock_rebuild_resource = (
+            mock_resource_summary_service.rebuild_resource_comment_monthly
+        )
+        mock_rebuild_resource.return_value = 4
+        mock_rebuild_utilization = (
+            mock_utilization_summary_service.rebuild_utilization_comment_monthly
+        )
+        mock_rebuild_utilization.return_value = 3
+
+        result = self.runner.invoke(
+            feedback, ['rollup-comments', '--batch-size', '100']
+        )
+
+        assert result.exit_code == 0
+        assert 'Rolled up 7 monthly comment counts: SUCCESS' in result.output
+        mock_rebuild_resource.assert_called_once_with(batch_size=100)
+        mock_rebuild_utilization.assert_called_once_with(batch_size=100)
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_called_once_with()
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.ranking_cache_service')
+    @patch('ckanext.feedback.command.feedback.utilization_summary_service')
+    @patch('ckanext.feedback.command.feedback.resource_summary_service')
+    def test_rollup_comments_error(
+        self,
+        mock_resource_summary_service,
+        mock_utilization_summary_service,
+        mock_ranking_cache_service,
+        mock_error_shout,
+    ):
+        error = Exception('Error message')
+        mock_rebuild_resource = (
+            mock_resource_summary_service.rebuild_resource_comment_monthly
+        )
+        mock_rebuild_resource.side_effect = error
+        mock_rebuild_utilization = (
+            mock_utilization_summary_service.rebuild_utilization_comment_monthly
+        )
+
+        result = self.runner.invoke(feedback, ['rollup-comments'])
+
+        assert result.exit_code != 0
+        mock_rebuild_resource.assert_called_once_with(batch_size=1000)
+        mock_rebuild_utilization.assert_not_called()
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_not_called()
+        mock_error_shout.assert_called_once_with(error)
+
+    @patch('ckanext.feedback.command.feedback.rebuild_search_index')
+    def test_reindex(self, mock_rebuild_search_index):
+        mock_rebuild_search_index.return_value = SearchIndexRebuildResult(5, [])
+
+        result = self.runner.invoke(feedback, ['reindex', '--chunk-size', '100'])
+
+        assert result.exit_code == 0
+        assert 'Reindexed 5 packages: SUCCESS' in result.output
+        mock_rebuild_search_index.assert_called_once_with(chunk_size=100, force=False)
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.rebuild_search_index')
+    def test_reindex_force_with_failed_packages(
+        self, mock_rebuild_search_index, mock_error_shout
+    ):
+        mock_rebuild_search_index.return_value = SearchIndexRebuildResult(
+            5, ['package-a', 'package-b']
+        )
+
+        result = self.runner.invoke(feedback, ['reindex', '--force'])
+
+        assert result.exit_code != 0
+        assert 'SUCCESS' not in result.output
+        mock_rebuild_search_index.assert_called_once_with(chunk_size=1000, force=True)
+        mock_error_shout.assert_called_once_with(
+            'Failed to reindex 2 of 5 packages: package-a, package-b'
+        )
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.rebuild_search_index')
+    def test_reindex_error(self, mock_rebuild_search_index, mock_error_shout):
+        error = Exception('Error message')
+        mock_rebuild_search_index.side_effect = error
+
+        result = self.runner.invoke(feedback, ['reindex'])
+
+        assert result.exit_code != 0
+        mock_rebuild_search_index.assert_called_once_with(chunk_size=1000, force=False)
+        mock_error_shout.assert_called_once_with(error)
+
+    @patch('ckanext.feedback.command.feedback.reindex_count_fields')
+    def test_reindex_counts(self, mock_reindex_count_fields):
+        def reindex_count_fields(on_progress, **kwargs):
+            progress = CountReindexProgress(total=3)
+            progress.add_batch(0, 'package-b', 2, updated=2)
+            on_progress(progress)
+            progress.add_batch(1, 'package-c', 1, missing=1)
+            on_progress(progress)
+            return progress
+
+        mock_reindex_count_fields.side_effect = reindex_count_fields
+
+        result = self.runner.invoke(
+            feedback,
+            [
+                'reindex-counts',
+                '--batch-size',
+                '2',
+                '--workers',
+                '8',
+                '--start-after',
+                'package-a',
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert '2/3 packages (resume with --start-after package-b)' in result.output
+        assert '1 packages are not in the search index' in result.output
+        assert 'Updated feedback counts of 2 packages: SUCCESS' in result.output
+        kwargs = mock_reindex_count_fields.call_args.kwargs
+        assert kwargs['batch_size'] == 2
+        assert kwargs['workers'] == 8
+        assert kwargs['start_after'] == 'package-a'
+        assert kwargs['dry_run'] is False
+
+    @patch('ckanext.feedback.command.feedback.reindex_count_fields')
+    def test_reindex_counts_dry_run(self, mock_reindex_count_fields):
+        mock_reindex_count_fields.return_value = CountReindexProgress(total=0)
+
+        result = self.runner.invoke(feedback, ['reindex-counts', '--dry-run'])
+
+        assert result.exit_code == 0
+        assert '[DRY RUN] Updated feedback counts of 0 packages' in result.output
+        kwargs = mock_reindex_count_fields.call_args.kwargs
+        assert kwargs['batch_size'] == 500
+        assert kwargs['workers'] == 4
+        assert kwargs['start_after'] is None
+        assert kwargs['dry_run'] is True
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.reindex_count_fields')
+    def test_reindex_counts_with_failed_batch(
+        self, mock_reindex_count_fields, mock_error_shout
+    ):
+        progress = CountReindexProgress(total=4)
+        progress.add_batch(0, 'package-b', 2, updated=2)
+        progress.add_batch(1, None, 2)
+        mock_reindex_count_fields.return_value = progress
+
+        result = self.runner.invoke(feedback, ['reindex-counts'])
+
+        assert result.exit_code == 1
+        mock_error_shout.assert_called_once_with(
+            'Failed to update 2 packages, resume with --start-after package-b'
+        )
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.reindex_count_fields')
+    def test_reindex_counts_error(self, mock_reindex_count_fields, mock_error_shout):
+        error = RuntimeError('Error message')
+        mock_reindex_count_fields.side_effect = error
+
+        result = self.runner.invoke(feedback, ['reindex-counts'])
+
+        assert result.exit_code == 1
+        mock_error_shout.assert_called_once_with(error)
+
+    def test_validate_config(self, tmp_path):
+        path = tmp_path / 'feedback_config.json'
+        path.write_text(
+            json.dumps(
+                {'modules': {'resources': {'enable': True, 'enable_orgs': ['org']}}}
+            )
+        )
+
+        result = self.runner.invoke(feedback, ['validate-config', str(path)])
+
+        assert result.exit_code == 0
+        assert f'{path} is valid: SUCCESS' in result.output
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    def test_validate_config_invalid(self, mock_error_shout, tmp_path):
+        path = tmp_path / 'feedback_config.json'
+        path.write_text(
+            json.dumps({'modules': {'resources': {'enable': True, 'enable_orgs': 1}}})
+        )
+
+        result = self.runner.invoke(feedback, ['validate-config', str(path)])
+
+        assert result.exit_code != 0
+        mock_error_shout.assert_called_once()
+        assert mock_error_shout.call_args[0][0].startswith(
+            'ckan.feedback.resources: The "enable_orgs" key'
+        )
+
+    @patch('ckanext.feedback.command.feedback.FeedbackConfig')
+    def test_validate_config_in_use(self, mock_feedback_config):
+        fb_config = mock_feedback_config.return_value
+        fb_config.get_feedback_config_file.return_value = '/srv/app/config.json'
+        fb_config.validate_feedback_config_file.return_value = []
+
+        result = self.runner.invoke(feedback, ['validate-config'])
+
+        assert result.exit_code == 0
+        fb_config.validate_feedback_config_file.assert_called_once_with(
+            '/srv/app/config.json'
+        )
+
     @patch('ckanext.feedback.command.feedback.upload_service')
     @patch('ckanext.feedback.command.feedback.comment_service')
     @patch('ckanext.feedback.command.feedback.detail_service')
@@ -404,28 +754,6 @@ class TestFeedbackCommand:
         mock_generate_moral_check_log_excel_bytes.assert_called_once_with(False)
         mock_echo.assert_called_once_with("Error: test exception", err=True)
 
-    @patch('ckanext.feedback.command.feedback.config')
-    def test_get_solr_url_with_ckan_solr_url(self, mock_config):
-        mock_config.get.side_effect = lambda key: (
-            'http://solr:8983/solr/ckan' if key == 'ckan.solr_url' else None
-        )
-        result = get_solr_url()
-        assert result == 'http://solr:8983/solr/ckan'
-
-    @patch('ckanext.feedback.command.feedback.config')
-    def test_get_solr_url_with_solr_url(self, mock_config):
-        mock_config.get.side_effect = lambda key: (
-            'http://custom-solr:8983/solr/ckan' if key == 'solr_url' else None
-        )
-        result = get_solr_url()
-        assert result == 'http://custom-solr:8983/solr/ckan'
-
-    @patch('ckanext.feedback.command.feedback.config')
-    def test_get_solr_url_default(self, mock_config):
-        mock_config.get.return_value = None
-        result = get_solr_url()
-        assert result == 'http://solr:8983/solr/ckan'
-
     @patch('ckanext.feedback.command.feedback.get_solr_url')
     def test_get_solr_schema_api(self, mock_get_solr_url):
         mock_get_solr_url.return_value = 'http://solr:8983/solr/ckan'
@@ -433,13 +761,67 @@ class TestFeedbackCommand:
         assert result == 'http://solr:8983/solr/ckan/schema'
         mock_get_solr_url.assert_called_once_with()
 
+    @patch('ckanext.feedback.command.feedback.setup_solr_schema')
+    @patch('ckanext.feedback.command.feedback.FeedbackConfig')
+    def test_setup_solr_fields(self, mock_feedback_config, mock_setup_solr_schema):
+        mock_feedback_config.return_value.custom_sort.is_enable.return_value = True
+        mock_setup_solr_schema.return_value = True
+
+        result = self.runner.invoke(feedback, ['setup-solr-fields'])
+
+        assert result.exit_code == 0
+        assert 'Set up Solr fields: SUCCESS' in result.output
+        mock_setup_solr_schema.assert_called_once_with()
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.setup_solr_schema')
+    @patch('ckanext.feedback.command.feedback.FeedbackConfig')
+    def test_setup_solr_fields_failed(
+        self, mock_feedback_config, mock_setup_solr_schema, mock_error_shout
+    ):
+        mock_feedback_config.return_value.custom_sort.is_enable.return_value = True
+        mock_setup_solr_schema.return_value = False
+
+        result = self.runner.invoke(feedback, ['setup-solr-fields'])
+
+        assert result.exit_code == 1
+        mock_error_shout.assert_called_once_with(
+            'Failed to set up the Solr fields, see the log'
+        )
+
+    @patch('ckanext.feedback.command.feedback.toolkit.error_shout')
+    @patch('ckanext.feedback.command.feedback.setup_solr_schema')
+    @patch('ckanext.feedback.command.feedback.FeedbackConfig')
+    def test_setup_solr_fields_custom_sort_disabled(
+        self, mock_feedback_config, mock_setup_solr_schema, mock_error_shout
+    ):
+        mock_feedback_config.return_value.custom_sort.is_enable.return_value = False
+
+        result = self.runner.invoke(feedback, ['setup-solr-fields'])
+
+        assert result.exit_code == 1
+        mock_setup_solr_schema.assert_not_called()
+        mock_error_shout.assert_called_once_with(
+            'custom_sort is disabled in feedback_config.json'
+        )
+
     @patch('ckanext.feedback.command.feedback.get_solr_schema_api')
+    @patch('ckanext.feedback.command.feedback.get_solr_url')
     @patch('ckanext.feedback.command.feedback.click')
+    @patch('ckanext.feedback.command.feedback.clear_solr_schema_setup_stamps')
+    @patch('ckanext.feedback.command.feedback.invalidate_solr_field_cache')
     @patch('ckanext.feedback.command.feedback.requests')
     def test_reset_solr_fields_with_yes_flag(
-        self, mock_requests, mock_click, mock_get_solr_schema_api
+        self,
+        mock_requests,
+        mock_invalidate_solr_field_cache,
+        mock_clear_solr_schema_setup_stamps,
+        mock_click,
+        mock_get_solr_url,
+        mock_get_solr_schema_api,
     ):
         mock_get_solr_schema_api.return_value = 'http://solr:8983/solr/ckan/schema'
+        mock_get_solr_url.return_value = 'http://solr:8983/solr/ckan'
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_requests.post.return_value = mock_response
@@ -452,6 +834,10 @@ class TestFeedbackCommand:
         mock_click.secho.assert_any_call(
             '✓ Fields deleted successfully!', fg='green', bold=True
         )
+        mock_invalidate_solr_field_cache.assert_called_once_with()
+        mock_clear_solr_schema_setup_stamps.assert_called_once_with(
+            'http://solr:8983/solr/ckan'
+        )
 
     @patch('ckanext.feedback.command.feedback.get_solr_schema_api')
     @patch('ckanext.feedback.command.feedback.get_solr_url')
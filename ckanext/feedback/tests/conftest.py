@@ -33,6 +33,8 @@ from ckanext.feedback.models.utilization import (
     UtilizationCommentCategory,
     UtilizationCommentMoralCheckLog,
 )
+from ckanext.feedback.services.common.config import ConfigSnapshot, set_config_snapshot
+from ckanext.feedback.services.common.search_index import solr_field_cache
 from ckanext.feedback.services.resource.summary import refresh_resource_summary
 
 os.environ.setdefault('COVERAGE_FILE', '/tmp/.coverage.ckanext-feedback')
@@ -57,6 +59,20 @@ def reset_transaction(request):
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_solr_field_cache():
+    # Tests mock the Solr schema API with different fields
+    solr_field_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_config_snapshot():
+    # Tests set the values of feedback_config.json in the CKAN config directly
+    set_config_snapshot(ConfigSnapshot())
+    yield
+
+
 @pytest.fixture(scope="function")
 def user():
     return factories.User()
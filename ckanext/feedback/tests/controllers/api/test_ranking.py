@@ -7,8 +7,11 @@ from ckan.plugins.toolkit import ValidationError
 from ckanext.feedback.controllers.api import ranking as DatasetRankingController
 from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
 from ckanext.feedback.models.likes import ResourceLike, ResourceLikeMonthly
-from ckanext.feedback.models.resource_comment import ResourceCommentSummary
-from ckanext.feedback.models.utilization import Utilization
+from ckanext.feedback.models.resource_comment import (
+    ResourceCommentMonthly,
+    ResourceCommentSummary,
+)
+from ckanext.feedback.models.utilization import Utilization, UtilizationCommentMonthly
 
 
 class TestRankingApi:
@@ -254,6 +257,7 @@ class TestRankingValidator:
             'likes',
             'resource_comments',
             'utilization_comments',
+            'trending',
         ]:
             controller.validator.validate_aggregation_metric(aggregation_metric)
 
@@ -269,6 +273,44 @@ class TestRankingValidator:
 
         assert error_message == "This is a non-existent aggregation metric."
 
+    @patch('ckanext.feedback.controllers.api.ranking.FeedbackConfig')
+    def test_validate_trending_function(self, mock_feedback_config):
+        controller = DatasetRankingController._ranking_controller
+        mock_feedback_config.return_value.ranking_rollup.is_enable.return_value = True
+        controller.validator.validate_trending_function()
+
+        mock_feedback_config.return_value.ranking_rollup.is_enable.return_value = False
+        with pytest.raises(ValidationError) as exc_info:
+            controller.validator.validate_trending_function()
+
+        error_dict = exc_info.value.__dict__.get('error_dict')
+        assert error_dict.get('message') == (
+            "Trending ranking is off. "
+            "Please contact the site administrator for assistance."
+        )
+
+    def test_validate_aggregation_metrics(self):
+        controller = DatasetRankingController._ranking_controller
+        controller.validator.validate_aggregation_metrics(['download', 'likes'])
+
+    @pytest.mark.parametrize(
+        "aggregation_metrics,message",
+        [
+            ([], "Please specify at least one aggregation metric."),
+            (['download', 'test'], "This is a non-existent aggregation metric."),
+        ],
+    )
+    def test_validate_aggregation_metrics_with_invalid_value(
+        self, aggregation_metrics, message
+    ):
+        controller = DatasetRankingController._ranking_controller
+
+        with pytest.raises(ValidationError) as exc_info:
+            controller.validator.validate_aggregation_metrics(aggregation_metrics)
+
+        error_dict = exc_info.value.__dict__.get('error_dict')
+        assert error_dict.get('message') == message
+
     @patch('ckanext.feedback.controllers.api.ranking.FeedbackConfig')
     def test_validate_download_function(self, mock_feedback_config):
         controller = DatasetRankingController._ranking_controller
@@ -683,6 +725,7 @@ class TestDatasetRankingService:
         total_model,
         total_column,
         organization_name,
+        metric,
     ):
         mock_get_generic_ranking.assert_called_once_with(
             top_ranked_limit,
@@ -694,6 +737,7 @@ class TestDatasetRankingService:
             total_column,
             enable_org=None,
             organization_name=organization_name,
+            metric=metric,
         )
 
     def test_get_dataset_ranking_with_invalid_metric(self):
@@ -713,6 +757,114 @@ class TestDatasetRankingService:
 
         assert error_message == "Invalid metric specified."
 
+    @patch('ckanext.feedback.controllers.api.ranking.FeedbackConfig')
+    @patch(
+        'ckanext.feedback.controllers.api.ranking.'
+        'dataset_ranking_service.get_generic_ranking'
+    )
+    def test_get_dataset_rankings(self, mock_get_generic_ranking, mock_feedback_config):
+        controller = DatasetRankingController._ranking_controller
+        mock_get_generic_ranking.side_effect = lambda *args, **kwargs: [
+            (kwargs['metric'],)
+        ]
+        feedback_config = mock_feedback_config.return_value
+        feedback_config.download.get_enable_org_names.return_value = ['test_org1']
+        feedback_config.like.get_enable_org_names.return_value = ['test_org1']
+
+        with patch.object(
+            controller.validator, 'validate_organization_name_in_group'
+        ) as mock_validate_org:
+            result = controller.ranking_service.get_dataset_rankings(
+                metrics=['download', 'likes'],
+                top_ranked_limit='1',
+                start_year_month='2023-04',
+                end_year_month='2023-12',
+                organization_name='test_org1',
+            )
+
+        assert result == {'download': [('download',)], 'likes': [('likes',)]}
+        mock_validate_org.assert_called_once_with('test_org1')
+        assert mock_get_generic_ranking.call_count == 2
+
+    @patch('ckanext.feedback.controllers.api.ranking.FeedbackConfig')
+    @patch(
+        'ckanext.feedback.controllers.api.ranking.'
+        'dataset_ranking_service.get_generic_ranking'
+    )
+    def test_get_dataset_rankings_validates_every_metric_first(
+        self, mock_get_generic_ranking, mock_feedback_config
+    ):
+        controller = DatasetRankingController._ranking_controller
+        feedback_config = mock_feedback_config.return_value
+        feedback_config.like.is_enable.return_value = False
+
+        with pytest.raises(ValidationError):
+            controller.ranking_service.get_dataset_rankings(
+                metrics=['download', 'likes'],
+                top_ranked_limit='1',
+                start_year_month='2023-04',
+                end_year_month='2023-12',
+                organization_name=None,
+            )
+
+        mock_get_generic_ranking.assert_not_called()
+        # Organizations are only listed when one is selected
+        feedback_config.download.get_enable_org_names.assert_not_called()
+
+    @patch(
+        'ckanext.feedback.controllers.api.ranking.'
+        'dataset_ranking_service.get_trending_ranking'
+    )
+    def test_get_dataset_ranking_trending(self, mock_get_trending_ranking):
+        controller = DatasetRankingController._ranking_controller
+        mock_get_trending_ranking.return_value = [('row',)]
+
+        with patch.object(
+            controller.validator, 'validate_trending_function'
+        ) as mock_validate, patch.object(
+            controller.validator, 'validate_organization_name_in_group'
+        ) as mock_validate_org:
+            result = controller.ranking_service.get_dataset_ranking(
+                metric='trending',
+                top_ranked_limit='1',
+                start_year_month='2023-04',
+                end_year_month='2023-12',
+                organization_name='test_org1',
+            )
+
+        assert result == [('row',)]
+        mock_validate.assert_called_once_with()
+        mock_validate_org.assert_called_once_with('test_org1')
+        mock_get_trending_ranking.assert_called_once_with(
+            '1', organization_name='test_org1'
+        )
+
+    @patch('ckanext.feedback.controllers.api.ranking.config.get')
+    @patch('ckanext.feedback.controllers.api.ranking.toolkit.url_for')
+    def test_generate_dataset_ranking_list_with_trending(
+        self, mock_url_for, mock_config_get
+    ):
+        controller = DatasetRankingController._ranking_controller
+        mock_config_get.return_value = 'https://test-site-url'
+        mock_url_for.return_value = '/dataset/test_dataset1'
+
+        result = controller.ranking_service.generate_dataset_ranking_list(
+            [('org', 'Org', 'test_dataset1', 'Dataset', 'notes', 1.23456, None)],
+            metric_name='trending',
+        )
+
+        assert result == [
+            {
+                'rank': 1,
+                'group_name': 'org',
+                'group_title': 'Org',
+                'dataset_title': 'Dataset',
+                'dataset_notes': 'notes',
+                'dataset_link': 'https://test-site-url/dataset/test_dataset1',
+                'trending_score': 1.23,
+            }
+        ]
+
     @patch('ckanext.feedback.controllers.api.ranking.config.get')
     @patch('ckanext.feedback.controllers.api.ranking.toolkit.url_for')
     def test_generate_dataset_ranking_list_with_different_metric(
@@ -788,6 +940,47 @@ class TestDatasetRankingService:
 
 
 class TestDatasetRankingController:
+    @patch.object(
+        DatasetRankingController._ranking_controller.ranking_service,
+        'generate_dataset_ranking_list',
+    )
+    @patch.object(
+        DatasetRankingController._ranking_controller.ranking_service,
+        'get_dataset_rankings',
+    )
+    @patch.object(
+        DatasetRankingController._ranking_controller.date_calculator, 'get_year_months'
+    )
+    def test_get_datasets_ranking_with_metric_list(
+        self,
+        mock_get_year_months,
+        mock_get_dataset_rankings,
+        mock_generate_ranking_list,
+    ):
+        controller = DatasetRankingController._ranking_controller
+        mock_get_year_months.return_value = ('2023-04', '2023-12')
+        mock_get_dataset_rankings.return_value = {
+            'download': ['download rows'],
+            'likes': ['likes rows'],
+        }
+        mock_generate_ranking_list.side_effect = lambda rows, metric_name: [
+            f'{metric_name} list'
+        ]
+
+        result = controller.get_datasets_ranking(
+            {'aggregation_metric': ['download', 'likes', 'download']}
+        )
+
+        assert result == {'download': ['download list'], 'likes': ['likes list']}
+        mock_get_year_months.assert_called_once()
+        mock_get_dataset_rankings.assert_called_once_with(
+            metrics=['download', 'likes'],
+            top_ranked_limit=5,
+            start_year_month='2023-04',
+            end_year_month='2023-12',
+            organization_name=None,
+        )
+
     def test_extract_parameters(self):
         controller = DatasetRankingController._ranking_controller
         data_dict = {
@@ -1067,8 +1260,8 @@ class TestDatasetRankingController:
                 None,
                 'validate_resource_comments_function',
                 None,
-                ResourceCommentSummary,
-                "comment",
+                ResourceCommentMonthly,
+                "comment_count",
                 ResourceCommentSummary,
                 "comment",
                 'resource_comment',
@@ -1078,8 +1271,8 @@ class TestDatasetRankingController:
                 None,
                 'validate_utilization_comments_function',
                 None,
-                Utilization,
-                "comment",
+                UtilizationCommentMonthly,
+                "comment_count",
                 Utilization,
                 "comment",
                 'utilization_comment',
@@ -1111,8 +1304,8 @@ class TestDatasetRankingController:
                 'test_org1',
                 'validate_resource_comments_function',
                 'validate_organization_resource_comments_enabled',
-                ResourceCommentSummary,
-                "comment",
+                ResourceCommentMonthly,
+                "comment_count",
                 ResourceCommentSummary,
                 "comment",
                 'resource_comment',
@@ -1122,8 +1315,8 @@ class TestDatasetRankingController:
                 'test_org1',
                 'validate_utilization_comments_function',
                 'validate_organization_utilization_comments_enabled',
-                Utilization,
-                "comment",
+                UtilizationCommentMonthly,
+                "comment_count",
                 Utilization,
                 "comment",
                 'utilization_comment',
@@ -1215,6 +1408,7 @@ class TestDatasetRankingController:
                         total_column,
                         enable_org=None,
                         organization_name=organization_name,
+                        metric=metric,
                     )
             else:
                 feedback_config = mock_feedback_config.return_value
@@ -1264,4 +1458,5 @@ class TestDatasetRankingController:
                     total_column,
                     enable_org=None,
                     organization_name=organization_name,
+                    metric=metric,
                 )
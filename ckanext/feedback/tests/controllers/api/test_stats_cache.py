@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+import pytest
+from ckan.plugins import toolkit
+from ckan.tests import factories
+
+from ckanext.feedback.controllers.api.stats_cache import feedback_stats_cache_status
+from ckanext.feedback.services.common.cache import LocalCache, StatsCache
+
+
+@pytest.mark.db_test
+class TestStatsCacheApi:
+    @patch('ckanext.feedback.controllers.api.stats_cache.stats_cache_service')
+    def test_feedback_stats_cache_status(self, mock_stats_cache_service):
+        mock_stats_cache_service.is_stats_cache_enabled.return_value = True
+        mock_stats_cache_service.get_stats_cache.return_value = StatsCache(
+            LocalCache(), 60
+        )
+        sysadmin = factories.Sysadmin()
+
+        result = feedback_stats_cache_status({'user': sysadmin['name']}, {})
+
+        assert result == {
+            'enabled': True,
+            'backend': 'local',
+            'ttl': 60,
+            'size': 0,
+            'hits': 0,
+            'misses': 0,
+            'hit_ratio': 0,
+        }
+
+    def test_feedback_stats_cache_status_disabled(self):
+        sysadmin = factories.Sysadmin()
+
+        result = feedback_stats_cache_status({'user': sysadmin['name']}, {})
+
+        assert result == {'enabled': False}
+
+    def test_feedback_stats_cache_status_not_sysadmin(self):
+        user = factories.User()
+
+        with pytest.raises(toolkit.NotAuthorized):
+            feedback_stats_cache_status({'user': user['name']}, {})
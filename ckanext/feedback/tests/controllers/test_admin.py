@@ -1054,10 +1054,12 @@ class TestAdminControllerWithContext:
         mock_log.exception.assert_called_once()
         mock_flash_error.assert_called_once()
 
+    @patch('ckanext.feedback.controllers.admin.ranking_cache_service')
     @patch('ckanext.feedback.controllers.admin.utilization_service')
     def test_delete_utilization(
         self,
         mock_utilization_service,
+        mock_ranking_cache_service,
     ):
         target = ['utilization_id']
 
@@ -1085,8 +1087,10 @@ class TestAdminControllerWithContext:
         mock_utilization_service.refresh_utilization_summary.\
             assert_called_once_with(['resource_id'])
         # fmt: on
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_called_once_with()
         assert result == len(target)
 
+    @patch('ckanext.feedback.controllers.admin.ranking_cache_service')
     @patch('ckanext.feedback.controllers.admin.utilization_service')
     @patch('ckanext.feedback.controllers.admin.session')
     @patch('ckanext.feedback.controllers.admin.helpers.flash_error')
@@ -1097,6 +1101,7 @@ class TestAdminControllerWithContext:
         mock_flash_error,
         mock_session,
         mock_utilization_service,
+        mock_ranking_cache_service,
     ):
         target = ['resource_comment_id']
 
@@ -1120,6 +1125,7 @@ class TestAdminControllerWithContext:
         )
         mock_log.exception.assert_called_once()
         mock_flash_error.assert_called_once()
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_not_called()
 
     @patch('ckanext.feedback.controllers.admin.resource_comments_service')
     def test_delete_resource_comments(
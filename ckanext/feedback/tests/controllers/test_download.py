@@ -2,10 +2,11 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 import requests
-from flask import Flask
+from flask import Flask, Response
 
 from ckanext.feedback.controllers.download import DownloadController
 from ckanext.feedback.models.download import DownloadSummary
+from ckanext.feedback.models.event import FeedbackEvent, FeedbackEventKind
 from ckanext.feedback.models.session import session
 
 
@@ -245,8 +246,8 @@ class TestDownloadController:
                 filename=resource['url'],
             )
 
-    @patch('ckanext.feedback.controllers.download.session.rollback')
-    @patch('ckanext.feedback.controllers.download.session.commit')
+    @patch('ckanext.feedback.services.download.counter.session.rollback')
+    @patch('ckanext.feedback.services.download.counter.session.commit')
     @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
     @patch('ckanext.feedback.controllers.download.resource.download')
     def test_extended_download_with_error(
@@ -286,7 +287,7 @@ class TestDownloadController:
 
     @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
     @patch('ckanext.feedback.controllers.download.resource.download')
-    @patch('ckanext.feedback.controllers.download._update_package_search_index')
+    @patch('ckanext.feedback.services.download.counter.update_package_search_index')
     def test_extended_download_updates_search_index(
         self,
         mock_update_index,
@@ -308,7 +309,7 @@ class TestDownloadController:
             )
             session.commit()
             assert get_downloads(resource['id']) == 1
-            # Verify that _update_package_search_index was called with package_id
+            # Verify that update_package_search_index was called with package_id
             mock_update_index.assert_called_once_with(resource['package_id'])
             mock_download.assert_called_once_with(
                 package_type='package_type',
@@ -317,18 +318,161 @@ class TestDownloadController:
                 filename=resource['url'],
             )
 
-    @patch('ckanext.feedback.controllers.download.log')
-    @patch('ckan.lib.search.rebuild')
-    def test_update_package_search_index_success(self, mock_rebuild, mock_log):
-        """Test that _update_package_search_index logs success when rebuild succeeds"""
-        from ckanext.feedback.controllers.download import _update_package_search_index
+    @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
+    @patch('ckanext.feedback.controllers.download.resource.download')
+    @patch('ckanext.feedback.services.download.counter.update_package_search_index')
+    @patch('ckanext.feedback.services.download.counter.get_download_buffer')
+    @patch('ckanext.feedback.services.download.counter.is_write_behind_enabled')
+    def test_extended_download_with_write_behind(
+        self,
+        mock_is_write_behind_enabled,
+        mock_get_download_buffer,
+        mock_update_index,
+        mock_download,
+        mock_download_handler,
+        resource,
+    ):
+        mock_download_handler.return_value = None
+        mock_is_write_behind_enabled.return_value = True
+
+        with self.app.test_request_context(
+            '/?user-download=true', headers={'Sec-Fetch-Dest': 'document'}
+        ):
+            DownloadController.extended_download(
+                'package_type', resource['package_id'], resource['id'], None
+            )
+            assert get_downloads(resource['id']) is None
+            mock_get_download_buffer.return_value.add.assert_called_once_with(
+                resource['id'], package_id=resource['package_id']
+            )
+            mock_update_index.assert_not_called()
+
+    @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
+    @patch('ckanext.feedback.controllers.download.resource.download')
+    @patch('ckanext.feedback.services.download.counter.update_package_search_index')
+    @patch('ckanext.feedback.services.download.counter.get_download_buffer')
+    @patch('ckanext.feedback.services.download.counter.is_event_log_enabled')
+    def test_extended_download_with_event_log(
+        self,
+        mock_is_event_log_enabled,
+        mock_get_download_buffer,
+        mock_update_index,
+        mock_download,
+        mock_download_handler,
+        resource,
+    ):
+        mock_download_handler.return_value = None
+        mock_is_event_log_enabled.return_value = True
+
+        with self.app.test_request_context(
+            '/?user-download=true', headers={'Sec-Fetch-Dest': 'document'}
+        ):
+            DownloadController.extended_download(
+                'package_type', resource['package_id'], resource['id'], None
+            )
+
+        events = (
+            session.query(FeedbackEvent)
+            .filter(FeedbackEvent.resource_id == resource['id'])
+            .all()
+        )
+        assert len(events) == 1
+        assert events[0].kind == FeedbackEventKind.DOWNLOAD
+        assert get_downloads(resource['id']) is None
+        mock_get_download_buffer.assert_not_called()
+        mock_update_index.assert_not_called()
+
+    @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
+    @patch('ckanext.feedback.controllers.download.resource.download')
+    @patch('ckanext.feedback.controllers.download.should_count_download')
+    def test_extended_download_skips_filtered_download(
+        self,
+        mock_should_count_download,
+        mock_download,
+        mock_download_handler,
+        resource,
+    ):
+        mock_download_handler.return_value = None
+        mock_should_count_download.return_value = False
+
+        with self.app.test_request_context(headers={'Sec-Fetch-Dest': 'document'}):
+            DownloadController.extended_download(
+                'package_type', resource['package_id'], resource['id'], None
+            )
+
+        mock_should_count_download.assert_called_once_with(resource['id'])
+        assert get_downloads(resource['id']) is None
+        mock_download.assert_called_once()
+
+    @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
+    @patch('ckanext.feedback.controllers.download.resource.download')
+    @patch('ckanext.feedback.controllers.download.requests.get')
+    @patch('ckanext.feedback.controllers.download.stream_external_resource')
+    @patch('ckanext.feedback.controllers.download.is_proxy_stream_enabled')
+    def test_extended_download_stream_redirect_resource(
+        self,
+        mock_is_proxy_stream_enabled,
+        mock_stream_external_resource,
+        mock_requests_get,
+        mock_download,
+        mock_download_handler,
+        resource,
+    ):
+        mock_download_handler.return_value = None
+        mock_is_proxy_stream_enabled.return_value = True
+
+        mock_responce = MagicMock()
+        mock_responce.status_code = 302
+        mock_responce.headers.get.return_value = 'http://mock_url.com/mock.txt'
+        mock_download.return_value = mock_responce
 
-        package_id = 'test-package-id'
-        mock_rebuild.return_value = None
+        mock_stream_external_resource.return_value = Response(
+            iter([b'mock']), headers={'Content-Length': '4'}
+        )
 
-        _update_package_search_index(package_id)
+        with self.app.test_request_context(
+            '/?user-download=true', headers={'Sec-Fetch-Dest': 'document'}
+        ):
+            response = DownloadController.extended_download(
+                'package_type', resource['package_id'], resource['id'], None
+            )
 
-        mock_rebuild.assert_called_once_with(package_id)
-        mock_log.debug.assert_called_once_with(
-            f"Updated search index for package {package_id}"
+        mock_stream_external_resource.assert_called_once_with(
+            'http://mock_url.com/mock.txt'
+        )
+        mock_requests_get.assert_not_called()
+        assert response.headers['Content-Length'] == '4'
+        assert (
+            response.headers['Content-Disposition'] == 'attachment; filename="mock.txt"'
         )
+
+    @patch('ckanext.feedback.controllers.download.feedback_config.download_handler')
+    @patch('ckanext.feedback.controllers.download.resource.download')
+    @patch('ckanext.feedback.controllers.download.stream_external_resource')
+    @patch('ckanext.feedback.controllers.download.is_proxy_stream_enabled')
+    def test_extended_download_stream_redirect_resource_failure(
+        self,
+        mock_is_proxy_stream_enabled,
+        mock_stream_external_resource,
+        mock_download,
+        mock_download_handler,
+        resource,
+    ):
+        mock_download_handler.return_value = None
+        mock_is_proxy_stream_enabled.return_value = True
+
+        mock_responce = MagicMock()
+        mock_responce.status_code = 302
+        mock_responce.headers.get.return_value = 'http://mock_url.com/mock.txt'
+        mock_download.return_value = mock_responce
+
+        mock_stream_external_resource.return_value = None
+
+        with self.app.test_request_context(
+            '/?user-download=true', headers={'Sec-Fetch-Dest': 'document'}
+        ):
+            response = DownloadController.extended_download(
+                'package_type', resource['package_id'], resource['id'], None
+            )
+
+        assert response is mock_responce
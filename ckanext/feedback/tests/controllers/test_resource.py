@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import MagicMock, Mock, call, patch
 
 import pytest
 from ckan import model
@@ -10,6 +10,7 @@ from werkzeug.exceptions import NotFound
 
 import ckanext.feedback.services.resource.comment as comment_service
 from ckanext.feedback.controllers.resource import ResourceController
+from ckanext.feedback.models.event import FeedbackEventKind
 from ckanext.feedback.models.resource_comment import ResourceCommentCategory
 from ckanext.feedback.models.session import session
 from ckanext.feedback.models.types import (
@@ -1980,16 +1981,11 @@ class TestResourceController:
     @patch('ckanext.feedback.controllers.resource.set_like_status_cookie')
     @patch(
         'ckanext.feedback.controllers.resource.likes_service.'
-        'increment_resource_like_count_monthly'
-    )
-    @patch(
-        'ckanext.feedback.controllers.resource.likes_service.'
-        'increment_resource_like_count'
+        'toggle_resource_like_count'
     )
     def test_like_toggle_True(
         self,
-        mock_increment,
-        mock_increment_monthly,
+        mock_toggle,
         mock_set_like_status_cookie,
         mock_response,
         mock_get_json,
@@ -2007,8 +2003,7 @@ class TestResourceController:
         mock_set_like_status_cookie.return_value = mock_resp
         resp = ResourceController.like_toggle(dataset['name'], resource['id'])
 
-        mock_increment.assert_called_once_with(resource['id'])
-        mock_increment_monthly.assert_called_once_with(resource['id'])
+        mock_toggle.assert_called_once_with(resource['id'], True)
 
         assert resp.data.decode() == "OK"
         assert resp.status_code == 200
@@ -2018,18 +2013,13 @@ class TestResourceController:
     @patch('ckanext.feedback.controllers.resource.' 'request.get_json')
     @patch('ckanext.feedback.controllers.resource.Response')
     @patch('ckanext.feedback.controllers.resource.set_like_status_cookie')
-    @patch(
-        'ckanext.feedback.controllers.resource.'
-        'likes_service.decrement_resource_like_count_monthly'
-    )
     @patch(
         'ckanext.feedback.controllers.resource.likes_service.'
-        'decrement_resource_like_count'
+        'toggle_resource_like_count'
     )
     def test_like_toggle_False(
         self,
-        mock_decrement,
-        mock_decrement_monthly,
+        mock_toggle,
         mock_set_like_status_cookie,
         mock_response,
         mock_get_json,
@@ -2047,14 +2037,47 @@ class TestResourceController:
         mock_set_like_status_cookie.return_value = mock_resp
         resp = ResourceController.like_toggle(dataset['name'], resource['id'])
 
-        mock_decrement.assert_called_once_with(resource['id'])
-        mock_decrement_monthly.assert_called_once_with(resource['id'])
+        mock_toggle.assert_called_once_with(resource['id'], False)
 
         assert resp.data.decode() == "OK"
         assert resp.status_code == 200
         assert resp.mimetype == 'text/plain'
         assert resp == mock_resp
 
+    @patch('ckanext.feedback.controllers.resource.request.get_json')
+    @patch('ckanext.feedback.controllers.resource.update_package_search_index')
+    @patch('ckanext.feedback.controllers.resource.likes_service')
+    @patch('ckanext.feedback.controllers.resource.add_event')
+    @patch('ckanext.feedback.controllers.resource.is_event_log_enabled')
+    def test_like_toggle_with_event_log(
+        self,
+        mock_is_event_log_enabled,
+        mock_add_event,
+        mock_likes_service,
+        mock_update_index,
+        mock_get_json,
+        dataset,
+        resource,
+    ):
+        mock_is_event_log_enabled.return_value = True
+
+        mock_get_json.return_value = {'likeStatus': True}
+        resp = ResourceController.like_toggle(dataset['name'], resource['id'])
+        assert resp.status_code == 200
+
+        mock_get_json.return_value = {'likeStatus': False}
+        resp = ResourceController.like_toggle(dataset['name'], resource['id'])
+        assert resp.status_code == 200
+
+        mock_add_event.assert_has_calls(
+            [
+                call(resource['id'], FeedbackEventKind.LIKE),
+                call(resource['id'], FeedbackEventKind.UNLIKE),
+            ]
+        )
+        mock_likes_service.toggle_resource_like_count.assert_not_called()
+        mock_update_index.assert_not_called()
+
     @patch('ckanext.feedback.controllers.resource.log')
     @patch('ckanext.feedback.controllers.resource.comment_service')
     @patch('ckanext.feedback.controllers.resource.request.get_json')
@@ -2062,16 +2085,11 @@ class TestResourceController:
     @patch('ckanext.feedback.controllers.resource.set_like_status_cookie')
     @patch(
         'ckanext.feedback.controllers.resource.likes_service.'
-        'increment_resource_like_count_monthly'
-    )
-    @patch(
-        'ckanext.feedback.controllers.resource.likes_service.'
-        'increment_resource_like_count'
+        'toggle_resource_like_count'
     )
     def test_like_toggle_update_index_exception(
         self,
-        mock_increment,
-        mock_increment_monthly,
+        mock_toggle,
         mock_set_like_status_cookie,
         mock_response,
         mock_get_json,
@@ -2097,8 +2115,7 @@ class TestResourceController:
 
         resp = ResourceController.like_toggle(dataset['name'], resource['id'])
 
-        mock_increment.assert_called_once_with(resource['id'])
-        mock_increment_monthly.assert_called_once_with(resource['id'])
+        mock_toggle.assert_called_once_with(resource['id'], True)
         # This should trigger the except block in like_toggle (lines 911-912)
         mock_log.warning.assert_called_once_with(
             "Failed to update search index after like toggle: Resource error"
@@ -2108,27 +2125,6 @@ class TestResourceController:
         assert resp.mimetype == 'text/plain'
 
 
-@pytest.mark.usefixtures('with_request_context')
-@pytest.mark.db_test
-class TestUpdatePackageSearchIndex:
-    @patch('ckanext.feedback.controllers.resource.log')
-    @patch('ckan.lib.search.rebuild')
-    def test_update_package_search_index_exception(self, mock_rebuild, mock_log):
-        """Test _update_package_search_index exception handling"""
-        from ckanext.feedback.controllers.resource import _update_package_search_index
-
-        package_id = 'test-package-id'
-        mock_rebuild.side_effect = Exception('Solr connection error')
-
-        _update_package_search_index(package_id)
-
-        mock_rebuild.assert_called_once_with(package_id)
-        mock_log.warning.assert_called_once_with(
-            f"Failed to update search index for package {package_id}: "
-            f"Solr connection error"
-        )
-
-
 @pytest.mark.usefixtures('with_request_context')
 @pytest.mark.db_test
 class TestResourceCommentReactions:
@@ -2757,18 +2753,13 @@ class TestResourceCreatePreviousLog:
     @patch('ckanext.feedback.controllers.resource.session.commit')
     @patch(
         'ckanext.feedback.controllers.resource.likes_service'
-        '.increment_resource_like_count_monthly'
-    )
-    @patch(
-        'ckanext.feedback.controllers.resource.likes_service'
-        '.increment_resource_like_count'
+        '.toggle_resource_like_count'
     )
     @patch('ckanext.feedback.controllers.resource.request.get_json')
     def test_like_toggle_with_error(
         self,
         mock_get_json,
-        mock_increment,
-        mock_increment_monthly,
+        mock_toggle,
         mock_commit,
         mock_rollback,
         resource,
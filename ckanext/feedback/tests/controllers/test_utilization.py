@@ -4069,6 +4069,7 @@ class TestUtilizationController:
             utilization_id=utilization_id,
         )
 
+    @patch('ckanext.feedback.controllers.utilization.ranking_cache_service')
     @patch('ckanext.feedback.controllers.utilization.detail_service')
     @patch('ckanext.feedback.controllers.utilization.edit_service')
     @patch('ckanext.feedback.controllers.utilization.summary_service')
@@ -4085,6 +4086,7 @@ class TestUtilizationController:
         mock_summary_service,
         mock_edit_service,
         mock_detail_service,
+        mock_ranking_cache_service,
         admin_context,
     ):
         utilization_id = 'utilization id'
@@ -4102,9 +4104,11 @@ class TestUtilizationController:
             resource_id
         )
         assert mock_session_commit.call_count == 1
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_called_once_with()
         mock_flash_success.assert_called_once()
         mock_redirect_to.assert_called_once_with('utilization.search')
 
+    @patch('ckanext.feedback.controllers.utilization.ranking_cache_service')
     @patch('ckanext.feedback.controllers.utilization.session.rollback')
     @patch('ckanext.feedback.controllers.utilization.detail_service')
     @patch('ckanext.feedback.controllers.utilization.edit_service')
@@ -4121,6 +4125,7 @@ class TestUtilizationController:
         mock_edit_service,
         mock_detail_service,
         mock_session_rollback,
+        mock_ranking_cache_service,
         admin_context,
     ):
         from sqlalchemy.exc import SQLAlchemyError
@@ -4142,6 +4147,7 @@ class TestUtilizationController:
             'utilization.details', utilization_id=utilization_id
         )
         mock_session_rollback.assert_called_once()
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_not_called()
 
     @patch('ckanext.feedback.controllers.utilization.request.form')
     @patch('ckanext.feedback.controllers.utilization.detail_service')
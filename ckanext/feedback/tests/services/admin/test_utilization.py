@@ -9,9 +9,13 @@ from ckanext.feedback.models.utilization import (
     Utilization,
     UtilizationComment,
     UtilizationCommentCategory,
+    UtilizationCommentMonthly,
     UtilizationSummary,
 )
 from ckanext.feedback.services.admin import utilization as utilization_service
+from ckanext.feedback.services.utilization.summary import (
+    refresh_utilization_comment_monthly,
+)
 
 
 def get_registered_utilization(resource_id):
@@ -27,6 +31,14 @@ def get_registered_utilization(resource_id):
     )
 
 
+def get_utilization_comment_monthly_count(resource_id):
+    return (
+        session.query(UtilizationCommentMonthly)
+        .filter(UtilizationCommentMonthly.resource_id == resource_id)
+        .count()
+    )
+
+
 def get_registered_utilization_summary(resource_id):
     return (
         session.query(UtilizationSummary)
@@ -201,6 +213,17 @@ class TestUtilization:
         utilization = get_registered_utilization(resource['id'])
         assert len(utilization) == 0
 
+    def test_delete_utilization_refreshes_comment_monthly(
+        self, resource, utilization_comment
+    ):
+        refresh_utilization_comment_monthly([resource['id']])
+        session.commit()
+        assert get_utilization_comment_monthly_count(resource['id']) == 1
+
+        utilization_service.delete_utilization([utilization_comment.utilization_id])
+
+        assert get_utilization_comment_monthly_count(resource['id']) == 0
+
     @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 0))
     def test_refresh_utilization_summary(self, resource, utilization):
 
@@ -0,0 +1,22 @@
+import pytest
+
+from ckanext.feedback.services.common.background import PeriodicWorker
+
+
+class TestPeriodicWorker:
+    def test_subclass_without_flush_cannot_be_created(self):
+        class Worker(PeriodicWorker):
+            pass
+
+        with pytest.raises(TypeError):
+            Worker(1)
+
+    def test_wakeup(self):
+        class Worker(PeriodicWorker):
+            def flush(self):
+                return 0
+
+        worker = Worker(1)
+        assert not worker._wakeup.is_set()
+        worker.wakeup()
+        assert worker._wakeup.is_set()
@@ -0,0 +1,227 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from ckan.common import config
+
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.cache import (
+    PACKAGE_STATS,
+    RESOURCE_STATS,
+    LocalCache,
+    RedisCache,
+    StatsCache,
+    get_cached_stats,
+    invalidate_package_stats,
+    invalidate_resource_stats,
+    is_stats_cache_enabled,
+)
+
+
+class FakeRedis:
+    "Dict-backed stand-in for the few Redis commands used by RedisCache"
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+        self.expires[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self):
+        pipeline = MagicMock()
+        pipeline.set.side_effect = self.set
+        return pipeline
+
+
+class TestLocalCache:
+    def test_get_many_and_set_many(self):
+        cache = LocalCache()
+        cache.set_many({'a': {'downloads': 1}, 'b': {'downloads': 2}}, 60)
+
+        assert cache.get_many(['a', 'b', 'c']) == {
+            'a': {'downloads': 1},
+            'b': {'downloads': 2},
+        }
+        assert cache.size() == 2
+
+    def test_entries_expire(self):
+        now = [100]
+        cache = LocalCache(clock=lambda: now[0])
+        cache.set_many({'a': {}}, 60)
+
+        now[0] = 159
+        assert cache.get_many(['a']) == {'a': {}}
+
+        now[0] = 160
+        assert cache.get_many(['a']) == {}
+        assert cache.size() == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LocalCache(max_size=2)
+        cache.set_many({'a': {}, 'b': {}}, 60)
+        cache.get_many(['a'])
+
+        cache.set_many({'c': {}}, 60)
+
+        assert set(cache.get_many(['a', 'b', 'c'])) == {'a', 'c'}
+
+    def test_delete_many(self):
+        cache = LocalCache()
+        cache.set_many({'a': {}, 'b': {}}, 60)
+
+        cache.delete_many(['a', 'unknown'])
+
+        assert set(cache.get_many(['a', 'b'])) == {'b'}
+
+
+class TestRedisCache:
+    def test_get_many_and_set_many(self):
+        client = FakeRedis()
+        cache = RedisCache(client)
+
+        cache.set_many({'a': {'downloads': 1}}, 60)
+
+        assert json.loads(client.data['ckanext-feedback:a']) == {'downloads': 1}
+        assert client.expires['ckanext-feedback:a'] == 60
+        assert cache.get_many(['a', 'b']) == {'a': {'downloads': 1}}
+        assert cache.get_many([]) == {}
+
+    def test_delete_many(self):
+        client = FakeRedis()
+        cache = RedisCache(client)
+        cache.set_many({'a': {}, 'b': {}}, 60)
+
+        cache.delete_many(['a'])
+        cache.delete_many([])
+
+        assert cache.get_many(['a', 'b']) == {'b': {}}
+        assert cache.size() is None
+
+
+class TestStatsCache:
+    def test_get_many_loads_missing_stats(self):
+        cache = StatsCache(LocalCache(), 60)
+        load = MagicMock(side_effect=lambda ids: {id_: {'downloads': 1} for id_ in ids})
+
+        assert cache.get_many(RESOURCE_STATS, ['a'], load) == {'a': {'downloads': 1}}
+        assert cache.get_many(RESOURCE_STATS, ['a', 'b'], load) == {
+            'a': {'downloads': 1},
+            'b': {'downloads': 1},
+        }
+
+        assert load.call_args_list[0][0] == (['a'],)
+        assert load.call_args_list[1][0] == (['b'],)
+        assert cache.get_status() == {
+            'backend': 'local',
+            'ttl': 60,
+            'size': 2,
+            'hits': 1,
+            'misses': 2,
+            'hit_ratio': 0.3333,
+        }
+
+    def test_get_many_returns_copies(self):
+        cache = StatsCache(LocalCache(), 60)
+        cache.get_many(RESOURCE_STATS, ['a'], lambda ids: {'a': {'downloads': 1}})
+
+        stats = cache.get_many(RESOURCE_STATS, ['a'], MagicMock())
+        stats['a']['downloads'] = 2
+
+        assert cache.get_many(RESOURCE_STATS, ['a'], MagicMock()) == {
+            'a': {'downloads': 1}
+        }
+
+    def test_get_many_with_backend_error(self):
+        backend = MagicMock()
+        backend.get_many.side_effect = Exception('error')
+        backend.set_many.side_effect = Exception('error')
+        cache = StatsCache(backend, 60)
+
+        result = cache.get_many(RESOURCE_STATS, ['a'], lambda ids: {'a': {}})
+
+        assert result == {'a': {}}
+        assert cache.misses == 1
+
+    def test_delete_many(self):
+        cache = StatsCache(LocalCache(), 60)
+        cache.get_many(PACKAGE_STATS, ['a', 'b'], lambda ids: {i: {} for i in ids})
+
+        cache.delete_many(PACKAGE_STATS, ['a'])
+
+        assert cache.backend.get_many(['package_stats:a', 'package_stats:b']) == {
+            'package_stats:b': {}
+        }
+
+    def test_get_status_without_lookups(self):
+        assert StatsCache(LocalCache(), 60).get_status()['hit_ratio'] == 0
+
+
+@pytest.mark.db_test
+class TestStatsCacheInvalidation:
+    def test_is_stats_cache_enabled(self):
+        config.pop('ckan.feedback.stats_cache.enable', None)
+        assert is_stats_cache_enabled() is False
+
+        config['ckan.feedback.stats_cache.enable'] = 'true'
+        assert is_stats_cache_enabled() is True
+        config.pop('ckan.feedback.stats_cache.enable', None)
+
+    def test_get_cached_stats_disabled(self):
+        load = MagicMock(return_value={'a': {}})
+
+        assert get_cached_stats(RESOURCE_STATS, ['a', 'a'], load) == {'a': {}}
+        load.assert_called_once_with(['a'])
+        assert get_cached_stats(RESOURCE_STATS, [], load) == {}
+
+    @patch('ckanext.feedback.services.common.cache.get_stats_cache')
+    @patch('ckanext.feedback.services.common.cache.is_stats_cache_enabled')
+    def test_stats_are_dropped_on_commit(
+        self, mock_is_stats_cache_enabled, mock_get_stats_cache, resource
+    ):
+        mock_is_stats_cache_enabled.return_value = True
+        cache = StatsCache(LocalCache(), 60)
+        mock_get_stats_cache.return_value = cache
+        load = MagicMock(side_effect=lambda ids: {id_: {} for id_ in ids})
+        get_cached_stats(RESOURCE_STATS, [resource['id']], load)
+        get_cached_stats(PACKAGE_STATS, [resource['package_id']], load)
+
+        invalidate_resource_stats([resource['id']])
+        # Nothing is dropped before the commit
+        assert cache.backend.size() == 2
+
+        session.commit()
+
+        assert cache.backend.size() == 0
+
+    @patch('ckanext.feedback.services.common.cache.get_stats_cache')
+    @patch('ckanext.feedback.services.common.cache.is_stats_cache_enabled')
+    def test_stats_are_kept_on_rollback(
+        self, mock_is_stats_cache_enabled, mock_get_stats_cache, dataset
+    ):
+        mock_is_stats_cache_enabled.return_value = True
+        cache = StatsCache(LocalCache(), 60)
+        mock_get_stats_cache.return_value = cache
+        get_cached_stats(PACKAGE_STATS, [dataset['id']], lambda ids: {ids[0]: {}})
+
+        invalidate_package_stats([dataset['id']])
+        session.rollback()
+        session.commit()
+
+        assert cache.backend.size() == 1
+
+    @patch('ckanext.feedback.services.common.cache.get_stats_cache')
+    def test_invalidate_disabled(self, mock_get_stats_cache, dataset):
+        invalidate_resource_stats(MagicMock(side_effect=Exception('not iterated')))
+        invalidate_package_stats([dataset['id']])
+        session.commit()
+
+        mock_get_stats_cache.assert_not_called()
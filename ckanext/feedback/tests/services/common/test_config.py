@@ -12,8 +12,15 @@ from ckanext.feedback.command import feedback
 from ckanext.feedback.plugin import FeedbackPlugin
 from ckanext.feedback.services.common.config import (
     CONFIG_HANDLER_PATH,
+    CONFIG_RELOAD_INTERVAL,
+    ConfigSnapshot,
     FeedbackConfig,
+    OrganizationNameCache,
+    StagedConfig,
+    compile_feature_flag,
     download_handler,
+    get_config_snapshot,
+    set_config_snapshot,
 )
 
 ORG_NAME_A = 'org-name-a'
@@ -1544,3 +1551,203 @@ class TestCheck:
         assert result == [ORG_NAME_A, ORG_NAME_B, ORG_NAME_C, ORG_NAME_D]
 
         os.remove('/srv/app/feedback_config.json')
+
+    @patch('ckanext.feedback.services.common.config.compile_feature_flag')
+    def test_feature_flag_is_compiled_when_config_changes(
+        self, mock_compile_feature_flag
+    ):
+        mock_compile_feature_flag.side_effect = compile_feature_flag
+        config['ckan.feedback.resources.enable'] = 'true'
+        config['ckan.feedback.resources.enable_orgs'] = [ORG_NAME_A]
+        config.pop('ckan.feedback.resources.disable_orgs', None)
+        resource_comment = FeedbackConfig().resource_comment
+        resource_comment._feature_flag = None
+
+        feature_flag = resource_comment.get_feature_flag()
+        assert resource_comment.get_feature_flag() is feature_flag
+        assert feature_flag.enable is True
+        assert feature_flag.enable_orgs == frozenset([ORG_NAME_A])
+        assert feature_flag.disable_orgs is None
+        assert mock_compile_feature_flag.call_count == 1
+
+        config['ckan.feedback.resources.enable'] = 'false'
+        assert resource_comment.get_feature_flag().enable is False
+        assert mock_compile_feature_flag.call_count == 2
+
+        config.pop('ckan.feedback.resources.enable', None)
+        config.pop('ckan.feedback.resources.enable_orgs', None)
+
+    def test_compile_feature_flag_with_invalid_orgs(self):
+        feature_flag = compile_feature_flag(True, ORG_NAME_A, [ORG_NAME_B])
+
+        assert feature_flag.enable_orgs is None
+        assert feature_flag.disable_orgs is None
+        assert feature_flag.error.startswith('The "enable_orgs" key')
+
+    @patch('ckanext.feedback.services.common.config.organization_service')
+    def test_organization_name_cache(self, mock_organization_service):
+        mock_organization_service.get_organization_name_by_id.return_value = (
+            SimpleNamespace(**{'name': ORG_NAME_A})
+        )
+        now = [100]
+        cache = OrganizationNameCache(ttl=60, clock=lambda: now[0])
+
+        assert cache.get('org-id') == ORG_NAME_A
+        now[0] = 159
+        assert cache.get('org-id') == ORG_NAME_A
+        mock_organization_service.get_organization_name_by_id.assert_called_once_with(
+            'org-id'
+        )
+
+        # Names are queried again once they expire
+        mock_organization_service.get_organization_name_by_id.return_value = None
+        now[0] = 160
+        assert cache.get('org-id') is None
+        assert mock_organization_service.get_organization_name_by_id.call_count == 2
+
+        cache.clear()
+        cache.get('org-id')
+        assert mock_organization_service.get_organization_name_by_id.call_count == 3
+
+    def test_load_feedback_config_drops_keys_removed_from_file(self, tmp_path):
+        fb_config = FeedbackConfig()
+        path = tmp_path / 'feedback_config.json'
+        with patch.object(fb_config, 'feedback_config_path', str(tmp_path)):
+            path.write_text(
+                json.dumps(
+                    {
+                        'modules': {
+                            'resources': {'enable': True, 'enable_orgs': [ORG_NAME_A]}
+                        }
+                    }
+                )
+            )
+            fb_config.load_feedback_config()
+            assert config['ckan.feedback.resources.enable_orgs'] == [ORG_NAME_A]
+
+            path.write_text(json.dumps({'modules': {'resources': {'enable': True}}}))
+            fb_config.load_feedback_config()
+            assert 'ckan.feedback.resources.enable_orgs' not in config
+            assert config['ckan.feedback.resources.enable'] is True
+
+    def test_config_snapshot(self):
+        config['ckan.feedback.likes.enable'] = True
+        config['ckan.feedback.resources.enable'] = True
+        config['ckan.feedback.download.enable'] = True
+        snapshot = ConfigSnapshot(
+            {'ckan.feedback.likes.enable': False}, {'ckan.feedback.resources.enable'}
+        )
+
+        assert snapshot.get('ckan.feedback.likes.enable') is False
+        assert snapshot.get('ckan.feedback.resources.enable', 'default') == 'default'
+        assert snapshot.get('ckan.feedback.download.enable') is True
+
+        config.pop('ckan.feedback.likes.enable', None)
+        config.pop('ckan.feedback.resources.enable', None)
+        config.pop('ckan.feedback.download.enable', None)
+
+    def test_apply_staged_config_replaces_snapshot(self):
+        fb_config = FeedbackConfig()
+        config['ckan.feedback.resources.enable'] = True
+        staged = StagedConfig()
+        staged['ckan.feedback.likes.enable'] = False
+        staged.pop('ckan.feedback.resources.enable')
+        before = get_config_snapshot()
+
+        fb_config.apply_staged_config(staged)
+
+        snapshot = get_config_snapshot()
+        assert snapshot is not before
+        assert dict(snapshot.values) == {'ckan.feedback.likes.enable': False}
+        assert 'ckan.feedback.resources.enable' in snapshot.removed
+        assert config['ckan.feedback.likes.enable'] is False
+        assert 'ckan.feedback.resources.enable' not in config
+
+        # Readers go through the snapshot, not the CKAN config being updated
+        config['ckan.feedback.likes.enable'] = True
+        assert fb_config.like.is_enable() is False
+        assert fb_config.resource_comment.is_enable() is True
+
+        fb_config.apply_staged_config(StagedConfig())
+        assert fb_config.like.is_enable() is True
+        set_config_snapshot(ConfigSnapshot())
+        config.pop('ckan.feedback.likes.enable', None)
+
+    @patch('ckanext.feedback.services.common.config.log')
+    def test_reload_feedback_config_if_changed(self, mock_log, tmp_path):
+        fb_config = FeedbackConfig()
+        path = tmp_path / 'feedback_config.json'
+        config[CONFIG_RELOAD_INTERVAL] = '5'
+        with patch.object(fb_config, 'feedback_config_path', str(tmp_path)):
+            path.write_text(json.dumps({'modules': {'likes': {'enable': True}}}))
+            fb_config.load_feedback_config()
+            fb_config._next_reload_check = 0
+
+            # Not loaded again while the file is unchanged
+            assert fb_config.reload_feedback_config_if_changed() is False
+
+            path.write_text(json.dumps({'modules': {'likes': {'enable': False}}}))
+            # Not checked again until the interval has passed
+            assert fb_config.reload_feedback_config_if_changed() is False
+            fb_config._next_reload_check = 0
+            assert fb_config.reload_feedback_config_if_changed() is True
+            assert config['ckan.feedback.likes.enable'] is False
+
+            # An invalid file is not loaded
+            path.write_text(json.dumps({'modules': {'likes': {}}}))
+            fb_config._next_reload_check = 0
+            assert fb_config.reload_feedback_config_if_changed() is False
+            assert config['ckan.feedback.likes.enable'] is False
+            mock_log.error.assert_called_once()
+
+        config.pop(CONFIG_RELOAD_INTERVAL, None)
+        config.pop('ckan.feedback.likes.enable', None)
+
+    def test_reload_feedback_config_if_changed_disabled(self):
+        config.pop(CONFIG_RELOAD_INTERVAL, None)
+        FeedbackConfig()._next_reload_check = 0
+
+        assert FeedbackConfig().reload_feedback_config_if_changed() is False
+
+    def test_validate_feedback_config_file(self, tmp_path):
+        config.pop('ckan.feedback.likes.enable', None)
+        path = tmp_path / 'feedback_config.json'
+        validate = FeedbackConfig().validate_feedback_config_file
+
+        assert validate(str(path)) == [f'The feedback config file not found. {path}']
+
+        path.write_text('{"modules":')
+        assert validate(str(path))[0].startswith(
+            'The feedback config file not decoded correctly'
+        )
+
+        path.write_text('[]')
+        assert validate(str(path)) == [
+            'The feedback config file must contain a JSON object.'
+        ]
+
+        path.write_text(json.dumps({'modules': {'likes': {}}}))
+        assert validate(str(path))[0].startswith(
+            'The configuration of the "likes" module'
+        )
+
+        path.write_text(
+            json.dumps({'modules': {'likes': {'enable': 'maybe', 'enable_orgs': []}}})
+        )
+        assert validate(str(path)) == [
+            'ckan.feedback.likes: The value of the "enable" key is invalid. '
+            'Please specify a boolean value such as '
+            '`true` or `false` for the "enable" key.'
+        ]
+
+        path.write_text(
+            json.dumps({'modules': {'likes': {'enable': True, 'disable_orgs': [1]}}})
+        )
+        assert validate(str(path))[0].startswith(
+            'ckan.feedback.likes: The "disable_orgs" key'
+        )
+
+        path.write_text(json.dumps({'modules': {'likes': {'enable': True}}}))
+        assert validate(str(path)) == []
+        # The CKAN config is left as it was
+        assert 'ckan.feedback.likes.enable' not in config
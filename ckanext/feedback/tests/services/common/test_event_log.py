@@ -0,0 +1,198 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import pytest
+from ckan.common import config
+
+from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
+from ckanext.feedback.models.event import (
+    FeedbackEvent,
+    FeedbackEventKind,
+    FeedbackEventRollup,
+)
+from ckanext.feedback.models.likes import ResourceLike, ResourceLikeMonthly
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.event_log import (
+    ROLLUP_NAME,
+    add_event,
+    is_event_log_enabled,
+    rollup_events,
+)
+
+
+def create_event(resource_id, kind, ts):
+    session.add(FeedbackEvent(resource_id=resource_id, kind=kind, ts=ts))
+    session.commit()
+
+
+def get_last_event_id():
+    return (
+        session.query(FeedbackEventRollup.last_event_id)
+        .filter(FeedbackEventRollup.name == ROLLUP_NAME)
+        .scalar()
+    )
+
+
+@pytest.mark.db_test
+class TestEventLog:
+    def test_is_event_log_enabled(self):
+        assert is_event_log_enabled() is False
+        config['ckan.feedback.event_log.enable'] = 'true'
+        assert is_event_log_enabled() is True
+        config.pop('ckan.feedback.event_log.enable', None)
+
+    @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 0))
+    def test_add_event(self, resource):
+        add_event(resource['id'], FeedbackEventKind.DOWNLOAD)
+        session.commit()
+
+        event = session.query(FeedbackEvent).one()
+        assert event.resource_id == resource['id']
+        assert event.kind == FeedbackEventKind.DOWNLOAD
+        assert event.ts == datetime(2024, 1, 1, 15, 0, 0)
+
+    @patch('ckanext.feedback.services.common.event_log.update_package_search_index')
+    def test_rollup_events(self, mock_update_index, resource):
+        create_event(
+            resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 1, 1, 15, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 1, 31, 15, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 2, 1, 15, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.LIKE, datetime(2024, 1, 1, 15, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.LIKE, datetime(2024, 2, 1, 15, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.UNLIKE, datetime(2024, 2, 2, 15, 0)
+        )
+
+        assert rollup_events() == 6
+        session.expire_all()
+
+        download_summary = (
+            session.query(DownloadSummary)
+            .filter(DownloadSummary.resource_id == resource['id'])
+            .one()
+        )
+        assert download_summary.download == 3
+        download_monthly = {
+            row.period: row.download_count
+            for row in session.query(DownloadMonthly).filter(
+                DownloadMonthly.resource_id == resource['id']
+            )
+        }
+        assert download_monthly == {date(2024, 1, 1): 2, date(2024, 2, 1): 1}
+
+        resource_like = (
+            session.query(ResourceLike)
+            .filter(ResourceLike.resource_id == resource['id'])
+            .one()
+        )
+        assert resource_like.like_count == 1
+        like_monthly = {
+            row.period: row.like_count
+            for row in session.query(ResourceLikeMonthly).filter(
+                ResourceLikeMonthly.resource_id == resource['id']
+            )
+        }
+        # The like and unlike of February cancel out and insert no row
+        assert like_monthly == {date(2024, 1, 1): 1}
+
+        assert (
+            get_last_event_id()
+            == session.query(FeedbackEvent.id)
+            .order_by(FeedbackEvent.id.desc())
+            .limit(1)
+            .scalar()
+        )
+        mock_update_index.assert_called_once_with(resource['package_id'])
+
+        # Already folded events are not counted again
+        assert rollup_events() == 0
+        session.expire_all()
+        assert download_summary.download == 3
+
+    @patch('ckanext.feedback.services.common.event_log.update_package_search_index')
+    def test_rollup_events_with_unlikes_only(self, mock_update_index, resource):
+        def get_like_counts():
+            session.expire_all()
+            total = (
+                session.query(ResourceLike.like_count)
+                .filter(ResourceLike.resource_id == resource['id'])
+                .scalar()
+            )
+            monthly = {
+                row.period: row.like_count
+                for row in session.query(ResourceLikeMonthly).filter(
+                    ResourceLikeMonthly.resource_id == resource['id']
+                )
+            }
+            return total, monthly
+
+        # No rows are inserted for unlikes of a resource without likes
+        create_event(
+            resource['id'], FeedbackEventKind.UNLIKE, datetime(2024, 1, 1, 15, 0)
+        )
+        assert rollup_events() == 1
+        assert get_like_counts() == (None, {})
+
+        create_event(
+            resource['id'], FeedbackEventKind.LIKE, datetime(2024, 1, 2, 15, 0)
+        )
+        assert rollup_events() == 1
+        assert get_like_counts() == (1, {date(2024, 1, 1): 1})
+
+        # Unlikes beyond the stored likes stop at zero
+        for _ in range(2):
+            create_event(
+                resource['id'], FeedbackEventKind.UNLIKE, datetime(2024, 1, 3, 15, 0)
+            )
+        create_event(
+            resource['id'], FeedbackEventKind.UNLIKE, datetime(2024, 2, 1, 15, 0)
+        )
+        assert rollup_events() == 3
+        assert get_like_counts() == (0, {date(2024, 1, 1): 0})
+
+    @patch('ckanext.feedback.services.common.event_log.update_package_search_index')
+    def test_rollup_events_in_batches(self, mock_update_index, resource):
+        for _ in range(3):
+            create_event(
+                resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 1, 1, 15, 0)
+            )
+
+        assert rollup_events(batch_size=2) == 3
+        session.expire_all()
+
+        download_summary = (
+            session.query(DownloadSummary)
+            .filter(DownloadSummary.resource_id == resource['id'])
+            .one()
+        )
+        assert download_summary.download == 3
+
+    @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 30))
+    @patch('ckanext.feedback.services.common.event_log.update_package_search_index')
+    def test_rollup_events_leaves_unsettled_events(self, mock_update_index, resource):
+        create_event(
+            resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 1, 1, 14, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 1, 1, 15, 0)
+        )
+        create_event(
+            resource['id'], FeedbackEventKind.DOWNLOAD, datetime(2024, 1, 1, 14, 0)
+        )
+
+        # The second event is within the settle window, so folding stops there
+        assert rollup_events(settle_seconds=60) == 1
+        assert rollup_events(settle_seconds=10) == 2
+
+    def test_rollup_events_without_events(self):
+        assert rollup_events() == 0
+        assert get_last_event_id() == 0
@@ -0,0 +1,1073 @@
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+from ckan.common import config
+from ckan.tests import factories
+
+from ckanext.feedback.services.common.search_index import (
+    SOLR_FIELDS_STAMP_KEY,
+    CountReindexProgress,
+    FeedbackCounts,
+    SearchIndexQueue,
+    SolrFieldCache,
+    _add_solr_field,
+    _query_package_counts,
+    clear_solr_schema_setup_stamps,
+    field_exists_in_solr,
+    get_index_id,
+    get_prefetched_feedback_counts,
+    get_solr_fields_stamp,
+    get_solr_url,
+    invalidate_solr_field_cache,
+    prefetched_feedback_counts,
+    rebuild_package_search_index,
+    rebuild_search_index,
+    reindex_count_fields,
+    setup_solr_schema_once,
+    solr_schema_setup_lock,
+    start_solr_schema_setup,
+    update_package_count_fields,
+    update_package_search_index,
+)
+
+SOLR_URL = 'http://solr:8983/solr/ckan'
+
+
+class TestSolrFieldCache:
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_field_exists_is_kept_until_ttl(self, mock_requests):
+        now = [100]
+        cache = SolrFieldCache(clock=lambda: now[0])
+        mock_requests.get.return_value = MagicMock(status_code=200)
+
+        assert cache.field_exists(SOLR_URL, 'downloads_total_i', 60) is True
+        mock_requests.get.return_value = MagicMock(status_code=404)
+        now[0] = 159
+        assert cache.field_exists(SOLR_URL, 'downloads_total_i', 60) is True
+        assert mock_requests.get.call_count == 1
+
+        now[0] = 160
+        assert cache.field_exists(SOLR_URL, 'downloads_total_i', 60) is False
+        assert mock_requests.get.call_count == 2
+        mock_requests.get.assert_called_with(
+            f'{SOLR_URL}/schema/fields/downloads_total_i', timeout=5
+        )
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_missing_field_is_kept(self, mock_requests):
+        cache = SolrFieldCache()
+        mock_requests.get.return_value = MagicMock(status_code=404)
+
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is False
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is False
+        assert mock_requests.get.call_count == 1
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_errors_are_not_kept(self, mock_requests):
+        cache = SolrFieldCache()
+        mock_requests.get.side_effect = Exception('Connection error')
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is False
+
+        mock_requests.get.side_effect = None
+        mock_requests.get.return_value = MagicMock(status_code=503)
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is False
+
+        mock_requests.get.return_value = MagicMock(status_code=200)
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is True
+        assert mock_requests.get.call_count == 3
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_ttl_zero_disables_cache(self, mock_requests):
+        cache = SolrFieldCache()
+        mock_requests.get.return_value = MagicMock(status_code=200)
+
+        cache.field_exists(SOLR_URL, 'likes_total_i', 0)
+        cache.field_exists(SOLR_URL, 'likes_total_i', 0)
+
+        assert mock_requests.get.call_count == 2
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_clear(self, mock_requests):
+        cache = SolrFieldCache()
+        mock_requests.get.return_value = MagicMock(status_code=200)
+        cache.field_exists(SOLR_URL, 'likes_total_i', 60)
+        cache.field_exists('http://other:8983/solr/ckan', 'likes_total_i', 60)
+
+        cache.clear()
+        cache.field_exists(SOLR_URL, 'likes_total_i', 60)
+
+        assert mock_requests.get.call_count == 3
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_results_are_checked_again_when_stamp_changes(self, mock_requests):
+        stamp = [b'1']
+        cache = SolrFieldCache(stamp=lambda: stamp[0])
+        mock_requests.get.return_value = MagicMock(status_code=404)
+
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is False
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is False
+        assert mock_requests.get.call_count == 1
+
+        # Another worker added the field
+        stamp[0] = b'2'
+        mock_requests.get.return_value = MagicMock(status_code=200)
+        assert cache.field_exists(SOLR_URL, 'likes_total_i', 60) is True
+        assert mock_requests.get.call_count == 2
+
+    @patch('ckanext.feedback.services.common.search_index.connect_to_redis')
+    def test_get_solr_fields_stamp(self, mock_connect_to_redis):
+        mock_connect_to_redis.return_value.get.return_value = b'3'
+        assert get_solr_fields_stamp() == b'3'
+        mock_connect_to_redis.return_value.get.assert_called_once_with(
+            SOLR_FIELDS_STAMP_KEY
+        )
+
+        mock_connect_to_redis.side_effect = Exception('Connection error')
+        assert get_solr_fields_stamp() is None
+
+    @patch('ckanext.feedback.services.common.search_index.solr_field_cache')
+    @patch('ckanext.feedback.services.common.search_index.connect_to_redis')
+    def test_invalidate_solr_field_cache(
+        self, mock_connect_to_redis, mock_solr_field_cache
+    ):
+        invalidate_solr_field_cache()
+
+        mock_solr_field_cache.clear.assert_called_once_with()
+        mock_connect_to_redis.return_value.incr.assert_called_once_with(
+            SOLR_FIELDS_STAMP_KEY
+        )
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.solr_field_cache')
+    @patch('ckanext.feedback.services.common.search_index.connect_to_redis')
+    def test_invalidate_solr_field_cache_without_redis(
+        self, mock_connect_to_redis, mock_solr_field_cache, mock_log
+    ):
+        mock_connect_to_redis.return_value.incr.side_effect = Exception('error')
+
+        invalidate_solr_field_cache()
+
+        mock_solr_field_cache.clear.assert_called_once_with()
+        mock_log.warning.assert_called_once()
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_atomic_update_supported(self, mock_requests):
+        cache = SolrFieldCache()
+        fields = MagicMock()
+        fields.json.return_value = {
+            'fields': [
+                {'name': 'id', 'stored': True},
+                {'name': 'text', 'stored': False},
+                {'name': 'likes_total_i', 'stored': False, 'docValues': True},
+            ]
+        }
+        copy_fields = MagicMock()
+        copy_fields.json.return_value = {
+            'copyFields': [{'source': 'title', 'dest': 'text'}]
+        }
+        mock_requests.get.side_effect = [fields, copy_fields]
+
+        assert cache.atomic_update_supported(SOLR_URL, 60) is True
+        assert cache.atomic_update_supported(SOLR_URL, 60) is True
+        assert mock_requests.get.call_args_list == [
+            call(
+                f'{SOLR_URL}/schema/fields', params={'showDefaults': 'true'}, timeout=5
+            ),
+            call(f'{SOLR_URL}/schema/copyfields', timeout=5),
+        ]
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_atomic_update_not_supported(self, mock_requests, mock_log):
+        cache = SolrFieldCache()
+        fields = MagicMock()
+        fields.json.return_value = {
+            'fields': [
+                {'name': 'id', 'stored': True},
+                {'name': 'permission_labels', 'stored': False, 'docValues': False},
+            ]
+        }
+        copy_fields = MagicMock()
+        copy_fields.json.return_value = {'copyFields': []}
+        mock_requests.get.side_effect = [fields, copy_fields]
+
+        assert cache.atomic_update_supported(SOLR_URL, 60) is False
+        assert cache.atomic_update_supported(SOLR_URL, 60) is False
+        assert mock_requests.get.call_count == 2
+        assert 'permission_labels' in mock_log.warning.call_args.args[0]
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_atomic_update_check_errors_are_not_kept(self, mock_requests):
+        cache = SolrFieldCache()
+        mock_requests.get.side_effect = Exception('Connection error')
+
+        assert cache.atomic_update_supported(SOLR_URL, 60) is False
+        assert cache.atomic_update_supported(SOLR_URL, 60) is False
+        assert mock_requests.get.call_count == 2
+
+    @patch('ckanext.feedback.services.common.search_index.solr_field_cache')
+    def test_field_exists_in_solr_uses_configured_ttl(self, mock_solr_field_cache):
+        config['ckan.feedback.custom_sort.field_cache_ttl'] = '30'
+        mock_solr_field_cache.field_exists.return_value = True
+
+        assert field_exists_in_solr(SOLR_URL, 'likes_total_i') is True
+        mock_solr_field_cache.field_exists.assert_called_once_with(
+            SOLR_URL, 'likes_total_i', 30
+        )
+        config.pop('ckan.feedback.custom_sort.field_cache_ttl', None)
+
+
+class TestSetupSolrSchema:
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_add_solr_field_already_exists(self, mock_requests, mock_log):
+        """Test _add_solr_field() when field already exists"""
+        existing_fields = ['downloads_total_i', 'likes_total_i']
+        assert _add_solr_field(
+            f'{SOLR_URL}/schema', 'downloads_total_i', existing_fields
+        )
+        mock_log.debug.assert_called_once_with(
+            "Field 'downloads_total_i' already exists"
+        )
+        mock_requests.post.assert_not_called()
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_add_solr_field_error_response(self, mock_requests, mock_log):
+        """Test _add_solr_field() when response status is not 200/201"""
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_response.text = 'Internal Server Error'
+        mock_requests.post.return_value = mock_response
+        assert not _add_solr_field(f'{SOLR_URL}/schema', 'test_field', [])
+        mock_log.error.assert_called_once()
+        assert 'Failed to add' in str(mock_log.error.call_args)
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_add_solr_field_request_exception(self, mock_requests, mock_log):
+        """Test _add_solr_field() when RequestException occurs"""
+        # Set requests.exceptions to the real module so exceptions can be caught
+        import requests.exceptions
+
+        mock_requests.exceptions = requests.exceptions
+        # Create a real RequestException instance
+        from requests.exceptions import RequestException
+
+        mock_requests.post.side_effect = RequestException('Timeout')
+        assert not _add_solr_field(f'{SOLR_URL}/schema', 'test_field', [])
+        mock_log.error.assert_called_once()
+        assert 'Error adding' in str(mock_log.error.call_args)
+
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_add_solr_field(self, mock_requests):
+        mock_requests.post.return_value = MagicMock(status_code=200)
+
+        assert _add_solr_field(f'{SOLR_URL}/schema', 'likes_total_i', []) is True
+        mock_requests.post.assert_called_once_with(
+            f'{SOLR_URL}/schema',
+            json={
+                'add-field': {
+                    'name': 'likes_total_i',
+                    'type': 'pint',
+                    'indexed': True,
+                    'stored': False,
+                    'docValues': True,
+                }
+            },
+            timeout=10,
+        )
+
+    @patch('ckanext.feedback.services.common.search_index.get_solr_url')
+    @patch('ckanext.feedback.services.common.search_index.setup_solr_schema')
+    def test_setup_solr_schema_once(
+        self, mock_setup_solr_schema, mock_get_solr_url, tmp_path
+    ):
+        mock_get_solr_url.return_value = SOLR_URL
+        mock_setup_solr_schema.return_value = True
+
+        with patch('tempfile.gettempdir', return_value=str(tmp_path)):
+            with solr_schema_setup_lock(SOLR_URL) as locked:
+                assert locked is True
+                # Held by another process
+                with solr_schema_setup_lock(SOLR_URL) as locked_again:
+                    assert locked_again is False
+                assert setup_solr_schema_once() is False
+            # Other Solr cores have their own lock
+            with solr_schema_setup_lock('http://other:8983/solr/ckan') as locked:
+                assert locked is True
+            mock_setup_solr_schema.assert_not_called()
+
+            assert setup_solr_schema_once() is True
+            # Recorded as done, so workers started later skip it
+            assert setup_solr_schema_once() is True
+            mock_setup_solr_schema.assert_called_once_with()
+
+            clear_solr_schema_setup_stamps(SOLR_URL)
+            assert setup_solr_schema_once() is True
+            assert mock_setup_solr_schema.call_count == 2
+
+    @patch('ckanext.feedback.services.common.search_index.FeedbackConfig')
+    @patch('ckanext.feedback.services.common.search_index.get_solr_url')
+    @patch('ckanext.feedback.services.common.search_index.setup_solr_schema')
+    def test_setup_solr_schema_once_records_enabled_fields(
+        self, mock_setup_solr_schema, mock_get_solr_url, mock_feedback_config, tmp_path
+    ):
+        mock_get_solr_url.return_value = SOLR_URL
+        mock_feedback_config.return_value.like.is_enable.return_value = False
+
+        with patch('tempfile.gettempdir', return_value=str(tmp_path)):
+            # Failed setups are not recorded
+            mock_setup_solr_schema.return_value = False
+            assert setup_solr_schema_once() is False
+            mock_setup_solr_schema.return_value = True
+            assert setup_solr_schema_once() is True
+            assert setup_solr_schema_once() is True
+            assert mock_setup_solr_schema.call_count == 2
+
+            # The field of a feature enabled later is added
+            mock_feedback_config.return_value.like.is_enable.return_value = True
+            assert setup_solr_schema_once() is True
+            assert mock_setup_solr_schema.call_count == 3
+
+    @patch('ckanext.feedback.services.common.search_index.setup_solr_schema_once')
+    def test_start_solr_schema_setup(self, mock_setup_solr_schema_once):
+        thread = start_solr_schema_setup()
+        thread.join()
+
+        assert thread.daemon is True
+        mock_setup_solr_schema_once.assert_called_once_with()
+
+
+class TestGetSolrUrl:
+    @patch('ckanext.feedback.services.common.search_index.config')
+    def test_get_solr_url_with_ckan_solr_url(self, mock_config):
+        mock_config.get.side_effect = lambda key: (
+            'http://solr:8983/solr/ckan' if key == 'ckan.solr_url' else None
+        )
+        result = get_solr_url()
+        assert result == 'http://solr:8983/solr/ckan'
+
+    @patch('ckanext.feedback.services.common.search_index.config')
+    def test_get_solr_url_with_solr_url(self, mock_config):
+        mock_config.get.side_effect = lambda key: (
+            'http://custom-solr:8983/solr/ckan' if key == 'solr_url' else None
+        )
+        result = get_solr_url()
+        assert result == 'http://custom-solr:8983/solr/ckan'
+
+    @patch('ckanext.feedback.services.common.search_index.config')
+    def test_get_solr_url_default(self, mock_config):
+        mock_config.get.return_value = None
+        result = get_solr_url()
+        assert result == 'http://solr:8983/solr/ckan'
+
+
+class TestRebuildPackageSearchIndex:
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckan.lib.search.rebuild')
+    def test_rebuild_package_search_index_success(self, mock_rebuild, mock_log):
+        package_id = 'test-package-id'
+        mock_rebuild.return_value = None
+
+        rebuild_package_search_index(package_id)
+
+        mock_rebuild.assert_called_once_with(package_id)
+        mock_log.debug.assert_called_once_with(
+            f"Updated search index for package {package_id}"
+        )
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckan.lib.search.rebuild')
+    def test_rebuild_package_search_index_exception(self, mock_rebuild, mock_log):
+        package_id = 'test-package-id'
+        mock_rebuild.side_effect = Exception('Solr connection error')
+
+        rebuild_package_search_index(package_id)
+
+        mock_rebuild.assert_called_once_with(package_id)
+        mock_log.warning.assert_called_once_with(
+            f"Failed to update search index for package {package_id}: "
+            "Solr connection error"
+        )
+
+
+def make_select_response(docs):
+    response = MagicMock()
+    response.json.return_value = {'response': {'docs': docs}}
+    return response
+
+
+@patch(
+    'ckanext.feedback.services.common.search_index.atomic_update_supported',
+    return_value=True,
+)
+@patch('ckanext.feedback.services.common.search_index.get_solr_url')
+@patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+@patch('ckanext.feedback.services.common.search_index.requests')
+@patch(
+    'ckanext.feedback.services.common.search_index.resource_likes_service'
+    '.get_package_like_count_bulk'
+)
+@patch(
+    'ckanext.feedback.services.common.search_index.download_summary_service'
+    '.get_package_downloads_bulk'
+)
+class TestUpdatePackageCountFields:
+    def test_update_package_count_fields(
+        self,
+        mock_downloads,
+        mock_likes,
+        mock_requests,
+        mock_rebuild,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_requests.get.return_value.status_code = 200
+        mock_requests.post.side_effect = [
+            make_select_response(
+                [
+                    {'index_id': get_index_id('package-a'), 'owner_org': 'org-a'},
+                    {'index_id': get_index_id('package-b'), 'owner_org': 'org-b'},
+                ]
+            ),
+            MagicMock(),
+        ]
+        mock_downloads.return_value = {'package-a': 3}
+        mock_likes.return_value = {'package-a': 1, 'package-b': 2}
+
+        update_package_count_fields(['package-a', 'package-b', 'package-a'])
+
+        update_call = mock_requests.post.call_args_list[1]
+        assert update_call.args == (f'{SOLR_URL}/update',)
+        assert update_call.kwargs['json'] == [
+            {
+                'index_id': get_index_id('package-a'),
+                'downloads_total_i': {'set': 3},
+                'likes_total_i': {'set': 1},
+            },
+            {
+                'index_id': get_index_id('package-b'),
+                'downloads_total_i': {'set': 0},
+                'likes_total_i': {'set': 2},
+            },
+        ]
+        mock_rebuild.assert_not_called()
+
+    def test_update_package_count_fields_rebuilds_missing_documents(
+        self,
+        mock_downloads,
+        mock_likes,
+        mock_requests,
+        mock_rebuild,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_requests.get.return_value.status_code = 200
+        mock_requests.post.side_effect = [
+            make_select_response(
+                [{'index_id': get_index_id('package-a'), 'owner_org': None}]
+            ),
+            MagicMock(),
+        ]
+        mock_downloads.return_value = {}
+        mock_likes.return_value = {}
+
+        update_package_count_fields(['package-a', 'package-b'])
+
+        mock_downloads.assert_called_once_with(['package-a'])
+        mock_rebuild.assert_called_once_with('package-b')
+
+    def test_update_package_count_fields_without_solr_fields(
+        self,
+        mock_downloads,
+        mock_likes,
+        mock_requests,
+        mock_rebuild,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_requests.get.return_value.status_code = 404
+        mock_requests.post.return_value = make_select_response(
+            [{'index_id': get_index_id('package-a'), 'owner_org': None}]
+        )
+
+        update_package_count_fields(['package-a'])
+
+        assert mock_requests.post.call_count == 1
+        mock_downloads.assert_not_called()
+        mock_likes.assert_not_called()
+        mock_rebuild.assert_not_called()
+
+    def test_update_package_count_fields_in_batches(
+        self,
+        mock_downloads,
+        mock_likes,
+        mock_requests,
+        mock_rebuild,
+        mock_solr_url,
+        mock_supported,
+    ):
+        config['ckan.feedback.custom_sort.atomic_update.batch_size'] = '1'
+        mock_solr_url.return_value = SOLR_URL
+        mock_requests.get.return_value.status_code = 404
+        mock_requests.post.return_value = make_select_response([])
+
+        update_package_count_fields(['package-a', 'package-b'])
+
+        assert mock_requests.post.call_count == 2
+        mock_rebuild.assert_has_calls([call('package-a'), call('package-b')])
+        config.pop('ckan.feedback.custom_sort.atomic_update.batch_size', None)
+
+    def test_update_package_count_fields_falls_back_to_rebuild(
+        self,
+        mock_downloads,
+        mock_likes,
+        mock_requests,
+        mock_rebuild,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_requests.post.side_effect = Exception('Solr connection error')
+
+        update_package_count_fields(['package-a', 'package-b'])
+
+        mock_rebuild.assert_has_calls([call('package-a'), call('package-b')])
+
+    def test_update_package_count_fields_without_atomic_update_support(
+        self,
+        mock_downloads,
+        mock_likes,
+        mock_requests,
+        mock_rebuild,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_supported.return_value = False
+        mock_downloads.return_value = {'package-a': 3}
+        mock_likes.return_value = {}
+
+        update_package_count_fields(['package-a', 'package-b', 'package-a'])
+
+        mock_supported.assert_called_once_with(SOLR_URL)
+        mock_requests.post.assert_not_called()
+        mock_downloads.assert_called_once_with(['package-a', 'package-b'])
+        mock_rebuild.assert_has_calls([call('package-a'), call('package-b')])
+        assert mock_rebuild.call_count == 2
+
+
+@patch(
+    'ckanext.feedback.services.common.search_index.resource_likes_service'
+    '.get_package_like_count_bulk'
+)
+@patch(
+    'ckanext.feedback.services.common.search_index.download_summary_service'
+    '.get_package_downloads_bulk'
+)
+class TestPrefetchedFeedbackCounts:
+    def test_prefetched_feedback_counts(self, mock_downloads, mock_likes):
+        mock_downloads.return_value = {'package-a': 3}
+        mock_likes.return_value = {'package-b': 2}
+
+        with prefetched_feedback_counts(['package-a', 'package-b']) as counts:
+            assert counts == {
+                'package-a': FeedbackCounts(3, 0),
+                'package-b': FeedbackCounts(0, 2),
+            }
+            assert get_prefetched_feedback_counts('package-a') == (3, 0)
+            assert get_prefetched_feedback_counts('package-c') is None
+
+        mock_downloads.assert_called_once_with(['package-a', 'package-b'])
+        mock_likes.assert_called_once_with(['package-a', 'package-b'])
+        assert get_prefetched_feedback_counts('package-a') is None
+
+    def test_prefetched_feedback_counts_without_packages(
+        self, mock_downloads, mock_likes
+    ):
+        with prefetched_feedback_counts([]) as counts:
+            assert counts == {}
+
+        mock_downloads.assert_not_called()
+        mock_likes.assert_not_called()
+
+    def test_prefetched_feedback_counts_are_dropped_on_error(
+        self, mock_downloads, mock_likes
+    ):
+        mock_downloads.return_value = {'package-a': 3}
+        mock_likes.return_value = {}
+
+        try:
+            with prefetched_feedback_counts(['package-a']):
+                raise ValueError()
+        except ValueError:
+            pass
+
+        assert get_prefetched_feedback_counts('package-a') is None
+
+
+@pytest.mark.db_test
+class TestRebuildSearchIndex:
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckan.lib.search.commit')
+    @patch('ckan.lib.search.rebuild')
+    def test_rebuild_search_index(self, mock_rebuild, mock_commit, mock_log):
+        package_ids = sorted(factories.Dataset()['id'] for _ in range(3))
+        prefetched = []
+        mock_rebuild.side_effect = lambda package_ids: prefetched.append(
+            [get_prefetched_feedback_counts(package_id) for package_id in package_ids]
+        )
+
+        assert rebuild_search_index(chunk_size=2) == (3, [])
+
+        assert mock_rebuild.call_args_list == [
+            call(package_ids=package_ids[:2]),
+            call(package_ids=package_ids[2:]),
+        ]
+        assert prefetched == [[(0, 0), (0, 0)], [(0, 0)]]
+        mock_commit.assert_called_once_with()
+        mock_log.info.assert_called_with('Reindexed 3/3 packages')
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckan.lib.search.commit')
+    @patch('ckan.lib.search.rebuild')
+    def test_rebuild_search_index_with_force(self, mock_rebuild, mock_commit, mock_log):
+        package_ids = sorted(factories.Dataset()['id'] for _ in range(3))
+
+        failing = package_ids[1]
+
+        def rebuild(package_ids):
+            if failing in package_ids:
+                raise Exception('Indexing error')
+
+        mock_rebuild.side_effect = rebuild
+
+        result = rebuild_search_index(chunk_size=2, force=True)
+
+        assert result == (3, [failing])
+        assert mock_rebuild.call_args_list == [
+            call(package_ids=package_ids[:2]),
+            call(package_ids=[package_ids[0]]),
+            call(package_ids=[package_ids[1]]),
+            call(package_ids=package_ids[2:]),
+        ]
+        mock_commit.assert_called_once_with()
+        mock_log.error.assert_called_once_with(
+            f'Failed to reindex package {failing}: Indexing error'
+        )
+
+    @patch('ckan.lib.search.commit')
+    @patch('ckan.lib.search.rebuild')
+    def test_rebuild_search_index_stops_at_failed_package(
+        self, mock_rebuild, mock_commit
+    ):
+        package_ids = sorted(factories.Dataset()['id'] for _ in range(3))
+        failing = package_ids[0]
+
+        def rebuild(package_ids):
+            if failing in package_ids:
+                raise Exception('Indexing error')
+
+        mock_rebuild.side_effect = rebuild
+
+        with pytest.raises(RuntimeError, match=failing):
+            rebuild_search_index(chunk_size=2)
+
+        assert mock_rebuild.call_args_list == [
+            call(package_ids=package_ids[:2]),
+            call(package_ids=[failing]),
+        ]
+        mock_commit.assert_not_called()
+
+
+class TestCountReindexProgress:
+    def test_resume_after_batches_finished_in_order(self):
+        progress = CountReindexProgress(total=6, start_after='package-0')
+        assert progress.resume_after == 'package-0'
+
+        progress.add_batch(1, 'package-4', 2, updated=2)
+        # The first batch has not finished yet
+        assert progress.resume_after == 'package-0'
+
+        progress.add_batch(0, 'package-2', 2, updated=1, missing=1)
+        assert progress.resume_after == 'package-4'
+        assert progress.packages == 4
+        assert progress.updated == 3
+        assert progress.missing == 1
+
+    def test_failed_batch_stops_resume_point(self):
+        progress = CountReindexProgress(total=6)
+
+        progress.add_batch(0, 'package-2', 2, updated=2)
+        progress.add_batch(1, None, 2)
+        progress.add_batch(2, 'package-6', 2, updated=2)
+
+        assert progress.resume_after == 'package-2'
+        assert progress.failed == 2
+        assert progress.updated == 4
+
+
+@pytest.mark.db_test
+class TestQueryPackageCounts:
+    def test_query_package_counts(
+        self, dataset, resource, download_summary, resource_like
+    ):
+        factories.Resource(package_id=dataset['id'], state='deleted')
+        other = factories.Dataset()
+
+        rows = {row.package_id: row for row in _query_package_counts()}
+
+        assert rows[dataset['id']].owner_org == dataset['owner_org']
+        assert rows[dataset['id']].downloads == 1
+        assert rows[dataset['id']].likes == 1
+        assert rows[other['id']].downloads == 0
+        assert rows[other['id']].likes == 0
+
+        first, last = sorted([dataset['id'], other['id']])
+        assert [row.package_id for row in _query_package_counts(first)] == [last]
+
+
+@patch(
+    'ckanext.feedback.services.common.search_index.atomic_update_supported',
+    return_value=True,
+)
+@patch('ckanext.feedback.services.common.search_index.get_solr_url')
+@patch('ckanext.feedback.services.common.search_index.field_exists_in_solr')
+@patch('ckanext.feedback.services.common.search_index.FeedbackConfig')
+@patch('ckanext.feedback.services.common.search_index._count_packages')
+@patch('ckanext.feedback.services.common.search_index._query_package_counts')
+@patch('ckanext.feedback.services.common.search_index.requests')
+class TestReindexCountFields:
+    rows = [
+        MagicMock(package_id='package-a', owner_org=None, downloads=3, likes=1),
+        MagicMock(package_id='package-b', owner_org=None, downloads=0, likes=2),
+        MagicMock(package_id='package-c', owner_org=None, downloads=5, likes=0),
+    ]
+
+    def mock_solr(self, mock_requests, missing=()):
+        def post(url, **kwargs):
+            if url.endswith('/select'):
+                return make_select_response(
+                    [
+                        {'index_id': get_index_id(row.package_id)}
+                        for row in self.rows
+                        if row.package_id not in missing
+                        and get_index_id(row.package_id) in kwargs['data']['fq']
+                    ]
+                )
+            return MagicMock()
+
+        mock_requests.post.side_effect = post
+
+    def test_reindex_count_fields(
+        self,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        self.mock_solr(mock_requests, missing=['package-c'])
+        mock_field_exists.return_value = True
+        mock_count.return_value = 3
+        mock_query.return_value.yield_per.return_value = iter(self.rows)
+        on_progress = MagicMock()
+
+        progress = reindex_count_fields(
+            batch_size=2, workers=1, start_after='package-0', on_progress=on_progress
+        )
+
+        mock_count.assert_called_once_with('package-0')
+        mock_query.assert_called_once_with('package-0')
+        mock_query.return_value.yield_per.assert_called_once_with(2)
+        assert on_progress.call_count == 2
+        assert progress.updated == 2
+        assert progress.missing == 1
+        assert progress.failed == 0
+        assert progress.resume_after == 'package-c'
+
+        update_calls = [
+            c
+            for c in mock_requests.post.call_args_list
+            if c.args[0].endswith('/update')
+        ]
+        assert update_calls[0].kwargs['params'] == {}
+        assert update_calls[0].kwargs['json'] == [
+            {
+                'index_id': get_index_id('package-a'),
+                'downloads_total_i': {'set': 3},
+                'likes_total_i': {'set': 1},
+            },
+            {
+                'index_id': get_index_id('package-b'),
+                'downloads_total_i': {'set': 0},
+                'likes_total_i': {'set': 2},
+            },
+        ]
+        # Committed once at the end
+        assert update_calls[-1].kwargs['json'] == {'commit': {}}
+        assert len(update_calls) == 2
+
+    def test_reindex_count_fields_with_failed_batch(
+        self,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_field_exists.return_value = True
+        mock_count.return_value = 3
+        mock_query.return_value.yield_per.return_value = iter(self.rows)
+        mock_requests.post.side_effect = Exception('Solr connection error')
+
+        progress = reindex_count_fields(batch_size=2, workers=2)
+
+        assert progress.failed == 3
+        assert progress.resume_after is None
+
+    def test_reindex_count_fields_dry_run(
+        self,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_field_exists.side_effect = lambda url, name: name == 'likes_total_i'
+        mock_count.return_value = 3
+        mock_query.return_value.yield_per.return_value = iter(self.rows)
+
+        progress = reindex_count_fields(batch_size=2, dry_run=True)
+
+        assert progress.updated == 3
+        assert progress.resume_after == 'package-c'
+        mock_requests.post.assert_not_called()
+
+    def test_reindex_count_fields_without_solr_fields(
+        self,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_field_exists.return_value = False
+
+        with pytest.raises(RuntimeError):
+            reindex_count_fields()
+
+        mock_query.assert_not_called()
+
+    def test_reindex_count_fields_custom_sort_disabled(
+        self,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_feedback_config.return_value.custom_sort.is_enable.return_value = False
+
+        with pytest.raises(RuntimeError):
+            reindex_count_fields()
+
+        mock_field_exists.assert_not_called()
+
+    @patch('ckan.lib.search.commit')
+    @patch('ckan.lib.search.rebuild')
+    def test_reindex_count_fields_without_atomic_update_support(
+        self,
+        mock_rebuild,
+        mock_commit,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_solr_url.return_value = SOLR_URL
+        mock_supported.return_value = False
+        mock_field_exists.return_value = True
+        mock_count.return_value = 3
+        mock_query.return_value.all.return_value = self.rows
+        indexed = []
+        mock_rebuild.side_effect = lambda package_ids: indexed.append(
+            {
+                package_id: get_prefetched_feedback_counts(package_id)
+                for package_id in package_ids
+            }
+        )
+
+        progress = reindex_count_fields(batch_size=2, start_after='package-0')
+
+        mock_supported.assert_called_once_with(SOLR_URL)
+        mock_query.assert_called_once_with('package-0')
+        assert indexed == [
+            {'package-a': (3, 1), 'package-b': (0, 2)},
+            {'package-c': (5, 0)},
+        ]
+        mock_commit.assert_called_once_with()
+        mock_requests.post.assert_not_called()
+        assert progress.updated == 3
+        assert progress.failed == 0
+        assert progress.resume_after == 'package-c'
+
+    @patch('ckan.lib.search.commit')
+    @patch('ckan.lib.search.rebuild')
+    def test_reindex_count_fields_rebuild_with_failed_batch(
+        self,
+        mock_rebuild,
+        mock_commit,
+        mock_requests,
+        mock_query,
+        mock_count,
+        mock_feedback_config,
+        mock_field_exists,
+        mock_solr_url,
+        mock_supported,
+    ):
+        mock_supported.return_value = False
+        mock_field_exists.return_value = True
+        mock_count.return_value = 3
+        mock_query.return_value.all.return_value = self.rows
+        mock_rebuild.side_effect = [Exception('Indexing error'), None]
+
+        progress = reindex_count_fields(batch_size=2)
+
+        assert progress.updated == 1
+        assert progress.failed == 2
+        assert progress.resume_after is None
+        mock_commit.assert_called_once_with()
+
+
+class TestSearchIndexQueue:
+    @patch.object(SearchIndexQueue, '_ensure_worker')
+    @patch(
+        'ckanext.feedback.services.common.search_index.prefetched_feedback_counts',
+        MagicMock(),
+    )
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    def test_flush_reindexes_each_package_once(self, mock_rebuild, mock_ensure_worker):
+        queue = SearchIndexQueue()
+        queue.add('package-a')
+        queue.add('package-a')
+        queue.add('package-b')
+        queue.add(None)
+        assert queue.pending() == 2
+
+        assert queue.flush() == 2
+
+        assert queue.pending() == 0
+        mock_rebuild.assert_has_calls(
+            [call('package-a'), call('package-b')], any_order=True
+        )
+        assert mock_rebuild.call_count == 2
+
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    def test_flush_without_pending_packages(self, mock_rebuild):
+        queue = SearchIndexQueue()
+        assert queue.flush() == 0
+        mock_rebuild.assert_not_called()
+
+    @patch.object(SearchIndexQueue, '_ensure_worker')
+    @patch(
+        'ckanext.feedback.services.common.search_index.prefetched_feedback_counts',
+        MagicMock(),
+    )
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    def test_flush_runs_in_request_context(self, mock_rebuild, mock_ensure_worker):
+        queue = SearchIndexQueue()
+        queue._app = MagicMock()
+        queue.add('package-a')
+
+        queue.flush()
+
+        queue._app.test_request_context.assert_called_once_with()
+        mock_rebuild.assert_called_once_with('package-a')
+
+    @patch.object(SearchIndexQueue, '_ensure_worker')
+    @patch('ckanext.feedback.services.common.search_index.prefetched_feedback_counts')
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    def test_flush_prefetches_feedback_counts(
+        self, mock_rebuild, mock_prefetched_feedback_counts, mock_ensure_worker
+    ):
+        queue = SearchIndexQueue()
+        queue.add('package-a')
+        queue.add('package-b')
+
+        queue.flush()
+
+        mock_prefetched_feedback_counts.assert_called_once_with(
+            {'package-a', 'package-b'}
+        )
+        assert mock_rebuild.call_count == 2
+
+    @patch.object(SearchIndexQueue, '_ensure_worker')
+    @patch('ckanext.feedback.services.common.search_index.update_package_count_fields')
+    def test_flush_with_atomic_update(self, mock_update, mock_ensure_worker):
+        config['ckan.feedback.custom_sort.atomic_update.enable'] = 'true'
+        queue = SearchIndexQueue()
+        queue.add('package-a')
+
+        queue.flush()
+
+        mock_update.assert_called_once_with({'package-a'})
+        config.pop('ckan.feedback.custom_sort.atomic_update.enable', None)
+
+
+class TestUpdatePackageSearchIndex:
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    @patch('ckanext.feedback.services.common.search_index.get_search_index_queue')
+    def test_update_package_search_index_without_queue(
+        self, mock_get_queue, mock_rebuild
+    ):
+        config.pop('ckan.feedback.custom_sort.reindex_queue.enable', None)
+
+        update_package_search_index('package-a')
+
+        mock_rebuild.assert_called_once_with('package-a')
+        mock_get_queue.assert_not_called()
+
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    @patch('ckanext.feedback.services.common.search_index.get_search_index_queue')
+    def test_update_package_search_index_with_queue(self, mock_get_queue, mock_rebuild):
+        config['ckan.feedback.custom_sort.reindex_queue.enable'] = 'true'
+
+        update_package_search_index('package-a')
+
+        mock_get_queue.return_value.add.assert_called_once_with('package-a')
+        mock_rebuild.assert_not_called()
+        config.pop('ckan.feedback.custom_sort.reindex_queue.enable', None)
+
+    @patch('ckanext.feedback.services.common.search_index.update_package_count_fields')
+    @patch('ckanext.feedback.services.common.search_index.rebuild_package_search_index')
+    def test_update_package_search_index_with_atomic_update(
+        self, mock_rebuild, mock_update
+    ):
+        config['ckan.feedback.custom_sort.atomic_update.enable'] = 'true'
+
+        update_package_search_index('package-a')
+
+        mock_update.assert_called_once_with(['package-a'])
+        mock_rebuild.assert_not_called()
+        config.pop('ckan.feedback.custom_sort.atomic_update.enable', None)
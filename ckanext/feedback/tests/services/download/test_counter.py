@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import pytest
+
+from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
+from ckanext.feedback.models.event import FeedbackEvent, FeedbackEventKind
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.download.counter import count_download
+
+
+def get_downloads(resource_id):
+    return (
+        session.query(DownloadSummary.download)
+        .filter(DownloadSummary.resource_id == resource_id)
+        .scalar()
+    )
+
+
+def get_monthly_downloads(resource_id):
+    return (
+        session.query(DownloadMonthly.download_count)
+        .filter(DownloadMonthly.resource_id == resource_id)
+        .scalar()
+    )
+
+
+@pytest.mark.db_test
+class TestCounter:
+    @patch('ckanext.feedback.services.download.counter.update_package_search_index')
+    def test_count_download(self, mock_update_index, resource):
+        count_download(resource['id'], package_id=resource['package_id'])
+
+        assert get_downloads(resource['id']) == 1
+        assert get_monthly_downloads(resource['id']) == 1
+        mock_update_index.assert_called_once_with(resource['package_id'])
+
+    @patch('ckanext.feedback.services.download.counter.update_package_search_index')
+    def test_count_download_without_package_id(self, mock_update_index, resource):
+        count_download(resource['id'])
+
+        assert get_downloads(resource['id']) == 1
+        mock_update_index.assert_not_called()
+
+    @patch('ckanext.feedback.services.download.counter.log')
+    @patch('ckanext.feedback.services.download.counter.session.rollback')
+    @patch('ckanext.feedback.services.download.counter.increment_resource_downloads')
+    def test_count_download_with_error(
+        self, mock_increment_downloads, mock_rollback, mock_log
+    ):
+        mock_increment_downloads.side_effect = Exception('error')
+
+        count_download('resource-id')
+
+        mock_rollback.assert_called_once_with()
+        mock_log.exception.assert_called_once()
+
+    @patch('ckanext.feedback.services.download.counter.get_download_buffer')
+    @patch('ckanext.feedback.services.download.counter.is_write_behind_enabled')
+    def test_count_download_with_write_behind(
+        self, mock_is_write_behind_enabled, mock_get_download_buffer, resource
+    ):
+        mock_is_write_behind_enabled.return_value = True
+
+        count_download(resource['id'])
+
+        mock_get_download_buffer.return_value.add.assert_called_once_with(
+            resource['id'], package_id=None
+        )
+        assert get_downloads(resource['id']) is None
+
+    @patch('ckanext.feedback.services.download.counter.get_download_buffer')
+    @patch('ckanext.feedback.services.download.counter.is_event_log_enabled')
+    def test_count_download_with_event_log(
+        self, mock_is_event_log_enabled, mock_get_download_buffer, resource
+    ):
+        mock_is_event_log_enabled.return_value = True
+
+        count_download(resource['id'])
+
+        event = session.query(FeedbackEvent).one()
+        assert event.resource_id == resource['id']
+        assert event.kind == FeedbackEventKind.DOWNLOAD
+        assert get_downloads(resource['id']) is None
+        mock_get_download_buffer.assert_not_called()
+
+    @patch('ckanext.feedback.services.download.counter.session.rollback')
+    @patch('ckanext.feedback.services.download.counter.add_event')
+    @patch('ckanext.feedback.services.download.counter.is_event_log_enabled')
+    def test_count_download_with_event_log_error(
+        self, mock_is_event_log_enabled, mock_add_event, mock_rollback
+    ):
+        mock_is_event_log_enabled.return_value = True
+        mock_add_event.side_effect = Exception('error')
+
+        count_download('resource-id')
+
+        mock_rollback.assert_called_once_with()
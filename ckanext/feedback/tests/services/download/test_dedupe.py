@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+from ckan.common import config
+from flask import Flask
+
+from ckanext.feedback.services.download.dedupe import (
+    DownloadDeduplicator,
+    get_client_fingerprint,
+    is_denied_user_agent,
+    should_count_download,
+)
+
+
+class TestDownloadDeduplicator:
+    @patch('ckanext.feedback.services.download.dedupe.time.monotonic')
+    def test_is_duplicate_within_window(self, mock_monotonic):
+        deduplicator = DownloadDeduplicator(window=30)
+
+        mock_monotonic.return_value = 100
+        assert deduplicator.is_duplicate('client-a', 'resource-a') is False
+        mock_monotonic.return_value = 129
+        assert deduplicator.is_duplicate('client-a', 'resource-a') is True
+        assert deduplicator.is_duplicate('client-a', 'resource-b') is False
+        assert deduplicator.is_duplicate('client-b', 'resource-a') is False
+
+    @patch('ckanext.feedback.services.download.dedupe.time.monotonic')
+    def test_is_duplicate_after_window(self, mock_monotonic):
+        deduplicator = DownloadDeduplicator(window=30)
+
+        mock_monotonic.return_value = 100
+        assert deduplicator.is_duplicate('client-a', 'resource-a') is False
+        mock_monotonic.return_value = 130
+        assert deduplicator.is_duplicate('client-a', 'resource-a') is False
+
+    def test_is_duplicate_evicts_least_recently_seen(self):
+        deduplicator = DownloadDeduplicator(window=30, max_entries=2)
+
+        deduplicator.is_duplicate('client-a', 'resource-a')
+        deduplicator.is_duplicate('client-b', 'resource-a')
+        # Seen again, so client-b becomes the least recently seen entry
+        deduplicator.is_duplicate('client-a', 'resource-a')
+        deduplicator.is_duplicate('client-c', 'resource-a')
+
+        assert len(deduplicator) == 2
+        assert deduplicator.is_duplicate('client-a', 'resource-a') is True
+        assert deduplicator.is_duplicate('client-b', 'resource-a') is False
+
+
+class TestShouldCountDownload:
+    def setup_method(self, method):
+        self.app = Flask(__name__)
+
+    def teardown_method(self, method):
+        config.pop('ckan.feedback.downloads.dedupe.enable', None)
+        config.pop('ckan.feedback.downloads.dedupe.deny_user_agents', None)
+
+    def test_is_denied_user_agent(self):
+        assert is_denied_user_agent('Mozilla/5.0 (compatible; Googlebot/2.1)')
+        assert is_denied_user_agent('Some-Crawler/1.0')
+        assert not is_denied_user_agent('Mozilla/5.0 (X11; Linux x86_64)')
+        assert not is_denied_user_agent(None)
+
+        config['ckan.feedback.downloads.dedupe.deny_user_agents'] = 'curl wget'
+        assert is_denied_user_agent('curl/8.0.1')
+        assert not is_denied_user_agent('Googlebot/2.1')
+
+    def test_get_client_fingerprint(self):
+        with self.app.test_request_context(
+            '/',
+            headers={'User-Agent': 'agent-a'},
+            environ_base={'REMOTE_ADDR': '1.1.1.1'},
+        ):
+            fingerprint = get_client_fingerprint()
+        with self.app.test_request_context(
+            '/',
+            headers={'User-Agent': 'agent-a'},
+            environ_base={'REMOTE_ADDR': '1.1.1.1'},
+        ):
+            assert get_client_fingerprint() == fingerprint
+        with self.app.test_request_context(
+            '/',
+            headers={'User-Agent': 'agent-b'},
+            environ_base={'REMOTE_ADDR': '1.1.1.1'},
+        ):
+            assert get_client_fingerprint() != fingerprint
+
+    @patch('ckanext.feedback.services.download.dedupe.get_download_deduplicator')
+    def test_should_count_download_disabled(self, mock_get_deduplicator):
+        with self.app.test_request_context('/', headers={'User-Agent': 'Googlebot'}):
+            assert should_count_download('resource-a') is True
+        mock_get_deduplicator.assert_not_called()
+
+    @patch('ckanext.feedback.services.download.dedupe.get_download_deduplicator')
+    def test_should_count_download_denied_user_agent(self, mock_get_deduplicator):
+        config['ckan.feedback.downloads.dedupe.enable'] = 'true'
+
+        with self.app.test_request_context('/', headers={'User-Agent': 'Googlebot'}):
+            assert should_count_download('resource-a') is False
+        mock_get_deduplicator.assert_not_called()
+
+    @patch('ckanext.feedback.services.download.dedupe.get_download_deduplicator')
+    def test_should_count_download_duplicate(self, mock_get_deduplicator):
+        config['ckan.feedback.downloads.dedupe.enable'] = 'true'
+        mock_get_deduplicator.return_value = DownloadDeduplicator(window=30)
+
+        with self.app.test_request_context('/', headers={'User-Agent': 'Mozilla'}):
+            assert should_count_download('resource-a') is True
+            assert should_count_download('resource-a') is False
+            assert should_count_download('resource-b') is True
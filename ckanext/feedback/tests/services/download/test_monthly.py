@@ -7,7 +7,7 @@ from ckanext.feedback.command.feedback import (
     create_resource_tables,
     create_utilization_tables,
 )
-from ckanext.feedback.models.download import DownloadMonthly
+from ckanext.feedback.models.download import DownloadMonthly, get_month_period
 from ckanext.feedback.models.session import session
 from ckanext.feedback.services.download.monthly import (
     increment_resource_downloads_monthly,
@@ -44,3 +44,20 @@ class TestDownloadMonthlyServices:
         increment_resource_downloads_monthly(resource['id'])
         session.commit()
         assert get_downloads(resource['id']) == 2
+
+    def test_increment_resource_downloads_monthly_keeps_one_row_per_month(self):
+        resource = factories.Resource()
+        session.commit()
+
+        increment_resource_downloads_monthly(resource['id'])
+        increment_resource_downloads_monthly(resource['id'])
+        session.commit()
+
+        rows = (
+            session.query(DownloadMonthly)
+            .filter(DownloadMonthly.resource_id == resource['id'])
+            .all()
+        )
+        assert len(rows) == 1
+        assert rows[0].download_count == 2
+        assert rows[0].period == get_month_period()
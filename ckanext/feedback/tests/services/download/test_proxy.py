@@ -0,0 +1,132 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from ckan.common import config
+from flask import Flask
+
+from ckanext.feedback.services.download.proxy import (
+    ResourceTooLargeError,
+    get_proxy_session,
+    is_proxy_stream_enabled,
+    stream_external_resource,
+)
+
+URL = 'http://mock_url.com/mock.csv'
+
+
+def make_upstream(status_code=200, headers=None, chunks=()):
+    upstream = MagicMock()
+    upstream.status_code = status_code
+    upstream.headers = headers or {}
+    upstream.raw.stream.return_value = iter(chunks)
+    return upstream
+
+
+@patch('ckanext.feedback.services.download.proxy.get_proxy_session')
+class TestStreamExternalResource:
+    def setup_method(self, method):
+        self.app = Flask(__name__)
+
+    def teardown_method(self, method):
+        config.pop('ckan.feedback.downloads.proxy_stream.max_size', None)
+        config.pop('ckan.feedback.downloads.proxy_stream.timeout', None)
+
+    def test_stream_external_resource(self, mock_get_proxy_session):
+        config['ckan.feedback.downloads.proxy_stream.timeout'] = '5'
+        upstream = make_upstream(
+            headers={
+                'Content-Type': 'text/csv',
+                'Content-Length': '6',
+                'ETag': '"abc"',
+                'Set-Cookie': 'session=secret',
+            },
+            chunks=[b'abc', b'def'],
+        )
+        mock_get_proxy_session.return_value.get.return_value = upstream
+
+        with self.app.test_request_context('/', headers={'Range': 'bytes=0-5'}):
+            response = stream_external_resource(URL)
+            body = b''.join(response.response)
+
+        mock_get_proxy_session.return_value.get.assert_called_once_with(
+            URL,
+            headers={'Range': 'bytes=0-5'},
+            stream=True,
+            timeout=5.0,
+            allow_redirects=True,
+        )
+        assert response.status_code == 200
+        assert body == b'abcdef'
+        assert response.headers['Content-Type'] == 'text/csv'
+        assert response.headers['Content-Length'] == '6'
+        assert response.headers['ETag'] == '"abc"'
+        assert 'Set-Cookie' not in response.headers
+        upstream.close.assert_called_once_with()
+
+    def test_stream_external_resource_partial_content(self, mock_get_proxy_session):
+        upstream = make_upstream(
+            status_code=206,
+            headers={'Content-Range': 'bytes 0-2/6', 'Accept-Ranges': 'bytes'},
+            chunks=[b'abc'],
+        )
+        mock_get_proxy_session.return_value.get.return_value = upstream
+
+        with self.app.test_request_context('/'):
+            response = stream_external_resource(URL)
+
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == 'bytes 0-2/6'
+        assert response.headers['Accept-Ranges'] == 'bytes'
+
+    def test_stream_external_resource_connection_error(self, mock_get_proxy_session):
+        mock_get_proxy_session.return_value.get.side_effect = (
+            requests.exceptions.ConnectionError()
+        )
+
+        with self.app.test_request_context('/'):
+            assert stream_external_resource(URL) is None
+
+    def test_stream_external_resource_error_status(self, mock_get_proxy_session):
+        upstream = make_upstream(status_code=404)
+        mock_get_proxy_session.return_value.get.return_value = upstream
+
+        with self.app.test_request_context('/'):
+            assert stream_external_resource(URL) is None
+        upstream.close.assert_called_once_with()
+
+    def test_stream_external_resource_content_length_too_large(
+        self, mock_get_proxy_session
+    ):
+        config['ckan.feedback.downloads.proxy_stream.max_size'] = '5'
+        upstream = make_upstream(headers={'Content-Length': '6'})
+        mock_get_proxy_session.return_value.get.return_value = upstream
+
+        with self.app.test_request_context('/'):
+            assert stream_external_resource(URL) is None
+        upstream.close.assert_called_once_with()
+
+    def test_stream_external_resource_body_too_large(self, mock_get_proxy_session):
+        config['ckan.feedback.downloads.proxy_stream.max_size'] = '5'
+        upstream = make_upstream(chunks=[b'abc', b'def'])
+        mock_get_proxy_session.return_value.get.return_value = upstream
+
+        with self.app.test_request_context('/'):
+            response = stream_external_resource(URL)
+            body = iter(response.response)
+            assert next(body) == b'abc'
+            with pytest.raises(ResourceTooLargeError):
+                next(body)
+        upstream.close.assert_called_once_with()
+
+
+class TestProxySession:
+    def test_get_proxy_session(self):
+        assert isinstance(get_proxy_session(), requests.Session)
+        assert get_proxy_session() is get_proxy_session()
+
+    def test_is_proxy_stream_enabled(self):
+        assert is_proxy_stream_enabled() is False
+        config['ckan.feedback.downloads.proxy_stream.enable'] = 'true'
+        assert is_proxy_stream_enabled() is True
+        config.pop('ckan.feedback.downloads.proxy_stream.enable', None)
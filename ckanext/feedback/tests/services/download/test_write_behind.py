@@ -0,0 +1,145 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from ckan.common import config
+from flask import Flask
+
+from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.download.write_behind import (
+    DownloadCounterBuffer,
+    get_current_month,
+    is_write_behind_enabled,
+)
+
+
+def get_downloads(resource_id):
+    return (
+        session.query(DownloadSummary.download)
+        .filter(DownloadSummary.resource_id == resource_id)
+        .scalar()
+    )
+
+
+def get_monthly_downloads(resource_id):
+    return (
+        session.query(DownloadMonthly.download_count)
+        .filter(DownloadMonthly.resource_id == resource_id)
+        .scalar()
+    )
+
+
+@pytest.mark.db_test
+class TestDownloadCounterBuffer:
+    @patch.object(DownloadCounterBuffer, '_ensure_worker')
+    @patch.object(DownloadCounterBuffer, '_update_search_index')
+    def test_flush_writes_buffered_downloads(
+        self, mock_update_search_index, mock_ensure_worker, resource
+    ):
+        buffer = DownloadCounterBuffer()
+        buffer.add(resource['id'], package_id=resource['package_id'])
+        buffer.add(resource['id'], package_id=resource['package_id'])
+        buffer.add(resource['id'])
+        assert buffer.pending() == 3
+        assert get_downloads(resource['id']) is None
+
+        assert buffer.flush() == 3
+        session.expire_all()
+
+        assert buffer.pending() == 0
+        assert get_downloads(resource['id']) == 3
+        assert get_monthly_downloads(resource['id']) == 3
+        mock_update_search_index.assert_called_once_with({resource['package_id']})
+
+    @patch.object(DownloadCounterBuffer, '_ensure_worker')
+    @patch.object(DownloadCounterBuffer, '_update_search_index')
+    def test_flush_adds_to_existing_counts(
+        self, mock_update_search_index, mock_ensure_worker, resource
+    ):
+        buffer = DownloadCounterBuffer()
+        buffer.add(resource['id'])
+        buffer.flush()
+        buffer.add(resource['id'])
+        buffer.add(resource['id'])
+        buffer.flush()
+        session.expire_all()
+
+        assert get_downloads(resource['id']) == 3
+        assert get_monthly_downloads(resource['id']) == 3
+        assert session.query(DownloadMonthly).count() == 1
+
+    def test_flush_without_pending_downloads(self):
+        buffer = DownloadCounterBuffer()
+        assert buffer.flush() == 0
+
+    @patch.object(DownloadCounterBuffer, '_ensure_worker')
+    @patch(
+        'ckanext.feedback.services.download.write_behind.'
+        'increment_resource_downloads_bulk'
+    )
+    def test_flush_restores_counts_on_error(
+        self, mock_increment_bulk, mock_ensure_worker, resource
+    ):
+        mock_increment_bulk.side_effect = Exception('db error')
+        buffer = DownloadCounterBuffer()
+        buffer.add(resource['id'], package_id=resource['package_id'])
+
+        assert buffer.flush() == 0
+        assert buffer.pending() == 1
+
+    @patch.object(DownloadCounterBuffer, '_ensure_worker')
+    def test_add_wakes_flush_thread_at_flush_size(self, mock_ensure_worker):
+        buffer = DownloadCounterBuffer(flush_size=2)
+        buffer.add('resource_id')
+        assert not buffer._wakeup.is_set()
+        buffer.add('resource_id')
+        assert buffer._wakeup.is_set()
+
+    @patch.object(DownloadCounterBuffer, '_ensure_worker')
+    def test_add_keeps_app(self, mock_ensure_worker):
+        app = Flask(__name__)
+        buffer = DownloadCounterBuffer()
+
+        buffer.add('resource_id')
+        assert buffer._app is None
+
+        with app.app_context():
+            buffer.add('resource_id')
+        assert buffer._app is app
+
+    @patch(
+        'ckanext.feedback.services.download.write_behind.update_package_search_index'
+    )
+    def test_update_search_index_runs_in_request_context(
+        self, mock_update_package_search_index
+    ):
+        buffer = DownloadCounterBuffer()
+        buffer._app = MagicMock()
+
+        buffer._update_search_index({'package-a'})
+
+        buffer._app.test_request_context.assert_called_once_with()
+        mock_update_package_search_index.assert_called_once_with('package-a')
+
+    @patch(
+        'ckanext.feedback.services.download.write_behind.update_package_search_index'
+    )
+    def test_update_search_index_without_app(self, mock_update_package_search_index):
+        buffer = DownloadCounterBuffer()
+
+        buffer._update_search_index({'package-a'})
+
+        mock_update_package_search_index.assert_called_once_with('package-a')
+
+    @pytest.mark.freeze_time(datetime(2024, 1, 15, 15, 0, 0))
+    def test_get_current_month(self):
+        assert get_current_month() == datetime(2024, 1, 1)
+
+    def test_is_write_behind_enabled(self):
+        config.pop('ckan.feedback.downloads.write_behind.enable', None)
+        assert is_write_behind_enabled() is False
+
+        config['ckan.feedback.downloads.write_behind.enable'] = 'true'
+        assert is_write_behind_enabled() is True
+        config.pop('ckan.feedback.downloads.write_behind.enable', None)
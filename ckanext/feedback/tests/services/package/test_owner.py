@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+import pytest
+from ckan.model import Resource
+from ckan.tests import factories
+from flask import Flask
+
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.package.owner import (
+    PackageOwner,
+    get_package_owner,
+    get_package_owners,
+    remember_package_owners,
+)
+
+
+@pytest.mark.db_test
+class TestOwner:
+    def test_get_package_owners(self, organization):
+        dataset = factories.Dataset(owner_org=organization['id'])
+        resource1 = factories.Resource(package_id=dataset['id'])
+        resource2 = factories.Resource(package_id=dataset['id'])
+        no_resource_dataset = factories.Dataset()
+
+        owners = get_package_owners(
+            [dataset['id'], no_resource_dataset['id'], 'unknown-package']
+        )
+
+        assert owners == {
+            dataset['id']: PackageOwner(
+                organization['id'], [resource1['id'], resource2['id']]
+            ),
+            no_resource_dataset['id']: PackageOwner(None, []),
+        }
+
+    def test_get_package_owners_skips_deleted_resources(self, dataset):
+        resource = factories.Resource(package_id=dataset['id'])
+        deleted = factories.Resource(package_id=dataset['id'])
+        session.query(Resource).filter(Resource.id == deleted['id']).update(
+            {'state': 'deleted'}
+        )
+
+        assert get_package_owner(dataset['id']).resource_ids == [resource['id']]
+
+    @patch('ckanext.feedback.services.package.owner._load_package_owners')
+    def test_remember_package_owners(self, mock_load_package_owners):
+        mock_load_package_owners.return_value = {}
+        pkg_dict = {
+            'id': 'package-a',
+            'owner_org': 'org-a',
+            'resources': [{'id': 'resource-a'}, {'id': 'resource-b'}],
+        }
+
+        with Flask(__name__).test_request_context():
+            remember_package_owners([pkg_dict, {'id': 'package-b'}])
+
+            assert get_package_owner('package-a') == PackageOwner(
+                'org-a', ['resource-a', 'resource-b']
+            )
+            mock_load_package_owners.assert_not_called()
+
+            # Dicts without owner_org are looked up
+            assert get_package_owner('package-b') is None
+            mock_load_package_owners.assert_called_once_with(['package-b'])
+
+    @patch('ckanext.feedback.services.package.owner._load_package_owners')
+    def test_get_package_owners_are_kept_in_request(self, mock_load_package_owners):
+        mock_load_package_owners.side_effect = lambda package_ids: {
+            package_id: PackageOwner('org-a') for package_id in package_ids
+        }
+
+        with Flask(__name__).test_request_context():
+            get_package_owners(['package-a', 'package-b'])
+            get_package_owners(['package-b', 'package-c'])
+
+            assert mock_load_package_owners.call_args_list[0][0] == (
+                ['package-a', 'package-b'],
+            )
+            assert mock_load_package_owners.call_args_list[1][0] == (['package-c'],)
+
+        # Not kept across requests
+        with Flask(__name__).test_request_context():
+            get_package_owners(['package-a'])
+            assert mock_load_package_owners.call_count == 3
+
+        # Nor outside of a request
+        get_package_owners(['package-a'])
+        get_package_owners(['package-a'])
+        assert mock_load_package_owners.call_count == 5
@@ -1,9 +1,54 @@
+import uuid
 from unittest.mock import MagicMock, patch
 
+import pytest
+from ckan.model import Resource
+from ckan.tests import factories
+
+from ckanext.feedback.models.likes import ResourceLike
+from ckanext.feedback.models.package_summary import PackageFeedbackSummary
+from ckanext.feedback.models.resource_comment import (
+    ResourceComment,
+    ResourceCommentCategory,
+    ResourceCommentSummary,
+)
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.download.summary import (
+    increment_resource_downloads,
+    increment_resource_downloads_bulk,
+)
 from ckanext.feedback.services.package.summary import (
     get_package_feedback_stats_bulk,
     get_package_id_from_packages,
+    rebuild_package_feedback_summary,
+    refresh_package_feedback_summary,
+)
+from ckanext.feedback.services.resource.likes import (
+    increment_resource_like_count_bulk,
+    toggle_resource_like_count,
 )
+from ckanext.feedback.services.resource.summary import refresh_resource_summary
+from ckanext.feedback.services.utilization.summary import (
+    increment_issue_resolution_summary,
+    refresh_utilization_summary,
+)
+
+
+@pytest.fixture
+def package_summary_enabled():
+    with patch(
+        'ckanext.feedback.services.package.summary.is_package_summary_enabled',
+        return_value=True,
+    ), patch(
+        'ckanext.feedback.services.resource.likes.is_package_summary_enabled',
+        return_value=True,
+    ):
+        yield
+
+
+def get_package_feedback_summary(package_id):
+    session.expire_all()
+    return session.query(PackageFeedbackSummary).get(package_id)
 
 
 class TestSummary:
@@ -40,140 +85,260 @@ class TestSummary:
     def test_get_package_feedback_stats_bulk_with_empty_list(self):
         assert get_package_feedback_stats_bulk([]) == {}
 
-    @patch('ckanext.feedback.services.package.summary.resource_likes_service')
-    @patch('ckanext.feedback.services.package.summary.download_summary_service')
-    @patch('ckanext.feedback.services.package.summary.utilization_summary_service')
-    @patch('ckanext.feedback.services.package.summary.resource_summary_service')
+    @patch('ckanext.feedback.services.package.summary._get_package_feedback_stats_rows')
     def test_get_package_feedback_stats_bulk_with_all_invalid_packages(
-        self,
-        mock_resource_summary_service,
-        mock_utilization_summary_service,
-        mock_download_summary_service,
-        mock_resource_likes_service,
+        self, mock_get_rows
     ):
         result = get_package_feedback_stats_bulk([None, {}])
         assert result == {}
-        mock_resource_likes_service.get_package_like_count_bulk.assert_not_called()
+        mock_get_rows.assert_not_called()
 
         result = get_package_feedback_stats_bulk([{'name': 'test-dataset'}])
         assert result == {}
-        mock_resource_likes_service.get_package_like_count_bulk.assert_not_called()
+        mock_get_rows.assert_not_called()
 
-    @patch('ckanext.feedback.services.package.summary.resource_likes_service')
-    @patch('ckanext.feedback.services.package.summary.download_summary_service')
-    @patch('ckanext.feedback.services.package.summary.utilization_summary_service')
-    @patch('ckanext.feedback.services.package.summary.resource_summary_service')
-    def test_get_package_feedback_stats_bulk_with_rating_zero(
+    @pytest.mark.db_test
+    def test_get_package_feedback_stats_bulk_with_data(
         self,
-        mock_resource_summary_service,
-        mock_utilization_summary_service,
-        mock_download_summary_service,
-        mock_resource_likes_service,
+        resource,
+        resource_comment,
+        download_summary,
+        resource_like,
+        utilization,
     ):
-        pid = 'abc-123'
-        mock_resource_likes_service.get_package_like_count_bulk.return_value = {pid: 5}
-        mock_download_summary_service.get_package_downloads_bulk.return_value = {
-            pid: 10
-        }
-        mock_utilization_summary_service.get_package_utilizations_bulk.return_value = {
-            pid: 3
-        }
-        issue_resolutions_bulk = (
-            mock_utilization_summary_service.get_package_issue_resolutions_bulk
-        )
-        issue_resolutions_bulk.return_value = {pid: 1}
-        mock_resource_summary_service.get_package_comments_bulk.return_value = {pid: 7}
-        mock_resource_summary_service.get_package_rating_bulk.return_value = {pid: 0}
+        refresh_utilization_summary(resource['id'])
+        increment_issue_resolution_summary(utilization.id)
+        session.commit()
 
-        result = get_package_feedback_stats_bulk([{'id': pid}])
+        result = get_package_feedback_stats_bulk([{'id': resource['package_id']}])
         assert result == {
-            pid: {
-                'like_count': 5,
-                'downloads': 10,
-                'utilizations': 3,
-                'comments': 7,
-                'rating': 0,
+            resource['package_id']: {
+                'like_count': 1,
+                'downloads': 1,
+                'utilizations': 1,
+                'comments': 1,
+                'rating': 3,
                 'issue_resolutions': 1,
             }
         }
 
-    @patch('ckanext.feedback.services.package.summary.resource_likes_service')
-    @patch('ckanext.feedback.services.package.summary.download_summary_service')
-    @patch('ckanext.feedback.services.package.summary.utilization_summary_service')
-    @patch('ckanext.feedback.services.package.summary.resource_summary_service')
-    def test_get_package_feedback_stats_bulk_with_rating_nonzero(
-        self,
-        mock_resource_summary_service,
-        mock_utilization_summary_service,
-        mock_download_summary_service,
-        mock_resource_likes_service,
-    ):
-        pid = 'abc-123'
-        mock_resource_likes_service.get_package_like_count_bulk.return_value = {pid: 2}
-        mock_download_summary_service.get_package_downloads_bulk.return_value = {pid: 4}
-        mock_utilization_summary_service.get_package_utilizations_bulk.return_value = {
-            pid: 1
-        }
-        issue_resolutions_bulk = (
-            mock_utilization_summary_service.get_package_issue_resolutions_bulk
+    @pytest.mark.db_test
+    def test_get_package_feedback_stats_bulk_with_no_data(self, dataset):
+        result = get_package_feedback_stats_bulk(
+            [{'id': dataset['id']}, {'id': 'no-package-id'}]
         )
-        issue_resolutions_bulk.return_value = {pid: 0}
-        mock_resource_summary_service.get_package_comments_bulk.return_value = {pid: 6}
-        mock_resource_summary_service.get_package_rating_bulk.return_value = {
-            pid: 4.666
+        empty = {
+            'like_count': 0,
+            'downloads': 0,
+            'utilizations': 0,
+            'comments': 0,
+            'rating': 0,
+            'issue_resolutions': 0,
         }
+        assert result == {dataset['id']: empty, 'no-package-id': empty}
 
-        result = get_package_feedback_stats_bulk([{'id': pid}])
-        assert result == {
-            pid: {
-                'like_count': 2,
-                'downloads': 4,
-                'utilizations': 1,
-                'comments': 6,
-                'rating': 4.7,
-                'issue_resolutions': 0,
-            }
-        }
+    @pytest.mark.db_test
+    def test_get_package_feedback_stats_bulk_with_mixed_packages(self, dataset):
+        another_dataset = factories.Dataset()
+        resources = [
+            factories.Resource(package_id=dataset['id']),
+            factories.Resource(package_id=dataset['id']),
+            factories.Resource(package_id=dataset['id']),
+            factories.Resource(package_id=another_dataset['id']),
+        ]
+        summaries = [(4.0, 2, 1), (5.0, 1, 2), (1.0, 1, 4), (2.0, 1, 8)]
+        for resource, (rating, rating_comment, like_count) in zip(resources, summaries):
+            session.add(
+                ResourceCommentSummary(
+                    id=str(uuid.uuid4()),
+                    resource_id=resource['id'],
+                    comment=rating_comment,
+                    rating_comment=rating_comment,
+                    rating=rating,
+                )
+            )
+            session.add(
+                ResourceLike(
+                    id=str(uuid.uuid4()),
+                    resource_id=resource['id'],
+                    like_count=like_count,
+                )
+            )
+        # Deleted resources are not counted
+        session.query(Resource).filter(Resource.id == resources[2]['id']).update(
+            {'state': 'deleted'}
+        )
+        session.commit()
 
-    @patch('ckanext.feedback.services.package.summary.resource_likes_service')
-    @patch('ckanext.feedback.services.package.summary.download_summary_service')
-    @patch('ckanext.feedback.services.package.summary.utilization_summary_service')
-    @patch('ckanext.feedback.services.package.summary.resource_summary_service')
-    def test_get_package_feedback_stats_bulk_with_mixed_packages(
+        result = get_package_feedback_stats_bulk(
+            [{'id': dataset['id']}, None, {'id': another_dataset['id']}]
+        )
+        assert set(result.keys()) == {dataset['id'], another_dataset['id']}
+        assert result[dataset['id']]['like_count'] == 3
+        assert result[dataset['id']]['comments'] == 3
+        # (4.0 * 2 + 5.0 * 1) / 3
+        assert result[dataset['id']]['rating'] == 4.3
+        assert result[another_dataset['id']]['like_count'] == 8
+        assert result[another_dataset['id']]['rating'] == 2
+
+
+@pytest.mark.db_test
+class TestPackageFeedbackSummary:
+    def test_refresh_package_feedback_summary(
         self,
-        mock_resource_summary_service,
-        mock_utilization_summary_service,
-        mock_download_summary_service,
-        mock_resource_likes_service,
+        package_summary_enabled,
+        resource,
+        resource_comment,
+        download_summary,
+        resource_like,
+        utilization,
     ):
-        pid1 = 'abc-123'
-        pid2 = 'def-456'
-        mock_resource_likes_service.get_package_like_count_bulk.return_value = {
-            pid1: 1,
-            pid2: 2,
-        }
-        mock_download_summary_service.get_package_downloads_bulk.return_value = {
-            pid1: 3,
-            pid2: 4,
-        }
-        mock_utilization_summary_service.get_package_utilizations_bulk.return_value = {
-            pid1: 0,
-            pid2: 0,
-        }
-        issue_resolutions_bulk = (
-            mock_utilization_summary_service.get_package_issue_resolutions_bulk
+        refresh_utilization_summary(resource['id'])
+        increment_issue_resolution_summary(utilization.id)
+        refresh_package_feedback_summary([resource['package_id']])
+        session.commit()
+
+        summary = get_package_feedback_summary(resource['package_id'])
+        assert summary.like_count == 1
+        assert summary.downloads == 1
+        assert summary.utilizations == 1
+        assert summary.comments == 1
+        assert summary.total_rating == 3
+        assert summary.rating_comment == 1
+        assert summary.issue_resolutions == 1
+
+    def test_refresh_package_feedback_summary_disabled(self, resource, resource_like):
+        refresh_package_feedback_summary([resource['package_id']])
+        session.commit()
+
+        assert get_package_feedback_summary(resource['package_id']) is None
+
+    def test_get_package_feedback_stats_bulk_reads_summary(
+        self, package_summary_enabled, dataset
+    ):
+        another_dataset = factories.Dataset()
+        session.add(
+            PackageFeedbackSummary(
+                package_id=dataset['id'],
+                like_count=1,
+                downloads=2,
+                utilizations=3,
+                comments=4,
+                total_rating=9,
+                rating_comment=2,
+                issue_resolutions=5,
+            )
         )
-        issue_resolutions_bulk.return_value = {pid1: 0, pid2: 0}
-        mock_resource_summary_service.get_package_comments_bulk.return_value = {
-            pid1: 0,
-            pid2: 0,
-        }
-        mock_resource_summary_service.get_package_rating_bulk.return_value = {
-            pid1: 0,
-            pid2: 0,
+        resource = factories.Resource(package_id=another_dataset['id'])
+        session.add(
+            ResourceLike(id=str(uuid.uuid4()), resource_id=resource['id'], like_count=6)
+        )
+        session.commit()
+
+        result = get_package_feedback_stats_bulk(
+            [{'id': dataset['id']}, {'id': another_dataset['id']}]
+        )
+        assert result[dataset['id']] == {
+            'like_count': 1,
+            'downloads': 2,
+            'utilizations': 3,
+            'comments': 4,
+            'rating': 4.5,
+            'issue_resolutions': 5,
         }
+        # Packages without a summary row are aggregated on the fly
+        assert result[another_dataset['id']]['like_count'] == 6
+
+    def test_downloads_and_likes_update_summary(
+        self, package_summary_enabled, resource
+    ):
+        refresh_package_feedback_summary([resource['package_id']])
+
+        increment_resource_downloads(resource['id'])
+        increment_resource_downloads_bulk({resource['id']: 2})
+        toggle_resource_like_count(resource['id'], True)
+        increment_resource_like_count_bulk({resource['id']: 2})
+        toggle_resource_like_count(resource['id'], False)
+        session.commit()
+
+        summary = get_package_feedback_summary(resource['package_id'])
+        assert summary.downloads == 3
+        assert summary.like_count == 2
+
+    def test_unlike_without_likes_keeps_summary(self, package_summary_enabled, dataset):
+        resources = [
+            factories.Resource(package_id=dataset['id']),
+            factories.Resource(package_id=dataset['id']),
+        ]
+        toggle_resource_like_count(resources[0]['id'], True)
+        refresh_package_feedback_summary([dataset['id']])
+
+        # The other resource has no likes to take away
+        toggle_resource_like_count(resources[1]['id'], False)
+        session.commit()
+
+        assert get_package_feedback_summary(dataset['id']).like_count == 1
+
+    def test_bulk_unlike_without_likes_keeps_summary(
+        self, package_summary_enabled, dataset
+    ):
+        resources = [
+            factories.Resource(package_id=dataset['id']),
+            factories.Resource(package_id=dataset['id']),
+        ]
+        increment_resource_like_count_bulk({resources[0]['id']: 3})
+        refresh_package_feedback_summary([dataset['id']])
+
+        # The other resource has no likes to take away
+        increment_resource_like_count_bulk(
+            {resources[0]['id']: -1, resources[1]['id']: -1}
+        )
+        session.commit()
+
+        assert get_package_feedback_summary(dataset['id']).like_count == 2
+
+    def test_refresh_resource_summary_updates_summary(
+        self, package_summary_enabled, resource
+    ):
+        refresh_package_feedback_summary([resource['package_id']])
+        session.add(
+            ResourceComment(
+                id=str(uuid.uuid4()),
+                resource_id=resource['id'],
+                category=ResourceCommentCategory.REQUEST,
+                content='test_content',
+                rating=4,
+                approval=True,
+            )
+        )
+        refresh_resource_summary(resource['id'])
+        session.commit()
+
+        summary = get_package_feedback_summary(resource['package_id'])
+        assert summary.comments == 1
+        assert summary.total_rating == 4
+        assert summary.rating_comment == 1
+
+    def test_deleted_resource_is_removed_from_summary(
+        self, package_summary_enabled, resource, resource_like
+    ):
+        refresh_package_feedback_summary([resource['package_id']])
+        session.commit()
+        assert get_package_feedback_summary(resource['package_id']).like_count == 1
+
+        session.query(Resource).filter(Resource.id == resource['id']).update(
+            {'state': 'deleted'}
+        )
+        refresh_package_feedback_summary([resource['package_id']])
+        session.commit()
+
+        assert get_package_feedback_summary(resource['package_id']).like_count == 0
+
+    def test_rebuild_package_feedback_summary(self, resource, resource_like):
+        dataset = factories.Dataset()
+
+        # Rebuilt even when the summary is disabled
+        assert rebuild_package_feedback_summary(batch_size=1) == 2
 
-        result = get_package_feedback_stats_bulk([{'id': pid1}, None, {'id': pid2}])
-        assert set(result.keys()) == {pid1, pid2}
-        assert result[pid1]['like_count'] == 1
-        assert result[pid2]['like_count'] == 2
+        assert get_package_feedback_summary(resource['package_id']).like_count == 1
+        assert get_package_feedback_summary(dataset['id']).like_count == 0
@@ -0,0 +1,172 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from ckanext.feedback.services.common.cache import LocalCache, RedisCache
+from ckanext.feedback.services.ranking import cache as ranking_cache_service
+from ckanext.feedback.services.ranking.cache import (
+    GENERATION_KEY,
+    RankingCache,
+    get_cached_ranking,
+    invalidate_ranking_cache,
+)
+
+ROW = ('org', 'Org', 'dataset', 'Dataset', 'notes', 1, 10)
+
+
+def get_ranking_cache(backend=None):
+    return RankingCache(
+        backend or LocalCache(), 600, 86400, clock=lambda: datetime(2024, 6, 15)
+    )
+
+
+class TestRankingCache:
+    def test_get_loads_missing_ranking(self):
+        cache = get_ranking_cache()
+        load = MagicMock(return_value=[ROW])
+
+        assert cache.get('download', '2024-01', '2024-05', None, 5, load) == [list(ROW)]
+        assert cache.get('download', '2024-01', '2024-05', None, '5', load) == [
+            list(ROW)
+        ]
+        load.assert_called_once_with()
+
+        # Each parameter is part of the key
+        cache.get('likes', '2024-01', '2024-05', None, 5, load)
+        cache.get('download', '2024-02', '2024-05', None, 5, load)
+        cache.get('download', '2024-01', '2024-04', None, 5, load)
+        cache.get('download', '2024-01', '2024-05', 'org', 5, load)
+        cache.get('download', '2024-01', '2024-05', None, 10, load)
+        assert load.call_count == 6
+
+    def test_get_returns_copies(self):
+        cache = get_ranking_cache()
+        cache.get('download', '2024-01', '2024-05', None, 5, lambda: [ROW])
+
+        rows = cache.get('download', '2024-01', '2024-05', None, 5, MagicMock())
+        rows[0][5] = 2
+
+        assert cache.get('download', '2024-01', '2024-05', None, 5, MagicMock()) == [
+            list(ROW)
+        ]
+
+    def test_closed_periods_are_kept_longer(self):
+        backend = MagicMock()
+        backend.get_many.return_value = {}
+        cache = get_ranking_cache(backend)
+
+        cache.get('download', '2024-01', '2024-05', None, 5, lambda: [])
+        cache.get('download', '2024-01', '2024-04', None, 5, lambda: [])
+
+        assert backend.set_many.call_args_list[0][0][1] == 600
+        assert backend.set_many.call_args_list[1][0][1] == 86400
+
+    def test_invalidate(self):
+        cache = get_ranking_cache()
+        cache.get('download', '2024-01', '2024-05', None, 5, lambda: [ROW])
+
+        cache.invalidate()
+
+        load = MagicMock(return_value=[])
+        assert cache.get('download', '2024-01', '2024-05', None, 5, load) == []
+        load.assert_called_once_with()
+        assert GENERATION_KEY in cache.backend.get_many([GENERATION_KEY])
+
+    def test_invalidate_with_shared_generation(self):
+        generation_backend = LocalCache()
+        caches = [
+            RankingCache(
+                LocalCache(),
+                600,
+                86400,
+                clock=lambda: datetime(2024, 6, 15),
+                generation_backend=generation_backend,
+            )
+            for _ in range(2)
+        ]
+        for cache in caches:
+            cache.get('download', '2024-01', '2024-05', None, 5, lambda: [ROW])
+
+        # Invalidated by another worker
+        caches[0].invalidate()
+
+        load = MagicMock(return_value=[])
+        assert caches[1].get('download', '2024-01', '2024-05', None, 5, load) == []
+        load.assert_called_once_with()
+        assert GENERATION_KEY not in caches[1].backend.get_many([GENERATION_KEY])
+
+    def test_get_with_backend_error(self):
+        backend = MagicMock()
+        backend.get_many.side_effect = Exception('error')
+        backend.set_many.side_effect = Exception('error')
+        cache = get_ranking_cache(backend)
+
+        assert cache.get('download', '2024-01', '2024-05', None, 5, lambda: [ROW]) == [
+            ROW
+        ]
+        cache.invalidate()
+
+        backend.get_many.return_value = {}
+        backend.get_many.side_effect = None
+        assert cache.get('download', '2024-01', '2024-05', None, 5, lambda: [ROW]) == [
+            list(ROW)
+        ]
+
+
+class TestRankingCacheEnabled:
+    @patch('ckanext.feedback.services.ranking.cache.get_ranking_cache')
+    @patch('ckanext.feedback.services.ranking.cache.is_ranking_cache_enabled')
+    def test_get_cached_ranking(
+        self, mock_is_ranking_cache_enabled, mock_get_ranking_cache
+    ):
+        mock_is_ranking_cache_enabled.return_value = True
+        mock_get_ranking_cache.return_value = get_ranking_cache()
+        load = MagicMock(return_value=[ROW])
+
+        get_cached_ranking('download', '2024-01', '2024-05', None, 5, load)
+        get_cached_ranking('download', '2024-01', '2024-05', None, 5, load)
+
+        load.assert_called_once_with()
+
+    @patch('ckanext.feedback.services.ranking.cache.get_ranking_cache')
+    @patch('ckanext.feedback.services.ranking.cache.is_ranking_cache_enabled')
+    def test_get_cached_ranking_disabled(
+        self, mock_is_ranking_cache_enabled, mock_get_ranking_cache
+    ):
+        mock_is_ranking_cache_enabled.return_value = False
+        load = MagicMock(return_value=[ROW])
+
+        assert get_cached_ranking('download', '2024-01', '2024-05', None, 5, load) == [
+            ROW
+        ]
+        invalidate_ranking_cache()
+
+        mock_get_ranking_cache.assert_not_called()
+
+    @patch('ckanext.feedback.services.ranking.cache.get_ranking_cache')
+    @patch('ckanext.feedback.services.ranking.cache.is_ranking_cache_enabled')
+    def test_invalidate_ranking_cache(
+        self, mock_is_ranking_cache_enabled, mock_get_ranking_cache
+    ):
+        mock_is_ranking_cache_enabled.return_value = True
+
+        invalidate_ranking_cache()
+
+        mock_get_ranking_cache.return_value.invalidate.assert_called_once_with()
+
+    @patch('ckanext.feedback.services.ranking.cache._ranking_cache', None)
+    @patch('ckanext.feedback.services.ranking.cache.connect_to_redis')
+    @patch('ckanext.feedback.services.ranking.cache.FeedbackConfig')
+    def test_get_ranking_cache_local_with_shared_generation(
+        self, mock_feedback_config, mock_connect_to_redis
+    ):
+        ranking_cache = mock_feedback_config.return_value.ranking_cache
+        ranking_cache.backend.get.return_value = 'local'
+        ranking_cache.max_size.get.return_value = 10
+        ranking_cache.ttl.get.return_value = 600
+        ranking_cache.closed_period_ttl.get.return_value = 86400
+
+        cache = ranking_cache_service.get_ranking_cache()
+
+        assert isinstance(cache.backend, LocalCache)
+        assert isinstance(cache.generation_backend, RedisCache)
+        assert cache.generation_backend._client is mock_connect_to_redis.return_value
@@ -1,14 +1,62 @@
 import logging
+from datetime import date
+from unittest.mock import patch
 
 import pytest
+from ckan.model import Resource
 
 import ckanext.feedback.services.ranking.dataset as dataset_ranking_service
 from ckanext.feedback.models.download import DownloadMonthly, DownloadSummary
+from ckanext.feedback.models.ranking import PackageMetricMonthly, PackageTrendingScore
 from ckanext.feedback.models.session import session
 
 log = logging.getLogger(__name__)
 
 
+@pytest.fixture
+def ranking_rollup_enabled():
+    with patch(
+        'ckanext.feedback.services.ranking.dataset.is_ranking_rollup_enabled',
+        return_value=True,
+    ):
+        yield
+
+
+def add_downloads(resource_id, downloads):
+    # `downloads` is a list of (created, count) of DownloadMonthly rows
+    session.add(
+        DownloadSummary(
+            id=f'sum_{resource_id}',
+            resource_id=resource_id,
+            download=sum(count for _, count in downloads),
+            created='2023-03-31 00:00:00',
+            updated='2023-03-31 00:00:00',
+        )
+    )
+    for index, (created, count) in enumerate(downloads):
+        session.add(
+            DownloadMonthly(
+                id=f'mon_{resource_id}_{index}',
+                resource_id=resource_id,
+                download_count=count,
+                created=created,
+                updated=created,
+            )
+        )
+    session.commit()
+
+
+def get_package_metric_monthly(metric):
+    return [
+        (row.package_id, row.month, row.count)
+        for row in (
+            session.query(PackageMetricMonthly)
+            .filter(PackageMetricMonthly.metric == metric)
+            .order_by(PackageMetricMonthly.package_id, PackageMetricMonthly.month)
+        )
+    ]
+
+
 @pytest.mark.db_test
 @pytest.mark.usefixtures('with_plugins', 'with_request_context')
 class TestRankingDataset:
@@ -407,3 +455,198 @@ class TestRankingDataset:
             [organization['name']],
         )
         assert result2 == []
+
+
+@pytest.mark.db_test
+@pytest.mark.usefixtures('with_plugins', 'with_request_context')
+class TestPackageMetricMonthly:
+    def test_rebuild_package_metric_monthly(self, dataset, resource_factory):
+        resource1 = resource_factory(package_id=dataset['id'])
+        resource2 = resource_factory(package_id=dataset['id'])
+        add_downloads(
+            resource1['id'],
+            [('2023-03-01 00:00:00', 1), ('2023-03-31 23:59:59', 2)],
+        )
+        add_downloads(resource2['id'], [('2023-04-15 00:00:00', 4)])
+
+        assert dataset_ranking_service.rebuild_package_metric_monthly() == 2
+
+        assert get_package_metric_monthly('download') == [
+            (dataset['id'], date(2023, 3, 1), 3),
+            (dataset['id'], date(2023, 4, 1), 4),
+        ]
+        assert get_package_metric_monthly('likes') == []
+
+    def test_rebuild_package_metric_monthly_by_period(self, dataset, resource):
+        # Rows are counted in the month of their period, which need not be
+        # the month of their created timestamp
+        session.add(
+            DownloadMonthly(
+                id='mon_period',
+                resource_id=resource['id'],
+                download_count=2,
+                period=date(2023, 4, 1),
+                created='2023-03-31 23:59:59',
+            )
+        )
+        session.commit()
+
+        dataset_ranking_service.rebuild_package_metric_monthly()
+
+        assert get_package_metric_monthly('download') == [
+            (dataset['id'], date(2023, 4, 1), 2),
+        ]
+
+    def test_rebuild_package_metric_monthly_since(self, dataset, resource):
+        add_downloads(
+            resource['id'],
+            [('2023-03-01 00:00:00', 1), ('2023-04-01 00:00:00', 2)],
+        )
+        dataset_ranking_service.rebuild_package_metric_monthly()
+        session.query(DownloadMonthly).update({'download_count': 5})
+        session.commit()
+
+        dataset_ranking_service.rebuild_package_metric_monthly(since=date(2023, 4, 15))
+
+        # Months before `since` are left as they were
+        assert get_package_metric_monthly('download') == [
+            (dataset['id'], date(2023, 3, 1), 1),
+            (dataset['id'], date(2023, 4, 1), 5),
+        ]
+
+    def test_refresh_package_metric_monthly(
+        self, ranking_rollup_enabled, dataset, resource
+    ):
+        add_downloads(resource['id'], [('2023-03-01 00:00:00', 1)])
+        dataset_ranking_service.rebuild_package_metric_monthly()
+
+        session.query(Resource).filter(Resource.id == resource['id']).update(
+            {'state': 'deleted'}
+        )
+        dataset_ranking_service.refresh_package_metric_monthly([dataset['id']])
+
+        assert get_package_metric_monthly('download') == []
+
+    def test_refresh_package_metric_monthly_disabled(self, dataset, resource):
+        add_downloads(resource['id'], [('2023-03-01 00:00:00', 1)])
+
+        dataset_ranking_service.refresh_package_metric_monthly([dataset['id']])
+
+        assert get_package_metric_monthly('download') == []
+
+    def test_get_generic_ranking_reads_rollup(
+        self,
+        ranking_rollup_enabled,
+        organization_factory,
+        package_factory,
+        resource_factory,
+    ):
+        org = organization_factory()
+        pkg_a = package_factory(owner_org=org['id'])
+        pkg_b = package_factory(owner_org=org['id'])
+        res_a = resource_factory(package_id=pkg_a['id'])
+        res_b = resource_factory(package_id=pkg_b['id'])
+        add_downloads(
+            res_a['id'], [('2023-02-28 23:59:59', 99), ('2023-03-01 00:00:00', 1)]
+        )
+        add_downloads(res_b['id'], [('2023-03-15 00:00:00', 2)])
+        dataset_ranking_service.rebuild_package_metric_monthly()
+
+        # The monthly tables are not read
+        session.query(DownloadMonthly).delete()
+        session.commit()
+
+        result = dataset_ranking_service.get_generic_ranking(
+            10,
+            '2023-03',
+            '2023-03',
+            DownloadMonthly,
+            'download_count',
+            DownloadSummary,
+            'download',
+            organization_name=org['name'],
+            metric='download',
+        )
+
+        assert [(row[2], row[5], row[6]) for row in result] == [
+            (pkg_b['name'], 2, 2),
+            (pkg_a['name'], 1, 100),
+        ]
+
+    def test_get_generic_ranking_without_metric_ignores_rollup(
+        self, ranking_rollup_enabled, organization, package, resource
+    ):
+        add_downloads(resource['id'], [('2023-03-01 00:00:00', 1)])
+
+        result = dataset_ranking_service.get_generic_ranking(
+            10,
+            '2023-01',
+            '2023-12',
+            DownloadMonthly,
+            'download_count',
+            DownloadSummary,
+            'download',
+        )
+
+        assert len(result) == 1
+
+
+@pytest.mark.db_test
+@pytest.mark.usefixtures('with_plugins', 'with_request_context')
+class TestPackageTrendingScore:
+    def add_package_metric_monthly(self, package_id, metric, month, count):
+        session.add(
+            PackageMetricMonthly(
+                package_id=package_id, metric=metric, month=month, count=count
+            )
+        )
+
+    def test_refresh_package_trending_score(self, package_factory):
+        pkg_a = package_factory()
+        pkg_b = package_factory()
+        self.add_package_metric_monthly(pkg_a['id'], 'download', date(2024, 3, 1), 4)
+        self.add_package_metric_monthly(pkg_a['id'], 'likes', date(2024, 2, 1), 2)
+        # Older than ten half-lives
+        self.add_package_metric_monthly(pkg_a['id'], 'download', date(2023, 1, 1), 99)
+        self.add_package_metric_monthly(
+            pkg_b['id'], 'resource_comments', date(2024, 1, 1), 4
+        )
+        pkg_stale = package_factory()
+        session.add(PackageTrendingScore(package_id=pkg_stale['id'], score=1))
+        session.commit()
+
+        scored = dataset_ranking_service.refresh_package_trending_score(
+            today=date(2024, 3, 15)
+        )
+
+        assert scored == 2
+        scores = {
+            row.package_id: row.score for row in session.query(PackageTrendingScore)
+        }
+        # 4 * 1 + 2 * 2 * 0.5, with a half-life of one month
+        assert scores[pkg_a['id']] == pytest.approx(6)
+        # 4 * 3 * 0.25
+        assert scores[pkg_b['id']] == pytest.approx(3)
+        assert pkg_stale['id'] not in scores
+
+    def test_get_trending_ranking(self, organization_factory, package_factory):
+        org_a = organization_factory()
+        org_b = organization_factory()
+        pkg_a = package_factory(owner_org=org_a['id'])
+        pkg_b = package_factory(owner_org=org_b['id'])
+        pkg_zero = package_factory(owner_org=org_a['id'])
+        session.add(PackageTrendingScore(package_id=pkg_a['id'], score=1.5))
+        session.add(PackageTrendingScore(package_id=pkg_b['id'], score=2.5))
+        session.add(PackageTrendingScore(package_id=pkg_zero['id'], score=0))
+        session.commit()
+
+        result = dataset_ranking_service.get_trending_ranking(10)
+
+        assert [(row[2], row[5], row[6]) for row in result] == [
+            (pkg_b['name'], 2.5, None),
+            (pkg_a['name'], 1.5, None),
+        ]
+        result = dataset_ranking_service.get_trending_ranking(
+            10, organization_name=org_a['name']
+        )
+        assert [row[2] for row in result] == [pkg_a['name']]
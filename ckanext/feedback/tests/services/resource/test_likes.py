@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 import pytest
 
@@ -12,7 +12,10 @@ from ckanext.feedback.services.resource.likes import (
     get_resource_like_count,
     get_resource_like_count_monthly,
     increment_resource_like_count,
+    increment_resource_like_count_bulk,
     increment_resource_like_count_monthly,
+    increment_resource_like_count_monthly_bulk,
+    toggle_resource_like_count,
 )
 
 
@@ -71,12 +74,21 @@ class TestLikes:
 
         decrement_resource_like_count(resource['id'])
         session.commit()
+        session.expire_all()
         resource_like = get_resource_like(resource['id'])
 
         assert resource_like.like_count == 0
         assert resource_like.created == datetime(2024, 1, 1, 15, 0, 0)
         assert resource_like.updated == datetime(2024, 1, 1, 15, 0, 0)
 
+        # The count never goes below zero
+        decrement_resource_like_count(resource['id'])
+        decrement_resource_like_count_monthly(resource['id'])
+        session.commit()
+        session.expire_all()
+
+        assert get_resource_like(resource['id']).like_count == 0
+
     @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 0))
     def test_increment_resource_like_count_monthly(self, resource):
         increment_resource_like_count_monthly(resource['id'])
@@ -84,16 +96,37 @@ class TestLikes:
         resource_like_monthly = get_resource_like_monthly(resource['id'])
 
         assert resource_like_monthly.like_count == 1
+        assert resource_like_monthly.period == date(2024, 1, 1)
         assert resource_like_monthly.created == datetime(2024, 1, 1, 15, 0, 0)
         assert resource_like_monthly.updated == datetime(2024, 1, 1, 15, 0, 0)
 
         increment_resource_like_count_monthly(resource['id'])
         session.commit()
+        session.expire_all()
         resource_like_monthly = get_resource_like_monthly(resource['id'])
 
         assert resource_like_monthly.like_count == 2
         assert resource_like_monthly.created == datetime(2024, 1, 1, 15, 0, 0)
         assert resource_like_monthly.updated == datetime(2024, 1, 1, 15, 0, 0)
+        assert session.query(ResourceLikeMonthly).count() == 1
+
+    def test_increment_resource_like_count_monthly_in_new_month(
+        self, resource, freezer
+    ):
+        freezer.move_to(datetime(2024, 1, 31, 23, 59, 59))
+        increment_resource_like_count_monthly(resource['id'])
+        session.commit()
+        freezer.move_to(datetime(2024, 2, 1, 0, 0, 0))
+        increment_resource_like_count_monthly(resource['id'])
+        session.commit()
+
+        rows = (
+            session.query(ResourceLikeMonthly.period, ResourceLikeMonthly.like_count)
+            .filter(ResourceLikeMonthly.resource_id == resource['id'])
+            .order_by(ResourceLikeMonthly.period)
+            .all()
+        )
+        assert rows == [(date(2024, 1, 1), 1), (date(2024, 2, 1), 1)]
 
     @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 0))
     def test_decrement_resource_like_count_monthly(self, resource):
@@ -113,12 +146,113 @@ class TestLikes:
 
         decrement_resource_like_count_monthly(resource['id'])
         session.commit()
+        session.expire_all()
         resource_like_monthly = get_resource_like_monthly(resource['id'])
 
         assert resource_like_monthly.like_count == 0
         assert resource_like_monthly.created == datetime(2024, 1, 1, 15, 0, 0)
         assert resource_like_monthly.updated == datetime(2024, 1, 1, 15, 0, 0)
 
+    @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 0))
+    def test_toggle_resource_like_count(self, resource):
+        toggle_resource_like_count(resource['id'], False)
+        session.commit()
+
+        assert get_resource_like(resource['id']) is None
+        assert get_resource_like_monthly(resource['id']) is None
+
+        toggle_resource_like_count(resource['id'], True)
+        toggle_resource_like_count(resource['id'], True)
+        session.commit()
+        session.expire_all()
+        resource_like = get_resource_like(resource['id'])
+        resource_like_monthly = get_resource_like_monthly(resource['id'])
+
+        assert resource_like.like_count == 2
+        assert resource_like.created == datetime(2024, 1, 1, 15, 0, 0)
+        assert resource_like_monthly.like_count == 2
+        assert resource_like_monthly.period == date(2024, 1, 1)
+
+        for _ in range(3):
+            toggle_resource_like_count(resource['id'], False)
+        session.commit()
+        session.expire_all()
+
+        assert get_resource_like(resource['id']).like_count == 0
+        assert get_resource_like_monthly(resource['id']).like_count == 0
+
+    def test_toggle_resource_like_count_in_new_month(self, resource, freezer):
+        freezer.move_to(datetime(2024, 1, 31, 23, 59, 59))
+        toggle_resource_like_count(resource['id'], True)
+        session.commit()
+        freezer.move_to(datetime(2024, 2, 1, 0, 0, 0))
+        toggle_resource_like_count(resource['id'], False)
+        session.commit()
+        session.expire_all()
+
+        # Only the current month is decremented, and it has no row yet
+        assert get_resource_like(resource['id']).like_count == 0
+        rows = (
+            session.query(ResourceLikeMonthly.period, ResourceLikeMonthly.like_count)
+            .filter(ResourceLikeMonthly.resource_id == resource['id'])
+            .all()
+        )
+        assert rows == [(date(2024, 1, 1), 1)]
+
+    @pytest.mark.freeze_time(datetime(2024, 1, 1, 15, 0, 0))
+    def test_increment_resource_like_count_bulk(self, resource):
+        increment_resource_like_count_bulk({resource['id']: 2})
+        session.commit()
+        increment_resource_like_count_bulk({resource['id']: -1})
+        session.commit()
+        session.expire_all()
+
+        resource_like = get_resource_like(resource['id'])
+        assert resource_like.like_count == 1
+        assert resource_like.updated == datetime(2024, 1, 1, 15, 0, 0)
+
+        increment_resource_like_count_bulk({resource['id']: -3})
+        session.commit()
+        session.expire_all()
+        assert get_resource_like(resource['id']).like_count == 0
+
+        increment_resource_like_count_bulk({})
+
+    def test_increment_resource_like_count_bulk_without_likes(self, resource):
+        increment_resource_like_count_bulk({resource['id']: -1})
+        session.commit()
+
+        assert get_resource_like(resource['id']) is None
+
+    @pytest.mark.freeze_time(datetime(2024, 2, 1, 15, 0, 0))
+    def test_increment_resource_like_count_monthly_bulk(self, resource):
+        increment_resource_like_count_monthly_bulk(
+            {
+                (resource['id'], datetime(2024, 1, 1)): 2,
+                (resource['id'], datetime(2024, 2, 1)): 1,
+            }
+        )
+        session.commit()
+        increment_resource_like_count_monthly_bulk(
+            {
+                (resource['id'], datetime(2024, 1, 1)): -1,
+                (resource['id'], datetime(2024, 2, 1)): -2,
+                (resource['id'], datetime(2024, 3, 1)): -1,
+            }
+        )
+        session.commit()
+        session.expire_all()
+
+        like_monthly = {
+            row.period: row.like_count
+            for row in session.query(ResourceLikeMonthly).filter(
+                ResourceLikeMonthly.resource_id == resource['id']
+            )
+        }
+        assert like_monthly == {date(2024, 1, 1): 1, date(2024, 2, 1): 0}
+
+        increment_resource_like_count_monthly_bulk({})
+
     def test_get_resource_like_count(self, resource_like):
         assert (
             get_resource_like_count(resource_like.resource_id)
@@ -1,11 +1,21 @@
+import uuid
+from datetime import date, datetime
+from unittest.mock import patch
+
 import pytest
 from ckan.model import User
+from ckan.tests import factories
+from flask import Flask
 
 from ckanext.feedback.models.resource_comment import (
     ResourceComment,
+    ResourceCommentCategory,
+    ResourceCommentMonthly,
     ResourceCommentSummary,
 )
 from ckanext.feedback.models.session import session
+from ckanext.feedback.services.common.cache import LocalCache, StatsCache
+from ckanext.feedback.services.download.summary import increment_resource_downloads
 from ckanext.feedback.services.resource.comment import (
     approve_resource_comment,
     create_resource_comment,
@@ -18,11 +28,41 @@ from ckanext.feedback.services.resource.summary import (
     get_package_rating,
     get_package_rating_bulk,
     get_resource_comments,
+    get_resource_feedback_stats,
+    get_resource_feedback_stats_bulk,
     get_resource_rating,
+    rebuild_resource_comment_monthly,
+    refresh_resource_comment_monthly,
     refresh_resource_summary,
 )
 
 
+def register_resource_comment(resource_id, approved, approval=True, content='test'):
+    resource_comment = ResourceComment(
+        id=str(uuid.uuid4()),
+        resource_id=resource_id,
+        category=ResourceCommentCategory.REQUEST,
+        content=content,
+        created=approved,
+        approval=approval,
+        approved=approved if approval else None,
+    )
+    session.add(resource_comment)
+    session.commit()
+    return resource_comment
+
+
+def get_resource_comment_monthly(resource_id):
+    return [
+        (row.period, row.comment_count, row.created)
+        for row in (
+            session.query(ResourceCommentMonthly)
+            .filter(ResourceCommentMonthly.resource_id == resource_id)
+            .order_by(ResourceCommentMonthly.period)
+        )
+    ]
+
+
 @pytest.mark.db_test
 class TestSummary:
     def test_get_package_comments(self, resource, resource_comment):
@@ -66,6 +106,90 @@ class TestSummary:
         result = get_resource_rating(resource['id'])
         assert result == 0
 
+    def test_get_resource_feedback_stats_bulk(
+        self, resource, resource_comment, download_summary, resource_like
+    ):
+        result = get_resource_feedback_stats_bulk([resource['id'], 'no-resource-id'])
+        assert result == {
+            resource['id']: {
+                'downloads': 1,
+                'utilizations': 0,
+                'issue_resolutions': 0,
+                'comments': 1,
+                'rating': resource_comment.rating,
+                'like_count': 1,
+            },
+            'no-resource-id': {
+                'downloads': 0,
+                'utilizations': 0,
+                'issue_resolutions': 0,
+                'comments': 0,
+                'rating': 0,
+                'like_count': 0,
+            },
+        }
+
+    def test_get_resource_feedback_stats_bulk_with_no_resource_ids(self):
+        assert get_resource_feedback_stats_bulk([]) == {}
+
+    @patch('ckanext.feedback.services.common.cache.get_stats_cache')
+    @patch('ckanext.feedback.services.common.cache.is_stats_cache_enabled')
+    def test_get_resource_feedback_stats_bulk_with_stats_cache(
+        self, mock_is_stats_cache_enabled, mock_get_stats_cache, resource
+    ):
+        mock_is_stats_cache_enabled.return_value = True
+        mock_get_stats_cache.return_value = StatsCache(LocalCache(), 60)
+
+        get_resource_feedback_stats_bulk([resource['id']])
+        result = get_resource_feedback_stats_bulk([resource['id']])
+        assert result[resource['id']]['downloads'] == 0
+        assert mock_get_stats_cache.return_value.hits == 1
+
+        # The cached stats are dropped when the download is committed
+        increment_resource_downloads(resource['id'])
+        session.commit()
+
+        result = get_resource_feedback_stats_bulk([resource['id']])
+        assert result[resource['id']]['downloads'] == 1
+        assert mock_get_stats_cache.return_value.misses == 2
+
+    @patch(
+        'ckanext.feedback.services.resource.summary.get_resource_feedback_stats_bulk'
+    )
+    def test_get_resource_feedback_stats(self, mock_get_stats_bulk):
+        mock_get_stats_bulk.side_effect = lambda resource_ids: {
+            resource_id: {'downloads': 1} for resource_id in resource_ids
+        }
+
+        with Flask(__name__).test_request_context():
+            assert get_resource_feedback_stats(
+                'package-a', 'resource-a', ['resource-a', 'resource-b']
+            ) == {'downloads': 1}
+            get_resource_feedback_stats(
+                'package-a', 'resource-b', ['resource-a', 'resource-b']
+            )
+            mock_get_stats_bulk.assert_called_once_with({'resource-a', 'resource-b'})
+
+            # Resources of another package are fetched again
+            get_resource_feedback_stats('package-b', 'resource-c', ['resource-c'])
+            assert mock_get_stats_bulk.call_count == 2
+
+        # The stats are not kept across requests
+        with Flask(__name__).test_request_context():
+            get_resource_feedback_stats('package-b', 'resource-c', ['resource-c'])
+            assert mock_get_stats_bulk.call_count == 3
+
+    @patch(
+        'ckanext.feedback.services.resource.summary.get_resource_feedback_stats_bulk'
+    )
+    def test_get_resource_feedback_stats_without_request(self, mock_get_stats_bulk):
+        mock_get_stats_bulk.return_value = {'resource-a': {'downloads': 1}}
+
+        result = get_resource_feedback_stats('package-a', 'resource-a', ['resource-b'])
+
+        assert result == {'downloads': 1}
+        mock_get_stats_bulk.assert_called_once_with(['resource-a'])
+
     def test_create_resource_summary(self, resource):
         create_resource_summary(resource['id'])
         query = session.query(ResourceCommentSummary).all()
@@ -108,3 +232,78 @@ class TestSummary:
         assert summary.comment == 2
         assert summary.rating == 4.0
         assert summary.updated
+
+    def test_refresh_resource_comment_monthly(self, resource):
+        register_resource_comment(resource['id'], datetime(2024, 1, 20))
+        register_resource_comment(resource['id'], datetime(2024, 1, 10))
+        february = register_resource_comment(resource['id'], datetime(2024, 2, 5))
+        register_resource_comment(resource['id'], datetime(2024, 2, 6), approval=False)
+        register_resource_comment(resource['id'], datetime(2024, 2, 7), content=None)
+
+        assert refresh_resource_comment_monthly([resource['id']]) == 2
+        session.commit()
+
+        assert get_resource_comment_monthly(resource['id']) == [
+            (date(2024, 1, 1), 2, datetime(2024, 1, 10)),
+            (date(2024, 2, 1), 1, datetime(2024, 2, 5)),
+        ]
+
+        # Comments deleted or no longer approved leave their months
+        session.delete(february)
+        assert refresh_resource_comment_monthly([resource['id']]) == 1
+        session.commit()
+
+        assert get_resource_comment_monthly(resource['id']) == [
+            (date(2024, 1, 1), 2, datetime(2024, 1, 10)),
+        ]
+
+    def test_refresh_resource_comment_monthly_updates_existing_periods(self, resource):
+        register_resource_comment(resource['id'], datetime(2024, 1, 20))
+        refresh_resource_comment_monthly([resource['id']])
+        session.commit()
+        monthly = session.query(ResourceCommentMonthly).one()
+        monthly_id = monthly.id
+
+        register_resource_comment(resource['id'], datetime(2024, 1, 10))
+        assert refresh_resource_comment_monthly([resource['id']]) == 1
+        session.commit()
+        session.expire_all()
+
+        monthly = session.query(ResourceCommentMonthly).one()
+        assert monthly.id == monthly_id
+        assert monthly.comment_count == 2
+        assert monthly.created == datetime(2024, 1, 10)
+
+    def test_refresh_resource_comment_monthly_without_resources(self):
+        assert refresh_resource_comment_monthly([]) == 0
+
+    def test_refresh_resource_summary_refreshes_monthly(self, resource):
+        register_resource_comment(resource['id'], datetime(2024, 3, 15))
+
+        refresh_resource_summary(resource['id'])
+        session.commit()
+
+        assert get_resource_comment_monthly(resource['id']) == [
+            (date(2024, 3, 1), 1, datetime(2024, 3, 15)),
+        ]
+
+    def test_rebuild_resource_comment_monthly(self, resource):
+        stale_resource = factories.Resource()
+        register_resource_comment(resource['id'], datetime(2024, 1, 10))
+        register_resource_comment(resource['id'], datetime(2024, 2, 10))
+        session.add(
+            ResourceCommentMonthly(
+                resource_id=stale_resource['id'],
+                comment_count=3,
+                period=date(2024, 1, 1),
+            )
+        )
+        session.commit()
+
+        assert rebuild_resource_comment_monthly(batch_size=1) == 2
+
+        assert get_resource_comment_monthly(resource['id']) == [
+            (date(2024, 1, 1), 1, datetime(2024, 1, 10)),
+            (date(2024, 2, 1), 1, datetime(2024, 2, 10)),
+        ]
+        assert get_resource_comment_monthly(stale_resource['id']) == []
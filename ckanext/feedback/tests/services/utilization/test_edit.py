@@ -3,13 +3,16 @@ import uuid
 import pytest
 
 from ckanext.feedback.models.session import session
-from ckanext.feedback.models.utilization import Utilization
+from ckanext.feedback.models.utilization import Utilization, UtilizationCommentMonthly
 from ckanext.feedback.services.utilization.edit import (
     delete_utilization,
     get_resource_details,
     get_utilization_details,
     update_utilization,
 )
+from ckanext.feedback.services.utilization.summary import (
+    refresh_utilization_comment_monthly,
+)
 
 
 def get_registered_utilization(id):
@@ -83,3 +86,25 @@ class TestUtilizationDetailsService:
         session.commit()
 
         assert get_registered_utilization(id) is None
+
+    def test_delete_utilization_refreshes_comment_monthly(
+        self, resource, utilization_comment
+    ):
+        refresh_utilization_comment_monthly([resource['id']])
+        session.commit()
+        assert (
+            session.query(UtilizationCommentMonthly)
+            .filter(UtilizationCommentMonthly.resource_id == resource['id'])
+            .count()
+            == 1
+        )
+
+        delete_utilization(utilization_comment.utilization_id)
+        session.commit()
+
+        assert (
+            session.query(UtilizationCommentMonthly)
+            .filter(UtilizationCommentMonthly.resource_id == resource['id'])
+            .count()
+            == 0
+        )
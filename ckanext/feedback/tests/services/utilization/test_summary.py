@@ -1,11 +1,18 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 import pytest
+from ckan.tests import factories
 
 from ckanext.feedback.models.issue import IssueResolutionSummary
 from ckanext.feedback.models.session import session
-from ckanext.feedback.models.utilization import Utilization, UtilizationSummary
+from ckanext.feedback.models.utilization import (
+    Utilization,
+    UtilizationComment,
+    UtilizationCommentCategory,
+    UtilizationCommentMonthly,
+    UtilizationSummary,
+)
 from ckanext.feedback.services.utilization.summary import (
     create_utilization_summary,
     get_package_issue_resolutions,
@@ -15,6 +22,8 @@ from ckanext.feedback.services.utilization.summary import (
     get_resource_issue_resolutions,
     get_resource_utilizations,
     increment_issue_resolution_summary,
+    rebuild_utilization_comment_monthly,
+    refresh_utilization_comment_monthly,
     refresh_utilization_summary,
 )
 
@@ -47,6 +56,32 @@ def register_utilization(id, resource_id, title, description, approval):
     session.commit()
 
 
+def register_utilization_comment(utilization_id, approved, approval=True):
+    utilization_comment = UtilizationComment(
+        id=str(uuid.uuid4()),
+        utilization_id=utilization_id,
+        category=UtilizationCommentCategory.REQUEST,
+        content='test',
+        created=approved,
+        approval=approval,
+        approved=approved if approval else None,
+    )
+    session.add(utilization_comment)
+    session.commit()
+    return utilization_comment
+
+
+def get_utilization_comment_monthly(resource_id):
+    return [
+        (row.period, row.comment_count, row.created)
+        for row in (
+            session.query(UtilizationCommentMonthly)
+            .filter(UtilizationCommentMonthly.resource_id == resource_id)
+            .order_by(UtilizationCommentMonthly.period)
+        )
+    ]
+
+
 def resister_issue_resolution_summary(id, utilization_id, created, updated):
     issue_resolution_summary = IssueResolutionSummary(
         id=id,
@@ -175,3 +210,60 @@ class TestUtilizationDetailsService:
         assert issue_resolution_summary.issue_resolution == 2
         assert issue_resolution_summary.created == datetime(2024, 1, 1, 15, 0, 0)
         assert issue_resolution_summary.updated == datetime(2024, 1, 1, 15, 0, 0)
+
+    def test_refresh_utilization_comment_monthly(self, resource):
+        utilization_id = str(uuid.uuid4())
+        another_utilization_id = str(uuid.uuid4())
+        register_utilization(utilization_id, resource['id'], 'title', 'desc', True)
+        register_utilization(
+            another_utilization_id, resource['id'], 'title', 'desc', False
+        )
+        register_utilization_comment(utilization_id, datetime(2024, 1, 20))
+        register_utilization_comment(another_utilization_id, datetime(2024, 1, 10))
+        february = register_utilization_comment(utilization_id, datetime(2024, 2, 5))
+        register_utilization_comment(
+            utilization_id, datetime(2024, 2, 6), approval=False
+        )
+
+        assert refresh_utilization_comment_monthly([resource['id']]) == 2
+        session.commit()
+
+        assert get_utilization_comment_monthly(resource['id']) == [
+            (date(2024, 1, 1), 2, datetime(2024, 1, 10)),
+            (date(2024, 2, 1), 1, datetime(2024, 2, 5)),
+        ]
+
+        # Comments deleted or no longer approved leave their months
+        session.delete(february)
+        assert refresh_utilization_comment_monthly([resource['id']]) == 1
+        session.commit()
+
+        assert get_utilization_comment_monthly(resource['id']) == [
+            (date(2024, 1, 1), 2, datetime(2024, 1, 10)),
+        ]
+
+    def test_refresh_utilization_comment_monthly_without_resources(self):
+        assert refresh_utilization_comment_monthly([]) == 0
+
+    def test_rebuild_utilization_comment_monthly(self, resource):
+        stale_resource = factories.Resource()
+        utilization_id = str(uuid.uuid4())
+        register_utilization(utilization_id, resource['id'], 'title', 'desc', True)
+        register_utilization_comment(utilization_id, datetime(2024, 1, 10))
+        register_utilization_comment(utilization_id, datetime(2024, 2, 10))
+        session.add(
+            UtilizationCommentMonthly(
+                resource_id=stale_resource['id'],
+                comment_count=3,
+                period=date(2024, 1, 1),
+            )
+        )
+        session.commit()
+
+        assert rebuild_utilization_comment_monthly(batch_size=1) == 2
+
+        assert get_utilization_comment_monthly(resource['id']) == [
+            (date(2024, 1, 1), 1, datetime(2024, 1, 10)),
+            (date(2024, 2, 1), 1, datetime(2024, 2, 10)),
+        ]
+        assert get_utilization_comment_monthly(stale_resource['id']) == []
@@ -12,8 +12,9 @@ from ckanext.feedback.command.feedback import (
     create_resource_tables,
     create_utilization_tables,
 )
-from ckanext.feedback.plugin import FeedbackPlugin
+from ckanext.feedback.plugin import FeedbackPlugin, _reload_feedback_config
 from ckanext.feedback.services.common.config import FeedbackConfig
+from ckanext.feedback.services.common.search_index import prefetched_feedback_counts
 
 engine = model.repo.session.get_bind()
 
@@ -49,6 +50,49 @@ class TestPlugin:
         instance.update_config(config)
         assert FeedbackConfig().is_feedback_config_file is True
 
+    @patch.object(FeedbackPlugin, '_setup_solr_schema')
+    @patch('ckanext.feedback.plugin.search_index_service.start_solr_schema_setup')
+    def test_update_config_solr_schema_setup(
+        self, mock_start_solr_schema_setup, mock_setup_solr_schema
+    ):
+        instance = FeedbackPlugin()
+
+        # Set up in the background by default
+        instance.update_config(config)
+        mock_start_solr_schema_setup.assert_called_once_with()
+        mock_setup_solr_schema.assert_not_called()
+
+        config['ckan.feedback.custom_sort.schema_setup'] = 'startup'
+        instance.update_config(config)
+        mock_setup_solr_schema.assert_called_once_with()
+
+        config['ckan.feedback.custom_sort.schema_setup'] = 'none'
+        instance.update_config(config)
+        assert mock_start_solr_schema_setup.call_count == 1
+        assert mock_setup_solr_schema.call_count == 1
+        config.pop('ckan.feedback.custom_sort.schema_setup', None)
+
+    def test_make_middleware(self):
+        instance = FeedbackPlugin()
+        app = MagicMock()
+
+        assert instance.make_middleware(app, {}) is app
+        app.before_request.assert_not_called()
+
+        instance.make_middleware(app, {'ckan.feedback.config_reload_interval': '30'})
+        app.before_request.assert_called_once_with(_reload_feedback_config)
+
+    @patch('ckanext.feedback.plugin.FeedbackConfig')
+    def test_reload_feedback_config(self, mock_feedback_config):
+        mock_reload = (
+            mock_feedback_config.return_value.reload_feedback_config_if_changed
+        )
+        mock_reload.return_value = True
+
+        # Flask goes on with the request only when None is returned
+        assert _reload_feedback_config() is None
+        mock_reload.assert_called_once_with()
+
     def test_get_commands(self):
         instance = FeedbackPlugin()
         commands = instance.get_commands()
@@ -248,16 +292,10 @@ class TestPlugin:
         assert result == dataset
         assert dataset['extras'] == [{'key': 'already', 'value': 'exists'}]
 
-    @patch('ckanext.feedback.plugin.download_summary_service')
-    @patch('ckanext.feedback.plugin.utilization_summary_service')
     @patch('ckanext.feedback.plugin.resource_summary_service')
-    @patch('ckanext.feedback.plugin.resource_likes_service')
     def test_before_resource_show_with_True(
         self,
-        mock_resource_likes_service,
         mock_resource_summary_service,
-        mock_utilization_summary_service,
-        mock_download_summary_service,
     ):
         instance = FeedbackPlugin()
 
@@ -269,18 +307,21 @@ class TestPlugin:
         config[f"{FeedbackConfig().download.get_ckan_conf_str()}.enable"] = True
         config[f"{FeedbackConfig().like.get_ckan_conf_str()}.enable"] = True
 
-        mock_resource_summary_service.get_resource_comments.return_value = 9999
-        mock_resource_summary_service.get_resource_rating.return_value = 23.333
-        mock_utilization_summary_service.get_resource_utilizations.return_value = 9999
-        mock_utilization_summary_service.get_resource_issue_resolutions.return_value = (
-            9999
-        )
-        mock_download_summary_service.get_resource_downloads.return_value = 9999
-        mock_resource_likes_service.get_resource_like_count.return_value = 9999
+        mock_resource_summary_service.get_resource_feedback_stats.return_value = {
+            'downloads': 9999,
+            'utilizations': 9999,
+            'issue_resolutions': 9999,
+            'comments': 9999,
+            'rating': 23.333,
+            'like_count': 9999,
+        }
 
         resource = factories.Resource()
 
         instance.before_resource_show(resource)
+        mock_resource_summary_service.get_resource_feedback_stats.assert_called_with(
+            resource['package_id'], resource['id'], [resource['id']]
+        )
         assert resource[_('Downloads')] == 9999
         assert resource[_('Utilizations')] == 9999
         assert resource[_('Issue Resolutions')] == 9999
@@ -293,8 +334,42 @@ class TestPlugin:
         instance.before_resource_show(resource)
         assert resource[_('Rating')] == 23.3
 
+    @patch('ckanext.feedback.plugin.package_owner_service._load_package_owners')
+    @patch('ckanext.feedback.plugin.resource_summary_service')
+    def test_before_resource_show_after_dataset_view(
+        self,
+        mock_resource_summary_service,
+        mock_load_package_owners,
+    ):
+        instance = FeedbackPlugin()
+        config[f"{FeedbackConfig().download.get_ckan_conf_str()}.enable"] = True
+        mock_resource_summary_service.get_resource_feedback_stats.return_value = {
+            'downloads': 9999,
+        }
+        pkg_dict = {
+            'id': 'package-id',
+            'owner_org': 'org-id',
+            'extras': [],
+            'resources': [{'id': 'resource-a'}, {'id': 'resource-b'}],
+        }
+
+        with patch('flask.request', new_callable=MagicMock) as mock_request, patch(
+            'ckanext.feedback.plugin.package_summary_service'
+        ):
+            mock_request.endpoint = 'dataset.read'
+            instance.before_dataset_view(pkg_dict)
+        instance.before_resource_show({'id': 'resource-b', 'package_id': 'package-id'})
+
+        # The package is taken from the viewed dict instead of being loaded
+        mock_load_package_owners.assert_not_called()
+        mock_resource_summary_service.get_resource_feedback_stats.assert_called_with(
+            'package-id', 'resource-b', ['resource-a', 'resource-b']
+        )
+
+    @patch('ckanext.feedback.plugin.resource_summary_service')
     def test_before_resource_show_with_False(
         self,
+        mock_resource_summary_service,
     ):
         instance = FeedbackPlugin()
 
@@ -312,6 +387,7 @@ class TestPlugin:
 
         instance.before_resource_show(resource)
         assert before_resource == resource
+        mock_resource_summary_service.get_resource_feedback_stats.assert_not_called()
 
     @patch('ckanext.feedback.plugin.plugins.plugin_loaded')
     def test_before_resource_show_datastore_not_loaded(
@@ -366,18 +442,12 @@ class TestPlugin:
         # Should remain True (not modified)
         assert resource['datastore_active'] is True
 
-    @patch('ckanext.feedback.plugin.download_summary_service')
-    @patch('ckanext.feedback.plugin.utilization_summary_service')
     @patch('ckanext.feedback.plugin.resource_summary_service')
-    @patch('ckanext.feedback.plugin.resource_likes_service')
     @patch('ckanext.feedback.plugin._')
     def test_before_resource_show_with_translation(
         self,
         mock_translation,
-        mock_resource_likes_service,
         mock_resource_summary_service,
-        mock_utilization_summary_service,
-        mock_download_summary_service,
     ):
         instance = FeedbackPlugin()
 
@@ -403,12 +473,14 @@ class TestPlugin:
 
         mock_translation.side_effect = mock_translate
 
-        mock_resource_summary_service.get_resource_comments.return_value = 5
-        mock_resource_summary_service.get_resource_rating.return_value = 4.5
-        mock_utilization_summary_service.get_resource_utilizations.return_value = 3
-        mock_utilization_summary_service.get_resource_issue_resolutions.return_value = 2
-        mock_download_summary_service.get_resource_downloads.return_value = 10
-        mock_resource_likes_service.get_resource_like_count.return_value = 8
+        mock_resource_summary_service.get_resource_feedback_stats.return_value = {
+            'downloads': 10,
+            'utilizations': 3,
+            'issue_resolutions': 2,
+            'comments': 5,
+            'rating': 4.5,
+            'like_count': 8,
+        }
 
         resource = factories.Resource()
         # Add English keys that should be removed
@@ -527,7 +599,7 @@ class TestPlugin:
         result = instance._get_solr_url()
         assert result == 'http://solr:8983/solr/ckan'
 
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     def test_field_exists_in_solr_exception(self, mock_requests):
         """Test _field_exists_in_solr() when exception occurs"""
         instance = FeedbackPlugin()
@@ -535,52 +607,8 @@ class TestPlugin:
         result = instance._field_exists_in_solr('test_field')
         assert result is False
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
-    def test_add_solr_field_already_exists(self, mock_requests, mock_log):
-        """Test _add_solr_field() when field already exists"""
-        instance = FeedbackPlugin()
-        existing_fields = ['downloads_total_i', 'likes_total_i']
-        instance._add_solr_field(
-            'http://solr:8983/solr/ckan/schema', 'downloads_total_i', existing_fields
-        )
-        mock_log.debug.assert_called_once_with(
-            "Field 'downloads_total_i' already exists"
-        )
-        mock_requests.post.assert_not_called()
-
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
-    def test_add_solr_field_error_response(self, mock_requests, mock_log):
-        """Test _add_solr_field() when response status is not 200/201"""
-        instance = FeedbackPlugin()
-        mock_response = MagicMock()
-        mock_response.status_code = 500
-        mock_response.text = 'Internal Server Error'
-        mock_requests.post.return_value = mock_response
-        instance._add_solr_field('http://solr:8983/solr/ckan/schema', 'test_field', [])
-        mock_log.error.assert_called_once()
-        assert 'Failed to add' in str(mock_log.error.call_args)
-
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
-    def test_add_solr_field_request_exception(self, mock_requests, mock_log):
-        """Test _add_solr_field() when RequestException occurs"""
-        instance = FeedbackPlugin()
-        # Set requests.exceptions to the real module so exceptions can be caught
-        import requests.exceptions
-
-        mock_requests.exceptions = requests.exceptions
-        # Create a real RequestException instance
-        from requests.exceptions import RequestException
-
-        mock_requests.post.side_effect = RequestException('Timeout')
-        instance._add_solr_field('http://solr:8983/solr/ckan/schema', 'test_field', [])
-        mock_log.error.assert_called_once()
-        assert 'Error adding' in str(mock_log.error.call_args)
-
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     def test_setup_solr_schema_api_not_200(self, mock_requests, mock_log):
         """Test _setup_solr_schema() when Schema API returns non-200 status"""
         instance = FeedbackPlugin()
@@ -604,8 +632,8 @@ class TestPlugin:
         mock_log.warning.assert_called_once()
         assert 'Schema API returned status' in str(mock_log.warning.call_args)
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     def test_setup_solr_schema_api_exception(self, mock_requests, mock_log):
         """Test _setup_solr_schema() when Schema API request fails"""
         instance = FeedbackPlugin()
@@ -637,8 +665,8 @@ class TestPlugin:
         warning_calls = [str(call) for call in mock_log.warning.call_args_list]
         assert any('Schema API not available' in call for call in warning_calls)
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     def test_setup_solr_schema_unexpected_exception(self, mock_requests, mock_log):
         """Test _setup_solr_schema() when unexpected exception occurs"""
         instance = FeedbackPlugin()
@@ -687,7 +715,7 @@ class TestPlugin:
         mock_likes_service.get_package_like_count.assert_not_called()
 
     @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.plugin.download_summary_service')
     @patch('ckanext.feedback.plugin.resource_likes_service')
     def test_before_dataset_index_field_not_exists(
@@ -718,9 +746,12 @@ class TestPlugin:
         assert 'downloads_total_i' not in result
         assert 'likes_total_i' not in result
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
-    def test_setup_solr_schema_with_download_and_likes(self, mock_requests, mock_log):
+    @patch('ckanext.feedback.plugin.search_index_service.invalidate_solr_field_cache')
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
+    def test_setup_solr_schema_with_download_and_likes(
+        self, mock_requests, mock_log, mock_invalidate_solr_field_cache
+    ):
         """Test _setup_solr_schema() when downloads and likes are enabled"""
         instance = FeedbackPlugin()
         instance.fb_config = FeedbackConfig()
@@ -751,9 +782,10 @@ class TestPlugin:
         # Verify that both fields were attempted to be added
         assert mock_requests.post.call_count == 2
         mock_log.info.assert_any_call("Solr schema setup completed")
+        mock_invalidate_solr_field_cache.assert_called_once_with()
 
     @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.plugin.download_summary_service')
     @patch('ckanext.feedback.plugin.resource_likes_service')
     @patch('ckanext.feedback.plugin.config')
@@ -814,8 +846,68 @@ class TestPlugin:
         assert result['downloads_total_i'] == 100
         assert result['likes_total_i'] == 50
 
+    @patch.object(FeedbackPlugin, '_field_exists_in_solr', return_value=True)
+    @patch(
+        'ckanext.feedback.services.common.search_index.resource_likes_service'
+        '.get_package_like_count_bulk'
+    )
+    @patch(
+        'ckanext.feedback.services.common.search_index.download_summary_service'
+        '.get_package_downloads_bulk'
+    )
+    @patch('ckanext.feedback.plugin.download_summary_service')
+    @patch('ckanext.feedback.plugin.resource_likes_service')
+    def test_before_dataset_index_uses_prefetched_counts(
+        self,
+        mock_likes_service,
+        mock_download_service,
+        mock_downloads_bulk,
+        mock_likes_bulk,
+        mock_field_exists_in_solr,
+    ):
+        instance = FeedbackPlugin()
+        instance.fb_config = FeedbackConfig()
+        feedback_config = {
+            'modules': {
+                'custom_sort': {'enable': True},
+                'download': {'enable': True},
+                'like': {'enable': True},
+            }
+        }
+        with open('/srv/app/feedback_config.json', 'w') as f:
+            json.dump(feedback_config, f, indent=2)
+        instance.fb_config.load_feedback_config()
+        mock_downloads_bulk.return_value = {'package-a': 100}
+        mock_likes_bulk.return_value = {'package-b': 50}
+
+        with prefetched_feedback_counts(['package-a', 'package-b']):
+            result_a = instance.before_dataset_index(
+                {'id': 'package-a', 'owner_org': None}
+            )
+            result_b = instance.before_dataset_index(
+                {'id': 'package-b', 'owner_org': None}
+            )
+
+        assert result_a['downloads_total_i'] == 100
+        assert result_a['likes_total_i'] == 0
+        assert result_b['downloads_total_i'] == 0
+        assert result_b['likes_total_i'] == 50
+        mock_download_service.get_package_downloads.assert_not_called()
+        mock_likes_service.get_package_like_count.assert_not_called()
+
+        # Packages that were not prefetched are queried one by one
+        mock_download_service.get_package_downloads.return_value = 3
+        mock_likes_service.get_package_like_count.return_value = 1
+        with prefetched_feedback_counts(['package-a']):
+            result = instance.before_dataset_index(
+                {'id': 'package-c', 'owner_org': None}
+            )
+
+        assert result['downloads_total_i'] == 3
+        assert result['likes_total_i'] == 1
+
     @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.plugin.download_summary_service')
     @patch('ckanext.feedback.plugin.resource_likes_service')
     def test_before_dataset_index_custom_sort_disabled(
@@ -844,7 +936,7 @@ class TestPlugin:
         mock_likes_service.get_package_like_count.assert_not_called()
 
     @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.plugin.download_summary_service')
     @patch('ckanext.feedback.plugin.resource_likes_service')
     def test_before_dataset_index_no_owner_org(
@@ -887,8 +979,44 @@ class TestPlugin:
         result = instance.before_dataset_view(pkg_dict)
         assert result == pkg_dict
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.plugin.package_summary_service')
+    def test_after_dataset_create(self, mock_package_summary_service):
+        instance = FeedbackPlugin()
+        instance.after_dataset_create({}, {'id': 'test-package-id'})
+
+        mock_refresh = mock_package_summary_service.refresh_package_feedback_summary
+        mock_refresh.assert_called_once_with(['test-package-id'])
+
+    @patch('ckanext.feedback.plugin.stats_cache_service')
+    @patch('ckanext.feedback.plugin.ranking_service')
+    @patch('ckanext.feedback.plugin.package_summary_service')
+    def test_after_dataset_update(
+        self,
+        mock_package_summary_service,
+        mock_ranking_service,
+        mock_stats_cache_service,
+    ):
+        instance = FeedbackPlugin()
+        instance.after_dataset_update({}, {'id': 'test-package-id'})
+
+        mock_refresh = mock_package_summary_service.refresh_package_feedback_summary
+        mock_refresh.assert_called_once_with(['test-package-id'])
+        mock_ranking_service.refresh_package_metric_monthly.assert_called_once_with(
+            ['test-package-id']
+        )
+        mock_stats_cache_service.invalidate_package_stats.assert_called_once_with(
+            ['test-package-id']
+        )
+
+    @patch('ckanext.feedback.plugin.ranking_cache_service')
+    def test_after_dataset_delete(self, mock_ranking_cache_service):
+        instance = FeedbackPlugin()
+        instance.after_dataset_delete({}, {'id': 'test-package-id'})
+
+        mock_ranking_cache_service.invalidate_ranking_cache.assert_called_once_with()
+
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     def test_setup_solr_schema_custom_sort_disabled_direct(
         self, mock_requests, mock_log
     ):
@@ -914,8 +1042,8 @@ class TestPlugin:
             "Custom sort feature is disabled in feedback_config.json"
         )
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.services.common.config.config')
     def test_setup_solr_schema_download_disabled(
         self, mock_config, mock_requests, mock_log
@@ -967,8 +1095,8 @@ class TestPlugin:
         call_args = mock_requests.post.call_args
         assert 'likes_total_i' in str(call_args)
 
-    @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.log')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.services.common.config.config')
     def test_setup_solr_schema_like_disabled(
         self, mock_config, mock_requests, mock_log
@@ -1021,7 +1149,7 @@ class TestPlugin:
         assert 'downloads_total_i' in str(call_args)
 
     @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.plugin.download_summary_service')
     @patch('ckanext.feedback.plugin.resource_likes_service')
     def test_before_dataset_index_downloads_field_not_exists(
@@ -1070,7 +1198,7 @@ class TestPlugin:
         mock_download_service.get_package_downloads.assert_not_called()
 
     @patch('ckanext.feedback.plugin.log')
-    @patch('ckanext.feedback.plugin.requests')
+    @patch('ckanext.feedback.services.common.search_index.requests')
     @patch('ckanext.feedback.plugin.download_summary_service')
     @patch('ckanext.feedback.plugin.resource_likes_service')
     def test_before_dataset_index_likes_field_not_exists(
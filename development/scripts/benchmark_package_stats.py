@@ -0,0 +1,98 @@
+"""Benchmark of the package feedback stats query
+
+Compares get_package_feedback_stats_bulk, which fetches all metrics with a
+single query, with the per-metric queries it replaced. Run it in the CKAN
+container against a database with feedback data:
+
+    python3 development/scripts/benchmark_package_stats.py \\
+        -c /srv/app/ckan.ini --packages 20 --repeat 50
+"""
+
+import argparse
+import statistics
+import time
+
+from ckan import model
+from ckan.cli import load_config
+from ckan.config.middleware import make_app
+from sqlalchemy import event
+
+from ckanext.feedback.models.session import session
+from ckanext.feedback.services.download import summary as download_summary_service
+from ckanext.feedback.services.package import summary as package_summary_service
+from ckanext.feedback.services.resource import likes as resource_likes_service
+from ckanext.feedback.services.resource import summary as resource_summary_service
+from ckanext.feedback.services.utilization import summary as utilization_summary_service
+
+
+def get_stats_per_metric(packages):
+    """The six grouped queries used before the single query"""
+    package_ids = [p['id'] for p in packages]
+    resource_likes_service.get_package_like_count_bulk(package_ids)
+    download_summary_service.get_package_downloads_bulk(package_ids)
+    utilization_summary_service.get_package_utilizations_bulk(package_ids)
+    resource_summary_service.get_package_comments_bulk(package_ids)
+    resource_summary_service.get_package_rating_bulk(package_ids)
+    utilization_summary_service.get_package_issue_resolutions_bulk(package_ids)
+
+
+def get_stats_single_query(packages):
+    package_summary_service.get_package_feedback_stats_bulk(packages)
+
+
+def run(name, func, packages, repeat):
+    queries = []
+
+    def count_query(*args):
+        queries.append(1)
+
+    engine = session.get_bind()
+    event.listen(engine, 'before_cursor_execute', count_query)
+    try:
+        # Warm up the connection pool and the statement cache
+        func(packages)
+        queries.clear()
+
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(packages)
+            durations.append((time.perf_counter() - start) * 1000)
+            session.rollback()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_query)
+
+    durations.sort()
+    p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+    print(
+        f'{name:<14} queries/call={len(queries) / repeat:.0f} '
+        f'median={statistics.median(durations):.2f}ms p95={p95:.2f}ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-c', '--config', required=True, help='CKAN config file')
+    parser.add_argument(
+        '--packages', type=int, default=20, help='number of packages per call'
+    )
+    parser.add_argument('--repeat', type=int, default=50, help='number of calls')
+    args = parser.parse_args()
+
+    app = make_app(load_config(args.config))
+    with app._wsgi_app.test_request_context():
+        packages = [
+            {'id': package_id}
+            for (package_id,) in (
+                session.query(model.Package.id)
+                .filter(model.Package.state == 'active')
+                .limit(args.packages)
+            )
+        ]
+        print(f'{len(packages)} packages, {args.repeat} calls')
+        run('per-metric', get_stats_per_metric, packages, args.repeat)
+        run('single query', get_stats_single_query, packages, args.repeat)
+
+
+if __name__ == '__main__':
+    main()